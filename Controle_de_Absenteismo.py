@@ -5,15 +5,36 @@ from unidecode import unidecode
 import io
 import datetime
 import sys
-from dateutil.relativedelta import relativedelta
+import time
 import re
 import openpyxl
 from openpyxl.styles import PatternFill, Font, Alignment
 from openpyxl.utils import get_column_letter
 from difflib import SequenceMatcher
 import plotly.express as px
-from copy import copy
-from openpyxl import load_workbook, Workbook
+from funcoes_lancamento import (
+    IndiceNomes, extrair_dia_do_cabecalho, montar_tabela_lancamentos,
+    resolver_lancamentos_arquivo, aplicar_lancamentos_em_bloco
+)
+from funcoes_calendario import (
+    montar_calendario, indexar_calendario, feriados_do_calendario, feriados_do_ano,
+    semanas_do_periodo, preencher_fins_de_semana
+)
+from funcoes_matriz_presenca import MatrizPresenca, chave_nome, detectar_afastamentos_no_dataframe
+from funcoes_fatos_abs import TabelaFatosAbs
+from funcoes_genero import IndiceGenero
+from funcoes_enriquecimento import IndiceFuzzyNomes, tempo_de_servico, SEM_DADO
+from funcoes_exportacao import (
+    renderizar_aba_dados, criar_aba, BORDA_CELULAS, calcular_porcentagens_abs, ValoresSemFormulas,
+    TERMOS_GRUPOS_PORCENTAGENS, COLUNA_GRUPO_AREA, FormulasPorcentagens, classificar_grupos_area
+)
+from funcoes_leitura_arquivos import (
+    ler_planilhas_em_paralelo, ler_planilha_cache, obter_info_planilha,
+    detectar_config_com_memoria, letras_colunas, carregar_planilha_mestra, hash_conteudo
+)
+from funcoes_leitura_csv import ler_csv_detectando, descrever_dialeto
+from funcoes_base_ativos import BaseAtivos, carregar_base_ativos
+from funcoes_reconciliacao import reconciliar_mestra, resumo_reconciliacao
 
 # Nota: A página "👥 Colaboradores" foi criada em pages/1_👥_Colaboradores.py
 # Ela será exibida automaticamente pelo Streamlit como uma página multipage
@@ -21,89 +42,32 @@ st.sidebar.caption("Versão v2.5 - Ordenação Impacto (Atualizado)")
 
 def obter_feriados_brasil(ano):
     """
-    Busca feriados nacionais do Brasil para um ano específico via API Brasil API.
-    Retorna um dicionário {data: nome_feriado}
+    Retorna os feriados do ano {data: nome_feriado}, calculados localmente
+    (nacionais, móveis da Páscoa e regionais do RJ) e memorizados por ano.
+    A Brasil API só é consultada se a opção de atualização online estiver ativa;
+    se ela falhar, avisa e usa só o cálculo local.
     """
-    import requests
-    feriados = {}
-    try:
-        url = f"https://brasilapi.com.br/api/feriados/v1/{ano}"
-        response = requests.get(url, timeout=5)
-        if response.status_code == 200:
-            dados = response.json()
-            for feriado in dados:
-                try:
-                    data = datetime.datetime.strptime(feriado['date'], '%Y-%m-%d').date()
-                    nome = feriado.get('name', 'Feriado')
-                    feriados[data] = nome
-                except:
-                    pass
-    except Exception as e:
-        print(f"Erro ao buscar feriados: {e}")
-    
+    feriados, erro_api = feriados_do_ano(ano, consultar_api=st.session_state.get('feriados_api', False))
+    if erro_api:
+        st.warning(f"⚠️ Brasil API indisponível para {ano} ({erro_api}). Usando apenas o calendário local de feriados.")
     return feriados
 
-def marcar_feriados_na_workbook(workbook, feriados, mapa_datas, mapa_cores):
-    """
-    Marca colunas inteiras de feriados na workbook como "FERIADO" (sobrescreve tudo)
-    """
-    if not feriados:
-        return
-    
-    for sheet_name in workbook.sheetnames:
-        if sheet_name == 'Dados':
-            ws = workbook[sheet_name]
-            
-            # Para cada feriado, marca a coluna inteira
-            for data_feriado, nome_feriado in feriados.items():
-                if data_feriado in mapa_datas:
-                    col_data = mapa_datas[data_feriado]
-                    col_idx = list(ws[1]) 
-                    
-                    # Procura a coluna pela data
-                    for col_letter_idx, cell in enumerate(ws[1], 1):
-                        if cell.value == col_data or str(cell.value) == str(col_data):
-                            # Marca toda a coluna (exceto header) como FERIADO
-                            for row_idx in range(2, ws.max_row + 1):
-                                cell_data = ws.cell(row=row_idx, column=col_letter_idx)
-                                cell_data.value = "FERIADO"
-                                # Aplica cor preta com texto branco
-                                if 'FERIADO' in mapa_cores:
-                                    cell_data.fill = PatternFill(
-                                        start_color=mapa_cores['FERIADO'],
-                                        end_color=mapa_cores['FERIADO'],
-                                        fill_type='solid'
-                                    )
-                                    cell_data.font = Font(color='FFFFFFFF')  # Texto branco
-                            break
-
-def eh_fim_de_semana(data):
-
-    """Retorna True se é sábado (5) ou domingo (6)"""
-    return data.weekday() in [5, 6]
-
-def ler_dataframe_do_workbook(workbook):
+def montar_calendario_periodo(mapa_datas, ano=None, mes=None):
     """
-    Lê o dataframe da sheet 'Dados' do workbook (após marcações de FERIADO e AFASTAMENTO)
-    Retorna um pandas DataFrame com os dados atualizados
+    Monta o calendário do período (uma vez por processamento), com os feriados
+    de todos os anos envolvidos. ano/mes são usados quando mapa_datas está vazio.
     """
-    ws = workbook['Dados']
-    dados = []
-    
-    # Lê header
-    header = []
-    for cell in ws[1]:
-        header.append(cell.value)
-    
-    # Lê dados
-    for row_idx in range(2, ws.max_row + 1):
-        row_data = {}
-        for col_idx, col_name in enumerate(header, 1):
-            cell = ws.cell(row=row_idx, column=col_idx)
-            row_data[col_name] = cell.value
-        dados.append(row_data)
-    
-    return pd.DataFrame(dados)
+    anos = {d.year for d in mapa_datas.keys()} or ({ano} if ano else set())
+    feriados = {}
+    for ano_feriado in sorted(anos):
+        feriados.update(obter_feriados_brasil(ano_feriado))
+    return montar_calendario(mapa_datas, feriados, ano, mes)
+
+def registrar_tempo_etapa(tempos_etapas, etapa, inicio):
+    """Registra (etapa, segundos desde inicio) e devolve o novo instante de início."""
+    agora = time.perf_counter()
+    tempos_etapas.append((etapa, agora - inicio))
+    return agora
 
 def calcular_similaridade(s1, s2):
     """Calcula similaridade entre duas strings (0 a 1)"""
@@ -114,76 +78,14 @@ def limpar_nome(nome):
         return unidecode(nome).upper().strip()
     return ""
 
-def chave_nome(nome):
-    """Normaliza nome para comparação exata, colapsando espaços e removendo acentos."""
-    texto = unidecode(str(nome)).upper().strip()
-    texto = re.sub(r'\s+', ' ', texto)
-    return texto
-
 def normalizar_coluna(nome_coluna):
     texto = unidecode(str(nome_coluna)).upper()
     return re.sub(r'[^A-Z0-9]', '', texto)
 
-def identificar_colunas_datas_workbook(workbook, mapa_datas):
-    """
-    Identifica as colunas de data da aba Dados comparando os cabeçalhos já
-    formatados do workbook com as datas conhecidas em mapa_datas.
-    """
-    if workbook is None or not mapa_datas:
-        return []
-
-    ws = workbook['Dados']
-    header = [cell.value for cell in ws[1]]
-
-    mapa_chaves_data = {}
-    for data_obj, nome_coluna in mapa_datas.items():
-        candidatos = {
-            normalizar_coluna(nome_coluna),
-            normalizar_coluna(data_obj.strftime('%d/%m')),
-            normalizar_coluna(data_obj.strftime('%d/%m/%Y')),
-            normalizar_coluna(data_obj.strftime('%Y-%m-%d')),
-        }
-        for candidato in candidatos:
-            mapa_chaves_data[candidato] = data_obj
-
-    colunas_datas = []
-    for idx, col_name in enumerate(header, 1):
-        chave = normalizar_coluna(col_name)
-        data_obj = mapa_chaves_data.get(chave)
-        if isinstance(data_obj, datetime.datetime):
-            data_obj = data_obj.date()
-        if isinstance(data_obj, datetime.date):
-            colunas_datas.append((idx, data_obj))
-
-    return colunas_datas
-
 def nomes_compatíveis(nome_a, nome_b):
     """Compara nomes de forma exata após normalização canônica."""
     return chave_nome(nome_a) == chave_nome(nome_b)
 
-def mapear_linhas_por_nome(workbook):
-    """Cria um mapa de nomes normalizados para as linhas da aba Dados."""
-    if workbook is None or 'Dados' not in workbook.sheetnames:
-        return {}
-
-    ws = workbook['Dados']
-    header = [cell.value for cell in ws[1]]
-    try:
-        col_nome = header.index('NOME') + 1
-    except ValueError:
-        try:
-            col_nome = header.index('Nome') + 1
-        except ValueError:
-            col_nome = 1
-
-    mapa_linhas = {}
-    for row_idx in range(2, ws.max_row + 1):
-        nome_linha = chave_nome(ws.cell(row=row_idx, column=col_nome).value)
-        if nome_linha:
-            mapa_linhas.setdefault(nome_linha, []).append(row_idx)
-
-    return mapa_linhas
-
 def detectar_coluna_colaborador(df_csv):
     """Detecta a coluna de colaborador com fallback para a 4a coluna (indice 3)."""
     if df_csv is None or df_csv.empty:
@@ -238,7 +140,7 @@ def extrair_nomes_detectados_csv(df_csv, coluna_principal='COLABORADOR'):
 
 def ler_tabela_robusta(arquivo):
     """
-    Lê CSV/XLSX tentando diferentes separadores, encodings e linhas de cabeçalho.
+    Lê CSV/XLSX detectando encoding, separador e linha de cabeçalho (uma única leitura).
     """
     if arquivo is None:
         return None
@@ -248,98 +150,14 @@ def ler_tabela_robusta(arquivo):
         if arquivo.name.endswith('.xlsx'):
             return pd.read_excel(arquivo)
 
-        encodings = ['latin-1', 'utf-8', 'iso-8859-1', 'cp1252']
-        separadores = [';', ',', '\t']
-        melhor_df = None
-        melhor_pontuacao = -1
-
-        for enc in encodings:
-            for sep in separadores:
-                for skiprows in [0, 1]:
-                    try:
-                        arquivo.seek(0)
-                        df = pd.read_csv(
-                            arquivo,
-                            encoding=enc,
-                            sep=sep,
-                            header=0,
-                            skiprows=skiprows,
-                            engine='python' if sep in ['\t', '|'] else 'c'
-                        )
-                        if len(df.columns) <= 1:
-                            continue
-
-                        colunas_norm = {normalizar_coluna(col) for col in df.columns}
-                        pontuacao = 0
-                        if 'COLABORADOR' in colunas_norm:
-                            pontuacao += 3
-                        if any('RESCISAO' in col or 'RECISAO' in col for col in colunas_norm):
-                            pontuacao += 3
-                        if 'STATUS' in colunas_norm:
-                            pontuacao += 1
-                        if any('GOZO' in col for col in colunas_norm):
-                            pontuacao += 1
-
-                        if pontuacao > melhor_pontuacao:
-                            melhor_pontuacao = pontuacao
-                            melhor_df = df
-                    except Exception:
-                        continue
+        df, _ = ler_csv_detectando(arquivo)
+        if len(df.columns) <= 1:
+            return None
     except Exception:
         return None
 
-    return melhor_df
-
-
-def carregar_csv_colaboradores_robusto(arquivo, min_colunas=4):
-    """
-    Lê CSV/XLSX de colaboradores/base de ativos com tolerância a encoding,
-    separador e linha-título extra.
-
-    Retorna:
-    - (df, erro)
-    """
-    if arquivo is None:
-        return None, None
-
-    try:
-        arquivo.seek(0)
-        if arquivo.name.endswith('.xlsx'):
-            return pd.read_excel(arquivo, header=None), None
-
-        encodings = ['latin-1', 'iso-8859-1', 'cp1252', 'utf-8-sig', 'utf-8']
-        tentativas = [
-            {'sep': ';', 'skiprows': 1},
-            {'sep': ';', 'skiprows': 0},
-            {'sep': ',', 'skiprows': 1},
-            {'sep': ',', 'skiprows': 0},
-            {'sep': '\t', 'skiprows': 1},
-            {'sep': '|', 'skiprows': 1},
-        ]
-
-        ultimo_erro = None
-        for enc in encodings:
-            for tentativa in tentativas:
-                try:
-                    arquivo.seek(0)
-                    df = pd.read_csv(
-                        arquivo,
-                        encoding=enc,
-                        sep=tentativa['sep'],
-                        skiprows=tentativa['skiprows'],
-                        header=0,
-                        engine='python',
-                        on_bad_lines='skip'
-                    )
-                    if df is not None and len(df.columns) >= min_colunas:
-                        return df, None
-                except Exception as e:
-                    ultimo_erro = f"Erro com encoding={enc}, sep={tentativa['sep']}: {str(e)}"
-                    continue
+    return df
 
-        return None, ultimo_erro or 'Não foi possível ler o CSV de colaboradores.'
-    except Exception as e:
-        return None, str(e)
 
 def encontrar_linha_nome(ws, nome_procurado, col_nome_excel=1):
     """Encontra a linha de um colaborador na aba Dados usando nome normalizado."""
@@ -361,14 +179,20 @@ def carregar_csv_demitidos(arquivo_demitidos):
     """
     return ler_tabela_robusta(arquivo_demitidos)
 
-def aplicar_ferias_na_workbook(workbook, df_ferias, mapa_datas):
+def linhas_por_nome_csv(nomes, matriz):
+    """Explode cada nome (já limpo) nas linhas compatíveis da matriz: Série posição-da-linha alinhada aos registros."""
+    mapa_linhas = matriz.mapa_linhas()
+    linhas_por_nome = {nome: encontrar_linhas_compativeis(nome, mapa_linhas) for nome in nomes.unique()}
+    return nomes.map(linhas_por_nome).explode().dropna().astype(int)
+
+def intervalos_ferias(matriz, df_ferias):
     """
-    Marca FÉRIAS-BH na sheet Dados para o período de gozo informado no CSV.
-    Apenas as datas existentes no mês carregado são pintadas.
-    Retorna a quantidade de células aplicadas.
+    Intervalos de gozo do CSV de férias, um por registro x linha compatível da matriz.
+    Retorna (linhas, inicios, fins); datas fora do mês carregado não geram células.
     """
-    if df_ferias is None or df_ferias.empty or not mapa_datas:
-        return 0
+    vazio = ([], [], [])
+    if df_ferias is None or df_ferias.empty or not len(matriz.datas):
+        return vazio
 
     col_nome = detectar_coluna_colaborador(df_ferias)
     col_status = None
@@ -385,7 +209,7 @@ def aplicar_ferias_na_workbook(workbook, df_ferias, mapa_datas):
             col_fim = col
 
     if col_nome is None or col_status is None or col_inicio is None or col_fim is None:
-        return 0
+        return vazio
 
     df_aux = df_ferias[[col_nome, col_status, col_inicio, col_fim]].copy()
     df_aux[col_nome] = df_aux[col_nome].astype(str).apply(limpar_nome)
@@ -401,59 +225,39 @@ def aplicar_ferias_na_workbook(workbook, df_ferias, mapa_datas):
     ]
 
     if df_aux.empty:
-        return 0
-
-    ws = workbook['Dados']
-
-    colunas_datas = identificar_colunas_datas_workbook(workbook, mapa_datas)
-
-    if not colunas_datas:
-        return 0
-
-    datas_mestra = [data_coluna for _, data_coluna in colunas_datas if isinstance(data_coluna, datetime.date)]
-    if not datas_mestra:
-        return 0
+        return vazio
 
-    primeira_data_mestra = min(datas_mestra)
-    ultima_data_mestra = max(datas_mestra)
+    linhas = linhas_por_nome_csv(df_aux[col_nome], matriz)
+    registros = df_aux.loc[linhas.index]
+    return linhas.to_numpy(), registros[col_inicio].to_numpy(), registros[col_fim].to_numpy()
 
-    mapa_linhas = mapear_linhas_por_nome(workbook)
-
-    # Usa o primeiro registro válido por colaborador, caso existam duplicados.
-    df_aux = df_aux.sort_values(by=[col_nome, col_inicio, col_fim])
-    aplicados = 0
-
-    for _, row in df_aux.iterrows():
-        nome_excel = chave_nome(row[col_nome])
-        data_inicio = row[col_inicio].date()
-        data_fim = row[col_fim].date()
-
-        if data_fim < primeira_data_mestra or data_inicio > ultima_data_mestra:
-            continue
-
-        data_inicio = max(data_inicio, primeira_data_mestra)
-        data_fim = min(data_fim, ultima_data_mestra)
-
-        linhas_compativeis = encontrar_linhas_compativeis(nome_excel, mapa_linhas)
-        for row_idx in linhas_compativeis:
-            for col_idx, data_coluna in colunas_datas:
-                if data_inicio <= data_coluna <= data_fim:
-                    cell = ws.cell(row=row_idx, column=col_idx)
-                    if str(cell.value).strip().upper() == 'DESLIGADO':
-                        continue
-                    cell.value = 'FÉRIAS-BH'
-                    cell.fill = PatternFill(start_color=MAPA_CORES['FÉRIAS-BH'], end_color=MAPA_CORES['FÉRIAS-BH'], fill_type='solid')
-                    cell.font = Font(color='FFFFFFFF')
-                    aplicados += 1
-
-    return aplicados
-
-def aplicar_desligados_na_workbook(workbook, df_demitidos, mapa_datas):
+def aplicar_ferias_na_matriz(matriz, lista_df_ferias):
     """
-    Marca DESLIGADO na sheet Dados a partir da data de rescisão para cada colaborador.
-    Retorna a quantidade de registros aplicados.
+    Marca FÉRIAS-BH na matriz de presença para os períodos de gozo de um ou mais
+    arquivos de férias. Os intervalos (linha, início, fim) de cada arquivo viram
+    uma máscara em uma comparação só com o vetor de datas, e a união é gravada
+    de uma vez. Apenas as datas existentes no mês carregado são marcadas
+    (DESLIGADO é mantido).
+    Retorna a quantidade de células de cada arquivo (na ordem de lista_df_ferias).
     """
-    if df_demitidos is None or df_demitidos.empty or not mapa_datas:
+    contagens = []
+    mascara_total = None
+    for df_ferias in lista_df_ferias:
+        mascara = matriz.mascara_intervalos(*intervalos_ferias(matriz, df_ferias))
+        contagens.append(int(matriz.alvo_mascara(mascara, preservar=['DESLIGADO']).sum()))
+        mascara_total = mascara if mascara_total is None else (mascara_total | mascara)
+
+    if mascara_total is not None:
+        matriz.marcar_mascara(mascara_total, 'FÉRIAS-BH', preservar=['DESLIGADO'])
+    return contagens
+
+def aplicar_desligados_na_matriz(matriz, df_demitidos):
+    """
+    Marca DESLIGADO na matriz de presença a partir da data de rescisão para cada colaborador.
+    Desligamentos do tipo 5TRANSFERENCIASEMONUS não são aplicados.
+    Retorna a quantidade de células aplicadas.
+    """
+    if df_demitidos is None or df_demitidos.empty or not len(matriz.datas):
         return 0
 
     col_nome = detectar_coluna_colaborador(df_demitidos)
@@ -499,352 +303,15 @@ def aplicar_desligados_na_workbook(workbook, df_demitidos, mapa_datas):
         return 0
 
     # Usa a menor data de rescisão por colaborador, caso haja mais de um registro.
-    mapa_demitidos = (
-        df_aux.groupby(col_nome)[col_data_rescisao]
-        .min()
-        .to_dict()
-    )
-
-    ws = workbook['Dados']
-    mapa_linhas = mapear_linhas_por_nome(workbook)
-
-    colunas_datas = identificar_colunas_datas_workbook(workbook, mapa_datas)
-
-    if not colunas_datas:
-        return 0
-
-    datas_mestra = [data_coluna for _, data_coluna in colunas_datas if isinstance(data_coluna, datetime.date)]
-    if not datas_mestra:
-        return 0
-
-    primeira_data_mestra = min(datas_mestra)
-    ultima_data_mestra = max(datas_mestra)
-
-    aplicados = 0
-    for nome_csv, data_rescisao_ts in mapa_demitidos.items():
-        linhas_compativeis = encontrar_linhas_compativeis(nome_csv, mapa_linhas)
-        if not linhas_compativeis:
-            continue
-
-        data_rescisao = data_rescisao_ts.date()
-        if data_rescisao > ultima_data_mestra:
-            continue
-
-        data_inicio_aplicacao = max(data_rescisao, primeira_data_mestra)
-        for row_idx in linhas_compativeis:
-            for col_idx, data_coluna in colunas_datas:
-                if isinstance(data_coluna, datetime.date) and data_inicio_aplicacao <= data_coluna <= ultima_data_mestra:
-                    cell = ws.cell(row=row_idx, column=col_idx)
-                    cell.value = 'DESLIGADO'
-                    cell.fill = PatternFill(start_color=MAPA_CORES['DESLIGADO'], end_color=MAPA_CORES['DESLIGADO'], fill_type='solid')
-                    cell.font = Font(color='FFFFFFFF')
-                    aplicados += 1
-
-    return aplicados
-
-def extrair_dia_do_cabecalho(label_dia, mes, ano):
-    """
-    Extrai a data do cabeçalho da coluna, detectando automaticamente o formato.
-    Aceita: "01/nov", "01/11", "01", "1/nov", "1/11", etc.
-    """
-    if pd.isna(label_dia):
-        return None
-    
-    label_str = str(label_dia).strip().lower()
-    
-    # Mapa de meses em português (tanto nomes curtos quanto abreviações)
-    mapa_mes_curto = {'jan': 1, 'fev': 2, 'mar': 3, 'abr': 4, 'mai': 5, 'jun': 6, 
-                      'jul': 7, 'ago': 8, 'set': 9, 'out': 10, 'nov': 11, 'dez': 12}
-    
-    dia_num = None
-    mes_encontrado = None
-    
-    # Formato 1: "DD/mmm" ou "D/mmm" (ex: "01/nov", "1/nov")
-    for nome_mes, num_mes in mapa_mes_curto.items():
-        if nome_mes in label_str:
-            if num_mes == mes:
-                mes_encontrado = num_mes
-                # Extrair número antes do mês
-                parts = label_str.split(nome_mes)
-                if parts[0]:
-                    try:
-                        # Remove tudo que não é número
-                        dia_num = int("".join(filter(str.isdigit, parts[0])))
-                    except:
-                        pass
-            if mes_encontrado is not None:
-                break
-    
-    # Formato 2: "DD/MM" ou "D/M" (ex: "01/11", "1/11")
-    if mes_encontrado is None:
-        # Tenta com separadores comuns: /, -, .
-        partes = re.split(r'[/.\-]', label_str.strip())
-        if len(partes) >= 2:
-            try:
-                dia_candidato = int(partes[0].strip())
-                mes_candidato = int(partes[1].strip())
-                # Valida se é o mês certo e dia válido
-                if mes_candidato == mes and 1 <= dia_candidato <= 31:
-                    dia_num = dia_candidato
-                    mes_encontrado = mes_candidato
-            except:
-                pass
-    
-    # Formato 3: "DD" (só o dia, sem separador)
-    if mes_encontrado is None:
-        try:
-            # Se for só número, assume que é o dia
-            dia_num = int(label_str.strip())
-            if 1 <= dia_num <= 31:
-                mes_encontrado = mes
-        except:
-            pass
-    
-    # Se encontrou dia e mês válidos, retornar data
-    if dia_num is not None and mes_encontrado == mes and 1 <= dia_num <= 31:
-        try:
-            return datetime.date(ano, mes, dia_num)
-        except:
-            pass
-    
-    return None
-    
-    return None
-
-    return None
-
-def marcar_afastamentos_na_workbook(workbook, mapa_cores, afastamentos=None, df_mest=None, mapa_datas=None):
-    """
-    Marca células como "Afastamento" onde foi detectado afastamento (>15 FA em sequência).
-    Usa os dados de afastamentos detectados pela função detectar_afastamentos_no_dataframe().
-    
-    Parâmetros:
-    - workbook: openpyxl Workbook
-    - mapa_cores: dicionário de cores
-    - afastamentos: dicionário {index_row: [(col_inicio, col_fim), ...]}
-    - df_mest: dataframe original (para mapear índices para linhas)
-    - mapa_datas: dicionário de mapeamento de datas
-    """
-    if not afastamentos or df_mest is None or mapa_datas is None:
-        return
-    
-    ws = workbook['Dados']
-    
-    # Pega todas as colunas de data em ordem
-    colunas_datas = sorted([col for col in df_mest.columns if col in mapa_datas.values()])
-    
-    # Para cada colaborador com afastamento
-    for row_idx_df, sequencias in afastamentos.items():
-        # row_idx_df é o índice no dataframe, precisa converter para linha do Excel (row_idx_excel = row_idx_df + 2)
-        row_idx_excel = row_idx_df + 2
-        
-        # Para cada sequência de afastamento detectada
-        for col_inicio_idx, col_fim_idx in sequencias:
-            # col_inicio_idx e col_fim_idx são índices em colunas_datas
-            col_inicio_nome = colunas_datas[col_inicio_idx]
-            col_fim_nome = colunas_datas[col_fim_idx]
-            
-            # Encontra posição dessas colunas no worksheet
-            col_inicio_excel = None
-            col_fim_excel = None
-            
-            for col_idx, cell in enumerate(ws[1], start=1):
-                if cell.value == col_inicio_nome:
-                    col_inicio_excel = col_idx
-                if cell.value == col_fim_nome:
-                    col_fim_excel = col_idx
-            
-            # Marca todas as células nesse intervalo como "Afastamento"
-            if col_inicio_excel and col_fim_excel:
-                for col_idx in range(col_inicio_excel, col_fim_excel + 1):
-                    cell = ws.cell(row=row_idx_excel, column=col_idx)
-                    valor_original = str(cell.value).strip().upper() if cell.value else ''
-                    
-                    # Substitui FA/FI/etc por Afastamento
-                    if valor_original not in ['FERIADO', '']:
-                        cell.value = 'Afastamento'
-                    
-                    # Aplica cor
-                    if 'Afastamento' in mapa_cores:
-                        cell.fill = PatternFill(
-                            start_color=mapa_cores['Afastamento'],
-                            end_color=mapa_cores['Afastamento'],
-                            fill_type='solid'
-                        )
-
-def detectar_afastamentos_no_dataframe(df, mapa_datas):
-    """
-    Detecta colaboradores com sequências contendo > 15 FA (ignorando D, FERIADO e AFASTAMENTO).
-    Retorna um dicionário {index_row: [(col_inicio, col_fim), ...]}
-    
-    Lógica: 
-    - Procura por sequências que começam com FA
-    - Continua enquanto houver FA, D, FERIADO ou AFASTAMENTO
-    - Conta apenas FA (ignora D, FERIADO, AFASTAMENTO)
-    - Se total de FA > 15, marca toda a sequência como afastamento
-    """
-    afastamentos = {}  # {index_row: [(col_inicio, col_fim), ...]}
-    
-    # Pega todas as colunas de data em ordem
-    colunas_datas = sorted([col for col in df.columns if col in mapa_datas.values()])
-    
-    for idx, row in df.iterrows():
-        afastamentos_row = []
-        
-        i = 0
-        while i < len(colunas_datas):
-            col = colunas_datas[i]
-            valor = str(row[col]).strip().upper() if pd.notna(row[col]) else ''
-            
-            # Procura por sequências que começam com FA, D, FERIADO ou AFASTAMENTO
-            if valor in ['FA', 'D', 'FERIADO', 'AFASTAMENTO']:
-                fa_total = 0
-                col_inicio = i
-                
-                # Percorre enquanto tiver FA, D, FERIADO ou AFASTAMENTO (ignora outros valores)
-                j = i
-                while j < len(colunas_datas):
-                    col_j = colunas_datas[j]
-                    valor_j = str(row[col_j]).strip().upper() if pd.notna(row[col_j]) else ''
-                    
-                    if valor_j == 'FA':
-                        fa_total += 1
-                        j += 1
-                    elif valor_j in ['D', 'FERIADO', 'AFASTAMENTO']:
-                        # Ignora (pula) mas continua a sequência
-                        j += 1
-                    else:
-                        # Quebra a sequência
-                        break
-                
-                # Se encontrou > 15 FA na sequência, registra
-                if fa_total > 15:
-                    afastamentos_row.append((col_inicio, j - 1))
-                
-                i = j if j > i else i + 1
-            else:
-                i += 1
-        
-        if afastamentos_row:
-            afastamentos[idx] = afastamentos_row
-    
-    return afastamentos
-
-def calcular_genero_gestor(gestor_nome, colaboradores_gestor_df, df_colab_csv, colunas_datas):
-    """
-    Calcula a proporção de Feminino e Masculino para um gestor.
-    Contabiliza colaboradores DISTINTOS que têm pelo menos 1 FI ou FA.
-    
-    Exemplo:
-    - Sergio (M): FI -> contabilizado 1x como masculino
-    - Paula (F): FA -> contabilizado 1x como feminino
-    - Clara (F): FA -> contabilizado 1x como feminino
-    - Maria (F): FI -> contabilizado 1x como feminino
-    Resultado: 25% Masculino | 75% Feminino
-    
-    Parâmetros:
-    - gestor_nome: nome do gestor (string)
-    - colaboradores_gestor_df: DataFrame com colaboradores do gestor
-    - df_colab_csv: DataFrame com colunas 'Nome' (ou similar) e 'Sexo' (ou 'Genero')
-    - colunas_datas: lista com nomes das colunas de datas
-    
-    Retorna:
-    - string no formato "Fem X% | Mas Y%" (ex: "Fem 75% | Mas 25%")
-    """
-    if df_colab_csv is None or df_colab_csv.empty or len(colaboradores_gestor_df) == 0:
-        return "N/A"
-    
-    try:
-        # Detecta coluna de nome (tenta vários nomes comuns)
-        col_nome = None
-        for possible_name in ['Nome', 'NOME', 'nome', 'Colaborador', 'COLABORADOR', 'Funcionário', 'FUNCIONÁRIO']:
-            if possible_name in df_colab_csv.columns:
-                col_nome = possible_name
-                break
-        
-        # Detecta coluna de sexo/gênero
-        col_sexo = None
-        for possible_sexo in ['Sexo', 'SEXO', 'sexo', 'Genero', 'GENERO', 'genero', 'Género', 'GÉNERO']:
-            if possible_sexo in df_colab_csv.columns:
-                col_sexo = possible_sexo
-                break
-        
-        if col_nome is None or col_sexo is None:
-            return "N/A"
-        
-        # Dicionário para armazenar gênero por colaborador (evita contar 2x)
-        colaboradores_genero = {}  # {nome_limpo: 'F' ou 'M'}
-        
-        # Para cada colaborador do gestor
-        for idx, row in colaboradores_gestor_df.iterrows():
-            nome_colab = str(row['NOME']).strip() if pd.notna(row['NOME']) else ''
-            
-            if not nome_colab:
-                continue
-            
-            # Verifica se tem FI ou FA nas colunas de data
-            tem_falta = False
-            for col_data in colunas_datas:
-                if col_data not in colaboradores_gestor_df.columns:
-                    continue
-                valor = str(row[col_data]).strip().upper() if pd.notna(row[col_data]) else ''
-                if valor in ['FI', 'FA']:
-                    tem_falta = True
-                    break
-            
-            # Só processa colaboradores com faltas
-            if not tem_falta:
-                continue
-            
-            # Procura no CSV para pegar o gênero
-            nome_limpo = unidecode(nome_colab).upper()
-            
-            # Se já encontrou este colaborador, pula (já está contabilizado)
-            if nome_limpo in colaboradores_genero:
-                continue
-            
-            # Procura no CSV
-            for csv_idx, csv_row in df_colab_csv.iterrows():
-                csv_nome = str(df_colab_csv.iloc[csv_idx][col_nome]).strip().upper() if pd.notna(df_colab_csv.iloc[csv_idx][col_nome]) else ''
-                csv_nome_limpo = unidecode(csv_nome).upper()
-                
-                # Tenta busca exata ou parcial
-                if nome_limpo == csv_nome_limpo or nome_limpo in csv_nome_limpo or csv_nome_limpo in nome_limpo:
-                    sexo = str(df_colab_csv.iloc[csv_idx][col_sexo]).strip().upper() if pd.notna(df_colab_csv.iloc[csv_idx][col_sexo]) else ''
-                    
-                    # Detecta feminino
-                    if sexo in ['F', 'FEMININO', 'MULHER', 'FEMINO']:
-                        colaboradores_genero[nome_limpo] = 'F'
-                        break
-                    # Detecta masculino
-                    elif sexo in ['M', 'MASCULINO', 'HOMEM', 'MASC']:
-                        colaboradores_genero[nome_limpo] = 'M'
-                        break
-        
-        # Conta totais
-        total_feminino = sum(1 for genero in colaboradores_genero.values() if genero == 'F')
-        total_masculino = sum(1 for genero in colaboradores_genero.values() if genero == 'M')
-        total_colaboradores = total_feminino + total_masculino
-        
-        if total_colaboradores == 0:
-            return "N/A"
-        
-        # Calcula proporções
-        pct_fem = (total_feminino / total_colaboradores * 100) if total_colaboradores > 0 else 0
-        pct_masc = (total_masculino / total_colaboradores * 100) if total_colaboradores > 0 else 0
-        
-        # Ordena por percentual maior (vem primeiro)
-        if pct_fem >= pct_masc:
-            return f"Fem {pct_fem:.0f}% | Mas {pct_masc:.0f}%"
-        else:
-            return f"Mas {pct_masc:.0f}% | Fem {pct_fem:.0f}%"
-    
-    except Exception as e:
-        print(f"Erro ao calcular gênero para gestor {gestor_nome}: {e}")
-        return "Erro"
+    rescisoes = df_aux.groupby(col_nome)[col_data_rescisao].min()
 
+    # DESLIGADO da data de rescisão até o fim do mês carregado, todas as linhas de uma vez
+    linhas = linhas_por_nome_csv(rescisoes.index.to_series(), matriz)
+    inicios = rescisoes.loc[linhas.index].to_numpy()
+    fins = [max(matriz.datas)] * len(linhas)
+    return matriz.marcar_mascara(matriz.mascara_intervalos(linhas.to_numpy(), inicios, fins), 'DESLIGADO')
 
-def criar_sheet_ofensores_abs(df_mest, w, mapa_datas, mapa_cores, afastamentos=None, df_colab_csv=None):
+def criar_sheet_ofensores_abs(df_mest, w, mapa_datas, mapa_cores, afastamentos=None, df_colab_csv=None, calendario=None, fatos=None):
     """
     Cria sheet 'Ofensores de ABS' mostrando por GESTOR e TURNO:
     - PERÍODO INTEIRO
@@ -852,11 +319,16 @@ def criar_sheet_ofensores_abs(df_mest, w, mapa_datas, mapa_cores, afastamentos=N
     
     afastamentos: dicionário com índices de linhas que têm afastamento
     df_colab_csv: DataFrame com informações de colaboradores (para gênero)
+    calendario: tabela de montar_calendario (montada aqui se não for informada)
+    fatos: TabelaFatosAbs com as contagens de marcações (montada aqui se não for informada)
     """
     if afastamentos is None:
         afastamentos = {}
+    if calendario is None:
+        calendario = montar_calendario_periodo(mapa_datas)
     try:
-        from openpyxl.styles import Border, Side
+        if fatos is None:
+            fatos = TabelaFatosAbs.da_mestra(df_mest, mapa_datas, afastamentos)
         
         # Extrai lista única de gestores
         gestores = df_mest['GESTOR'].dropna().unique()
@@ -865,17 +337,11 @@ def criar_sheet_ofensores_abs(df_mest, w, mapa_datas, mapa_cores, afastamentos=N
         # Colunas de datas no dataframe
         colunas_datas = [col for col in df_mest.columns if col not in ['NOME', 'FUNÇÃO', 'SITUAÇÃO', 'AREA', 'GESTOR', 'SUPERVISOR', 'NOME_LIMPO']]
         
-        # Define bordas para as células (MEDIUM para melhor visibilidade)
-        border_style = Side(style='medium', color='000000')
-        thin_border = Border(
-            left=border_style,
-            right=border_style,
-            top=border_style,
-            bottom=border_style
-        )
+        # Bordas das células: definidas pela política de estilo da saída
+        borda_celula = BORDA_CELULAS
         
         # Cria o sheet
-        ws = w.book.create_sheet('Ofensores de ABS', 1)
+        ws = criar_aba(w.book, 'Ofensores de ABS', 1)
         
         # Header principal
         titulo_cell = ws['A1']
@@ -884,117 +350,72 @@ def criar_sheet_ofensores_abs(df_mest, w, mapa_datas, mapa_cores, afastamentos=N
         titulo_cell.fill = PatternFill(start_color='FF0D4F45', end_color='FF0D4F45', fill_type='solid')
         ws.merge_cells('A1:I1')
         titulo_cell.alignment = Alignment(horizontal='center', vertical='center')
-        titulo_cell.border = thin_border
+        titulo_cell.border = borda_celula
         
-        datas_obj = sorted([d for d in mapa_datas.keys() if isinstance(d, datetime.date)])
         periodos_dict = {}  # {label: [colunas_datas], ...}
         
-        if datas_obj:
-            import calendar
-            
-            ano_dados = datas_obj[0].year
-            mes_dados = datas_obj[0].month
-            
-            # monthcalendar retorna semanas (segunda a domingo)
-            cal = calendar.monthcalendar(ano_dados, mes_dados)
-            
-            # Processa cada semana do calendário
-            periodo_num = 1
-            for semana_dias in cal:
-                # Filtra apenas dias que existem em nosso dataset
-                dias_na_semana = [dia for dia in semana_dias if dia != 0]
-                
-                # Encontra quais datas do nosso dataset estão nesta semana
-                datas_nesta_semana = [d for d in datas_obj if d.day in dias_na_semana]
-                
-                if datas_nesta_semana:
-                    # Cria label com as datas (exemplo: "3/11 a 8/11")
-                    data_inicio = min(datas_nesta_semana)
-                    data_fim = max(datas_nesta_semana)
-                    
-                    label = f"{data_inicio.day}/{data_inicio.month:02d} a {data_fim.day}/{data_fim.month:02d}"
-                    
-                    # Adiciona colunas de data neste período
-                    periodos_dict[label] = [mapa_datas[d] for d in sorted(datas_nesta_semana)]
-                    periodo_num += 1
+        # Semanas do calendário (segunda a domingo) com as datas do nosso dataset
+        for datas_nesta_semana in semanas_do_periodo(calendario):
+            # Cria label com as datas (exemplo: "3/11 a 8/11")
+            data_inicio = min(datas_nesta_semana)
+            data_fim = max(datas_nesta_semana)
+            
+            label = f"{data_inicio.day}/{data_inicio.month:02d} a {data_fim.day}/{data_fim.month:02d}"
+            
+            # Adiciona colunas de data neste período
+            periodos_dict[label] = [mapa_datas[d] for d in datas_nesta_semana]
+        
+        # Colaboradores de cada gestor (posições na mestra) e turno do gestor: o TURNO mais
+        # frequente dos seus colaboradores (não depende do período, calculado uma vez)
+        linhas_por_gestor = df_mest.groupby('GESTOR', sort=False).indices
+        turno_por_gestor = {}
+        for gestor in gestores:
+            gestor_turno = 'N/A'
+            if 'TURNO' in df_mest.columns:
+                turnos = df_mest['TURNO'].iloc[linhas_por_gestor[gestor]].dropna()
+                turnos = [str(t).strip() for t in turnos if str(t).strip()]
+                if turnos:
+                    from collections import Counter
+                    gestor_turno = Counter(turnos).most_common(1)[0][0]
+            turno_por_gestor[gestor] = gestor_turno
+        
+        # FI, FA (sem afastamento), HC e colaboradores com falta de todos os gestores em
+        # todos os períodos: um único groupby sobre a tabela de fatos
+        rotulo_periodo_inteiro = 'PERÍODO INTEIRO'
+        periodos_analise = {rotulo_periodo_inteiro: colunas_datas, **periodos_dict}
+        resumo_gestores = fatos.resumo_por_gestor(periodos_analise)
+        
+        # Proporção de gênero dos colaboradores com faltas: índice nome -> gênero do CSV
+        # (montado uma vez) + groupby por gestor e período
+        genero_gestores = None
+        if df_colab_csv is not None:
+            try:
+                genero_gestores = fatos.resumo_genero_por_gestor(periodos_analise, IndiceGenero(df_colab_csv))
+            except Exception as e:
+                print(f"Erro ao calcular gênero dos gestores: {e}")
         
         # Função para processar análise
-        def processar_analise(colunas_processar):
+        def processar_analise(rotulo_periodo, colunas_processar):
             dados_gestores = []
+            resumo_periodo = resumo_gestores.xs(rotulo_periodo, level='PERIODO')
             
             for gestor in gestores:
-                colaboradores_gestor = df_mest[df_mest['GESTOR'] == gestor]
-                total_colab = len(colaboradores_gestor)
-                
-                # Encontra o turno do GESTOR: pega o TURNO mais frequente dos colaboradores deste gestor
-                gestor_turno = 'N/A'
-                if 'TURNO' in df_mest.columns and len(colaboradores_gestor) > 0:
-                    # Extrai todos os turnos dos colaboradores deste gestor
-                    turnos = colaboradores_gestor['TURNO'].dropna()
-                    turnos = [str(t).strip() for t in turnos if str(t).strip()]
-                    
-                    if turnos:
-                        # Pega o turno mais frequente (moda)
-                        from collections import Counter
-                        turno_counts = Counter(turnos)
-                        gestor_turno = turno_counts.most_common(1)[0][0]
-                    else:
-                        gestor_turno = 'N/A'
+                totais = resumo_periodo.loc[gestor]
+                total_colab = int(totais['TOTAL_COLAB'])
+                total_fi = int(totais['FI'])
+                total_fa = int(totais['FA'])
+                colab_com_faltas = int(totais['COLAB_COM_FALTAS'])
                 
-                # Calcula proporção de gênero dos colaboradores do gestor
+                # Proporção de gênero dos colaboradores do gestor
                 genero_gestor = 'N/A'
                 if df_colab_csv is not None:
-                    genero_gestor = calcular_genero_gestor(gestor, colaboradores_gestor, df_colab_csv, colunas_processar)
-                
-                total_fi = 0
-                total_fa = 0
-                
-                for idx, row in colaboradores_gestor.iterrows():
-                    # Verifica se o colaborador tem afastamento (já detectado antes)
-                    tem_afastamento = idx in afastamentos
-                    
-                    for col_data in colunas_processar:
-                        if col_data not in df_mest.columns:
-                            continue
-                        
-                        valor = str(row[col_data]).strip().upper() if pd.notna(row[col_data]) else ''
-                        
-                        # Ignora FERIADO nas contagens
-                        if valor == 'FERIADO':
-                            continue
-                        
-                        if valor == 'FI':
-                            total_fi += 1
-                        elif valor == 'FA':
-                            # Só conta FA se NÃO for afastamento
-                            if not tem_afastamento:
-                                total_fa += 1
+                    genero_gestor = 'Erro' if genero_gestores is None else genero_gestores.get((rotulo_periodo, gestor), 'N/A')
                 
                 total_faltas = total_fi + total_fa
                 dias_uteis = len(colunas_processar)
                 percentual = (total_faltas / dias_uteis / total_colab * 100) if total_colab > 0 and dias_uteis > 0 else 0
                 
-                # OPÇÃO 1: % Colaboradores com faltas (Número de colaboradores que tiveram pelo menos 1 falta)
-                colab_com_faltas = 0
-                for idx, row in colaboradores_gestor.iterrows():
-                    tem_afastamento = idx in afastamentos
-                    tem_falta = False
-                    
-                    for col_data in colunas_processar:
-                        if col_data not in df_mest.columns:
-                            continue
-                        valor = str(row[col_data]).strip().upper() if pd.notna(row[col_data]) else ''
-                        
-                        if valor == 'FERIADO':
-                            continue
-                        if valor == 'FI' or (valor == 'FA' and not tem_afastamento):
-                            tem_falta = True
-                            break
-                    
-                    if tem_falta:
-                        colab_com_faltas += 1
-                
-                # Porcentagem de colaboradores com faltas
+                # Porcentagem de colaboradores com faltas (pelo menos 1 falta no período)
                 pct_colab_com_faltas = (colab_com_faltas / total_colab * 100) if total_colab > 0 else 0
                 
                 if percentual > 20:
@@ -1009,7 +430,7 @@ def criar_sheet_ofensores_abs(df_mest, w, mapa_datas, mapa_cores, afastamentos=N
                 
                 dados_gestores.append({
                     'gestor': gestor,
-                    'turno': gestor_turno,
+                    'turno': turno_por_gestor[gestor],
                     'total_colab': total_colab,
                     'total_fi': total_fi,
                     'total_fa': total_fa,
@@ -1027,11 +448,11 @@ def criar_sheet_ofensores_abs(df_mest, w, mapa_datas, mapa_cores, afastamentos=N
             return dados_gestores
         
         # PERÍODO INTEIRO
-        dados_periodo = processar_analise(colunas_datas)
+        dados_periodo = processar_analise(rotulo_periodo_inteiro, colunas_datas)
         
         dados_periodos = {}
         for label, colunas_periodo in periodos_dict.items():
-            dados_periodos[label] = processar_analise(colunas_periodo)
+            dados_periodos[label] = processar_analise(label, colunas_periodo)
         
         # Preenche o sheet com PERÍODO + PERÍODOS
         row_idx = 3
@@ -1041,7 +462,7 @@ def criar_sheet_ofensores_abs(df_mest, w, mapa_datas, mapa_cores, afastamentos=N
         ws.cell(row=row_idx, column=1).font = Font(bold=True, size=11)
         ws.merge_cells(f'A{row_idx}:I{row_idx}')
         ws.cell(row=row_idx, column=1).alignment = Alignment(horizontal='left')
-        ws.cell(row=row_idx, column=1).border = thin_border
+        ws.cell(row=row_idx, column=1).border = borda_celula
         row_idx += 1
         
         # Headers
@@ -1052,7 +473,7 @@ def criar_sheet_ofensores_abs(df_mest, w, mapa_datas, mapa_cores, afastamentos=N
             cell.font = Font(bold=True, color='FFFFFF', size=11)
             cell.fill = PatternFill(start_color='FF0D4F45', end_color='FF0D4F45', fill_type='solid')  # Verde escuro corporativo
             cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-            cell.border = thin_border
+            cell.border = borda_celula
         
         row_idx += 1
         
@@ -1063,7 +484,7 @@ def criar_sheet_ofensores_abs(df_mest, w, mapa_datas, mapa_cores, afastamentos=N
             for col_idx, value in enumerate(values, 1):
                 cell = ws.cell(row=row_idx, column=col_idx)
                 cell.value = value
-                cell.border = thin_border
+                cell.border = borda_celula
                 
                 # Cores - Paleta Corporativa Profarma
                 if col_idx == 1:  # GESTOR - Verde escuro
@@ -1095,7 +516,7 @@ def criar_sheet_ofensores_abs(df_mest, w, mapa_datas, mapa_cores, afastamentos=N
             cell_pct_colab.alignment = Alignment(horizontal='center', vertical='center')
             cell_pct_colab.fill = PatternFill(start_color='FF8CC850', end_color='FF8CC850', fill_type='solid')  # Verde light
             cell_pct_colab.font = Font(bold=True, color='FF000000')
-            cell_pct_colab.border = thin_border
+            cell_pct_colab.border = borda_celula
             
             # Coluna 8: GENERO
             cell_genero = ws.cell(row=row_idx, column=8)
@@ -1103,7 +524,7 @@ def criar_sheet_ofensores_abs(df_mest, w, mapa_datas, mapa_cores, afastamentos=N
             cell_genero.alignment = Alignment(horizontal='center', vertical='center')
             cell_genero.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
             cell_genero.font = Font(bold=True)
-            cell_genero.border = thin_border
+            cell_genero.border = borda_celula
             
             row_idx += 1
         
@@ -1113,7 +534,7 @@ def criar_sheet_ofensores_abs(df_mest, w, mapa_datas, mapa_cores, afastamentos=N
             ws.cell(row=row_idx, column=1).font = Font(bold=True, size=11)
             ws.merge_cells(f'A{row_idx}:I{row_idx}')
             ws.cell(row=row_idx, column=1).alignment = Alignment(horizontal='left')
-            ws.cell(row=row_idx, column=1).border = thin_border
+            ws.cell(row=row_idx, column=1).border = borda_celula
             row_idx += 1
             
             # Headers
@@ -1123,7 +544,7 @@ def criar_sheet_ofensores_abs(df_mest, w, mapa_datas, mapa_cores, afastamentos=N
                 cell.font = Font(bold=True, color='FFFFFF', size=11)
                 cell.fill = PatternFill(start_color='FF0D4F45', end_color='FF0D4F45', fill_type='solid')  # Verde escuro corporativo
                 cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-                cell.border = thin_border
+                cell.border = borda_celula
             
             row_idx += 1
             
@@ -1134,7 +555,7 @@ def criar_sheet_ofensores_abs(df_mest, w, mapa_datas, mapa_cores, afastamentos=N
                 for col_idx, value in enumerate(values, 1):
                     cell = ws.cell(row=row_idx, column=col_idx)
                     cell.value = value
-                    cell.border = thin_border
+                    cell.border = borda_celula
                     
                     # Cores corporativas Profarma
                     if col_idx == 1:  # GESTOR - cinza claro
@@ -1166,7 +587,7 @@ def criar_sheet_ofensores_abs(df_mest, w, mapa_datas, mapa_cores, afastamentos=N
                 cell_pct_colab.alignment = Alignment(horizontal='center', vertical='center')
                 cell_pct_colab.fill = PatternFill(start_color='FF8CC850', end_color='FF8CC850', fill_type='solid')
                 cell_pct_colab.font = Font(bold=True, color='FF000000')
-                cell_pct_colab.border = thin_border
+                cell_pct_colab.border = borda_celula
                 
                 # Coluna 8: GENERO
                 cell_genero = ws.cell(row=row_idx, column=8)
@@ -1174,7 +595,7 @@ def criar_sheet_ofensores_abs(df_mest, w, mapa_datas, mapa_cores, afastamentos=N
                 cell_genero.alignment = Alignment(horizontal='center', vertical='center')
                 cell_genero.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
                 cell_genero.font = Font(bold=True)
-                cell_genero.border = thin_border
+                cell_genero.border = borda_celula
                 
                 row_idx += 1
         
@@ -1195,7 +616,23 @@ def criar_sheet_ofensores_abs(df_mest, w, mapa_datas, mapa_cores, afastamentos=N
         st.write(traceback.format_exc())
         return False
 
-def criar_sheet_ranking_abs(df_mest, w, mapa_colors, top10_fa_enriquecido=None, top10_fi_enriquecido=None):
+def montar_ranking_abs(df_mest, fatos):
+    """
+    Quantidade de FI e FA de cada colaborador (base do Ranking ABS), lida da tabela de fatos.
+    Registros sem nome ficam de fora.
+    """
+    df_ranking = pd.DataFrame({
+        'NOME': df_mest['NOME'],
+        'GESTOR': df_mest['GESTOR'],
+        'FUNÇÃO': df_mest['FUNÇÃO'],
+        'AREA': df_mest['AREA'],
+        'FI': fatos.colaboradores['FI'].to_numpy(),
+        'FA': fatos.colaboradores['FA'].to_numpy(),
+    })
+    return df_ranking[df_ranking['NOME'].notna() & (df_ranking['NOME'] != '')]
+
+
+def criar_sheet_ranking_abs(df_mest, w, mapa_colors, df_ranking, top10_fa_enriquecido=None, top10_fi_enriquecido=None):
     """
     Cria sheet 'Ranking ABS' completo (sem limite), ordenado do maior para o menor
     para FA e FI.
@@ -1204,28 +641,11 @@ def criar_sheet_ranking_abs(df_mest, w, mapa_colors, top10_fa_enriquecido=None,
         df_mest: DataFrame da planilha mestra
         w: Workbook
         mapa_colors: Dicionário de cores
+        df_ranking: Contagens de FI/FA por colaborador (montar_ranking_abs)
         top10_fa_enriquecido: TOP 10 FA com dados enriquecidos (opcional)
         top10_fi_enriquecido: TOP 10 FI com dados enriquecidos (opcional)
     """
     try:
-        from openpyxl.styles import Border, Side
-        
-        # Colunas de datas no dataframe (contêm dados de FA/FI)
-        colunas_datas = [col for col in df_mest.columns if col not in ['NOME', 'FUNÇÃO', 'SITUAÇÃO', 'AREA', 'GESTOR', 'SUPERVISOR', 'NOME_LIMPO']]
-        
-        # Conta FA e FI para cada colaborador
-        df_ranking = pd.DataFrame({
-            'NOME': df_mest['NOME'],
-            'GESTOR': df_mest['GESTOR'],
-            'FUNÇÃO': df_mest['FUNÇÃO'],
-            'AREA': df_mest['AREA'],
-            'FI': df_mest[colunas_datas].apply(lambda row: (row == 'FI').sum(), axis=1),
-            'FA': df_mest[colunas_datas].apply(lambda row: (row == 'FA').sum(), axis=1),
-        }).copy()
-        
-        # Remove registros vazios
-        df_ranking = df_ranking[df_ranking['NOME'].notna() & (df_ranking['NOME'] != '')]
-        
         # Ranking completo (sem limite), do maior para o menor
         # Exibe apenas colaboradores com pelo menos 1 ocorrência no indicador.
         top10_fa = df_ranking[df_ranking['FA'] >= 1].sort_values(by='FA', ascending=False)
@@ -1238,16 +658,10 @@ def criar_sheet_ranking_abs(df_mest, w, mapa_colors, top10_fa_enriquecido=None,
             top10_fi = top10_fi_enriquecido[top10_fi_enriquecido['FI'] >= 1].sort_values(by='FI', ascending=False)
         
         # Cria o sheet
-        ws = w.book.create_sheet('Ranking ABS')
+        ws = criar_aba(w.book, 'Ranking ABS')
         
-        # Define bordas
-        border_style = Side(style='medium', color='000000')
-        thin_border = Border(
-            left=border_style,
-            right=border_style,
-            top=border_style,
-            bottom=border_style
-        )
+        # Bordas das células: definidas pela política de estilo da saída
+        borda_celula = BORDA_CELULAS
         
         row_idx = 1
         
@@ -1276,41 +690,41 @@ def criar_sheet_ranking_abs(df_mest, w, mapa_colors, top10_fa_enriquecido=None,
             cell.font = Font(bold=True, color='FFFFFF')
             cell.fill = PatternFill(start_color='FF0D4F45', end_color='FF0D4F45', fill_type='solid')
             cell.alignment = Alignment(horizontal='center', vertical='center')
-            cell.border = thin_border
+            cell.border = borda_celula
         row_idx += 1
         
         # Dados ranking FA
         for idx, (_, row) in enumerate(top10_fa.iterrows(), 1):
             # Posição
             cell_pos = ws.cell(row=row_idx, column=1, value=idx)
-            cell_pos.border = thin_border
+            cell_pos.border = borda_celula
             cell_pos.fill = PatternFill(start_color='FF0D4F45', end_color='FF0D4F45', fill_type='solid')
             cell_pos.font = Font(bold=True, color='FFFFFFFF')
             cell_pos.alignment = Alignment(horizontal='center', vertical='center')
             
             # Nome
             cell_nome = ws.cell(row=row_idx, column=2, value=row['NOME'])
-            cell_nome.border = thin_border
+            cell_nome.border = borda_celula
             cell_nome.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
             
             # Gestor
             cell_gestor = ws.cell(row=row_idx, column=3, value=row['GESTOR'])
-            cell_gestor.border = thin_border
+            cell_gestor.border = borda_celula
             cell_gestor.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
             
             # Função
             cell_func = ws.cell(row=row_idx, column=4, value=row['FUNÇÃO'])
-            cell_func.border = thin_border
+            cell_func.border = borda_celula
             cell_func.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
             
             # Área
             cell_area = ws.cell(row=row_idx, column=5, value=row['AREA'])
-            cell_area.border = thin_border
+            cell_area.border = borda_celula
             cell_area.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
             
             # FA
             cell_fa = ws.cell(row=row_idx, column=6, value=row['FA'])
-            cell_fa.border = thin_border
+            cell_fa.border = borda_celula
             cell_fa.fill = PatternFill(start_color='FF008C4B', end_color='FF008C4B', fill_type='solid')
             cell_fa.font = Font(bold=True, color='FFFFFFFF')
             cell_fa.alignment = Alignment(horizontal='center', vertical='center')
@@ -1318,14 +732,14 @@ def criar_sheet_ranking_abs(df_mest, w, mapa_colors, top10_fa_enriquecido=None,
             # Data Admissão
             data_adm = row.get('Data Admissão', 'N/A') if 'Data Admissão' in row.index else 'N/A'
             cell_data = ws.cell(row=row_idx, column=7, value=data_adm)
-            cell_data.border = thin_border
+            cell_data.border = borda_celula
             cell_data.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
             cell_data.alignment = Alignment(horizontal='center', vertical='center')
             
             # Tempo de Serviço
             tempo_srv = row.get('Tempo de Serviço', 'N/A') if 'Tempo de Serviço' in row.index else 'N/A'
             cell_tempo = ws.cell(row=row_idx, column=8, value=tempo_srv)
-            cell_tempo.border = thin_border
+            cell_tempo.border = borda_celula
             cell_tempo.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
             cell_tempo.alignment = Alignment(horizontal='center', vertical='center')
             
@@ -1349,41 +763,41 @@ def criar_sheet_ranking_abs(df_mest, w, mapa_colors, top10_fa_enriquecido=None,
             cell.font = Font(bold=True, color='FFFFFF')
             cell.fill = PatternFill(start_color='FF0D4F45', end_color='FF0D4F45', fill_type='solid')
             cell.alignment = Alignment(horizontal='center', vertical='center')
-            cell.border = thin_border
+            cell.border = borda_celula
         row_idx += 1
         
         # Dados ranking FI
         for idx, (_, row) in enumerate(top10_fi.iterrows(), 1):
             # Posição
             cell_pos = ws.cell(row=row_idx, column=1, value=idx)
-            cell_pos.border = thin_border
+            cell_pos.border = borda_celula
             cell_pos.fill = PatternFill(start_color='FF0D4F45', end_color='FF0D4F45', fill_type='solid')
             cell_pos.font = Font(bold=True, color='FFFFFFFF')
             cell_pos.alignment = Alignment(horizontal='center', vertical='center')
             
             # Nome
             cell_nome = ws.cell(row=row_idx, column=2, value=row['NOME'])
-            cell_nome.border = thin_border
+            cell_nome.border = borda_celula
             cell_nome.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
             
             # Gestor
             cell_gestor = ws.cell(row=row_idx, column=3, value=row['GESTOR'])
-            cell_gestor.border = thin_border
+            cell_gestor.border = borda_celula
             cell_gestor.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
             
             # Função
             cell_func = ws.cell(row=row_idx, column=4, value=row['FUNÇÃO'])
-            cell_func.border = thin_border
+            cell_func.border = borda_celula
             cell_func.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
             
             # Área
             cell_area = ws.cell(row=row_idx, column=5, value=row['AREA'])
-            cell_area.border = thin_border
+            cell_area.border = borda_celula
             cell_area.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
             
             # FI
             cell_fi = ws.cell(row=row_idx, column=6, value=row['FI'])
-            cell_fi.border = thin_border
+            cell_fi.border = borda_celula
             cell_fi.fill = PatternFill(start_color='FF007864', end_color='FF007864', fill_type='solid')
             cell_fi.font = Font(bold=True, color='FFFFFFFF')
             cell_fi.alignment = Alignment(horizontal='center', vertical='center')
@@ -1391,14 +805,14 @@ def criar_sheet_ranking_abs(df_mest, w, mapa_colors, top10_fa_enriquecido=None,
             # Data Admissão
             data_adm = row.get('Data Admissão', 'N/A') if 'Data Admissão' in row.index else 'N/A'
             cell_data = ws.cell(row=row_idx, column=7, value=data_adm)
-            cell_data.border = thin_border
+            cell_data.border = borda_celula
             cell_data.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
             cell_data.alignment = Alignment(horizontal='center', vertical='center')
             
             # Tempo de Serviço
             tempo_srv = row.get('Tempo de Serviço', 'N/A') if 'Tempo de Serviço' in row.index else 'N/A'
             cell_tempo = ws.cell(row=row_idx, column=8, value=tempo_srv)
-            cell_tempo.border = thin_border
+            cell_tempo.border = borda_celula
             cell_tempo.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
             cell_tempo.alignment = Alignment(horizontal='center', vertical='center')
             
@@ -1421,16 +835,17 @@ def criar_sheet_ranking_abs(df_mest, w, mapa_colors, top10_fa_enriquecido=None,
         st.write(traceback.format_exc())
         return False
 
-def criar_sheet_ofensores_por_setor(df_mest, w, df_colab_csv=None, mapa_datas=None):
+def criar_sheet_ofensores_por_setor(df_mest, w, df_colab_csv=None, mapa_datas=None, calendario=None, fatos=None):
     """
     Cria sheet 'Ofensores por setor'
     Passo 1: Identificação de colunas e limpeza dos nomes de setor (Unificando T1, T2, T3)
+    As contagens diárias de FI/FA vêm da tabela de fatos (montada aqui se não for informada).
     """
     if df_colab_csv is None:
         return
 
     try:
-        from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
+        from openpyxl.styles import Font, Alignment, PatternFill
         import re
         from unidecode import unidecode
         import pandas as pd
@@ -1441,11 +856,10 @@ def criar_sheet_ofensores_por_setor(df_mest, w, df_colab_csv=None, mapa_datas=No
         feriados_no_periodo = []
         if mapa_datas:
             col_to_date = {v: k for k, v in mapa_datas.items()}
-            # Identifica feriados no período
-            anos = set(d.year for d in mapa_datas.keys())
-            feriados_dict = {}
-            for ano in anos:
-                feriados_dict.update(obter_feriados_brasil(ano))
+            # Identifica feriados no período (calendário compartilhado)
+            if calendario is None:
+                calendario = montar_calendario_periodo(mapa_datas)
+            feriados_dict = feriados_do_calendario(calendario)
             
             # Lista de datas que são feriados
             feriados_no_periodo = [d for d in mapa_datas.keys() if d in feriados_dict]
@@ -1493,7 +907,10 @@ def criar_sheet_ofensores_por_setor(df_mest, w, df_colab_csv=None, mapa_datas=No
         df_setor = df_setor.drop_duplicates(subset=['NOME_NORM']) # Garante 1 setor por pessoa
 
         # Prepara dados de Absenteísmo
+        if fatos is None:
+            fatos = TabelaFatosAbs.da_mestra(df_mest, mapa_datas or {})
         df_merged = df_mest.copy()
+        df_merged['LINHA_MESTRA'] = range(len(df_merged))  # posição na tabela de fatos
         df_merged['NOME_NORM'] = df_merged['NOME'].astype(str).apply(lambda x: unidecode(x).strip().upper())
 
         # Merge para trazer o Setor para o dataframe principal
@@ -1522,7 +939,7 @@ def criar_sheet_ofensores_por_setor(df_mest, w, df_colab_csv=None, mapa_datas=No
         grupos = df_merged.groupby('SETOR_UNIFICADO')
 
         # --- 4. CRIAÇÃO DA PLANILHA ---
-        ws = w.book.create_sheet('Ofensores por setor')
+        ws = criar_aba(w.book, 'Ofensores por setor')
         
         # Cabeçalho Setor (A1)
         header_fill = PatternFill(start_color='FF0D4F45', end_color='FF0D4F45', fill_type='solid') # Verde Escuro
@@ -1536,7 +953,7 @@ def criar_sheet_ofensores_por_setor(df_mest, w, df_colab_csv=None, mapa_datas=No
         
         # Cabeçalho Datas (B1 em diante)
         # Filtra colunas que NÃO são de identificação ou metadados
-        colunas_ignoradas = ['NOME', 'FUNÇÃO', 'SITUAÇÃO', 'AREA', 'GESTOR', 'SUPERVISOR', 'NOME_LIMPO', 'TURNO', 'HORARIO', 'SETOR', 'NOME_NORM', 'SETOR_UNIFICADO', col_setor_csv]
+        colunas_ignoradas = ['NOME', 'FUNÇÃO', 'SITUAÇÃO', 'AREA', 'GESTOR', 'SUPERVISOR', 'NOME_LIMPO', 'TURNO', 'HORARIO', 'SETOR', 'NOME_NORM', 'SETOR_UNIFICADO', 'LINHA_MESTRA', col_setor_csv]
         colunas_datas = [c for c in df_mest.columns if c not in colunas_ignoradas and c in df_merged.columns]
         
         # Tenta ordenar como data para garantir ordem cronológica
@@ -1579,7 +996,7 @@ def criar_sheet_ofensores_por_setor(df_mest, w, df_colab_csv=None, mapa_datas=No
         font_white_bold = Font(color='FFFFFFFF', bold=True)
         font_black_bold = Font(color='FF000000', bold=True)
         
-        thin_border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
+        borda_celula = BORDA_CELULAS  # política de estilo da saída
         
         META_ABSENTEISMO = 0.03 # 3%
         
@@ -1613,14 +1030,11 @@ def criar_sheet_ofensores_por_setor(df_mest, w, df_colab_csv=None, mapa_datas=No
             soma_fa = {d: 0 for d in colunas_datas_ordenadas}
             total_geral = {d: 0 for d in colunas_datas_ordenadas}
             
-            for _, row in df_grupo.iterrows():
-                for d in colunas_datas_ordenadas:
-                     if d in row:
-                        val = str(row[d]).strip().upper()
-                        if val == 'FI':
-                            soma_fi[d] += 1
-                        elif val == 'FA':
-                            soma_fa[d] += 1
+            contagens_dia = fatos.por_dia(df_grupo['LINHA_MESTRA'].to_numpy())
+            for d in colunas_datas_ordenadas:
+                if d in contagens_dia.index:
+                    soma_fi[d] = int(contagens_dia.at[d, 'FI'])
+                    soma_fa[d] = int(contagens_dia.at[d, 'FA'])
 
             for d in colunas_datas_ordenadas:
                 total_geral[d] = soma_fi[d] + soma_fa[d]
@@ -1631,13 +1045,13 @@ def criar_sheet_ofensores_por_setor(df_mest, w, df_colab_csv=None, mapa_datas=No
             c_area.fill = fill_label_pct # Verde Escuro
             c_area.font = font_white_bold
             c_area.alignment = Alignment(horizontal='center', vertical='center')
-            c_area.border = thin_border
+            c_area.border = borda_celula
             
             # Colunas B em diante: Datas
             for i, data_str in enumerate(colunas_datas_ordenadas):
                  c_dt = ws.cell(row=linha_atual, column=2+i, value=data_str)
                  c_dt.alignment = Alignment(horizontal='center', vertical='center')
-                 c_dt.border = thin_border
+                 c_dt.border = borda_celula
                  
                  if eh_feriado_ou_domingo(data_str):
                      c_dt.fill = fill_blackout
@@ -1648,7 +1062,7 @@ def criar_sheet_ofensores_por_setor(df_mest, w, df_colab_csv=None, mapa_datas=No
 
             c_media = ws.cell(row=linha_atual, column=col_media_idx, value='MÉDIA')
             c_media.alignment = Alignment(horizontal='center', vertical='center')
-            c_media.border = thin_border
+            c_media.border = borda_celula
             c_media.fill = fill_label_pct
             c_media.font = font_white_bold
             linha_atual += 1
@@ -1659,7 +1073,7 @@ def criar_sheet_ofensores_por_setor(df_mest, w, df_colab_csv=None, mapa_datas=No
             cell_setor.font = font_black_bold 
             cell_setor.fill = fill_hc # Branco
             cell_setor.alignment = Alignment(horizontal='left', vertical='center')
-            cell_setor.border = thin_border
+            cell_setor.border = borda_celula
             
             # Colunas B em diante: HC Count (MOVIDO DA LINHA TOTAL HC)
             for i, d in enumerate(colunas_datas_ordenadas):
@@ -1667,7 +1081,7 @@ def criar_sheet_ofensores_por_setor(df_mest, w, df_colab_csv=None, mapa_datas=No
                 # Agora ela recebe o hc_total
                 cc = ws.cell(row=linha_atual, column=2+i, value=hc_total)
                 cc.alignment = Alignment(horizontal='center')
-                cc.border = thin_border
+                cc.border = borda_celula
                 
                 if eh_feriado_ou_domingo(d):
                     cc.fill = fill_blackout
@@ -1678,7 +1092,7 @@ def criar_sheet_ofensores_por_setor(df_mest, w, df_colab_csv=None, mapa_datas=No
 
             c_media_hc = ws.cell(row=linha_atual, column=col_media_idx, value=f"=AVERAGE({col_inicio_letra}{linha_atual}:{col_fim_letra}{linha_atual})")
             c_media_hc.alignment = Alignment(horizontal='center', vertical='center')
-            c_media_hc.border = thin_border
+            c_media_hc.border = borda_celula
             c_media_hc.fill = fill_hc
             c_media_hc.font = font_black_bold
             c_media_hc.number_format = '0.00'
@@ -1688,13 +1102,13 @@ def criar_sheet_ofensores_por_setor(df_mest, w, df_colab_csv=None, mapa_datas=No
             c_fi = ws.cell(row=linha_atual, column=1, value="FI - Faltas Injustificadas")
             c_fi.fill = fill_hc # Branco nas Labels
             c_fi.font = font_black_bold
-            c_fi.border = thin_border
+            c_fi.border = borda_celula
             
             for i, d in enumerate(colunas_datas_ordenadas):
                 val = soma_fi[d]
                 cc = ws.cell(row=linha_atual, column=2+i, value=val)
                 cc.alignment = Alignment(horizontal='center')
-                cc.border = thin_border
+                cc.border = borda_celula
                 
                 if eh_feriado_ou_domingo(d):
                     cc.fill = fill_blackout
@@ -1705,7 +1119,7 @@ def criar_sheet_ofensores_por_setor(df_mest, w, df_colab_csv=None, mapa_datas=No
 
             c_media_fi = ws.cell(row=linha_atual, column=col_media_idx, value=f"=AVERAGE({col_inicio_letra}{linha_atual}:{col_fim_letra}{linha_atual})")
             c_media_fi.alignment = Alignment(horizontal='center', vertical='center')
-            c_media_fi.border = thin_border
+            c_media_fi.border = borda_celula
             c_media_fi.fill = fill_fi
             c_media_fi.font = font_white_bold
             c_media_fi.number_format = '0.00'
@@ -1715,13 +1129,13 @@ def criar_sheet_ofensores_por_setor(df_mest, w, df_colab_csv=None, mapa_datas=No
             c_fa = ws.cell(row=linha_atual, column=1, value="FA - Faltas por Atestado")
             c_fa.fill = fill_hc # Branco nas Labels
             c_fa.font = font_black_bold
-            c_fa.border = thin_border
+            c_fa.border = borda_celula
 
             for i, d in enumerate(colunas_datas_ordenadas):
                 val = soma_fa[d]
                 cc = ws.cell(row=linha_atual, column=2+i, value=val)
                 cc.alignment = Alignment(horizontal='center')
-                cc.border = thin_border
+                cc.border = borda_celula
                 
                 if eh_feriado_ou_domingo(d):
                     cc.fill = fill_blackout
@@ -1732,7 +1146,7 @@ def criar_sheet_ofensores_por_setor(df_mest, w, df_colab_csv=None, mapa_datas=No
 
             c_media_fa = ws.cell(row=linha_atual, column=col_media_idx, value=f"=AVERAGE({col_inicio_letra}{linha_atual}:{col_fim_letra}{linha_atual})")
             c_media_fa.alignment = Alignment(horizontal='center', vertical='center')
-            c_media_fa.border = thin_border
+            c_media_fa.border = borda_celula
             c_media_fa.fill = fill_fa
             c_media_fa.font = font_white_bold
             c_media_fa.number_format = '0.00'
@@ -1742,13 +1156,13 @@ def criar_sheet_ofensores_por_setor(df_mest, w, df_colab_csv=None, mapa_datas=No
             c_tot = ws.cell(row=linha_atual, column=1, value="TOTAL")
             c_tot.fill = fill_hc # Branco nas Labels
             c_tot.font = font_black_bold
-            c_tot.border = thin_border
+            c_tot.border = borda_celula
 
             for i, d in enumerate(colunas_datas_ordenadas):
                 val = total_geral[d]
                 cc = ws.cell(row=linha_atual, column=2+i, value=val)
                 cc.alignment = Alignment(horizontal='center')
-                cc.border = thin_border
+                cc.border = borda_celula
                 
                 if eh_feriado_ou_domingo(d):
                     cc.fill = fill_blackout
@@ -1759,7 +1173,7 @@ def criar_sheet_ofensores_por_setor(df_mest, w, df_colab_csv=None, mapa_datas=No
 
             c_media_tot = ws.cell(row=linha_atual, column=col_media_idx, value=f"=AVERAGE({col_inicio_letra}{linha_atual}:{col_fim_letra}{linha_atual})")
             c_media_tot.alignment = Alignment(horizontal='center', vertical='center')
-            c_media_tot.border = thin_border
+            c_media_tot.border = borda_celula
             c_media_tot.fill = fill_total
             c_media_tot.font = font_black_bold
             c_media_tot.number_format = '0.00'
@@ -1769,7 +1183,7 @@ def criar_sheet_ofensores_por_setor(df_mest, w, df_colab_csv=None, mapa_datas=No
             c_pct = ws.cell(row=linha_atual, column=1, value="%Acumulado")
             c_pct.fill = fill_label_pct # Verde Escuro na Label
             c_pct.font = font_white_bold
-            c_pct.border = thin_border
+            c_pct.border = borda_celula
 
             for i, d in enumerate(colunas_datas_ordenadas):
                 val = total_geral[d]
@@ -1778,7 +1192,7 @@ def criar_sheet_ofensores_por_setor(df_mest, w, df_colab_csv=None, mapa_datas=No
                 cc = ws.cell(row=linha_atual, column=2+i, value=pct)
                 cc.number_format = '0.00%'
                 cc.alignment = Alignment(horizontal='center')
-                cc.border = thin_border
+                cc.border = borda_celula
 
                 if eh_feriado_ou_domingo(d):
                     cc.fill = fill_blackout
@@ -1795,7 +1209,7 @@ def criar_sheet_ofensores_por_setor(df_mest, w, df_colab_csv=None, mapa_datas=No
 
             c_media_pct = ws.cell(row=linha_atual, column=col_media_idx, value=f"=AVERAGE({col_inicio_letra}{linha_atual}:{col_fim_letra}{linha_atual})")
             c_media_pct.alignment = Alignment(horizontal='center', vertical='center')
-            c_media_pct.border = thin_border
+            c_media_pct.border = borda_celula
             c_media_pct.fill = fill_label_pct
             c_media_pct.font = font_white_bold
             c_media_pct.number_format = '0.00%'
@@ -1817,7 +1231,7 @@ def criar_sheet_ofensores_por_setor(df_mest, w, df_colab_csv=None, mapa_datas=No
                     celula.fill = fill_blackout
                     celula.font = font_white_bold
                     celula.alignment = Alignment(horizontal='center', vertical='center')
-                    celula.border = thin_border
+                    celula.border = borda_celula
 
 
             
@@ -1827,7 +1241,7 @@ def criar_sheet_ofensores_por_setor(df_mest, w, df_colab_csv=None, mapa_datas=No
         st.error(traceback.format_exc())
 
 
-def criar_sheet_ofensores_semanais(df_mest, w, mapa_datas, df_colaboradores=None):
+def criar_sheet_ofensores_semanais(df_mest, w, mapa_datas, df_colaboradores=None, calendario=None, fatos=None):
     """
     Cria sheet 'Ofensores Semanais' mostrando:
     - Semana (segunda a sábado)
@@ -1836,10 +1250,13 @@ def criar_sheet_ofensores_semanais(df_mest, w, mapa_datas, df_colaboradores=None
     - Quantidade de FI
     - Quantidade de FA
     - Tempo de Serviço (se disponível no CSV)
+    
+    fatos: TabelaFatosAbs com as contagens de marcações (montada aqui se não for informada)
     """
     try:
-        from openpyxl.styles import Border, Side
-        import calendar
+        if fatos is None:
+            fatos = TabelaFatosAbs.da_mestra(df_mest, mapa_datas)
+        
         from dateutil.relativedelta import relativedelta
         
         # Função para calcular tempo de admissão
@@ -1922,17 +1339,11 @@ def criar_sheet_ofensores_semanais(df_mest, w, mapa_datas, df_colaboradores=None
         if not datas_obj:
             return False
         
-        # Define bordas
-        border_style = Side(style='thin', color='000000')
-        thin_border = Border(
-            left=border_style,
-            right=border_style,
-            top=border_style,
-            bottom=border_style
-        )
+        # Bordas das células: definidas pela política de estilo da saída
+        borda_celula = BORDA_CELULAS
         
         # Cria o sheet
-        ws = w.book.create_sheet('Ofensores Semanais')
+        ws = criar_aba(w.book, 'Ofensores Semanais')
         
         # Header principal
         titulo_cell = ws['A1']
@@ -1942,26 +1353,14 @@ def criar_sheet_ofensores_semanais(df_mest, w, mapa_datas, df_colaboradores=None
         ws.merge_cells('A1:E1')
         titulo_cell.alignment = Alignment(horizontal='center', vertical='center')
         
-        # Processa semanas
-        ano_dados = datas_obj[0].year
-        mes_dados = datas_obj[0].month
-        
-        # monthcalendar retorna semanas (segunda a domingo)
-        cal = calendar.monthcalendar(ano_dados, mes_dados)
+        # Processa semanas (segunda a sábado) do calendário compartilhado
+        if calendario is None:
+            calendario = montar_calendario_periodo(mapa_datas)
         
         row_atual = 3
         semana_num = 1
         
-        for semana_dias in cal:
-            # Filtra apenas dias que existem em nosso dataset (segunda a sábado = índices 0-5)
-            dias_na_semana = [dia for dia in semana_dias[:6] if dia != 0]  # Pega segunda a sábado
-            
-            # Encontra quais datas do nosso dataset estão nesta semana
-            datas_nesta_semana = sorted([d for d in datas_obj if d.day in dias_na_semana])
-            
-            if not datas_nesta_semana:
-                continue
-            
+        for datas_nesta_semana in semanas_do_periodo(calendario, ate_sabado=True):
             # Header da semana
             data_inicio = datas_nesta_semana[0]
             data_fim = datas_nesta_semana[-1]
@@ -1983,7 +1382,7 @@ def criar_sheet_ofensores_semanais(df_mest, w, mapa_datas, df_colaboradores=None
                 cell.font = Font(bold=True, color='FFFFFF', size=10)
                 cell.fill = PatternFill(start_color='FF0D4F45', end_color='FF0D4F45', fill_type='solid')
                 cell.alignment = Alignment(horizontal='center', vertical='center')
-                cell.border = thin_border
+                cell.border = borda_celula
             row_atual += 1
             
             # Colunas das datas nesta semana
@@ -1991,35 +1390,26 @@ def criar_sheet_ofensores_semanais(df_mest, w, mapa_datas, df_colaboradores=None
             
             # Coleta dados dos colaboradores que faltaram nesta semana
             dados_colaboradores = []
-            
-            for idx, row_colab in df_mest.iterrows():
-                total_fi_semana = 0
-                total_fa_semana = 0
-                
-                for col_data in colunas_semana:
-                    if col_data not in df_mest.columns:
-                        continue
-                    
-                    valor = str(row_colab[col_data]).strip().upper() if pd.notna(row_colab[col_data]) else ''
-                    
-                    if valor == 'FI':
-                        total_fi_semana += 1
-                    elif valor == 'FA':
-                        total_fa_semana += 1
-                
-                # Inclui apenas colaboradores que tiveram faltas nesta semana
-                if total_fi_semana > 0 or total_fa_semana > 0:
-                    # Obtém tempo de serviço do colaborador
-                    tempo_srv = obter_tempo_servico(row_colab.get('NOME', ''), df_colaboradores)
-                    
-                    dados_colaboradores.append({
-                        'nome': row_colab.get('NOME', ''),
-                        'gestor': row_colab.get('GESTOR', ''),
-                        'fi': total_fi_semana,
-                        'fa': total_fa_semana,
-                        'total': total_fi_semana + total_fa_semana,
-                        'tempo_servico': tempo_srv
-                    })
+            contagens_semana = fatos.contagens(colunas_semana)
+            
+            # Inclui apenas colaboradores que tiveram faltas nesta semana
+            com_faltas = contagens_semana[(contagens_semana['FI'] > 0) | (contagens_semana['FA'] > 0)]
+            for pos, total_fi_semana, total_fa_semana in zip(com_faltas.index, com_faltas['FI'], com_faltas['FA']):
+                row_colab = df_mest.iloc[pos]
+                total_fi_semana = int(total_fi_semana)
+                total_fa_semana = int(total_fa_semana)
+                
+                # Obtém tempo de serviço do colaborador
+                tempo_srv = obter_tempo_servico(row_colab.get('NOME', ''), df_colaboradores)
+                
+                dados_colaboradores.append({
+                    'nome': row_colab.get('NOME', ''),
+                    'gestor': row_colab.get('GESTOR', ''),
+                    'fi': total_fi_semana,
+                    'fa': total_fa_semana,
+                    'total': total_fi_semana + total_fa_semana,
+                    'tempo_servico': tempo_srv
+                })
             
             # Ordena por total de faltas (descendente)
             dados_colaboradores.sort(key=lambda x: x['total'], reverse=True)
@@ -2049,7 +1439,7 @@ def criar_sheet_ofensores_semanais(df_mest, w, mapa_datas, df_colaboradores=None
                 # Formatação
                 for col_idx in range(1, 7):
                     cell = ws.cell(row=row_atual, column=col_idx)
-                    cell.border = thin_border
+                    cell.border = borda_celula
                     if col_idx >= 3:  # Colunas numéricas
                         cell.alignment = Alignment(horizontal='center', vertical='center')
                 
@@ -2073,17 +1463,18 @@ def criar_sheet_ofensores_semanais(df_mest, w, mapa_datas, df_colaboradores=None
         import traceback
         st.write(traceback.format_exc())
 
-def criar_sheet_ofensores_por_turno(df_mest, w, mapa_datas):
+def criar_sheet_ofensores_por_turno(df_mest, w, mapa_datas, calendario=None, fatos=None):
     """
     Cria sheet 'Ofensores por Turno' de forma ESTÁTICA (sem fórmulas).
     Calcula os valores no Python e escreve direto na célula.
+    As contagens diárias de FI/FA/DESLIGADO vêm da tabela de fatos (montada aqui se não for informada).
     """
     if df_mest is None or not mapa_datas:
         return
 
     try:
         from openpyxl.utils import get_column_letter
-        from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+        from openpyxl.styles import Font, PatternFill, Alignment
         import datetime
         import pandas as pd
         import calendar
@@ -2110,6 +1501,13 @@ def criar_sheet_ofensores_por_turno(df_mest, w, mapa_datas):
         df_work = df_mest.copy()
         df_work['TURNO_NORM'] = df_work[col_turno_orig].astype(str).str.strip().str.upper()
         df_work['AREA_NORM'] = df_work[col_area_orig].astype(str).str.strip().str.upper() if col_area_orig else ''
+        
+        # M&A: PROJETO INTERPRISE / MOVIMENTACAO E ARMAZENAGEM, BLOQ, CD-RJ | FOB ou M&A | LOCAFARMA CD-RJ
+        eh_ma_linhas = df_work['AREA_NORM'].astype(str).str.contains(
+            r'MOVIMENTACAO E ARMAZENAGEM|BLOQ|CD-RJ \| FOB|M&A \| LOCAFARMA CD-RJ', regex=True
+        ).to_numpy()
+        if fatos is None:
+            fatos = TabelaFatosAbs.da_mestra(df_mest, mapa_datas)
 
         # Identifica Turnos presentes + Força 1, 2, 3 se não estiverem
         turnos_presentes = list(df_work['TURNO_NORM'].unique())
@@ -2175,11 +1573,10 @@ def criar_sheet_ofensores_por_turno(df_mest, w, mapa_datas):
         # Define quais colunas são as datas
         mapa_datas_str = {d: str(c) for d, c in mapa_datas.items()} # data -> nome_coluna
         
-        # Prepara feriados
-        anos = set(d.year for d in mapa_datas.keys())
-        feriados_temp = {}
-        for ano in anos:
-            feriados_temp.update(obter_feriados_brasil(ano))
+        # Prepara feriados / dias da semana (calendário compartilhado)
+        if calendario is None:
+            calendario = montar_calendario_periodo(mapa_datas)
+        dias_calendario = indexar_calendario(calendario)
         
         # Ordena datas
         datas_ordenadas = sorted(mapa_datas.keys())
@@ -2192,7 +1589,7 @@ def criar_sheet_ofensores_por_turno(df_mest, w, mapa_datas):
         # Deleta a sheet se já existir para recriar
         if 'Ofensores por Turno' in w.book.sheetnames:
             del w.book['Ofensores por Turno']
-        ws = w.book.create_sheet("Ofensores por Turno")
+        ws = criar_aba(w.book, "Ofensores por Turno")
 
         row_atual = 1
         
@@ -2239,7 +1636,8 @@ def criar_sheet_ofensores_por_turno(df_mest, w, mapa_datas):
         # --- PROCESSAMENTO POR TURNO ---
         for turno in turnos_ordenados:
             # Filtra DF pelo turno (String exata)
-            df_turno = df_work[df_work['TURNO_NORM'] == turno]
+            mascara_turno = (df_work['TURNO_NORM'] == turno).to_numpy()
+            df_turno = df_work[mascara_turno]
             
             # Calcula HC Base deste turno
             hc_ma_base, hc_crdk_base = calcular_hc_filtrado(df_turno)
@@ -2313,36 +1711,17 @@ def criar_sheet_ofensores_por_turno(df_mest, w, mapa_datas):
             for dia in range(1, dias_no_mes + 1):
                 dados_dias[dia] = {'ma_cnt': 0, 'crdk_cnt': 0, 'desligados': 0, 'fi': 0, 'fa': 0}
 
-            # Popula Counts
-            for idx, row in df_turno.iterrows():
-                area = str(row['AREA_NORM'])
-                eh_ma = False
-                if "PROJETO INTERPRISE" in area and "MOVIMENTACAO E ARMAZENAGEM" in area: eh_ma = True
-                elif "MOVIMENTACAO E ARMAZENAGEM" in area and "PROJETO INTERPRISE" not in area: eh_ma = True
-                elif "BLOQ" in area: eh_ma = True
-                elif "CD-RJ | FOB" in area: eh_ma = True
-                elif "M&A | LOCAFARMA CD-RJ" in area: eh_ma = True
-
-                
-                # eh_crdk removido logica interna pois nao usamos mais na saida
-                
-                # Para cada dia, checa valor na coluna
-                for dia in range(1, dias_no_mes + 1):
-                     data_obj = datetime.date(ano_dados, mes_dados, dia)
-                     col_name = mapa_datas.get(data_obj)
-                     if col_name:
-                         val = str(row.get(col_name, '')).strip().upper()
-                         
-                         if val in ['FI', 'FA']:
-                             # LOGICA MODIFICADA: Conta M&A em ma_cnt E fi/fa. IGNORA CRDK.
-                             if eh_ma: 
-                                 dados_dias[dia]['ma_cnt'] += 1
-                                 if val == 'FI': dados_dias[dia]['fi'] += 1
-                                 if val == 'FA': dados_dias[dia]['fa'] += 1
-                                 
-                         # Desligados tambem deve ser filtrado?
-                         if val == 'DESLIGADO':
-                             if eh_ma: dados_dias[dia]['desligados'] += 1
+            # Popula Counts: só colaboradores M&A do turno (CRDK ignorado na saída)
+            contagens_dia = fatos.por_dia(mascara_turno & eh_ma_linhas)
+            for dia in range(1, dias_no_mes + 1):
+                col_name = mapa_datas.get(datetime.date(ano_dados, mes_dados, dia))
+                if col_name in contagens_dia.index:
+                    fi_dia = int(contagens_dia.at[col_name, 'FI'])
+                    fa_dia = int(contagens_dia.at[col_name, 'FA'])
+                    dados_dias[dia]['ma_cnt'] = fi_dia + fa_dia
+                    dados_dias[dia]['fi'] = fi_dia
+                    dados_dias[dia]['fa'] = fa_dia
+                    dados_dias[dia]['desligados'] = int(contagens_dia.at[col_name, 'DESLIGADO'])
 
             # ESCREVE LINHAS
             labels = ['M&A', 'M&A - %'] # CRDK REMOVIDO
@@ -2362,8 +1741,8 @@ def criar_sheet_ofensores_por_turno(df_mest, w, mapa_datas):
                     cell = ws.cell(row=row_atual, column=col_idx)
                     
                     data_obj = datetime.date(ano_dados, mes_dados, dia)
-                    eh_domingo = data_obj.weekday() == 6
-                    eh_feriado = data_obj in feriados_temp
+                    eh_domingo = dias_calendario[data_obj]['DOMINGO']
+                    eh_feriado = dias_calendario[data_obj]['FERIADO']
                     
                     if eh_feriado or eh_domingo:
                         cell.value = "FERIADO" if eh_feriado else "DOMINGO"
@@ -2437,8 +1816,8 @@ def criar_sheet_ofensores_por_turno(df_mest, w, mapa_datas):
                 col_idx = dia + 1
                 info = dados_dias[dia]
                 data_obj = datetime.date(ano_dados, mes_dados, dia)
-                eh_domingo = data_obj.weekday() == 6
-                eh_feriado = data_obj in feriados_temp
+                eh_domingo = dias_calendario[data_obj]['DOMINGO']
+                eh_feriado = dias_calendario[data_obj]['FERIADO']
                 
                 # Valores do dia
                 hc_do_dia = hc_total_base - info['desligados'] # Considerando apenas M&A agora pois crdk removido
@@ -2515,10 +1894,12 @@ def criar_sheet_ofensores_por_turno(df_mest, w, mapa_datas):
         st.write(traceback.format_exc())
 
 
-def enriquecer_ranking_com_dados_csv(top_10_fa, top_10_fi, df_colaboradores):
+def enriquecer_ranking_com_dados_csv(top_10_fa, top_10_fi, base_ativos):
     """
-    Enriquece os TOP 10 FA e FI com dados do CSV de colaboradores.
-    Usa fuzzy matching (LIKE) para encontrar nomes mesmo com pequenas diferenças.
+    Enriquece os rankings de FA e FI com dados do CSV de colaboradores.
+    Usa fuzzy matching (LIKE) para encontrar nomes mesmo com pequenas diferenças:
+    cada nome distinto é buscado uma vez (IndiceFuzzyNomes), só entre os candidatos
+    com mais trigramas em comum.
     
     Extrai:
     - Data de Admissão (coluna "Data Admissão")
@@ -2526,172 +1907,54 @@ def enriquecer_ranking_com_dados_csv(top_10_fa, top_10_fi, df_colaboradores):
     - Calcula Tempo de Serviço em Anos e Meses
     
     Args:
-        top_10_fa: DataFrame com TOP 10 FA
-        top_10_fi: DataFrame com TOP 10 FI
-        df_colaboradores: DataFrame com dados dos colaboradores (CSV)
+        top_10_fa: Ranking de FA (DataFrame com NOME)
+        top_10_fi: Ranking de FI (DataFrame com NOME)
+        base_ativos: BaseAtivos (ou DataFrame do CSV de colaboradores)
     
     Returns:
         tuple: (df_fa_enriquecido, df_fi_enriquecido)
     """
-    from difflib import SequenceMatcher
+    # Fazer merge dos DataFrames
+    df_fa_enriquecido = top_10_fa.copy()
+    df_fi_enriquecido = top_10_fi.copy()
     
-    def calcular_tempo_admissao(data_admissao):
-        """Calcula Anos e Meses desde a data de admissão (formato: XaYm)"""
-        try:
-            if pd.isna(data_admissao):
-                return "N/A"
-            
-            # Converte para datetime se necessário
-            if isinstance(data_admissao, str):
-                # Tenta diferentes formatos
-                try:
-                    data = pd.to_datetime(data_admissao, format='%d/%m/%Y')
-                except:
-                    try:
-                        data = pd.to_datetime(data_admissao, format='%Y-%m-%d')
-                    except:
-                        return "N/A"
-            else:
-                data = pd.to_datetime(data_admissao)
-            
-            hoje = datetime.datetime.now()
-            
-            # Calcula diferença
-            diff = relativedelta(hoje, data)
-            anos = diff.years
-            meses = diff.months
-            
-            return f"{anos}a {meses}m"
-        except:
-            return "N/A"
-    
-    def similarity_ratio(a, b):
-        """Calcula o índice de similaridade entre duas strings (0 a 1)"""
-        return SequenceMatcher(None, str(a).upper().strip(), str(b).upper().strip()).ratio()
-    
-    # Fazer merge dos DataFrames
-    df_fa_enriquecido = top_10_fa.copy()
-    df_fi_enriquecido = top_10_fi.copy()
-    
-    # Procurar colunas pelo padrão correto
-    # No seu CSV: coluna 4 (índice 3) é "Colaborador", coluna 13 (índice 12) é "Data Admissão", coluna 51 (índice 50) é "Sexo"
-    
-    col_nome_csv = None
-    col_data_adm = None
-    col_sexo = None
-    
-    # Tenta encontrar by exact match na lista de colunas
-    for i, col in enumerate(df_colaboradores.columns):
-        col_upper = str(col).upper().strip()
-        
-        # Coluna de Colaborador
-        if col_upper == 'COLABORADOR':
-            col_nome_csv = col
-        
-        # Coluna de Data Admissão
-        if 'DATA ADMISS' in col_upper:
-            col_data_adm = col
-        
-        # Coluna de Sexo
-        if col_upper == 'SEXO':
-            col_sexo = col
-    
-    # Fallback: se não encontrou, usa índices conhecidos
-    if col_nome_csv is None and len(df_colaboradores.columns) > 3:
-        col_nome_csv = df_colaboradores.columns[3]
-    
-    if col_data_adm is None and len(df_colaboradores.columns) > 12:
-        col_data_adm = df_colaboradores.columns[12]
-    
-    if col_sexo is None and len(df_colaboradores.columns) > 50:
-        col_sexo = df_colaboradores.columns[50]
-    
-    # Função para buscar dados do colaborador com fuzzy matching
-    def buscar_dados_colaborador(nome_ranking):
-        if not col_nome_csv:
-            return {
-                'Data Admissão': 'Não consta',
-                'Tempo de Serviço': 'Não consta',
-                'Gênero': 'Não consta'
-            }
-        
-        nome_ranking_upper = str(nome_ranking).strip().upper()
-        
-        # Busca por correspondência exata primeiro
-        matches_exatos = [
-            idx for idx, row in df_colaboradores.iterrows()
-            if str(row[col_nome_csv]).strip().upper() == nome_ranking_upper
-        ]
-        
-        if matches_exatos:
-            idx_match = matches_exatos[0]
-        else:
-            # Busca por fuzzy matching (similaridade >= 0.75)
-            melhor_idx = None
-            melhor_score = 0
-            
-            for idx, row in df_colaboradores.iterrows():
-                nome_csv = str(row[col_nome_csv]).strip()
-                score = similarity_ratio(nome_ranking_upper, nome_csv)
-                
-                if score > melhor_score:
-                    melhor_score = score
-                    melhor_idx = idx
-            
-            # Só aceita se a similaridade for >= 75%
-            if melhor_score >= 0.75:
-                idx_match = melhor_idx
-            else:
-                idx_match = None
-        
-        if idx_match is not None:
-            row_match = df_colaboradores.iloc[idx_match]
-            
-            # Extrai dados com segurança
-            data_adm = 'Não consta'
-            sexo = 'Não consta'
-            tempo_servico = 'Não consta'
-            
-            try:
-                if col_data_adm and col_data_adm in df_colaboradores.columns:
-                    data_adm_val = row_match[col_data_adm]
-                    if pd.notna(data_adm_val):
-                        data_adm = str(data_adm_val).strip()
-                        tempo_servico = calcular_tempo_admissao(data_adm_val)
-            except:
-                pass
-            
-            try:
-                if col_sexo and col_sexo in df_colaboradores.columns:
-                    sexo_val = row_match[col_sexo]
-                    if pd.notna(sexo_val):
-                        sexo = str(sexo_val).strip()
-            except:
-                pass
-            
-            return {
-                'Data Admissão': data_adm,
-                'Tempo de Serviço': tempo_servico,
-                'Gênero': sexo
-            }
-        else:
-            return {
-                'Data Admissão': 'Não consta',
-                'Tempo de Serviço': 'Não consta',
-                'Gênero': 'Não consta'
-            }
-    
-    # Aplicar busca para FA
-    for idx, row in df_fa_enriquecido.iterrows():
-        dados = buscar_dados_colaborador(row['NOME'])
-        for col, val in dados.items():
-            df_fa_enriquecido.at[idx, col] = val
-    
-    # Aplicar busca para FI
-    for idx, row in df_fi_enriquecido.iterrows():
-        dados = buscar_dados_colaborador(row['NOME'])
-        for col, val in dados.items():
-            df_fi_enriquecido.at[idx, col] = val
+    # Colunas resolvidas uma vez pela base de ativos (nome da coluna ou posição padrão:
+    # Colaborador = índice 3, Data Admissão = índice 12, Sexo = índice 50)
+    if not isinstance(base_ativos, BaseAtivos):
+        base_ativos = BaseAtivos(base_ativos)
+    df_colaboradores = base_ativos.df
+    col_nome_csv = base_ativos.coluna('colaborador')
+    col_data_adm = base_ativos.coluna('admissao')
+    col_sexo = base_ativos.coluna('sexo')
+    
+    # Dados de cada linha do CSV (texto da admissão, tempo de serviço e sexo), calculados uma vez
+    colunas_enriquecidas = ['Data Admissão', 'Tempo de Serviço', 'Gênero']
+    dados_csv = pd.DataFrame(SEM_DADO, index=pd.RangeIndex(len(df_colaboradores)), columns=colunas_enriquecidas)
+    if col_data_adm is not None:
+        valores_adm = df_colaboradores[col_data_adm].reset_index(drop=True)
+        preenchidas = valores_adm.notna()
+        dados_csv.loc[preenchidas, 'Data Admissão'] = valores_adm[preenchidas].astype(str).str.strip()
+        dados_csv['Tempo de Serviço'] = tempo_de_servico(valores_adm)
+    if col_sexo is not None:
+        valores_sexo = df_colaboradores[col_sexo].reset_index(drop=True)
+        preenchidas = valores_sexo.notna()
+        dados_csv.loc[preenchidas, 'Gênero'] = valores_sexo[preenchidas].astype(str).str.strip()
+    
+    # Busca de cada nome distinto do ranking (exata ou aproximada), compartilhada por FA e FI
+    posicao_por_nome = {}
+    if col_nome_csv:
+        indice_nomes = IndiceFuzzyNomes(df_colaboradores[col_nome_csv], limiar=0.75)
+        nomes_ranking = pd.concat([df_fa_enriquecido['NOME'], df_fi_enriquecido['NOME']])
+        posicao_por_nome = {nome: indice_nomes.buscar(nome) for nome in pd.unique(nomes_ranking)}
+    
+    def aplicar_dados(df_ranking):
+        posicoes = df_ranking['NOME'].map(posicao_por_nome).to_numpy()
+        for col in colunas_enriquecidas:
+            valores = dados_csv[col].reindex(posicoes).to_numpy()
+            df_ranking[col] = pd.Series(valores, index=df_ranking.index, dtype=object).fillna(SEM_DADO)
+    
+    aplicar_dados(df_fa_enriquecido)
+    aplicar_dados(df_fi_enriquecido)
     
     return df_fa_enriquecido, df_fi_enriquecido
 
@@ -2771,7 +2034,7 @@ def criar_sheet_faltantes(df_mest, w, mapa_datas):
 
     try:
         from openpyxl.utils.dataframe import dataframe_to_rows
-        from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+        from openpyxl.styles import Font, PatternFill, Alignment
         from copy import copy
         import pandas as pd
         
@@ -2780,7 +2043,7 @@ def criar_sheet_faltantes(df_mest, w, mapa_datas):
              ws_faltantes = w.book['Faltantes'] # Se já existir, sobrescreve? Melhor remover e criar
              w.book.remove(ws_faltantes)
         
-        ws_faltantes = w.book.create_sheet("Faltantes")
+        ws_faltantes = criar_aba(w.book, "Faltantes")
         
         # Identifica colunas de datas para buscar FI
         colunas_datas_nomes = list(mapa_datas.values())
@@ -2915,16 +2178,139 @@ MAPA_CORES = {
     'DESCANSO': 'FFC0C0C0'  # Cinza
 }
 
+
+def gerar_relatorio_ranking_abs(contexto):
+    """Gera o Ranking ABS uma vez (contagens da tabela de fatos), já enriquecido com o CSV de colaboradores quando houver."""
+    top_fa_enriquecido = top_fi_enriquecido = None
+    df_mest = contexto['df_mest']
+    try:
+        df_ranking = montar_ranking_abs(df_mest, contexto['fatos'])
+    except Exception as e:
+        st.error(f"Erro ao criar sheet de ranking: {str(e)}")
+        return
+    if contexto['base_ativos'] is not None:
+        try:
+            top_fa_enriquecido, top_fi_enriquecido = enriquecer_ranking_com_dados_csv(
+                df_ranking.sort_values(by='FA', ascending=False),
+                df_ranking.sort_values(by='FI', ascending=False),
+                contexto['base_ativos']
+            )
+        except Exception as e:
+            st.warning(f"⚠️ Não foi possível enriquecer ranking com CSV: {str(e)}")
+            top_fa_enriquecido = top_fi_enriquecido = None
+    
+    criar_sheet_ranking_abs(df_mest, contexto['w'], MAPA_CORES, df_ranking, top_fa_enriquecido, top_fi_enriquecido)
+
+
+def gerar_relatorio_ofensores_por_setor(contexto):
+    """Ofensores por setor depende do CSV de colaboradores (sem ele, a aba não é gerada)."""
+    if contexto['df_colaboradores'] is None:
+        st.info("ℹ️ Ofensores por setor precisa do CSV de colaboradores. Aba não gerada.")
+        return
+    criar_sheet_ofensores_por_setor(
+        contexto['df_mest'], contexto['w'], contexto['df_colaboradores'], contexto['mapa_datas'],
+        calendario=contexto['calendario'], fatos=contexto['fatos']
+    )
+
+
+# Relatórios opcionais da planilha, na ordem de geração.
+# Cada relatório declara as dependências (dados agregados além da mestra marcada) que usa;
+# só as dependências dos relatórios selecionados são calculadas. Todos leem as contagens de
+# marcações da tabela de fatos (contexto['fatos']), montada uma vez antes dos relatórios.
+#   'colaboradores': CSV de colaboradores carregado (df_colaboradores)
+RELATORIOS = {
+    'Ofensores de ABS': {
+        'mensagem': "📊 Gerando relatório de ofensores...",
+        'dependencias': ('colaboradores',),
+        'gerar': lambda contexto: criar_sheet_ofensores_abs(
+            contexto['df_mest'], contexto['w'], contexto['mapa_datas'], MAPA_CORES, contexto['afastamentos'],
+            contexto['df_colaboradores'], calendario=contexto['calendario'], fatos=contexto['fatos']
+        ),
+    },
+    'Ranking ABS': {
+        'mensagem': "🏆 Gerando ranking de absenteísmo...",
+        'dependencias': ('colaboradores',),
+        'gerar': gerar_relatorio_ranking_abs,
+    },
+    'Ofensores por setor': {
+        'mensagem': "🏢 Gerando ofensores por setor...",
+        'dependencias': ('colaboradores',),
+        'gerar': gerar_relatorio_ofensores_por_setor,
+    },
+    'Ofensores Semanais': {
+        'mensagem': "📅 Gerando ofensores semanais...",
+        'dependencias': ('colaboradores',),
+        'gerar': lambda contexto: criar_sheet_ofensores_semanais(
+            contexto['df_mest'], contexto['w'], contexto['mapa_datas'], contexto['df_colaboradores'],
+            calendario=contexto['calendario'], fatos=contexto['fatos']
+        ),
+    },
+    'Ofensores por Turno': {
+        'mensagem': "🏭 Gerando ofensores por turno...",
+        'dependencias': (),
+        'gerar': lambda contexto: criar_sheet_ofensores_por_turno(
+            contexto['df_mest'], contexto['w'], contexto['mapa_datas'], calendario=contexto['calendario'], fatos=contexto['fatos']
+        ),
+    },
+}
+
+
+def dependencias_dos_relatorios(relatorios_selecionados):
+    """Conjunto das dependências declaradas pelos relatórios selecionados."""
+    return {dep for nome in relatorios_selecionados for dep in RELATORIOS[nome]['dependencias']}
+
+
 col1, col2 = st.columns(2)
 
 # Checkbox para modo rápido (apenas Dados + Porcentagens)
 if 'modo_rapido' not in st.session_state:
     st.session_state.modo_rapido = False
 
+# Checkbox para leitura paralela das planilhas de encarregado
+if 'leitura_paralela' not in st.session_state:
+    st.session_state.leitura_paralela = True
+
+# Checkbox para consultar a Brasil API além do calendário local de feriados
+if 'feriados_api' not in st.session_state:
+    st.session_state.feriados_api = False
+
+# Checkbox para pintar as marcações da aba Dados por formatação condicional
+if 'cores_condicionais' not in st.session_state:
+    st.session_state.cores_condicionais = False
+
+# Checkbox para as fórmulas leves (COUNTIFS na coluna auxiliar de grupo) da aba Porcentagens ABS
+if 'formulas_leves' not in st.session_state:
+    st.session_state.formulas_leves = False
+
+# Relatórios (abas extras) gerados junto com Dados e Porcentagens ABS
+if 'relatorios_selecionados' not in st.session_state:
+    st.session_state.relatorios_selecionados = list(RELATORIOS)
+
+# Estado processado (matriz com feriados, afastamentos, desligados e férias) do último processamento
+if 'estado_processado' not in st.session_state:
+    st.session_state.estado_processado = None
+
 with col1:
     st.checkbox("⚡ Modo Rápido (apenas abas Dados e Porcentagens ABS)", 
                 key="modo_rapido",
                 help="Ative para gerar apenas as abas essenciais e pular relatórios pesados (Ofensores, Ranking, etc.)")
+    st.multiselect("📑 Relatórios a gerar",
+                   list(RELATORIOS),
+                   key="relatorios_selecionados",
+                   disabled=st.session_state.modo_rapido,
+                   help="Abas extras geradas junto com Dados e Porcentagens ABS. Depois de processar, é possível gerar a planilha de novo com outra seleção sem refazer o lançamento.")
+    st.checkbox("🧵 Leitura paralela das planilhas de encarregado",
+                key="leitura_paralela",
+                help="Lê vários arquivos de encarregado ao mesmo tempo (um processo por núcleo). Desative se houver problemas de memória.")
+    st.checkbox("🌐 Atualizar feriados pela Brasil API (requer internet)",
+                key="feriados_api",
+                help="Os feriados são calculados localmente (nacionais, Carnaval, Sexta-feira Santa, Corpus Christi e feriados do RJ). Ative para complementar com a Brasil API.")
+    st.checkbox("🎨 Cores da aba Dados por formatação condicional (arquivo mais leve)",
+                key="cores_condicionais",
+                help="As células de data levam só a marcação e o Excel aplica a cor de cada código (P, FI, FA, ...). As cores se mantêm corretas se as marcações forem editadas depois.")
+    st.checkbox("🪶 Fórmulas leves na aba Porcentagens ABS",
+                key="formulas_leves",
+                help="Grava na aba Dados uma coluna auxiliar com o grupo de área de cada colaborador (M&A, CRDK / D&E) e usa COUNTIFS nela, em vez de SUMPRODUCT/SEARCH sobre colunas inteiras. Recalcula bem mais rápido no Excel e no LibreOffice. Cada colaborador conta em um único grupo.")
     st.header("Upload")
     file_mestra = st.file_uploader("Planilha MESTRA", type=["xlsx", "xlsm"])
     file_colaboradores = st.file_uploader("CSV de Colaboradores (para enriquecer Ranking e atualizar Situação)", type=["csv", "xlsx", "xlsm"])
@@ -2973,16 +2359,12 @@ if files_encarregado:
     # Valida cada arquivo
     for file_enc in files_encarregado:
         try:
-            # Tenta detectar sheets com múltiplos engines
+            # Detecta as guias (cache por conteúdo: não reabre o arquivo a cada rerun)
             guias = None
             try:
-                guias = pd.ExcelFile(io.BytesIO(file_enc.getvalue()), engine='openpyxl').sheet_names
+                guias = obter_info_planilha(file_enc.getvalue())['guias']
             except:
-                try:
-                    file_enc.seek(0)
-                    guias = pd.ExcelFile(io.BytesIO(file_enc.getvalue())).sheet_names
-                except:
-                    guias = None
+                guias = None
             
             if guias:
                 arquivos_validos.append(file_enc)
@@ -3010,53 +2392,6 @@ if files_encarregado:
     for idx, f in enumerate(files_encarregado):
         st.markdown(f"**[{idx + 1}]** - `{f.name}`")
     
-    # Função auxiliar para detecção automática (reutilizada no modo individual e em lote)
-    def detectar_config_arquivo(df_raw):
-        letras_disponiveis = []
-        for i in range(len(df_raw.columns)):
-            if i < 26:
-                letras_disponiveis.append(chr(65 + i))
-            else:
-                letras_disponiveis.append(f"{chr(65 + i//26 - 1)}{chr(65 + i%26)}")
-        
-        # 1. Detecta COLUNA (Nomes)
-        keywords_nomes = ['NOME', 'NOMES', 'COLABORADOR', 'COLABORADORES', 'FUNCIONARIO', 'FUNCIONARIOS', 'EMPLOYEE', 'EMPLOYEES', 'PESSOAL', 'PERSON', 'STAFF']
-        col_detectada = None
-        idx_col_detectada = None
-        
-        # Pela keyword
-        for linha_teste in range(min(10, len(df_raw))):
-            for i in range(len(df_raw.columns) - 1, -1, -1):
-                header = str(df_raw.iloc[linha_teste, i]).upper().strip()
-                for keyword in keywords_nomes:
-                    if keyword in header:
-                        col_detectada = letras_disponiveis[i]
-                        idx_col_detectada = i
-                        break
-                if col_detectada: break
-            if col_detectada: break
-            
-        # Pelo conteúdo
-        if col_detectada is None:
-            for i in range(len(df_raw.columns) - 1, -1, -1):
-                valores = df_raw.iloc[:, i].astype(str).str.strip()
-                tem_letras = valores.apply(lambda x: any(c.isalpha() for c in x)).sum() > len(valores) * 0.7
-                if tem_letras:
-                    col_detectada = letras_disponiveis[i]
-                    idx_col_detectada = i
-                    break
-        
-        # 2. Detecta LINHA (Dias)
-        linha_detectada = None
-        for tentativa_linha in range(min(20, len(df_raw))):
-            valores_linha = [str(df_raw.iloc[tentativa_linha, i]).strip() for i in range(len(df_raw.columns))]
-            numeros_encontrados = [v for v in valores_linha if v.isdigit() or v in ['1', '2', '3', '4', '5', '6', '7', '8', '9', '10', '11', '12', '13', '14', '15', '16', '17', '18', '19', '20', '21', '22', '23', '24', '25', '26', '27', '28', '29', '30', '31']]
-            if len(numeros_encontrados) >= 15:
-                linha_detectada = tentativa_linha
-                break
-        
-        return col_detectada, idx_col_detectada, linha_detectada
-
     st.header("Pré-Visualização")
     
     # Se há múltiplos arquivos, mostra opção de processamento automático em lote
@@ -3068,19 +2403,30 @@ if files_encarregado:
                 status_text = st.empty()
                 erros_configuracao = []  # Rastreia planilhas com erro
                 
-                for i, file_obj in enumerate(files_encarregado):
-                    status_text.text(f"Processando [{i + 1}/{len(files_encarregado)}] - {file_obj.name}...")
+                def atualizar_progresso_configuracao(concluidos, total, resultado):
+                    status_text.text(f"Processando [{concluidos}/{total}] - {resultado['nome']}...")
+                    progress_bar.progress(concluidos / total)
+                
+                # Lê todas as planilhas (guia ativa de cada uma) de uma vez
+                leituras = ler_planilhas_em_paralelo(
+                    [(i, f.name, f.getvalue(), None) for i, f in enumerate(files_encarregado)],
+                    paralelo=st.session_state.leitura_paralela,
+                    ao_progredir=atualizar_progresso_configuracao
+                )
+                
+                for leitura in leituras:
+                    i = leitura['indice']
+                    file_obj = files_encarregado[i]
                     
                     try:
-                        # Carrega arquivo
-                        wb_temp = load_workbook(io.BytesIO(file_obj.getvalue()), data_only=True)
-                        guia = wb_temp.active.title
+                        if leitura['erro']:
+                            raise Exception(leitura['erro'])
                         
-                        # Carrega dataframe
-                        df_temp = pd.read_excel(io.BytesIO(file_obj.getvalue()), sheet_name=guia, header=None, dtype=str)
+                        guia = leitura['guia']
+                        df_temp = leitura['df']
                         
-                        # Detecta configurações
-                        col_letra, col_idx, linha_idx = detectar_config_arquivo(df_temp)
+                        # Detecta configurações (layouts já conhecidos vêm da memória)
+                        col_letra, col_idx, linha_idx, _ = detectar_config_com_memoria(df_temp, guia)
                         
                         # Aplica configurações se detectou tudo
                         if col_letra and linha_idx is not None:
@@ -3107,9 +2453,6 @@ if files_encarregado:
                             'nome': file_obj.name,
                             'erro': str(e)
                         })
-                    
-                    # Atualiza progresso
-                    progress_bar.progress((i + 1) / len(files_encarregado))
                 
                 status_text.text("✅ Configuração automática concluída!")
                 
@@ -3170,13 +2513,10 @@ if files_encarregado:
         idx_arquivo_atual = st.session_state.idx_arquivo_nav
         file_encarregado = files_encarregado[idx_arquivo_atual]
     
-    # Detecta as guias (sheets) disponíveis no arquivo
-    guias_disponiveis = pd.ExcelFile(io.BytesIO(file_encarregado.getvalue())).sheet_names
-    
-    # Detecta qual é a guia ATIVA no arquivo Excel
-    wb_temp = load_workbook(io.BytesIO(file_encarregado.getvalue()), data_only=True)
-    guia_ativa_arquivo = wb_temp.active.title  # Pega o título da guia ativa
-    wb_temp.close()
+    # Detecta as guias (sheets) disponíveis e a guia ATIVA no arquivo Excel
+    info_planilha = obter_info_planilha(file_encarregado.getvalue())
+    guias_disponiveis = info_planilha['guias']
+    guia_ativa_arquivo = info_planilha['guia_ativa']  # Pega o título da guia ativa
     
     # Define a guia ativa do arquivo como padrão
     if guia_ativa_arquivo in guias_disponiveis:
@@ -3192,57 +2532,16 @@ if files_encarregado:
     
     # Guarda a guia selecionada no session_state
     st.session_state.guia_selecionada = guia_selecionada
-    buf = io.BytesIO(file_encarregado.getvalue())
-    df_raw = pd.read_excel(buf, sheet_name=guia_selecionada, header=None, dtype=str)  # Especifica dtype direto
+    df_raw, _ = ler_planilha_cache(file_encarregado.getvalue(), guia_selecionada)  # header=None, dtype=str
     
     st.write(f"**Linhas detectadas:** {len(df_raw)} | **Colunas:** {len(df_raw.columns)}")
     
     # Cria nomes em formato Excel (A, B, C...)
-    letras_disponíveis = []
-    for i in range(len(df_raw.columns)):
-        if i < 26:
-            letras_disponíveis.append(chr(65 + i))  # A-Z
-        else:
-            letras_disponíveis.append(f"{chr(65 + i//26 - 1)}{chr(65 + i%26)}")  # AA, AB, etc
-    
-    # DETECTA AUTOMATICAMENTE qual é a coluna com nomes (testando múltiplas linhas)
-    keywords_nomes = ['NOME', 'NOMES', 'COLABORADOR', 'COLABORADORES', 'FUNCIONARIO', 'FUNCIONARIOS', 'EMPLOYEE', 'EMPLOYEES', 'PESSOAL', 'PERSON', 'STAFF']
-    col_detectada_auto = None
-    idx_col_detectada_auto = None
+    letras_disponíveis = letras_colunas(len(df_raw.columns))
     
-    # Testa as primeiras 10 linhas procurando por keywords
-    for linha_teste in range(min(10, len(df_raw))):
-        for i in range(len(df_raw.columns) - 1, -1, -1):  # De trás para frente
-            header = str(df_raw.iloc[linha_teste, i]).upper().strip()
-            for keyword in keywords_nomes:
-                if keyword in header:
-                    col_detectada_auto = letras_disponíveis[i]
-                    idx_col_detectada_auto = i
-                    break
-            if col_detectada_auto:
-                break
-        if col_detectada_auto:
-            break
-    
-    # Se não encontrou pela keyword, detecta por conteúdo (muitas letras)
-    if col_detectada_auto is None:
-        for i in range(len(df_raw.columns) - 1, -1, -1):
-            valores = df_raw.iloc[:, i].astype(str).str.strip()
-            tem_letras = valores.apply(lambda x: any(c.isalpha() for c in str(x))).sum() > len(valores) * 0.7
-            if tem_letras:
-                col_detectada_auto = letras_disponíveis[i]
-                idx_col_detectada_auto = i
-                break
-    
-    # Detecta automaticamente qual é a linha com os dias
-    # Procura pela primeira linha que tem números em sequência (1, 2, 3, 4, 5...)
-    linha_detectada = None
-    for tentativa_linha in range(min(20, len(df_raw))):
-        valores_linha = [str(df_raw.iloc[tentativa_linha, i]).strip() for i in range(len(df_raw.columns))]
-        numeros_encontrados = [v for v in valores_linha if v.isdigit() or v in ['1', '2', '3', '4', '5', '6', '7', '8', '9', '10', '11', '12', '13', '14', '15', '16', '17', '18', '19', '20', '21', '22', '23', '24', '25', '26', '27', '28', '29', '30', '31']]
-        if len(numeros_encontrados) >= 15:  # Se tem pelo menos 15 números (dias do mês)
-            linha_detectada = tentativa_linha
-            break
+    # DETECTA AUTOMATICAMENTE a coluna com nomes e a linha com os dias
+    # (layouts já vistos em meses anteriores vêm direto da memória de layouts)
+    col_detectada_auto, idx_col_detectada_auto, linha_detectada, _ = detectar_config_com_memoria(df_raw, guia_selecionada)
     
     linhas = [f"Linha {i+1}" for i in range(min(20, len(df_raw)))]
     
@@ -3402,53 +2701,52 @@ with col_btn_processar:
         if faltando_config:
             st.warning("⚠️ Algumas planilhas de encarregado ainda não foram configuradas automaticamente.")
     
+    # A planilha é gerada logo após o processamento ou, depois, a partir do estado em cache
+    # (válido enquanto todas as entradas do processamento forem as mesmas: conteúdo dos
+    # arquivos, configuração de cada encarregado, mês/ano, inserções pendentes e feriados)
+    uploads_atuais = [f for f in [file_mestra, *(files_encarregado or []), file_demitidos,
+                                  file_ferias_1, file_ferias_2, file_colaboradores] if f is not None]
+    hashes_anteriores = st.session_state.get('hashes_uploads', {})
+    # Hash calculado uma vez por arquivo enviado (file_id), não a cada rerun
+    st.session_state.hashes_uploads = {
+        f.file_id: hashes_anteriores.get(f.file_id) or hash_conteudo(f.getvalue()) for f in uploads_atuais
+    }
+
+    def hash_upload(arquivo):
+        return st.session_state.hashes_uploads[arquivo.file_id] if arquivo is not None else None
+
+    def config_encarregado(arquivo):
+        config = st.session_state.config_arquivos.get(arquivo.name) or {}
+        return tuple(config.get(campo) for campo in ('guia', 'linha_idx', 'col_idx', 'nome_encarregado'))
+
+    entradas_processamento = (
+        hash_upload(file_mestra),
+        tuple((hash_upload(f), config_encarregado(f)) for f in files_encarregado or []),
+        hash_upload(file_demitidos),
+        hash_upload(file_ferias_1),
+        hash_upload(file_ferias_2),
+        hash_upload(file_colaboradores),
+        int(mes),
+        int(ano),
+        tuple((str(item.get('nome', '')), str(item.get('encarregado', '')))
+              for item in st.session_state.insercoes_mestra_pendentes),
+        bool(st.session_state.feriados_api),
+    )
+    gerar_planilha = False
+    processado_agora = False
     if st.button("🚀 Processar TODOS os Arquivos", disabled=not todos_configurados):
         if file_mestra and files_encarregado and todos_configurados:
             try:
-                # Carrega a planilha mestra UMA VEZ
+                # Carrega a planilha mestra UMA VEZ (lê os bytes uma vez; snapshot local por hash)
                 df_mest = None
                 
                 try:
-                    # Primeiro tenta ler direto com pandas (automático)
-                    file_mestra.seek(0)
-                    df_mest = pd.read_excel(file_mestra, header=0)
-                except Exception as e1:
-                    try:
-                        # Segunda tentativa: especifica openpyxl
-                        file_mestra.seek(0)
-                        df_mest = pd.read_excel(file_mestra, header=0, engine='openpyxl')
-                    except Exception as e2:
-                        try:
-                            # Terceira tentativa: lê como bytes
-                            file_mestra.seek(0)
-                            file_bytes = file_mestra.read()
-                            import io as io_module
-                            df_mest = pd.read_excel(io_module.BytesIO(file_bytes), header=0, engine='openpyxl')
-                        except Exception as e3:
-                            try:
-                                # Quarta tentativa: tenta reparar ZIP interno
-                                import zipfile
-                                file_mestra.seek(0)
-                                file_bytes = file_mestra.read()
-                                import io as io_module
-                                
-                                try:
-                                    # Tenta verificar como ZIP
-                                    zip_file = zipfile.ZipFile(io_module.BytesIO(file_bytes), 'r')
-                                    zip_file.testzip()  # Testa integridade
-                                    df_mest = pd.read_excel(io_module.BytesIO(file_bytes), header=0, engine='openpyxl')
-                                except zipfile.BadZipFile:
-                                    st.warning("⚠️ Arquivo ZIP corrompido, tentando recuperar...")
-                                    # Tenta reparar procurando por PK (assinatura ZIP)
-                                    pk_index = file_bytes.find(b'PK\x03\x04')
-                                    if pk_index > 0:
-                                        file_bytes_repaired = file_bytes[pk_index:]
-                                        df_mest = pd.read_excel(io_module.BytesIO(file_bytes_repaired), header=0, engine='openpyxl')
-                                    else:
-                                        raise Exception("Não foi possível reparar o arquivo")
-                            except Exception as e4:
-                                st.error(f"❌ Erro ao ler planilha mestra:\n\n**Tentativa 1 (automática):** {str(e1)}\n**Tentativa 2 (openpyxl):** {str(e2)}\n**Tentativa 3 (bytes):** {str(e3)}\n**Tentativa 4 (reparar ZIP):** {str(e4)}\n\n**Solução:** O arquivo está severamente corrompido e não pode ser recuperado. Tente:\n1. Abrir o arquivo no LibreOffice/Excel\n2. Salvar como novo arquivo (.xlsx)\n3. Fazer upload novamente")
-                                st.stop()
+                    df_mest, info_mestra = carregar_planilha_mestra(file_mestra.getvalue())
+                    if info_mestra['tipo'] == 'zip_deslocado':
+                        st.warning("⚠️ Arquivo ZIP com bytes extras no início, recuperado automaticamente.")
+                except Exception as e:
+                    st.error(f"❌ Erro ao ler planilha mestra:\n\n{str(e)}\n\n**Solução:** O arquivo está severamente corrompido e não pode ser recuperado. Tente:\n1. Abrir o arquivo no LibreOffice/Excel\n2. Salvar como novo arquivo (.xlsx)\n3. Fazer upload novamente")
+                    st.stop()
                 
                 if df_mest is None:
                     st.error("❌ Não foi possível carregar a planilha mestra (DataFrame vazio)")
@@ -3458,193 +2756,23 @@ with col_btn_processar:
                     st.error("Coluna NOME não encontrada!")
                     st.stop()
 
-                # Aplica inserções pendentes feitas manualmente para o próximo ciclo de processamento.
-                if st.session_state.insercoes_mestra_pendentes:
-
-                    def extrair_dados_colaborador_csv(nome_colaborador, df_csv_base):
-                        """
-                        Busca um colaborador no CSV de base de ativos e extrai os dados mapeados.
-                        Mapeamento de colunas (Excel):
-                        - D (idx 3): Colaborador
-                        - T (idx 19): CARGO
-                        - I (idx 8): Descrição Situação
-                        - AD (idx 29): Descrição CC
-                        - Z (idx 25): Nome Gestor
-                        - V (idx 21): Descrição da Unidade Organizacional
-                        - AQ (idx 42): Jornada
-                        """
-                        if df_csv_base is None or df_csv_base.empty:
-                            return {}
-
-                        try:
-                            nome_limpo = limpar_nome(nome_colaborador)
-                            
-                            # Índices das colunas (Excel padrão)
-                            indices_esperados = {
-                                'colaborador': 3,   # D
-                                'cargo': 19,        # T
-                                'situacao': 8,      # I
-                                'cc': 29,           # AD
-                                'gestor': 25,       # Z
-                                'unidade': 21,      # V
-                                'jornada': 42       # AQ
-                            }
-
-                            # Busca o colaborador por índice 3 (coluna D)
-                            col_colaborador_idx = indices_esperados.get('colaborador', 3)
-                            
-                            if col_colaborador_idx >= len(df_csv_base.columns):
-                                return {}
-
-                            # Procura na coluna D por match do nome limpo
-                            match_encontrado = None
-                            for idx, val in df_csv_base.iloc[:, col_colaborador_idx].items():
-                                if pd.notna(val) and limpar_nome(str(val)) == nome_limpo:
-                                    match_encontrado = idx
-                                    break
-
-                            if match_encontrado is None:
-                                return {}
-
-                            linha_csv = df_csv_base.iloc[match_encontrado]
-                            
-                            # Extrai os dados mapeados
-                            dados_extraidos = {}
-
-                            # FUNÇÃO (coluna T, idx 19)
-                            if indices_esperados['cargo'] < len(df_csv_base.columns):
-                                dados_extraidos['FUNCAO'] = str(linha_csv.iloc[indices_esperados['cargo']]).strip() if pd.notna(linha_csv.iloc[indices_esperados['cargo']]) else ''
-
-                            # SITUAÇÃO (coluna I, idx 8)
-                            if indices_esperados['situacao'] < len(df_csv_base.columns):
-                                dados_extraidos['SITUACAO'] = str(linha_csv.iloc[indices_esperados['situacao']]).strip() if pd.notna(linha_csv.iloc[indices_esperados['situacao']]) else ''
-
-                            # AREA (coluna AD, idx 29 = descrição CC)
-                            if indices_esperados['cc'] < len(df_csv_base.columns):
-                                dados_extraidos['AREA'] = str(linha_csv.iloc[indices_esperados['cc']]).strip() if pd.notna(linha_csv.iloc[indices_esperados['cc']]) else ''
-
-                            # SUPERVISOR (coluna Z = Nome Gestor, idx 25)
-                            if indices_esperados['gestor'] < len(df_csv_base.columns):
-                                dados_extraidos['SUPERVISOR'] = str(linha_csv.iloc[indices_esperados['gestor']]).strip() if pd.notna(linha_csv.iloc[indices_esperados['gestor']]) else ''
-
-                            # SETOR (coluna V, idx 21)
-                            if indices_esperados['unidade'] < len(df_csv_base.columns):
-                                dados_extraidos['SETOR'] = str(linha_csv.iloc[indices_esperados['unidade']]).strip() if pd.notna(linha_csv.iloc[indices_esperados['unidade']]) else ''
-
-                            # JORNADA (coluna AQ, idx 42) - para determinar TURNO
-                            if indices_esperados['jornada'] < len(df_csv_base.columns):
-                                jornada_val = linha_csv.iloc[indices_esperados['jornada']]
-                                dados_extraidos['HORARIO'] = str(jornada_val).strip() if pd.notna(jornada_val) else ''
-                                
-                                # Calcula TURNO usando a função determinar_turno
-                                try:
-                                    from funcoes_processamento_csv import determinar_turno
-                                    dados_extraidos['TURNO'] = determinar_turno(dados_extraidos['HORARIO'])
-                                except:
-                                    dados_extraidos['TURNO'] = ''
-
-                            return dados_extraidos
-                        except Exception as e:
-                            return {}
-
-                    inseridos_agora = 0
-                    inseridos_sem_modelo = 0
-                    nomes_existentes = set(df_mest['NOME'].apply(limpar_nome).tolist())
-
-                    def normalizar_coluna(col_nome):
-                        texto = unidecode(str(col_nome)).upper()
-                        return re.sub(r'[^A-Z0-9]', '', texto)
-
-                    def encontrar_coluna_por_alias(aliases):
-                        aliases_norm = set(normalizar_coluna(a) for a in aliases)
-                        for c in df_mest.columns:
-                            if normalizar_coluna(c) in aliases_norm:
-                                return c
-                        return None
-
-                    # Detecta colunas principais na mestra (com fallback por alias).
-                    col_gestor = encontrar_coluna_por_alias(['GESTOR', 'ENCARREGADO'])
-                    colunas_copiar = {
-                        'FUNCAO': encontrar_coluna_por_alias(['FUNÇÃO', 'FUNCAO']),
-                        'SITUACAO': encontrar_coluna_por_alias(['SITUAÇÃO', 'SITUACAO']),
-                        'AREA': encontrar_coluna_por_alias(['AREA', 'ÁREA']),
-                        'SUPERVISOR': encontrar_coluna_por_alias(['SUPERVISOR']),
-                        'SETOR': encontrar_coluna_por_alias(['SETOR']),
-                        'TURNO': encontrar_coluna_por_alias(['TURNO']),
-                        'HORARIO': encontrar_coluna_por_alias(['HORARIO', 'HORÁRIO'])
-                    }
-
-                    # Carrega CSV de base de ativos se disponível
-                    df_csv_base = None
-                    if file_colaboradores is not None:
-                        try:
-                            df_csv_base, erro_leitura_csv_base = carregar_csv_colaboradores_robusto(file_colaboradores)
-                        except Exception as e:
-                            df_csv_base = None  # Se falhar, continua sem CSV
-                            erro_leitura_csv_base = str(e)
-
-                    for item in st.session_state.insercoes_mestra_pendentes:
-                        nome_novo = str(item.get('nome', '')).strip()
-                        encarregado_novo = str(item.get('encarregado', '')).strip()
-                        nome_novo_limpo = limpar_nome(nome_novo)
-
-                        if not nome_novo or nome_novo_limpo in ['', 'LEGENDA']:
-                            continue
-                        if nome_novo_limpo in nomes_existentes:
-                            continue
-
-                        nova_linha = {col: '' for col in df_mest.columns}
-                        nova_linha['NOME'] = nome_novo
-
-                        if col_gestor is not None:
-                            nova_linha[col_gestor] = encarregado_novo
-
-                        # Tenta extrair dados do CSV de base de ativos
-                        dados_csv = extrair_dados_colaborador_csv(nome_novo, df_csv_base)
-
-                        if dados_csv:
-                            # Mapeia dados do CSV para colunas da mestra
-                            mapa_csv_para_mestra = {
-                                'FUNCAO': colunas_copiar.get('FUNCAO'),
-                                'SITUACAO': colunas_copiar.get('SITUACAO'),
-                                'AREA': colunas_copiar.get('AREA'),
-                                'SUPERVISOR': colunas_copiar.get('SUPERVISOR'),
-                                'SETOR': colunas_copiar.get('SETOR'),
-                                'TURNO': colunas_copiar.get('TURNO'),
-                                'HORARIO': colunas_copiar.get('HORARIO')
-                            }
-
-                            for chave_csv, coluna_mestra in mapa_csv_para_mestra.items():
-                                if coluna_mestra is not None and coluna_mestra in df_mest.columns:
-                                    nova_linha[coluna_mestra] = dados_csv.get(chave_csv, '')
-                        else:
-                            inseridos_sem_modelo += 1
-
-                        df_mest = pd.concat([df_mest, pd.DataFrame([nova_linha])], ignore_index=True)
-                        nomes_existentes.add(nome_novo_limpo)
-                        inseridos_agora += 1
-
-                    if inseridos_agora > 0:
-                        st.info(f"✅ {inseridos_agora} nome(s) inserido(s) da base de ativos CSV antes do processamento.")
-                    if inseridos_sem_modelo > 0:
-                        st.warning(
-                            f"⚠️ {inseridos_sem_modelo} nome(s) não foram encontrados no CSV de base de ativos. "
-                            "Nesses casos, os campos de função/área/turno podem ficar em branco."
-                        )
+                # Base de ativos (CSV de colaboradores): lida uma vez por conteúdo e usada por todas as etapas
+                base_ativos, erro_base_ativos = carregar_base_ativos(file_colaboradores)
                 
                 # ===== ATUALIZAR SITUAÇÃO A PARTIR DO CSV DE COLABORADORES =====
+                atualizar_situacao = False
                 if file_colaboradores is not None:
                     try:
                         st.info("📊 Atualizando situação dos colaboradores a partir do CSV de Colaboradores...")
-                        df_colab_ativos, erro_leitura = carregar_csv_colaboradores_robusto(file_colaboradores)
+                        df_colab_ativos = base_ativos.df if base_ativos is not None else None
                         
                         # DEBUG: Mostra informações do CSV
                         with st.expander("🔍 DEBUG - Informações do CSV de Colaboradores"):
                             st.write(f"**Arquivo:** {file_colaboradores.name}")
-                            st.write(f"**Tipo:** {'XLSX' if file_colaboradores.name.endswith('.xlsx') else 'CSV'}")
+                            st.write(f"**Tipo:** {'XLSX' if base_ativos is None or base_ativos.dialeto is None else 'CSV (' + descrever_dialeto(base_ativos.dialeto) + ')'}")
                             
-                            if erro_leitura:
-                                st.error(f"**Erro na leitura:** {erro_leitura}")
+                            if erro_base_ativos:
+                                st.error(f"**Erro na leitura:** {erro_base_ativos}")
                             
                             if df_colab_ativos is not None:
                                 st.write(f"**Total de linhas:** {len(df_colab_ativos)}")
@@ -3688,37 +2816,17 @@ with col_btn_processar:
                                 st.write("- Arquivo corrompido ou vazio")
                         
                         if df_colab_ativos is not None and len(df_colab_ativos.columns) > 3:
-                            # Detecta coluna de colaborador (índice 3 = coluna D)
-                            col_colaborador_csv = df_colab_ativos.columns[3] if len(df_colab_ativos.columns) > 3 else None
-                            
-                            # Detecta coluna de situação (índice 8 = coluna I, "Descrição Situação")
-                            col_situacao_csv = None
-                            for idx, col in enumerate(df_colab_ativos.columns):
-                                if idx == 8:  # Coluna I (índice 8)
-                                    col_situacao_csv = col
-                                    break
-                            
-                            # Se não encontrou pelo índice, busca por nome
-                            if col_situacao_csv is None:
-                                for col in df_colab_ativos.columns:
-                                    col_norm = normalizar_coluna(str(col))
-                                    if 'SITUACAO' in col_norm or 'SITUAÇÃO' in col_norm:
-                                        col_situacao_csv = col
-                                        break
+                            # Colunas resolvidas pela base (nome da coluna ou posição: D = colaborador, I = situação)
+                            col_colaborador_csv = base_ativos.coluna('colaborador')
+                            col_situacao_csv = base_ativos.coluna('situacao')
                             
                             st.write(f"🔎 **Coluna Colaborador detectada:** {col_colaborador_csv}")
                             st.write(f"🔎 **Coluna Situação detectada:** {col_situacao_csv}")
                             
                             if col_colaborador_csv and col_situacao_csv:
-                                # Cria dicionário {nome_limpo: situacao}
-                                mapa_situacoes = {}
-                                for idx, row in df_colab_ativos.iterrows():
-                                    nome_colab = str(row[col_colaborador_csv]).strip() if pd.notna(row[col_colaborador_csv]) else ''
-                                    situacao_colab = str(row[col_situacao_csv]).strip() if pd.notna(row[col_situacao_csv]) else ''
-                                    
-                                    if nome_colab:
-                                        nome_limpo = limpar_nome(nome_colab)
-                                        mapa_situacoes[nome_limpo] = situacao_colab
+                                atualizar_situacao = True
+                                # Dicionário {nome_limpo: situacao}
+                                mapa_situacoes = base_ativos.mapa_por_nome('situacao')
                                 
                                 # Mostra os 5 primeiros mapeamentos
                                 with st.expander("📋 DEBUG - Primeiros 5 mapeamentos (Nome → Situação)"):
@@ -3730,23 +2838,6 @@ with col_btn_processar:
                                         else:
                                             break
                                     st.write(f"**Total de mapeamentos:** {len(mapa_situacoes)}")
-                                
-                                # Atualiza coluna SITUAÇÃO na planilha mestra
-                                atualizados = 0
-                                nao_encontrados = []
-                                for idx_mest in df_mest.index:
-                                    nome_mest = str(df_mest.at[idx_mest, 'NOME']).strip() if pd.notna(df_mest.at[idx_mest, 'NOME']) else ''
-                                    if nome_mest:
-                                        nome_limpo_mest = limpar_nome(nome_mest)
-                                        if nome_limpo_mest in mapa_situacoes:
-                                            nova_situacao = mapa_situacoes[nome_limpo_mest]
-                                            # Atualiza apenas se for diferente
-                                            situacao_atual = str(df_mest.at[idx_mest, 'SITUAÇÃO']) if 'SITUAÇÃO' in df_mest.columns else ''
-                                            if situacao_atual != nova_situacao:
-                                                df_mest.at[idx_mest, 'SITUAÇÃO'] = nova_situacao
-                                                atualizados += 1
-                                
-                                st.success(f"✅ Situação atualizada para {atualizados} colaboradores!")
                             else:
                                 st.warning("⚠️ Não foi possível detectar as colunas de colaborador e situação no CSV de Colaboradores.")
                                 st.error(f"   Coluna Colaborador: {col_colaborador_csv}")
@@ -3760,6 +2851,36 @@ with col_btn_processar:
                         import traceback
                         st.error(traceback.format_exc())
                 
+                # ===== RECONCILIAÇÃO COM A BASE DE ATIVOS (inserções pendentes + SITUAÇÃO, de uma vez) =====
+                if st.session_state.insercoes_mestra_pendentes or atualizar_situacao:
+                    try:
+                        df_mest, diff_reconciliacao = reconciliar_mestra(
+                            df_mest, base_ativos, st.session_state.insercoes_mestra_pendentes, atualizar_situacao
+                        )
+                        inseridos = diff_reconciliacao['inseridos']
+                        inseridos_sem_modelo = int((~inseridos['NA_BASE']).sum())
+                        if len(inseridos) > 0:
+                            st.info(f"✅ {len(inseridos)} nome(s) inserido(s) da base de ativos CSV antes do processamento.")
+                        if inseridos_sem_modelo > 0:
+                            st.warning(
+                                f"⚠️ {inseridos_sem_modelo} nome(s) não foram encontrados no CSV de base de ativos. "
+                                "Nesses casos, os campos de função/área/turno podem ficar em branco."
+                            )
+                        if atualizar_situacao:
+                            st.success(f"✅ Situação atualizada para {len(diff_reconciliacao['situacao'])} colaboradores!")
+                        
+                        with st.expander("📋 Reconciliação mestra x base de ativos"):
+                            st.dataframe(resumo_reconciliacao(diff_reconciliacao), width='stretch', hide_index=True)
+                            for titulo, chave in [("Inseridos", 'inseridos'), ("Situação atualizada", 'situacao'),
+                                                  ("Nomes da mestra fora da base", 'nao_encontrados')]:
+                                if len(diff_reconciliacao[chave]) > 0:
+                                    st.write(f"**{titulo}:**")
+                                    st.dataframe(diff_reconciliacao[chave], width='stretch', hide_index=True)
+                    except Exception as e:
+                        st.warning(f"⚠️ Erro ao reconciliar a mestra com a base de ativos: {str(e)}")
+                        import traceback
+                        st.error(traceback.format_exc())
+                
                 df_mest['NOME_LIMPO'] = df_mest['NOME'].apply(limpar_nome)
                 
                 mapa_datas = {}
@@ -3789,36 +2910,45 @@ with col_btn_processar:
                     if col_data_obj in df_mest.columns and df_mest[col_data_obj].dtype != 'object':
                         df_mest[col_data_obj] = df_mest[col_data_obj].astype('object')
                 
+                # Calendário do período (dia da semana, semanas, feriados) montado UMA VEZ
+                calendario = montar_calendario_periodo(mapa_datas, ano, mes)
+                dias_calendario = indexar_calendario(calendario)
+                
                 # Pré-preenche APENAS sábados e domingos VAZIOS com "D" (Descanso)
                 st.info("🗓️ Pré-preenchendo fins de semana vazios com 'D'...")
-                for data_obj, col_data_obj in mapa_datas.items():
-                    # data_obj já é uma datetime.date, col_data_obj é o nome da coluna
-                    if eh_fim_de_semana(data_obj):
-                        for idx in df_mest.index:
-                            # Verifica se a célula está vazia antes de preencher
-                            valor_atual = df_mest.at[idx, col_data_obj]
-                            
-                            # Converte para string e limpa espaços
-                            valor_str = str(valor_atual).strip() if valor_atual is not None else ''
-                            
-                            # Considera vazio se for: '', 'nan', 'none', '<na>', ou se for NaN
-                            eh_vazio = (
-                                valor_str == '' or 
-                                valor_str.lower() in ['nan', 'none', '<na>', 'nat'] or 
-                                pd.isna(valor_atual)
-                            )
-                            
-                            # Só preenche se estiver realmente vazio
-                            if eh_vazio:
-                                df_mest.at[idx, col_data_obj] = 'D'
+                preencher_fins_de_semana(df_mest, calendario, 'D')
+                
+                # Índice de nomes da mestra (montado UMA VEZ para todos os arquivos)
+                indice_nomes = IndiceNomes(df_mest['NOME_LIMPO'].tolist())
                 
                 # Processa CADA arquivo de encarregado
                 total_sucesso = 0
                 total_erros = []  # Agora será uma lista de tuplas: (nome_colaborador, nome_arquivo)
                 total_nomes_unicos = set()
-                total_linhas_processadas = set()
+                triplas_lancamentos = []  # (linha, coluna de data, marcação) de todos os arquivos
+                gestores_arquivos = {}  # {ordem do arquivo: nome do encarregado}
                 
                 with st.spinner('Processando todos os arquivos...'):
+                    # Lê todas as planilhas configuradas de uma vez (em paralelo) antes de lançar
+                    tarefas_leitura = []
+                    for idx_arquivo, file_enc in enumerate(files_encarregado):
+                        config = st.session_state.config_arquivos.get(file_enc.name)
+                        if config:
+                            tarefas_leitura.append((idx_arquivo, file_enc.name, file_enc.getvalue(), config['guia']))
+                    
+                    progresso_leitura = st.progress(0, text="Lendo planilhas de encarregado...")
+                    leituras = {
+                        leitura['indice']: leitura
+                        for leitura in ler_planilhas_em_paralelo(
+                            tarefas_leitura,
+                            paralelo=st.session_state.leitura_paralela,
+                            ao_progredir=lambda concluidos, total, resultado: progresso_leitura.progress(
+                                concluidos / total, text=f"Lendo [{concluidos}/{total}] - {resultado['nome']}"
+                            )
+                        )
+                    }
+                    progresso_leitura.empty()
+                    
                     for idx_arquivo, file_enc in enumerate(files_encarregado):
                         # Recupera a configuração salva deste arquivo
                         config = st.session_state.config_arquivos.get(file_enc.name)
@@ -3828,170 +2958,45 @@ with col_btn_processar:
                         
                         idx_linha = config['linha_idx']
                         idx_col = config['col_idx']
-                        guia_usar = config['guia']
                         nome_encarregado = config['nome_encarregado']
                         
                         st.write(f"📄 **[{idx_arquivo + 1}]** Processando: **{file_enc.name}**")
                         
-                        df_enc = None
-                        try:
-                            # Primeira tentativa: leitura direta
-                            file_enc.seek(0)
-                            df_enc = pd.read_excel(file_enc, sheet_name=guia_usar, header=None, dtype=str)
-                        except Exception as e1:
-                            try:
-                                # Segunda tentativa: com openpyxl
-                                file_enc.seek(0)
-                                df_enc = pd.read_excel(file_enc, sheet_name=guia_usar, header=None, dtype=str, engine='openpyxl')
-                            except Exception as e2:
-                                try:
-                                    # Terceira tentativa: bytes
-                                    file_enc.seek(0)
-                                    file_bytes = file_enc.read()
-                                    import io as io_module
-                                    df_enc = pd.read_excel(io_module.BytesIO(file_bytes), sheet_name=guia_usar, header=None, dtype=str, engine='openpyxl')
-                                except Exception as e3:
-                                    try:
-                                        # Quarta tentativa: tenta reparar ZIP
-                                        import zipfile
-                                        file_enc.seek(0)
-                                        file_bytes = file_enc.read()
-                                        import io as io_module
-                                        
-                                        try:
-                                            zip_file = zipfile.ZipFile(io_module.BytesIO(file_bytes), 'r')
-                                            zip_file.testzip()
-                                            df_enc = pd.read_excel(io_module.BytesIO(file_bytes), sheet_name=guia_usar, header=None, dtype=str, engine='openpyxl')
-                                        except zipfile.BadZipFile:
-                                            pk_index = file_bytes.find(b'PK\x03\x04')
-                                            if pk_index > 0:
-                                                file_bytes_repaired = file_bytes[pk_index:]
-                                                df_enc = pd.read_excel(io_module.BytesIO(file_bytes_repaired), sheet_name=guia_usar, header=None, dtype=str, engine='openpyxl')
-                                            else:
-                                                raise Exception("Não foi possível reparar")
-                                    except Exception as e4:
-                                        st.error(f"❌ Erro ao ler arquivo {file_enc.name}: {str(e1)}")
-                                        continue
-                        
-                        if df_enc is None:
+                        leitura = leituras.get(idx_arquivo)
+                        if leitura is None or leitura['erro']:
+                            erro_leitura = leitura['erro'] if leitura else 'arquivo não lido'
+                            st.error(f"❌ Erro ao ler arquivo {file_enc.name}: {erro_leitura}")
                             continue
                         
+                        df_enc = leitura['df']
+                        
                         cols_nomes = [str(df_enc.iloc[idx_linha, i]) for i in range(len(df_enc.columns))]
                         df_enc = df_enc.iloc[idx_linha+1:].copy()
                         df_enc.columns = cols_nomes
                         df_enc.reset_index(drop=True, inplace=True)
                         
-                        col_nome = cols_nomes[idx_col]
-                        cols_datas = cols_nomes[idx_col + 1:]
-                        
                         df_enc = df_enc.dropna(how='all')
                         # Usa iloc para pegar a coluna por índice para evitar problema com nomes duplicados
                         df_enc = df_enc[df_enc.iloc[:, idx_col].astype(str).str.strip() != '']
                         df_enc.reset_index(drop=True, inplace=True)
                         
-                        # Renomeia a coluna de nomes para algo único para evitar problemas com colunas duplicadas
-                        df_enc_temp = df_enc.iloc[:, idx_col:].copy()
-                        df_enc_temp.columns = ['___NOME___'] + list(df_enc_temp.columns[1:])
-                        
-                        df_long = df_enc_temp.melt(
-                            id_vars=['___NOME___'],
-                            value_vars=cols_datas,
-                            var_name='DIA', value_name='COD'
+                        # ===== Aceita TEXTO (P, FI, FA) além de números (1, 2, 4) =====
+                        # Cabeçalhos viram datas e códigos viram marcações uma vez por valor distinto
+                        df_long = montar_tabela_lancamentos(
+                            df_enc, idx_col, mes, ano, MAPA_CODIGOS, MAPA_TEXTO_PARA_MARCACAO
                         )
                         
-                        df_long.rename(columns={'___NOME___': 'NOME'}, inplace=True)
-                        df_long['NOME_LIMPO'] = df_long['NOME'].apply(limpar_nome)
-                        
-                        # ===== MODIFICADO: Aceita TEXTO (P, FI, FA) além de números (1, 2, 4) =====
-                        # Função que converte o valor para o código de marcação
-                        def converter_para_marcacao(valor):
-                            if pd.isna(valor):
-                                return None
-                            # Tenta primeiro como número
-                            try:
-                                num_val = int(float(str(valor).strip()))
-                                if num_val in MAPA_CODIGOS:
-                                    return MAPA_CODIGOS[num_val]
-                            except (ValueError, TypeError):
-                                pass
-                            # Tenta como texto normalizado
-                            texto_normalizado = normalizar_coluna(str(valor))
-                            if texto_normalizado in MAPA_TEXTO_PARA_MARCACAO:
-                                return MAPA_TEXTO_PARA_MARCACAO[texto_normalizado]
-                            return None
-                        
-                        df_long['MARCACAO'] = df_long['COD'].apply(converter_para_marcacao)
-                        df_long['DATA'] = df_long['DIA'].apply(lambda x: extrair_dia_do_cabecalho(x, mes, ano))
-                        df_long = df_long[df_long['NOME_LIMPO'].astype(str).str.strip() != '']
-                        df_long = df_long.dropna(subset=['DATA', 'NOME_LIMPO'])
-                        # Remove linhas onde não foi possível determinar a marcação
-                        df_long = df_long[df_long['MARCACAO'].notna()]
-                        
-                        sucesso = 0
-                        erros = []
-                        nomes_com_erro = set()  # Rastreia nomes únicos que não foram encontrados
-                        linhas_processadas = set()
-                        nomes_unicos = set()
-                        
-                        for _, row in df_long.iterrows():
-                            nome = row['NOME_LIMPO']
-                            marcacao = row['MARCACAO']  # Agora é string: 'P', 'FI', 'FA', etc.
-                            data = row['DATA']
-
-                            # Regra fixa: nunca processar o rótulo LEGENDA.
-                            if nome == 'LEGENDA':
-                                continue
-                            
-                            nomes_unicos.add(nome)
-                            total_nomes_unicos.add(nome)
-                            
-                            if data not in mapa_datas:
-                                continue
-                            
-                            col_data = mapa_datas[data]
-                            
-                            # BUSCA EXATA
-                            match = df_mest['NOME_LIMPO'] == nome
-                            
-                            # BUSCA FUZZY (por similaridade)
-                            if match.sum() == 0:
-                                similaridades = df_mest['NOME_LIMPO'].apply(lambda x: calcular_similaridade(nome, x))
-                                match = similaridades >= 0.85
-                            
-                            # BUSCA POR PALAVRAS-CHAVE
-                            if match.sum() == 0:
-                                palavras_nome = nome.split()[:3]
-                                
-                                def contem_palavras_iniciais(nome_mestra):
-                                    palavras_mestra = nome_mestra.split()
-                                    return all(p in palavras_mestra for p in palavras_nome[:2])
-                                
-                                match = df_mest['NOME_LIMPO'].apply(contem_palavras_iniciais)
-                            
-                            if match.sum() > 0:
-                                indices_match = df_mest[match].index.tolist()
-                                
-                                for idx in indices_match:
-                                    if df_mest[col_data].dtype != 'object':
-                                        df_mest[col_data] = df_mest[col_data].astype('object')
-                                    
-                                    # ===== CORREÇÃO: SEMPRE sobrescreve o valor (mesmo se já preenchido) =====
-                                    df_mest.at[idx, col_data] = marcacao
-                                    linhas_processadas.add(idx)
-                                    total_linhas_processadas.add(idx)
-                                
-                                sucesso += 1
-                            else:
-                                # Só adiciona ao erro se não foi adicionado antes
-                                if nome not in nomes_com_erro:
-                                    erros.append(nome)
-                                    nomes_com_erro.add(nome)
+                        # Resolve os nomes (cada nome ÚNICO uma vez) e guarda as triplas para gravação em bloco
+                        triplas, resumo = resolver_lancamentos_arquivo(
+                            df_long, indice_nomes, mapa_datas, ordem_arquivo=idx_arquivo
+                        )
+                        triplas_lancamentos.append(triplas)
+                        gestores_arquivos[idx_arquivo] = nome_encarregado
                         
-                        # Atualiza GESTOR para este arquivo (usa o nome_encarregado da configuração)
-                        if nome_encarregado and nome_encarregado.strip() != '':
-                            if 'GESTOR' in df_mest.columns:
-                                for idx in linhas_processadas:
-                                    df_mest.at[idx, 'GESTOR'] = nome_encarregado
+                        sucesso = resumo['sucesso']
+                        erros = resumo['erros']
+                        nomes_unicos = resumo['nomes_unicos']
+                        total_nomes_unicos.update(nomes_unicos)
                         
                         # Agrega erros locais para o total com nome do arquivo
                         for erro_nome in erros:
@@ -3999,6 +3004,13 @@ with col_btn_processar:
                         
                         st.success(f"  ✅ {sucesso} lançamentos | 👥 {len(nomes_unicos)} colaboradores únicos")
                         total_sucesso += sucesso
+                    
+                    # Grava todos os lançamentos de uma vez (em conflito, vence o último arquivo)
+                    if triplas_lancamentos:
+                        aplicar_lancamentos_em_bloco(
+                            df_mest, pd.concat(triplas_lancamentos, ignore_index=True),
+                            gestores=gestores_arquivos
+                        )
                 
                 st.divider()
                 st.success(f"🎉 Total: ✅ {total_sucesso} lançamentos | 👥 {len(total_nomes_unicos)} colaboradores processados")
@@ -4034,920 +3046,774 @@ with col_btn_processar:
                     st.success("✅ Todos os colaboradores foram encontrados e processados!")
                 
                 st.divider()
-                out = io.BytesIO()
-                df_mest_final = df_mest.drop(columns=['NOME_LIMPO'])
                 
-                with pd.ExcelWriter(out, engine='openpyxl') as w:
-                    df_mest_final.to_excel(w, index=False, sheet_name='Dados')
-                    
-                    worksheet = w.sheets['Dados']
-                    
-                    # ===== FORMATAÇÃO DO HEADER =====
-                    header_fill = PatternFill(start_color='FF0D4F45', end_color='FF0D4F45', fill_type='solid')  # Azul escuro
-                    header_font = Font(bold=True, color='FFFFFFFF', size=11)  # Texto branco
-                    
-                    # Formata todas as colunas do header
-                    for col_idx in range(1, len(df_mest_final.columns) + 1):
-                        header_cell = worksheet.cell(row=1, column=col_idx)
-                        header_cell.fill = header_fill
-                        header_cell.font = header_font
-                        header_cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-                    
-                    # ===== FORMATAÇÃO DAS COLUNAS ESPECÍFICAS =====
-                    # Mapeamento de colunas com cores
-                    col_names = df_mest_final.columns.tolist()
-                    
-                    # Função para calcular largura baseada no maior valor da coluna
-                    def calc_width(df, col_name, min_width=10, max_width=50):
-                        if col_name not in df.columns:
-                            return min_width
-                        max_len = df[col_name].astype(str).str.len().max()
-                        header_len = len(str(col_name))
-                        largest = max(max_len, header_len)
-                        width = min(max(largest + 2, min_width), max_width)
-                        return width
-                    
-                    for col_idx, col_name in enumerate(col_names, 1):
-                        # Define preenchimento e largura para cada tipo de coluna
-                        if col_name == 'NOME':
-                            col_fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')  # Azul claro suave
-                            width = calc_width(df_mest_final, col_name, min_width=15, max_width=40)
-                            worksheet.column_dimensions[get_column_letter(col_idx)].width = width
-                        elif col_name == 'AREA':
-                            col_fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')  # Verde claro suave
-                            worksheet.column_dimensions[get_column_letter(col_idx)].width = 25
-                        elif col_name == 'GESTOR':
-                            col_fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')  # Laranja #ffbf5e
-                            width = calc_width(df_mest_final, col_name, min_width=15, max_width=40)
-                            worksheet.column_dimensions[get_column_letter(col_idx)].width = width
-                        else:
-                            col_fill = None
-                            # Largura fixa para outras colunas
-                            try:
-                                datetime.datetime.strptime(str(col_name), '%d/%m')
-                                worksheet.column_dimensions[get_column_letter(col_idx)].width = 7
-                            except:
-                                worksheet.column_dimensions[get_column_letter(col_idx)].width = 10
-                        
-                        # Aplica a cor a todas as linhas de dados desta coluna
-                        if col_fill is not None:
-                            for row_idx in range(2, worksheet.max_row + 1):
-                                cell = worksheet.cell(row=row_idx, column=col_idx)
-                                cell.fill = col_fill
-                    
-                    for col_data_obj in mapa_datas.values():
-                        col_idx = list(df_mest_final.columns).index(col_data_obj) + 1
-                        
-                        header_cell = worksheet.cell(row=1, column=col_idx)
-                        if isinstance(col_data_obj, (datetime.datetime, datetime.date)):
-                            data_formatada = col_data_obj.strftime('%d/%m') if isinstance(col_data_obj, datetime.date) else col_data_obj.date().strftime('%d/%m')
-                            header_cell.value = data_formatada
-                        
-                        for row_idx, row in enumerate(worksheet.iter_rows(min_col=col_idx, max_col=col_idx, min_row=2), start=2):
-                            for cell in row:
-                                cell.number_format = 'DD/MM'
-                                
-                                valor = str(cell.value).strip() if cell.value else ''
-                                
-                                if valor == 'P':
-                                    cell.fill = PatternFill(start_color=MAPA_CORES['P'], end_color=MAPA_CORES['P'], fill_type='solid')
-                                elif valor == 'FI':
-                                    cell.fill = PatternFill(start_color=MAPA_CORES['FI'], end_color=MAPA_CORES['FI'], fill_type='solid')
-                                    cell.font = Font(color='FFFFFFFF')
-                                elif valor == 'FA':
-                                    cell.fill = PatternFill(start_color=MAPA_CORES['FA'], end_color=MAPA_CORES['FA'], fill_type='solid')
-                                elif valor == 'FÉRIAS-BH':
-                                    cell.fill = PatternFill(start_color=MAPA_CORES['FÉRIAS-BH'], end_color=MAPA_CORES['FÉRIAS-BH'], fill_type='solid')
-                                    cell.font = Font(color='FFFFFFFF')
-                                elif valor == 'DESLIGADO':
-                                    cell.fill = PatternFill(start_color=MAPA_CORES['DESLIGADO'], end_color=MAPA_CORES['DESLIGADO'], fill_type='solid')
-                                    cell.font = Font(color='FFFFFFFF')
-                                elif valor == 'D':
-                                    cell.fill = PatternFill(start_color=MAPA_CORES['DESCANSO'], end_color=MAPA_CORES['DESCANSO'], fill_type='solid')
+                # ===== MATRIZ DE PRESENÇA: TODAS AS MARCAÇÕES ANTES DE GRAVAR A ABA DADOS =====
+                # Feriados, afastamentos, desligamentos e férias alteram a matriz em memória;
+                # a aba Dados é gravada a partir dela uma única vez.
+                tempos_etapas = []  # [(etapa, segundos)] da geração do relatório
+                inicio_etapa = time.perf_counter()
+                matriz_presenca = MatrizPresenca(df_mest.drop(columns=['NOME_LIMPO']), mapa_datas)
+                
+                progress_bar = st.progress(0)
+                status_text = st.empty()
+                
+                status_text.info("📥 Obtendo feriados nacionais...")
+                progress_bar.progress(10)
+                
+                if mapa_datas:
+                    feriados = feriados_do_calendario(calendario)
+                    if feriados:
+                        status_text.info("🎨 Marcando feriados...")
+                        progress_bar.progress(20)
+                        matriz_presenca.marcar_feriados(feriados)
+                
+                # ===== DETECTAR AFASTAMENTOS NA MATRIZ COM FERIADOS (ignora FERIADO) =====
+                status_text.info("🔍 Detectando afastamentos...")
+                progress_bar.progress(30)
+                afastamentos = detectar_afastamentos_no_dataframe(matriz_presenca.dataframe_datas(), mapa_datas)
+                
+                # ===== MARCAR AFASTAMENTOS =====
+                status_text.info("📌 Marcando afastamentos...")
+                progress_bar.progress(40)
+                matriz_presenca.marcar_afastamentos(afastamentos)
+                
+                # ===== CARREGAR E MARCAR DEMITIDOS =====
+                status_text.info("📤 Aplicando desligamentos...")
+                progress_bar.progress(45)
+                if file_demitidos is not None:
+                    df_demitidos = carregar_csv_demitidos(file_demitidos)
+                else:
+                    df_demitidos = None
+                
+                if df_demitidos is not None:
+                    aplicados_desligado = aplicar_desligados_na_matriz(matriz_presenca, df_demitidos)
+                    if aplicados_desligado == 0:
+                        st.warning("⚠️ O CSV de demitidos foi carregado, mas nenhuma linha foi aplicada. Confira os nomes e a coluna de data de rescisão.")
+                elif file_demitidos is not None:
+                    st.warning("⚠️ Não foi possível ler o CSV de demitidos. O relatório seguirá sem aplicar DESLIGADO.")
+                
+                # ===== CARREGAR E MARCAR FÉRIAS =====
+                status_text.info("🌴 Aplicando férias...")
+                progress_bar.progress(50)
+                arquivos_ferias = [arquivo for arquivo in [file_ferias_1, file_ferias_2] if arquivo is not None]
+                if arquivos_ferias:
+                    ferias_lidas = []
+                    for arquivo_ferias in arquivos_ferias:
+                        df_ferias = carregar_csv_demitidos(arquivo_ferias)
+                        if df_ferias is None:
+                            st.warning(f"⚠️ Não foi possível ler o arquivo de férias {arquivo_ferias.name}. O relatório seguirá sem aplicar FÉRIAS-BH nesse arquivo.")
+                            continue
+                        ferias_lidas.append((arquivo_ferias.name, df_ferias))
                     
-                    # ===== OBTER FERIADOS PARA USO NO SHEET RELATÓRIO E PORCENTAGENS =====
-                    if mapa_datas:
-                        ano_feriados_temp = min(mapa_datas.keys()).year
-                        feriados_temp = obter_feriados_brasil(ano_feriados_temp)
+                    # Todos os arquivos de férias aplicados de uma vez (contagem por arquivo)
+                    aplicados_por_arquivo = aplicar_ferias_na_matriz(matriz_presenca, [df for _, df in ferias_lidas])
+                    if sum(aplicados_por_arquivo) == 0:
+                        st.warning("⚠️ Os CSVs de férias foram carregados, mas nenhuma célula foi aplicada. Confira os nomes, status e datas de gozo.")
                     else:
-                        feriados_temp = {}
-                    
-                    # ===== CRIAR GUIA PORCENTAGENS ABS =====
-                    try:
-                        if 'AREA' not in df_mest_final.columns:
-                             st.error("Coluna 'AREA' não encontrada para gerar Porcentagens ABS. Pulando esta aba.")
-                        else:
-                            ws_porcentagens = w.book.create_sheet('Porcentagens ABS')
-                            
-                            # Linha 1: Título
-                            ws_porcentagens.merge_cells('A1:Z1')
-                            titulo_cell = ws_porcentagens.cell(row=1, column=1, value='📊 PORCENTAGENS DE ABSENTEÍSMO')
-                            titulo_cell.font = Font(bold=True, size=14, color='FFFFFF')
-                            titulo_cell.fill = PatternFill(start_color='FF0D4F45', end_color='FF0D4F45', fill_type='solid')
-                            
-                            # Linha 3: Headers - Área, HC (agregado)
-                            ws_porcentagens.cell(row=3, column=1, value='Área')
-                            ws_porcentagens.cell(row=3, column=2, value='HC')
-                            
-                            # Formata header
-                            for col_num in [1, 2]:
-                                cell_header = ws_porcentagens.cell(row=3, column=col_num)
-                                cell_header.font = Font(bold=True, color='FFFFFF', size=10)
-                                cell_header.fill = PatternFill(start_color='FF0D4F45', end_color='FF0D4F45', fill_type='solid')
-                                cell_header.alignment = Alignment(horizontal='center', vertical='center')
-                            
-                            area_col_letter = get_column_letter(list(df_mest_final.columns).index('AREA') + 1)
-                            
-                            # Linha 4: M&A com HC
-                            cell_ma = ws_porcentagens.cell(row=4, column=1, value='M&A')
-                            cell_ma.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
-                            cell_ma.font = Font(bold=True)
-                            
-                            cell_hc_ma = ws_porcentagens.cell(row=4, column=2)
-                            hc_ma_formula = (
-                                f'=SUMPRODUCT(ISNUMBER(SEARCH("PROJETO INTERPRISE - MOVIMENTACAO E ARMAZENAGEM",Dados!{area_col_letter}:${area_col_letter}))*1)'
-                                f'+SUMPRODUCT(ISNUMBER(SEARCH("MOVIMENTACAO E ARMAZENAGEM",Dados!{area_col_letter}:${area_col_letter}))*NOT(ISNUMBER(SEARCH("PROJETO INTERPRISE",Dados!{area_col_letter}:${area_col_letter})))*1)'
-                                f'+SUMPRODUCT(ISNUMBER(SEARCH("BLOQ",Dados!{area_col_letter}:${area_col_letter}))*1)'
-                                f'+SUMPRODUCT(ISNUMBER(SEARCH("CD-RJ | FOB",Dados!{area_col_letter}:${area_col_letter}))*1)'
-                                f'+SUMPRODUCT(ISNUMBER(SEARCH("M&A | LOCAFARMA CD-RJ",Dados!{area_col_letter}:${area_col_letter}))*1)'
-                            )
-                            cell_hc_ma.value = hc_ma_formula
-                            cell_hc_ma.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
-                            cell_hc_ma.alignment = Alignment(horizontal='center', vertical='center')
-                            
-                            # Linha 5: CRDK / D&E com HC
-                            cell_crdk = ws_porcentagens.cell(row=5, column=1, value='CRDK / D&E')
-                            cell_crdk.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
-                            cell_crdk.font = Font(bold=True)
-                            
-                            cell_hc_crdk = ws_porcentagens.cell(row=5, column=2)
-                            hc_crdk_formula = (
-                                f'=SUMPRODUCT(ISNUMBER(SEARCH("CRDK D&E LCFA | CD-RJ",Dados!{area_col_letter}:${area_col_letter}))*1)'
-                                f'+SUMPRODUCT(ISNUMBER(SEARCH("CRDK D&E|CD-RJ HB",Dados!{area_col_letter}:${area_col_letter}))*1)'
-                                f'+SUMPRODUCT(ISNUMBER(SEARCH("CRDK FOB LCFA | CD-RJ",Dados!{area_col_letter}:${area_col_letter}))*1)'
-                                f'+SUMPRODUCT(ISNUMBER(SEARCH("D&E LCFA | CD-RJ",Dados!{area_col_letter}:${area_col_letter}))*1)'
-                                f'+SUMPRODUCT(ISNUMBER(SEARCH("CRDK LCFA | CD-RJ",Dados!{area_col_letter}:${area_col_letter}))*1)'
-                            )
-                            cell_hc_crdk.value = hc_crdk_formula
-                            cell_hc_crdk.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
-                    except Exception as e:
-                        st.error(f"Erro ao gerar Porcentagens ABS: {str(e)}")
-
-                    cell_hc_crdk.alignment = Alignment(horizontal='center', vertical='center')
-                    
-                    # Linha 6: TOTAL HC
-                    cell_total_hc_label = ws_porcentagens.cell(row=6, column=1, value='TOTAL HC')
-                    cell_total_hc_label.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
-                    cell_total_hc_label.font = Font(bold=True)
-                    
-                    cell_total_hc_value = ws_porcentagens.cell(row=6, column=2)
-                    cell_total_hc_value.value = '=B4+B5'
-                    cell_total_hc_value.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
-                    cell_total_hc_value.font = Font(bold=True)
-                    cell_total_hc_value.alignment = Alignment(horizontal='center', vertical='center')
-                    
-                    # Linha 7: Headers com datas para porcentagens - TODOS os dias do mês
-                    ws_porcentagens.cell(row=8, column=1, value='Área')
-                    
-                    # Gera todos os dias do mês
-                    if mapa_datas:
-                        mes_dados = min(mapa_datas.keys()).month
-                        ano_dados = min(mapa_datas.keys()).year
+                        for (nome_arquivo, _), aplicados in zip(ferias_lidas, aplicados_por_arquivo):
+                            if aplicados == 0:
+                                st.warning(f"⚠️ Nenhuma célula de férias aplicada pelo arquivo {nome_arquivo}. Confira os nomes, status e datas de gozo.")
+                
+                # DataFrame final (com todas as marcações) usado na aba Dados e nos relatórios
+                df_mest_final = matriz_presenca.para_dataframe()
+                inicio_etapa = registrar_tempo_etapa(tempos_etapas, 'Marcações (feriados, afastamentos, desligados, férias)', inicio_etapa)
+                
+                # Guarda o estado processado na sessão: a planilha pode ser gerada de novo
+                # (com outros relatórios) sem refazer o lançamento
+                st.session_state.estado_processado = {
+                    'df_mest_final': df_mest_final,
+                    'matriz_presenca': matriz_presenca,
+                    'mapa_datas': mapa_datas,
+                    'afastamentos': afastamentos,
+                    'calendario': calendario,
+                    'dias_calendario': dias_calendario,
+                    'mes': mes,
+                    'ano': ano,
+                    'entradas': entradas_processamento,
+                }
+                gerar_planilha = True
+                processado_agora = True
+            except Exception as e:
+                st.error(f"❌ Erro durante o processamento: {str(e)}")
+    
+    # ===== GERAÇÃO DA PLANILHA (A PARTIR DO ESTADO PROCESSADO) =====
+    estado_processado = st.session_state.estado_processado
+    if estado_processado is not None and estado_processado['entradas'] != entradas_processamento:
+        estado_processado = st.session_state.estado_processado = None
+    if estado_processado is not None and not gerar_planilha:
+        gerar_planilha = st.button("🔁 Gerar planilha com os relatórios selecionados (sem reprocessar)")
+    
+    if gerar_planilha and estado_processado is not None:
+        try:
+            # Cópia do DataFrame final: os relatórios não alteram o estado guardado na sessão
+            df_mest_final = estado_processado['df_mest_final'].copy()
+            df_mest_marcado = df_mest_final
+            matriz_presenca = estado_processado['matriz_presenca']
+            mapa_datas = estado_processado['mapa_datas']
+            afastamentos = estado_processado['afastamentos']
+            calendario = estado_processado['calendario']
+            dias_calendario = estado_processado['dias_calendario']
+            mes_planilha = estado_processado['mes']
+            ano_planilha = estado_processado['ano']
+            # Base de ativos (cache por conteúdo): também existe na geração sem reprocessar
+            base_ativos, erro_base_ativos = carregar_base_ativos(file_colaboradores)
+            out = io.BytesIO()
+            
+            if not processado_agora:
+                tempos_etapas = []
+                inicio_etapa = time.perf_counter()
+                progress_bar = st.progress(0)
+                status_text = st.empty()
+            
+            status_text.info("📝 Gravando aba Dados...")
+            progress_bar.progress(60)
+            
+            valores_sem_formulas = ValoresSemFormulas()
+            
+            # Modo de fórmulas leves: coluna auxiliar com o grupo de cada colaborador na
+            # taxonomia de áreas, calculada uma vez aqui (a aba Porcentagens ABS usa COUNTIFS nela)
+            df_dados = df_mest_final
+            grupos_area = None
+            letra_grupo_area = None
+            if st.session_state.formulas_leves and 'AREA' in df_mest_final.columns:
+                grupos_area = classificar_grupos_area(df_mest_final['AREA'])
+                df_dados = df_mest_final.assign(**{COLUNA_GRUPO_AREA: grupos_area.to_numpy()})
+                letra_grupo_area = get_column_letter(list(df_dados.columns).index(COLUNA_GRUPO_AREA) + 1)
+            
+            with pd.ExcelWriter(out, engine='openpyxl') as w:
+                # Aba Dados gravada em bloco, com os estilos das marcações declarados uma vez
+                # (ou com uma regra de formatação condicional por marcação)
+                renderizar_aba_dados(
+                    w.book, df_dados, matriz_presenca, MAPA_CORES,
+                    cores_condicionais=st.session_state.cores_condicionais,
+                    marcar_incomuns=not st.session_state.modo_rapido
+                )
+                inicio_etapa = registrar_tempo_etapa(tempos_etapas, 'Aba Dados', inicio_etapa)
+                
+                # Feriados / domingos do SHEET PORCENTAGENS vêm do calendário do período (dias_calendario)
+                
+                # ===== CRIAR GUIA PORCENTAGENS ABS =====
+                try:
+                    if 'AREA' not in df_mest_final.columns:
+                         st.error("Coluna 'AREA' não encontrada para gerar Porcentagens ABS. Pulando esta aba.")
                     else:
-                        mes_dados = mes
-                        ano_dados = ano
-                    
-                    import calendar
-                    dias_no_mes = calendar.monthrange(ano_dados, mes_dados)[1]
-                    
-                    # Preenche header com todos os dias (mesmo sem dados)
-                    for dia in range(1, dias_no_mes + 1):
-                        data_obj = datetime.date(ano_dados, mes_dados, dia)
-                        data_formatada = f"{dia:02d}/{mes_dados:02d}"
-                        col_idx = dia + 1  # Coluna começa em 2 (coluna 1 é "Área")
-                        cell_header = ws_porcentagens.cell(row=8, column=col_idx, value=data_formatada)
-                        cell_header.font = Font(bold=True, color='FFFFFF', size=10)
-                        cell_header.fill = PatternFill(start_color='FF0D4F45', end_color='FF0D4F45', fill_type='solid')
-                        cell_header.alignment = Alignment(horizontal='center', vertical='center')
-                    
-                    # Coluna MÉDIA no Header (Pós-loop dias)
-                    col_media_idx = dias_no_mes + 2 # Coluna após o último dia
-                    cell_media_header = ws_porcentagens.cell(row=8, column=col_media_idx, value="MÉDIA")
-                    cell_media_header.font = Font(bold=True, color='FFFFFF', size=10)
-                    cell_media_header.fill = PatternFill(start_color='FF0D4F45', end_color='FF0D4F45', fill_type='solid')
-                    cell_media_header.alignment = Alignment(horizontal='center', vertical='center')
-
-                    # Formata header coluna Área
-                    cell_area_header = ws_porcentagens.cell(row=8, column=1)
-                    cell_area_header.font = Font(bold=True, color='FFFFFF', size=10)
-                    cell_area_header.fill = PatternFill(start_color='FF0D4F45', end_color='FF0D4F45', fill_type='solid')
-                    cell_area_header.alignment = Alignment(horizontal='center', vertical='center')
-                    
-                    # Setores para porcentagens
-                    setores_info_pct = [
-                        ('M&A', ['MOVIMENTACAO E ARMAZENAGEM', 'PROJETO INTERPRISE - MOVIMENTACAO E ARMAZENAGEM', 'BLOQ', 'CD-RJ | FOB']),
-                        ('M&A - %', ['MOVIMENTACAO E ARMAZENAGEM', 'PROJETO INTERPRISE - MOVIMENTACAO E ARMAZENAGEM', 'BLOQ', 'CD-RJ | FOB']),
-                        ('CRDK / D&E', ['CRDK D&E LCFA | CD-RJ', 'CRDK D&E|CD-RJ HB', 'CRDK FOB LCFA | CD-RJ', 'CRDK LCFA | CD-RJ']),
-                        ('CRDK / D&E - %', ['CRDK D&E LCFA | CD-RJ', 'CRDK D&E|CD-RJ HB', 'CRDK FOB LCFA | CD-RJ', 'CRDK LCFA | CD-RJ'])
-                    ]
-                    
-                    row_pct = 9
-                    
-                    for setor_idx, (setor_nome, keywords_setor) in enumerate(setores_info_pct):
-                        # Nome do setor
-                        cell_setor = ws_porcentagens.cell(row=row_pct, column=1, value=setor_nome)
-                        # Títulos em VERDE PASTEL
-                        cell_setor.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
-                        cell_setor.font = Font(bold=True)
+                        ws_porcentagens = criar_aba(w.book, 'Porcentagens ABS')
                         
-                        # Preenche cada data - TODOS os dias do mês
-                        for dia in range(1, dias_no_mes + 1):
-                            col_idx = dia + 1  # Coluna começa em 2
-                            cell = ws_porcentagens.cell(row=row_pct, column=col_idx)
-                            
-                            # Verifica se existe data para este dia
-                            data_obj = datetime.date(ano_dados, mes_dados, dia)
-                            
-                            # Verifica se é domingo ou feriado
-                            eh_domingo = data_obj.weekday() == 6
-                            eh_feriado = data_obj in feriados_temp
-                            
-                            if '%' not in setor_nome:
-                                # Linhas de contagem FI+FA (M&A e CRDK / D&E)
-                                if eh_feriado:
-                                    cell.value = "FERIADO"
-                                elif eh_domingo:
-                                    cell.value = "DOMINGO"
-                                elif data_obj in mapa_datas:
-                                    col_data = mapa_datas[data_obj]
-                                    data_col_idx = list(df_mest_final.columns).index(col_data) + 1
-                                    data_col_letter = get_column_letter(data_col_idx)
-                                    
-                                    if setor_nome == 'M&A':
-                                        formula = (
-                                            f'=SUMPRODUCT('
-                                            f'(ISNUMBER(SEARCH("PROJETO INTERPRISE - MOVIMENTACAO E ARMAZENAGEM",Dados!{area_col_letter}:${area_col_letter}))'
-                                            f'+ISNUMBER(SEARCH("MOVIMENTACAO E ARMAZENAGEM",Dados!{area_col_letter}:${area_col_letter}))*NOT(ISNUMBER(SEARCH("PROJETO INTERPRISE",Dados!{area_col_letter}:${area_col_letter})))'
-                                            f'+ISNUMBER(SEARCH("BLOQ",Dados!{area_col_letter}:${area_col_letter}))'
-                                            f'+ISNUMBER(SEARCH("CD-RJ | FOB",Dados!{area_col_letter}:${area_col_letter}))'
-                                            f'+ISNUMBER(SEARCH("M&A | LOCAFARMA CD-RJ",Dados!{area_col_letter}:${area_col_letter})))*'
-                                            f'((Dados!{data_col_letter}:${data_col_letter}="FI")+(Dados!{data_col_letter}:${data_col_letter}="FA")))'
-                                        )
-                                    else:  # CRDK / D&E
-                                        formula = (
-                                            f'=SUMPRODUCT('
-                                            f'(ISNUMBER(SEARCH("CRDK D&E LCFA | CD-RJ",Dados!{area_col_letter}:${area_col_letter}))'
-                                            f'+ISNUMBER(SEARCH("CRDK D&E|CD-RJ HB",Dados!{area_col_letter}:${area_col_letter}))'
-                                            f'+ISNUMBER(SEARCH("CRDK FOB LCFA | CD-RJ",Dados!{area_col_letter}:${area_col_letter}))'
-                                            f'+ISNUMBER(SEARCH("D&E LCFA | CD-RJ",Dados!{area_col_letter}:${area_col_letter}))'
-                                            f'+ISNUMBER(SEARCH("CRDK LCFA | CD-RJ",Dados!{area_col_letter}:${area_col_letter})))*'
-                                            f'((Dados!{data_col_letter}:${data_col_letter}="FI")+(Dados!{data_col_letter}:${data_col_letter}="FA")))'
-                                        )
-                                    
-                                    cell.value = formula
-                                else:
-                                    # Se não tem dados para este dia, deixa vazio ou 0
-                                    cell.value = 0
-                                
-                                if eh_feriado or eh_domingo:
-                                    cell.fill = PatternFill(start_color='FF000000', end_color='FF000000', fill_type='solid')
-                                    cell.font = Font(bold=True, color='FFFFFFFF')
-                                else:
-                                    cell.fill = PatternFill(start_color='FFE2EFDA', end_color='FFE2EFDA', fill_type='solid')
-                            else:
-                                # Linhas de porcentagem: (contagem / HC) * 100 (M&A - % e CRDK / D&E - %)
-                                if eh_feriado:
-                                    cell.value = "FERIADO"
-                                    cell.fill = PatternFill(start_color='FF000000', end_color='FF000000', fill_type='solid')
-                                    cell.font = Font(bold=True, color='FFFFFFFF')
-                                elif eh_domingo:
-                                    cell.value = "DOMINGO"
-                                    cell.fill = PatternFill(start_color='FF000000', end_color='FF000000', fill_type='solid')
-                                    cell.font = Font(bold=True, color='FFFFFFFF')
-                                else:
-                                    if 'M&A - %' in setor_nome:
-                                        contagem_row = row_pct - 1  # Linha anterior (M&A)
-                                        hc_cell = 'B4'  # HC está em B4
-                                    else:  # CRDK / D&E - %
-                                        contagem_row = row_pct - 1  # Linha anterior (CRDK / D&E)
-                                        # Verifica se deve usar HC filtrado de D&E LCFA | CD-RJ (linha 7)
-                                        centro_custo_filtro = st.session_state.get('centro_custo_selecionado', 'Todos')
-                                        if centro_custo_filtro == 'D&E LCFA | CD-RJ':
-                                            hc_cell = 'B7'  # Usa HC específico de D&E LCFA | CD-RJ
-                                        else:
-                                            hc_cell = 'B5'  # Usa HC total de CRDK / D&E
-                                    
-                                    col_letter = get_column_letter(col_idx)
-                                    formula_pct = f'=ROUND(IFERROR(({col_letter}{contagem_row}/{hc_cell})*100, 0), 2)'
-                                    cell.value = formula_pct
-                                    cell.number_format = '0.00"%"'
-                                    cell.fill = PatternFill(start_color='FFE2EFDA', end_color='FFE2EFDA', fill_type='solid')
-                                    cell.font = Font(bold=True)
-                            
-                            cell.alignment = Alignment(horizontal='center', vertical='center')
-                        
-                        # --- COLUNA MÉDIA (Pós-loop dias) ---
-                        col_media_letra = get_column_letter(col_media_idx)
-                        col_inicio_letra = get_column_letter(2) # B
-                        col_fim_letra = get_column_letter(dias_no_mes + 1)
+                        # Formulas da aba (SUMPRODUCT por termo ou COUNTIFS na coluna auxiliar de grupo)
+                        area_col_letter = get_column_letter(list(df_mest_final.columns).index('AREA') + 1)
+                        formulas_pct = FormulasPorcentagens(area_col_letter, len(df_mest_final), letra_grupo_area)
                         
-                        cell_media = ws_porcentagens.cell(row=row_pct, column=col_media_idx)
-                        cell_media.value = f'=AVERAGE({col_inicio_letra}{row_pct}:{col_fim_letra}{row_pct})'
-                        cell_media.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
-                        cell_media.font = Font(bold=True)
-                        cell_media.alignment = Alignment(horizontal='center', vertical='center')
+                        # Valores das fórmulas calculados no pandas (versão SEM fórmulas)
+                        valores_pct = calcular_porcentagens_abs(df_mest_final, mapa_datas, grupos=grupos_area)
+                        hc_pct = valores_pct['HC']
+                        hc_total_pct = sum(hc_pct.values())
                         
-                        if '%' in setor_nome:
-                            cell_media.number_format = '0.00"%"'
-                        else:
-                            cell_media.number_format = '0.00'
-
-                        row_pct += 1
-                    
-                    # --- LINHA TOTAL DE FALTAS (Soma de M&A e CRDK) - REMOVIDO A PEDIDO PELO USUARIO ---
-                    # O usuario quer que apareça FI e FA e o total abaixo
-                    # Entao pulamos a criacao das linhas "TOTAL ABS (FI + FA)" e "TOTAL ABS %" aqui
-                    
-                    # Linha de TOTAL HC - mostrar HC total em todas as colunas
-                    cell_total_hc_label = ws_porcentagens.cell(row=row_pct, column=1, value='TOTAL HC')
-                    cell_total_hc_label.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
-                    cell_total_hc_label.font = Font(bold=True)
-                    
-                    # HC Total (soma de B4 e B5) - mostra em todas as datas também
-                    cell_hc_total_label = ws_porcentagens.cell(row=row_pct, column=2)
-                    cell_hc_total_label.value = '=B4+B5'
-                    cell_hc_total_label.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
-                    cell_hc_total_label.font = Font(bold=True)
-                    cell_hc_total_label.alignment = Alignment(horizontal='center', vertical='center')
-                    
-                    # Replica o HC Total em todas as colunas de data (subtraindo DESLIGADOS)
-                    for dia in range(1, dias_no_mes + 1):
-                        col_idx = dia + 1
-                        data_obj = datetime.date(ano_dados, mes_dados, dia)
+                        # Linha 1: Título
+                        ws_porcentagens.merge_cells('A1:Z1')
+                        titulo_cell = ws_porcentagens.cell(row=1, column=1, value='📊 PORCENTAGENS DE ABSENTEÍSMO')
+                        titulo_cell.font = Font(bold=True, size=14, color='FFFFFF')
+                        titulo_cell.fill = PatternFill(start_color='FF0D4F45', end_color='FF0D4F45', fill_type='solid')
                         
-                        # Verifica se é domingo ou feriado
-                        eh_domingo = data_obj.weekday() == 6
-                        eh_feriado = data_obj in feriados_temp
+                        # Linha 3: Headers - Área, HC (agregado)
+                        ws_porcentagens.cell(row=3, column=1, value='Área')
+                        ws_porcentagens.cell(row=3, column=2, value='HC')
                         
-                        cell_hc_data = ws_porcentagens.cell(row=row_pct, column=col_idx)
+                        # Formata header
+                        for col_num in [1, 2]:
+                            cell_header = ws_porcentagens.cell(row=3, column=col_num)
+                            cell_header.font = Font(bold=True, color='FFFFFF', size=10)
+                            cell_header.fill = PatternFill(start_color='FF0D4F45', end_color='FF0D4F45', fill_type='solid')
+                            cell_header.alignment = Alignment(horizontal='center', vertical='center')
                         
-                        # Se é domingo ou feriado, escreve o texto com background preto
-                        if eh_feriado:
-                            cell_hc_data.value = "FERIADO"
-                            cell_hc_data.fill = PatternFill(start_color='FF000000', end_color='FF000000', fill_type='solid')
-                            cell_hc_data.font = Font(bold=True, color='FFFFFFFF')
-                        elif eh_domingo:
-                            cell_hc_data.value = "DOMINGO"
-                            cell_hc_data.fill = PatternFill(start_color='FF000000', end_color='FF000000', fill_type='solid')
-                            cell_hc_data.font = Font(bold=True, color='FFFFFFFF')
-                        elif data_obj in mapa_datas:
-                            col_data = mapa_datas[data_obj]
-                            data_col_idx = list(df_mest_final.columns).index(col_data) + 1
-                            data_col_letter = get_column_letter(data_col_idx)
+                        # Linhas 4 em diante: um grupo da taxonomia de áreas por linha, com o HC
+                        celula_hc_grupo = {}
+                        for linha_grupo, grupo in enumerate(TERMOS_GRUPOS_PORCENTAGENS, start=4):
+                            cell_grupo = ws_porcentagens.cell(row=linha_grupo, column=1, value=grupo)
+                            cell_grupo.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
+                            cell_grupo.font = Font(bold=True)
                             
-                            # Fórmula: HC Total (B4+B5) menos a contagem de DESLIGADO nesta data
-                            # COUNTIF insensível a maiúsculas/minúsculas
-                            cell_hc_data.value = f'=(B4+B5)-COUNTIF(Dados!{data_col_letter}:${data_col_letter},"DESLIGADO")'
-                            cell_hc_data.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
-                            cell_hc_data.font = Font(bold=True)
-                        else:
-                            # Se não tem dados, coloca 0
-                            cell_hc_data.value = 0
-                            cell_hc_data.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
-                            cell_hc_data.font = Font(bold=True)
-                        
-                        cell_hc_data.alignment = Alignment(horizontal='center', vertical='center')
-                    
-                    # MÉDIA para TOTAL HC
-                    cell_media_thc = ws_porcentagens.cell(row=row_pct, column=col_media_idx)
-                    cell_media_thc.value = f'=AVERAGE({col_inicio_letra}{row_pct}:{col_fim_letra}{row_pct})'
-                    cell_media_thc.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
-                    cell_media_thc.font = Font(bold=True)
-                    cell_media_thc.alignment = Alignment(horizontal='center', vertical='center')
-                    cell_media_thc.number_format = '0.00'
-                    
-                    row_total_hc = row_pct
-                    row_pct += 1
-                    
-                    # Linha de FI - Faltas Injustificadas
-                    cell_fi_label = ws_porcentagens.cell(row=row_pct, column=1, value='FI - Faltas Injustificadas')
-                    cell_fi_label.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
-                    cell_fi_label.font = Font(bold=True)
-                    
-                    # HC vazio para FI
-                    cell_fi_hc = ws_porcentagens.cell(row=row_pct, column=2)
-                    cell_fi_hc.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
-                    
-                    # Soma de FI por data (soma das linhas 9 e 11 de FI apenas)
+                            cell_hc_grupo = ws_porcentagens.cell(row=linha_grupo, column=2, value=formulas_pct.hc(grupo))
+                            valores_sem_formulas.registrar(cell_hc_grupo, hc_pct[grupo])
+                            cell_hc_grupo.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
+                            cell_hc_grupo.alignment = Alignment(horizontal='center', vertical='center')
+                            celula_hc_grupo[grupo] = f'B{linha_grupo}'
+                except Exception as e:
+                    st.error(f"Erro ao gerar Porcentagens ABS: {str(e)}")
+                
+                # Linha após os grupos: TOTAL HC
+                row_total_hc_grupos = 4 + len(celula_hc_grupo)
+                formula_hc_total = f'SUM(B4:B{row_total_hc_grupos - 1})'
+                cell_total_hc_label = ws_porcentagens.cell(row=row_total_hc_grupos, column=1, value='TOTAL HC')
+                cell_total_hc_label.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
+                cell_total_hc_label.font = Font(bold=True)
+                
+                cell_total_hc_value = ws_porcentagens.cell(row=row_total_hc_grupos, column=2)
+                cell_total_hc_value.value = f'={formula_hc_total}'
+                valores_sem_formulas.registrar(cell_total_hc_value, hc_total_pct)
+                cell_total_hc_value.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
+                cell_total_hc_value.font = Font(bold=True)
+                cell_total_hc_value.alignment = Alignment(horizontal='center', vertical='center')
+                
+                # Headers com datas para porcentagens (uma linha em branco após o TOTAL HC) - TODOS os dias do mês
+                row_cabecalho_pct = row_total_hc_grupos + 2
+                ws_porcentagens.cell(row=row_cabecalho_pct, column=1, value='Área')
+                
+                # Gera todos os dias do mês
+                if mapa_datas:
+                    mes_dados = min(mapa_datas.keys()).month
+                    ano_dados = min(mapa_datas.keys()).year
+                else:
+                    mes_dados = mes_planilha
+                    ano_dados = ano_planilha
+                
+                import calendar
+                dias_no_mes = calendar.monthrange(ano_dados, mes_dados)[1]
+                
+                # Preenche header com todos os dias (mesmo sem dados)
+                for dia in range(1, dias_no_mes + 1):
+                    data_obj = datetime.date(ano_dados, mes_dados, dia)
+                    data_formatada = f"{dia:02d}/{mes_dados:02d}"
+                    col_idx = dia + 1  # Coluna começa em 2 (coluna 1 é "Área")
+                    cell_header = ws_porcentagens.cell(row=row_cabecalho_pct, column=col_idx, value=data_formatada)
+                    cell_header.font = Font(bold=True, color='FFFFFF', size=10)
+                    cell_header.fill = PatternFill(start_color='FF0D4F45', end_color='FF0D4F45', fill_type='solid')
+                    cell_header.alignment = Alignment(horizontal='center', vertical='center')
+                
+                # Coluna MÉDIA no Header (Pós-loop dias)
+                col_media_idx = dias_no_mes + 2 # Coluna após o último dia
+                cell_media_header = ws_porcentagens.cell(row=row_cabecalho_pct, column=col_media_idx, value="MÉDIA")
+                cell_media_header.font = Font(bold=True, color='FFFFFF', size=10)
+                cell_media_header.fill = PatternFill(start_color='FF0D4F45', end_color='FF0D4F45', fill_type='solid')
+                cell_media_header.alignment = Alignment(horizontal='center', vertical='center')
+
+                # Formata header coluna Área
+                cell_area_header = ws_porcentagens.cell(row=row_cabecalho_pct, column=1)
+                cell_area_header.font = Font(bold=True, color='FFFFFF', size=10)
+                cell_area_header.fill = PatternFill(start_color='FF0D4F45', end_color='FF0D4F45', fill_type='solid')
+                cell_area_header.alignment = Alignment(horizontal='center', vertical='center')
+                
+                # Setores para porcentagens: contagem e % de cada grupo da taxonomia de áreas
+                setores_info_pct = []
+                for grupo in celula_hc_grupo:
+                    setores_info_pct.append((grupo, grupo))
+                    setores_info_pct.append((f'{grupo} - %', grupo))
+                
+                row_pct = row_cabecalho_pct + 1
+                
+                for setor_idx, (setor_nome, grupo_setor) in enumerate(setores_info_pct):
+                    # Nome do setor
+                    cell_setor = ws_porcentagens.cell(row=row_pct, column=1, value=setor_nome)
+                    # Títulos em VERDE PASTEL
+                    cell_setor.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
+                    cell_setor.font = Font(bold=True)
+                    
+                    # Preenche cada data - TODOS os dias do mês
                     for dia in range(1, dias_no_mes + 1):
-                        col_idx = dia + 1
+                        col_idx = dia + 1  # Coluna começa em 2
+                        cell = ws_porcentagens.cell(row=row_pct, column=col_idx)
+                        
+                        # Verifica se existe data para este dia
                         data_obj = datetime.date(ano_dados, mes_dados, dia)
                         
                         # Verifica se é domingo ou feriado
-                        eh_domingo = data_obj.weekday() == 6
-                        eh_feriado = data_obj in feriados_temp
+                        eh_domingo = dias_calendario[data_obj]['DOMINGO']
+                        eh_feriado = dias_calendario[data_obj]['FERIADO']
                         
-                        if data_obj in mapa_datas:
-                            col_data = mapa_datas[data_obj]
-                            data_col_idx = list(df_mest_final.columns).index(col_data) + 1
-                            data_col_letter = get_column_letter(data_col_idx)
-                            
-                            cell_fi_data = ws_porcentagens.cell(row=row_pct, column=col_idx)
-                            
-                            # Se é domingo ou feriado, escreve o texto com background preto
+                        if '%' not in setor_nome:
+                            # Linhas de contagem FI+FA do grupo (M&A, CRDK / D&E, ...)
                             if eh_feriado:
-                                cell_fi_data.value = "FERIADO"
-                                cell_fi_data.fill = PatternFill(start_color='FF000000', end_color='FF000000', fill_type='solid')
-                                cell_fi_data.font = Font(bold=True, color='FFFFFFFF')
+                                cell.value = "FERIADO"
                             elif eh_domingo:
-                                cell_fi_data.value = "DOMINGO"
-                                cell_fi_data.fill = PatternFill(start_color='FF000000', end_color='FF000000', fill_type='solid')
-                                cell_fi_data.font = Font(bold=True, color='FFFFFFFF')
+                                cell.value = "DOMINGO"
+                            elif data_obj in mapa_datas:
+                                col_data = mapa_datas[data_obj]
+                                data_col_idx = list(df_mest_final.columns).index(col_data) + 1
+                                data_col_letter = get_column_letter(data_col_idx)
+                                
+                                formula = formulas_pct.faltas_grupo(grupo_setor, data_col_letter)
+                                cell.value = formula
+                                valores_sem_formulas.registrar(cell, valores_pct['DATAS'][data_obj][grupo_setor])
                             else:
-                                # Usa as linhas 9 (M&A FI) e 11 (CRDK FI), pegando apenas a parte de FI
-                                cell_fi_data.value = f'=COUNTIF(Dados!{data_col_letter}:${data_col_letter},"FI")'
-                                cell_fi_data.fill = PatternFill(start_color='FF007864', end_color='FF007864', fill_type='solid')
-                                cell_fi_data.font = Font(bold=True, color='FFFFFFFF')
+                                # Se não tem dados para este dia, deixa vazio ou 0
+                                cell.value = 0
                             
-                            cell_fi_data.alignment = Alignment(horizontal='center', vertical='center')
+                            if eh_feriado or eh_domingo:
+                                cell.fill = PatternFill(start_color='FF000000', end_color='FF000000', fill_type='solid')
+                                cell.font = Font(bold=True, color='FFFFFFFF')
+                            else:
+                                cell.fill = PatternFill(start_color='FFE2EFDA', end_color='FFE2EFDA', fill_type='solid')
                         else:
-                            # Se não tem dados, coloca 0
-                            cell_fi_data = ws_porcentagens.cell(row=row_pct, column=col_idx)
-                            cell_fi_data.value = 0
-                            cell_fi_data.fill = PatternFill(start_color='FF007864', end_color='FF007864', fill_type='solid')
-                            cell_fi_data.font = Font(bold=True, color='FFFFFFFF')
-                            cell_fi_data.alignment = Alignment(horizontal='center', vertical='center')
-                    
-                    # MÉDIA para FI
-                    cell_media_fi = ws_porcentagens.cell(row=row_pct, column=col_media_idx)
-                    cell_media_fi.value = f'=AVERAGE({col_inicio_letra}{row_pct}:{col_fim_letra}{row_pct})'
-                    cell_media_fi.fill = PatternFill(start_color='FF007864', end_color='FF007864', fill_type='solid')
-                    cell_media_fi.font = Font(bold=True, color='FFFFFFFF')
-                    cell_media_fi.alignment = Alignment(horizontal='center', vertical='center')
-                    cell_media_fi.number_format = '0.00'
-                    
-                    row_fi = row_pct
-                    row_pct += 1
-                    
-                    # Linha de FA - Faltas por Atestado
-                    cell_fa_label = ws_porcentagens.cell(row=row_pct, column=1, value='FA - Faltas por Atestado')
-                    cell_fa_label.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
-                    cell_fa_label.font = Font(bold=True)
-                    
-                    # HC vazio para FA
-                    cell_fa_hc = ws_porcentagens.cell(row=row_pct, column=2)
-                    cell_fa_hc.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
-                    
-                    # Soma de FA por data
-                    for dia in range(1, dias_no_mes + 1):
-                        col_idx = dia + 1
-                        data_obj = datetime.date(ano_dados, mes_dados, dia)
-                        
-                        # Verifica se é domingo ou feriado
-                        eh_domingo = data_obj.weekday() == 6
-                        eh_feriado = data_obj in feriados_temp
-                        
-                        if data_obj in mapa_datas:
-                            col_data = mapa_datas[data_obj]
-                            data_col_idx = list(df_mest_final.columns).index(col_data) + 1
-                            data_col_letter = get_column_letter(data_col_idx)
-                            
-                            cell_fa_data = ws_porcentagens.cell(row=row_pct, column=col_idx)
-                            
-                            # Se é domingo ou feriado, escreve o texto com background preto
+                            # Linhas de porcentagem: (contagem / HC do grupo) * 100 (M&A - %, CRDK / D&E - %, ...)
                             if eh_feriado:
-                                cell_fa_data.value = "FERIADO"
-                                cell_fa_data.fill = PatternFill(start_color='FF000000', end_color='FF000000', fill_type='solid')
-                                cell_fa_data.font = Font(bold=True, color='FFFFFFFF')
+                                cell.value = "FERIADO"
+                                cell.fill = PatternFill(start_color='FF000000', end_color='FF000000', fill_type='solid')
+                                cell.font = Font(bold=True, color='FFFFFFFF')
                             elif eh_domingo:
-                                cell_fa_data.value = "DOMINGO"
-                                cell_fa_data.fill = PatternFill(start_color='FF000000', end_color='FF000000', fill_type='solid')
-                                cell_fa_data.font = Font(bold=True, color='FFFFFFFF')
+                                cell.value = "DOMINGO"
+                                cell.fill = PatternFill(start_color='FF000000', end_color='FF000000', fill_type='solid')
+                                cell.font = Font(bold=True, color='FFFFFFFF')
                             else:
-                                cell_fa_data.value = f'=COUNTIF(Dados!{data_col_letter}:${data_col_letter},"FA")'
-                                cell_fa_data.fill = PatternFill(start_color='FF008C4B', end_color='FF008C4B', fill_type='solid')
-                                cell_fa_data.font = Font(bold=True, color='FFFFFFFF')
-                            
-                            cell_fa_data.alignment = Alignment(horizontal='center', vertical='center')
-                        else:
-                            # Se não tem dados, coloca 0
-                            cell_fa_data = ws_porcentagens.cell(row=row_pct, column=col_idx)
-                            cell_fa_data.value = 0
-                            cell_fa_data.fill = PatternFill(start_color='FF008C4B', end_color='FF008C4B', fill_type='solid')
-                            cell_fa_data.font = Font(bold=True, color='FFFFFFFF')
-                            cell_fa_data.alignment = Alignment(horizontal='center', vertical='center')
+                                contagem_row = row_pct - 1  # Linha anterior (contagem do grupo)
+                                hc_cell = celula_hc_grupo[grupo_setor]
+                                hc_valor_pct = hc_pct[grupo_setor]
+                                if grupo_setor == 'CRDK / D&E':
+                                    # Verifica se deve usar HC filtrado de D&E LCFA | CD-RJ (linha após o TOTAL HC)
+                                    centro_custo_filtro = st.session_state.get('centro_custo_selecionado', 'Todos')
+                                    if centro_custo_filtro == 'D&E LCFA | CD-RJ':
+                                        hc_cell = f'B{row_total_hc_grupos + 1}'  # Usa HC específico de D&E LCFA | CD-RJ
+                                        hc_valor_pct = 0
+                                
+                                col_letter = get_column_letter(col_idx)
+                                formula_pct = f'=ROUND(IFERROR(({col_letter}{contagem_row}/{hc_cell})*100, 0), 2)'
+                                cell.value = formula_pct
+                                contagem_pct = valores_pct['DATAS'].get(data_obj, {}).get(grupo_setor, 0)
+                                valores_sem_formulas.registrar(
+                                    cell, round(contagem_pct / hc_valor_pct * 100, 2) if hc_valor_pct else 0
+                                )
+                                cell.number_format = '0.00"%"'
+                                cell.fill = PatternFill(start_color='FFE2EFDA', end_color='FFE2EFDA', fill_type='solid')
+                                cell.font = Font(bold=True)
+                        
+                        cell.alignment = Alignment(horizontal='center', vertical='center')
+                    
+                    # --- COLUNA MÉDIA (Pós-loop dias) ---
+                    col_media_letra = get_column_letter(col_media_idx)
+                    col_inicio_letra = get_column_letter(2) # B
+                    col_fim_letra = get_column_letter(dias_no_mes + 1)
                     
-                    # MÉDIA para FA
-                    cell_media_fa = ws_porcentagens.cell(row=row_pct, column=col_media_idx)
-                    cell_media_fa.value = f'=AVERAGE({col_inicio_letra}{row_pct}:{col_fim_letra}{row_pct})'
-                    cell_media_fa.fill = PatternFill(start_color='FF008C4B', end_color='FF008C4B', fill_type='solid')
-                    cell_media_fa.font = Font(bold=True, color='FFFFFFFF')
-                    cell_media_fa.alignment = Alignment(horizontal='center', vertical='center')
-                    cell_media_fa.number_format = '0.00'
+                    cell_media = ws_porcentagens.cell(row=row_pct, column=col_media_idx)
+                    cell_media.value = f'=AVERAGE({col_inicio_letra}{row_pct}:{col_fim_letra}{row_pct})'
+                    cell_media.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
+                    cell_media.font = Font(bold=True)
+                    cell_media.alignment = Alignment(horizontal='center', vertical='center')
                     
-                    row_fa = row_pct
+                    if '%' in setor_nome:
+                        cell_media.number_format = '0.00"%"'
+                    else:
+                        cell_media.number_format = '0.00'
+
                     row_pct += 1
+                
+                # --- LINHA TOTAL DE FALTAS (Soma de M&A e CRDK) - REMOVIDO A PEDIDO PELO USUARIO ---
+                # O usuario quer que apareça FI e FA e o total abaixo
+                # Entao pulamos a criacao das linhas "TOTAL ABS (FI + FA)" e "TOTAL ABS %" aqui
+                
+                # Linha de TOTAL HC - mostrar HC total em todas as colunas
+                cell_total_hc_label = ws_porcentagens.cell(row=row_pct, column=1, value='TOTAL HC')
+                cell_total_hc_label.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
+                cell_total_hc_label.font = Font(bold=True)
+                
+                # HC Total (soma dos grupos) - mostra em todas as datas também
+                cell_hc_total_label = ws_porcentagens.cell(row=row_pct, column=2)
+                cell_hc_total_label.value = f'={formula_hc_total}'
+                valores_sem_formulas.registrar(cell_hc_total_label, hc_total_pct)
+                cell_hc_total_label.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
+                cell_hc_total_label.font = Font(bold=True)
+                cell_hc_total_label.alignment = Alignment(horizontal='center', vertical='center')
+                
+                # Replica o HC Total em todas as colunas de data (subtraindo DESLIGADOS)
+                for dia in range(1, dias_no_mes + 1):
+                    col_idx = dia + 1
+                    data_obj = datetime.date(ano_dados, mes_dados, dia)
                     
-                    # Linha de TOTAL - soma de todas as faltas (AGORA APÓS FI E FA)
-                    cell_total_label = ws_porcentagens.cell(row=row_pct, column=1, value='TOTAL')
-                    cell_total_label.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
-                    cell_total_label.font = Font(bold=True)
+                    # Verifica se é domingo ou feriado
+                    eh_domingo = dias_calendario[data_obj]['DOMINGO']
+                    eh_feriado = dias_calendario[data_obj]['FERIADO']
+                    
+                    cell_hc_data = ws_porcentagens.cell(row=row_pct, column=col_idx)
+                    
+                    # Se é domingo ou feriado, escreve o texto com background preto
+                    if eh_feriado:
+                        cell_hc_data.value = "FERIADO"
+                        cell_hc_data.fill = PatternFill(start_color='FF000000', end_color='FF000000', fill_type='solid')
+                        cell_hc_data.font = Font(bold=True, color='FFFFFFFF')
+                    elif eh_domingo:
+                        cell_hc_data.value = "DOMINGO"
+                        cell_hc_data.fill = PatternFill(start_color='FF000000', end_color='FF000000', fill_type='solid')
+                        cell_hc_data.font = Font(bold=True, color='FFFFFFFF')
+                    elif data_obj in mapa_datas:
+                        col_data = mapa_datas[data_obj]
+                        data_col_idx = list(df_mest_final.columns).index(col_data) + 1
+                        data_col_letter = get_column_letter(data_col_idx)
+                        
+                        # Fórmula: HC Total (soma dos grupos) menos a contagem de DESLIGADO nesta data
+                        # COUNTIF insensível a maiúsculas/minúsculas
+                        cell_hc_data.value = f'={formula_hc_total}-{formulas_pct.contagem(data_col_letter, "DESLIGADO")}'
+                        valores_sem_formulas.registrar(cell_hc_data, hc_total_pct - valores_pct['DATAS'][data_obj]['DESLIGADO'])
+                        cell_hc_data.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
+                        cell_hc_data.font = Font(bold=True)
+                    else:
+                        # Se não tem dados, coloca 0
+                        cell_hc_data.value = 0
+                        cell_hc_data.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
+                        cell_hc_data.font = Font(bold=True)
+                    
+                    cell_hc_data.alignment = Alignment(horizontal='center', vertical='center')
+                
+                # MÉDIA para TOTAL HC
+                cell_media_thc = ws_porcentagens.cell(row=row_pct, column=col_media_idx)
+                cell_media_thc.value = f'=AVERAGE({col_inicio_letra}{row_pct}:{col_fim_letra}{row_pct})'
+                cell_media_thc.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
+                cell_media_thc.font = Font(bold=True)
+                cell_media_thc.alignment = Alignment(horizontal='center', vertical='center')
+                cell_media_thc.number_format = '0.00'
+                
+                row_total_hc = row_pct
+                row_pct += 1
+                
+                # Linha de FI - Faltas Injustificadas
+                cell_fi_label = ws_porcentagens.cell(row=row_pct, column=1, value='FI - Faltas Injustificadas')
+                cell_fi_label.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
+                cell_fi_label.font = Font(bold=True)
+                
+                # HC vazio para FI
+                cell_fi_hc = ws_porcentagens.cell(row=row_pct, column=2)
+                cell_fi_hc.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
+                
+                # Soma de FI por data (soma das linhas 9 e 11 de FI apenas)
+                for dia in range(1, dias_no_mes + 1):
+                    col_idx = dia + 1
+                    data_obj = datetime.date(ano_dados, mes_dados, dia)
                     
-                    # HC Total (soma de B4 e B5)
-                    cell_hc_total = ws_porcentagens.cell(row=row_pct, column=2)
-                    cell_hc_total.value = '=B4+B5'
-                    cell_hc_total.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
-                    cell_hc_total.font = Font(bold=True)
-                    cell_hc_total.alignment = Alignment(horizontal='center', vertical='center')
+                    # Verifica se é domingo ou feriado
+                    eh_domingo = dias_calendario[data_obj]['DOMINGO']
+                    eh_feriado = dias_calendario[data_obj]['FERIADO']
                     
-                    # Soma das faltas por data (linha 9 + linha 11)
-                    for dia in range(1, dias_no_mes + 1):
-                        col_idx = dia + 1
-                        data_obj = datetime.date(ano_dados, mes_dados, dia)
+                    if data_obj in mapa_datas:
+                        col_data = mapa_datas[data_obj]
+                        data_col_idx = list(df_mest_final.columns).index(col_data) + 1
+                        data_col_letter = get_column_letter(data_col_idx)
                         
-                        # Verifica se é domingo ou feriado
-                        eh_domingo = data_obj.weekday() == 6
-                        eh_feriado = data_obj in feriados_temp
-                        
-                        cell_total_data = ws_porcentagens.cell(row=row_pct, column=col_idx)
-                        col_letter = get_column_letter(col_idx)
+                        cell_fi_data = ws_porcentagens.cell(row=row_pct, column=col_idx)
                         
                         # Se é domingo ou feriado, escreve o texto com background preto
                         if eh_feriado:
-                            cell_total_data.value = "FERIADO"
-                            cell_total_data.fill = PatternFill(start_color='FF000000', end_color='FF000000', fill_type='solid')
-                            cell_total_data.font = Font(bold=True, color='FFFFFFFF')
+                            cell_fi_data.value = "FERIADO"
+                            cell_fi_data.fill = PatternFill(start_color='FF000000', end_color='FF000000', fill_type='solid')
+                            cell_fi_data.font = Font(bold=True, color='FFFFFFFF')
                         elif eh_domingo:
-                            cell_total_data.value = "DOMINGO"
-                            cell_total_data.fill = PatternFill(start_color='FF000000', end_color='FF000000', fill_type='solid')
-                            cell_total_data.font = Font(bold=True, color='FFFFFFFF')
+                            cell_fi_data.value = "DOMINGO"
+                            cell_fi_data.fill = PatternFill(start_color='FF000000', end_color='FF000000', fill_type='solid')
+                            cell_fi_data.font = Font(bold=True, color='FFFFFFFF')
                         else:
-                            # Soma FI e FA (linhas armazenadas em row_fi e row_fa)
-                            cell_total_data.value = f'={col_letter}{row_fi}+{col_letter}{row_fa}'
-                            cell_total_data.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
-                            cell_total_data.font = Font(bold=True)
+                            # Usa as linhas 9 (M&A FI) e 11 (CRDK FI), pegando apenas a parte de FI
+                            cell_fi_data.value = f'={formulas_pct.contagem(data_col_letter, "FI")}'
+                            valores_sem_formulas.registrar(cell_fi_data, valores_pct['DATAS'][data_obj]['FI'])
+                            cell_fi_data.fill = PatternFill(start_color='FF007864', end_color='FF007864', fill_type='solid')
+                            cell_fi_data.font = Font(bold=True, color='FFFFFFFF')
                         
-                        cell_total_data.alignment = Alignment(horizontal='center', vertical='center')
-                    
-                    # MÉDIA para TOTAL
-                    cell_media_tot = ws_porcentagens.cell(row=row_pct, column=col_media_idx)
-                    cell_media_tot.value = f'=AVERAGE({col_inicio_letra}{row_pct}:{col_fim_letra}{row_pct})'
-                    cell_media_tot.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
-                    cell_media_tot.font = Font(bold=True)
-                    cell_media_tot.alignment = Alignment(horizontal='center', vertical='center')
-                    cell_media_tot.number_format = '0.00'
-                    
-                    row_total_faltas = row_pct
-                    row_pct += 1
-                    
-                    # Linha de %Acumulado - TOTAL / HC Total
-                    cell_acum_label = ws_porcentagens.cell(row=row_pct, column=1, value='%Acumulado')
-                    cell_acum_label.fill = PatternFill(start_color='FF0D4F45', end_color='FF0D4F45', fill_type='solid')
-                    cell_acum_label.font = Font(bold=True, color='FFFFFFFF')
+                        cell_fi_data.alignment = Alignment(horizontal='center', vertical='center')
+                    else:
+                        # Se não tem dados, coloca 0
+                        cell_fi_data = ws_porcentagens.cell(row=row_pct, column=col_idx)
+                        cell_fi_data.value = 0
+                        cell_fi_data.fill = PatternFill(start_color='FF007864', end_color='FF007864', fill_type='solid')
+                        cell_fi_data.font = Font(bold=True, color='FFFFFFFF')
+                        cell_fi_data.alignment = Alignment(horizontal='center', vertical='center')
+                
+                # MÉDIA para FI
+                cell_media_fi = ws_porcentagens.cell(row=row_pct, column=col_media_idx)
+                cell_media_fi.value = f'=AVERAGE({col_inicio_letra}{row_pct}:{col_fim_letra}{row_pct})'
+                cell_media_fi.fill = PatternFill(start_color='FF007864', end_color='FF007864', fill_type='solid')
+                cell_media_fi.font = Font(bold=True, color='FFFFFFFF')
+                cell_media_fi.alignment = Alignment(horizontal='center', vertical='center')
+                cell_media_fi.number_format = '0.00'
+                
+                row_fi = row_pct
+                row_pct += 1
+                
+                # Linha de FA - Faltas por Atestado
+                cell_fa_label = ws_porcentagens.cell(row=row_pct, column=1, value='FA - Faltas por Atestado')
+                cell_fa_label.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
+                cell_fa_label.font = Font(bold=True)
+                
+                # HC vazio para FA
+                cell_fa_hc = ws_porcentagens.cell(row=row_pct, column=2)
+                cell_fa_hc.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
+                
+                # Soma de FA por data
+                for dia in range(1, dias_no_mes + 1):
+                    col_idx = dia + 1
+                    data_obj = datetime.date(ano_dados, mes_dados, dia)
                     
-                    # Célula vazia em B
-                    cell_acum_hc = ws_porcentagens.cell(row=row_pct, column=2)
-                    cell_acum_hc.fill = PatternFill(start_color='FF0D4F45', end_color='FF0D4F45', fill_type='solid')
+                    # Verifica se é domingo ou feriado
+                    eh_domingo = dias_calendario[data_obj]['DOMINGO']
+                    eh_feriado = dias_calendario[data_obj]['FERIADO']
                     
-                    # Soma acumulada de faltas / HC do dia respectivo * 100
-                    # Cores condicionais: Verde <3%, Amarelo 3-3.5%, Vermelho >3.5%
-                    row_acumulado = row_pct
-                    for dia in range(1, dias_no_mes + 1):
-                        col_idx = dia + 1
-                        data_obj = datetime.date(ano_dados, mes_dados, dia)
+                    if data_obj in mapa_datas:
+                        col_data = mapa_datas[data_obj]
+                        data_col_idx = list(df_mest_final.columns).index(col_data) + 1
+                        data_col_letter = get_column_letter(data_col_idx)
                         
-                        # Verifica se é domingo ou feriado
-                        eh_domingo = data_obj.weekday() == 6
-                        eh_feriado = data_obj in feriados_temp
-                        
-                        cell_acum_data = ws_porcentagens.cell(row=row_pct, column=col_idx)
-                        col_letter = get_column_letter(col_idx)
+                        cell_fa_data = ws_porcentagens.cell(row=row_pct, column=col_idx)
                         
                         # Se é domingo ou feriado, escreve o texto com background preto
                         if eh_feriado:
-                            cell_acum_data.value = "FERIADO"
-                            cell_acum_data.fill = PatternFill(start_color='FF000000', end_color='FF000000', fill_type='solid')
-                            cell_acum_data.font = Font(bold=True, color='FFFFFFFF')
+                            cell_fa_data.value = "FERIADO"
+                            cell_fa_data.fill = PatternFill(start_color='FF000000', end_color='FF000000', fill_type='solid')
+                            cell_fa_data.font = Font(bold=True, color='FFFFFFFF')
                         elif eh_domingo:
-                            cell_acum_data.value = "DOMINGO"
-                            cell_acum_data.fill = PatternFill(start_color='FF000000', end_color='FF000000', fill_type='solid')
-                            cell_acum_data.font = Font(bold=True, color='FFFFFFFF')
+                            cell_fa_data.value = "DOMINGO"
+                            cell_fa_data.fill = PatternFill(start_color='FF000000', end_color='FF000000', fill_type='solid')
+                            cell_fa_data.font = Font(bold=True, color='FFFFFFFF')
                         else:
-                            # Referencia: célula do TOTAL (row_total_faltas) / HC da data respectiva (mesmo col_letter em row_total_hc) * 100
-                            cell_acum_data.value = f'=IFERROR(({col_letter}{row_total_faltas}/{col_letter}{row_total_hc})*100,0)'
-                            cell_acum_data.number_format = '0.00"%"'
-                            cell_acum_data.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
-                            cell_acum_data.font = Font(bold=True)
+                            cell_fa_data.value = f'={formulas_pct.contagem(data_col_letter, "FA")}'
+                            valores_sem_formulas.registrar(cell_fa_data, valores_pct['DATAS'][data_obj]['FA'])
+                            cell_fa_data.fill = PatternFill(start_color='FF008C4B', end_color='FF008C4B', fill_type='solid')
+                            cell_fa_data.font = Font(bold=True, color='FFFFFFFF')
                         
-                        cell_acum_data.alignment = Alignment(horizontal='center', vertical='center')
-                    
-                    # MÉDIA para %Acumulado
-                    cell_media_acum = ws_porcentagens.cell(row=row_pct, column=col_media_idx)
-                    cell_media_acum.value = f'=AVERAGE({col_inicio_letra}{row_pct}:{col_fim_letra}{row_pct})'
-                    cell_media_acum.fill = PatternFill(start_color='FF0D4F45', end_color='FF0D4F45', fill_type='solid')
-                    cell_media_acum.font = Font(bold=True, color='FFFFFFFF')
-                    cell_media_acum.alignment = Alignment(horizontal='center', vertical='center')
-                    cell_media_acum.number_format = '0.00"%"'
-                    
-                    # Adiciona regras condicionais para %Acumulado
-                    from openpyxl.formatting.rule import CellIsRule
-                    # Verde: < 3% (VERDE FORTE)
-                    green_fill = PatternFill(start_color='FF00B050', end_color='FF00B050', fill_type='solid')
-                    green_font = Font(bold=True, color='FFFFFFFF')
-                    green_rule = CellIsRule(operator='lessThan', formula=['3'], fill=green_fill, font=green_font)
-                    
-                    # Vermelho: >= 3% (VERMELHO FORTE)
-                    red_fill = PatternFill(start_color='FFFF0000', end_color='FFFF0000', fill_type='solid')
-                    red_font = Font(bold=True, color='FFFFFFFF')
-                    red_rule = CellIsRule(operator='greaterThanOrEqual', formula=['3'], fill=red_fill, font=red_font)
-                    
-                    # Aplica as regras ao intervalo de %Acumulado
-                    acum_range = f'{get_column_letter(2)}{row_acumulado}:{get_column_letter(len(sorted(mapa_datas.keys()))+1)}{row_acumulado}'
-                    ws_porcentagens.conditional_formatting.add(acum_range, green_rule)
-                    ws_porcentagens.conditional_formatting.add(acum_range, red_rule)
-                    
-                    # Ajusta largura das colunas
-                    ws_porcentagens.column_dimensions['A'].width = 25
-                    ws_porcentagens.column_dimensions['B'].width = 15
-                    for col_idx in range(2, len(sorted(mapa_datas.keys())) + 2):
-                        ws_porcentagens.column_dimensions[get_column_letter(col_idx)].width = 12
-                    
-                    # ===== OBTER FERIADOS E MARCAR NA PLANILHA =====
-                    progress_bar = st.progress(0)
-                    status_text = st.empty()
-                    
-                    status_text.info("📥 Obtendo feriados nacionais...")
-                    progress_bar.progress(10)
-                    
-                    if mapa_datas:
-                        ano_feriados = min(mapa_datas.keys()).year
-                        feriados = obter_feriados_brasil(ano_feriados)
-                        if feriados:
-                            status_text.info("🎨 Marcando feriados na planilha...")
-                            progress_bar.progress(20)
-                            marcar_feriados_na_workbook(w.book, feriados, mapa_datas, MAPA_CORES)
-                    
-                    # ===== LER DATAFRAME ATUALIZADO DO WORKBOOK (COM FERIADOS MARCADOS) =====
-                    status_text.info("📖 Lendo dados marcados...")
-                    progress_bar.progress(30)
-                    df_mest_com_feriados = ler_dataframe_do_workbook(w.book)
-                    
-                    # ===== DETECTAR AFASTAMENTOS NO DATAFRAME COM FERIADOS (ignora FERIADO) =====
-                    status_text.info("🔍 Detectando afastamentos...")
-                    progress_bar.progress(40)
-                    afastamentos = detectar_afastamentos_no_dataframe(df_mest_com_feriados, mapa_datas)
-                    
-                    # ===== MARCAR AFASTAMENTOS NA PLANILHA =====
-                    status_text.info("📌 Marcando afastamentos...")
-                    progress_bar.progress(50)
-                    marcar_afastamentos_na_workbook(w.book, MAPA_CORES, afastamentos, df_mest_com_feriados, mapa_datas)
-
-                    # ===== CARREGAR E MARCAR DEMITIDOS =====
-                    status_text.info("📤 Aplicando desligamentos...")
-                    progress_bar.progress(55)
-                    if file_demitidos is not None:
-                        df_demitidos = carregar_csv_demitidos(file_demitidos)
+                        cell_fa_data.alignment = Alignment(horizontal='center', vertical='center')
                     else:
-                        df_demitidos = None
-
-                    if df_demitidos is not None:
-                        aplicados_desligado = aplicar_desligados_na_workbook(w.book, df_demitidos, mapa_datas)
-                        if aplicados_desligado == 0:
-                            st.warning("⚠️ O CSV de demitidos foi carregado, mas nenhuma linha foi aplicada. Confira os nomes e a coluna de data de rescisão.")
-                    elif file_demitidos is not None:
-                        st.warning("⚠️ Não foi possível ler o CSV de demitidos. O relatório seguirá sem aplicar DESLIGADO.")
-
-                    # ===== CARREGAR E MARCAR FÉRIAS =====
-                    status_text.info("🌴 Aplicando férias...")
-                    progress_bar.progress(58)
-                    arquivos_ferias = [arquivo for arquivo in [file_ferias_1, file_ferias_2] if arquivo is not None]
-                    if arquivos_ferias:
-                        total_aplicados_ferias = 0
-                        for arquivo_ferias in arquivos_ferias:
-                            df_ferias = carregar_csv_demitidos(arquivo_ferias)
-                            if df_ferias is None:
-                                st.warning(f"⚠️ Não foi possível ler o arquivo de férias {arquivo_ferias.name}. O relatório seguirá sem aplicar FÉRIAS-BH nesse arquivo.")
-                                continue
-
-                            total_aplicados_ferias += aplicar_ferias_na_workbook(w.book, df_ferias, mapa_datas)
-
-                        if total_aplicados_ferias == 0:
-                            st.warning("⚠️ Os CSVs de férias foram carregados, mas nenhuma célula foi aplicada. Confira os nomes, status e datas de gozo.")
-                    
-                    # ===== LER DATAFRAME ATUALIZADO DO WORKBOOK (COM MARCAÇÕES) =====
-                    status_text.info("📖 Lendo dados finais...")
-                    progress_bar.progress(60)
-                    df_mest_marcado = ler_dataframe_do_workbook(w.book)
-                    
-                    # ===== CARREGAR DADOS DO CSV DE COLABORADORES =====
-                    status_text.info("📊 Capturando dados do CSV de colaboradores...")
-                    progress_bar.progress(70)
-                    
-                    df_colab_para_ranking = None
-                    if file_colaboradores is not None:
-                        try:
-                            # Carrega CSV de colaboradores
-                            if file_colaboradores.name.endswith('.xlsx'):
-                                file_colaboradores.seek(0)
-                                df_colab_para_ranking = pd.read_excel(file_colaboradores)
-                            else:
-                                df_colab_para_ranking, erro_leitura_ranking = carregar_csv_colaboradores_robusto(file_colaboradores)
-                        except Exception as e:
-                            st.warning(f"⚠️ Não foi possível carregar CSV de colaboradores: {str(e)}")
+                        # Se não tem dados, coloca 0
+                        cell_fa_data = ws_porcentagens.cell(row=row_pct, column=col_idx)
+                        cell_fa_data.value = 0
+                        cell_fa_data.fill = PatternFill(start_color='FF008C4B', end_color='FF008C4B', fill_type='solid')
+                        cell_fa_data.font = Font(bold=True, color='FFFFFFFF')
+                        cell_fa_data.alignment = Alignment(horizontal='center', vertical='center')
+                
+                # MÉDIA para FA
+                cell_media_fa = ws_porcentagens.cell(row=row_pct, column=col_media_idx)
+                cell_media_fa.value = f'=AVERAGE({col_inicio_letra}{row_pct}:{col_fim_letra}{row_pct})'
+                cell_media_fa.fill = PatternFill(start_color='FF008C4B', end_color='FF008C4B', fill_type='solid')
+                cell_media_fa.font = Font(bold=True, color='FFFFFFFF')
+                cell_media_fa.alignment = Alignment(horizontal='center', vertical='center')
+                cell_media_fa.number_format = '0.00'
+                
+                row_fa = row_pct
+                row_pct += 1
+                
+                # Linha de TOTAL - soma de todas as faltas (AGORA APÓS FI E FA)
+                cell_total_label = ws_porcentagens.cell(row=row_pct, column=1, value='TOTAL')
+                cell_total_label.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
+                cell_total_label.font = Font(bold=True)
+                
+                # HC Total (soma dos grupos)
+                cell_hc_total = ws_porcentagens.cell(row=row_pct, column=2)
+                cell_hc_total.value = f'={formula_hc_total}'
+                valores_sem_formulas.registrar(cell_hc_total, hc_total_pct)
+                cell_hc_total.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
+                cell_hc_total.font = Font(bold=True)
+                cell_hc_total.alignment = Alignment(horizontal='center', vertical='center')
+                
+                # Soma das faltas por data (linha 9 + linha 11)
+                for dia in range(1, dias_no_mes + 1):
+                    col_idx = dia + 1
+                    data_obj = datetime.date(ano_dados, mes_dados, dia)
                     
-                    # ===== MODO RÁPIDO: pula sheets extras se ativado =====
-                    if not st.session_state.modo_rapido:
-                        # ===== CRIAR SHEET DE OFENSORES DE ABS (COM DADOS MARCADOS) =====
-                        status_text.info("📊 Gerando relatório de ofensores...")
-                        progress_bar.progress(71)
-                        criar_sheet_ofensores_abs(df_mest_marcado, w, mapa_datas, MAPA_CORES, afastamentos, df_colab_para_ranking)
-                        
-                        # ===== CRIAR SHEET DE RANKING DE ABS =====
-                        status_text.info("🏆 Gerando ranking de absenteísmo...")
-                        progress_bar.progress(72)
-                        
-                        criar_sheet_ranking_abs(df_mest_marcado, w, MAPA_CORES)
-                        
-                        # ===== CRIAR SHEET DE OFENSORES POR SETOR =====
-                        if df_colab_para_ranking is not None:
-                             status_text.info("🏢 Gerando ofensores por setor...")
-                             progress_bar.progress(72)
-                             criar_sheet_ofensores_por_setor(df_mest_marcado, w, df_colab_para_ranking, mapa_datas)
-
-                        # ===== CRIAR SHEET DE OFENSORES SEMANAIS =====
-                        status_text.info("📅 Gerando ofensores semanais...")
-                        progress_bar.progress(73)
-                        
-                        criar_sheet_ofensores_semanais(df_mest_marcado, w, mapa_datas, df_colab_para_ranking)
-
-                        # ===== FALTANTES DESATIVADO =====
-                        # Não gera mais esta planilha por regra de negócio.
-                        if 'Faltantes' in w.book.sheetnames:
-                            del w.book['Faltantes']
-                        
-                        # ===== CRIAR SHEET OFENSORES POR TURNO =====
-                        status_text.info("🏭 Gerando ofensores por turno...")
-                        progress_bar.progress(74)
-                        criar_sheet_ofensores_por_turno(df_mest_marcado, w, mapa_datas)
-
-                        # ===== ENRIQUECER RANKING COM DADOS DO CSV =====
-                        status_text.info("📊 Enriquecendo ranking com dados do CSV...")
-                        progress_bar.progress(75)
-                        
-                        if df_colab_para_ranking is not None:
-                            try:
-                                # Re-gera ranking completo para enriquecimento
-                                colunas_datas = [col for col in df_mest_marcado.columns if col not in ['NOME', 'FUNÇÃO', 'SITUAÇÃO', 'AREA', 'GESTOR', 'SUPERVISOR', 'NOME_LIMPO']]
-                                df_ranking_temp = pd.DataFrame({
-                                    'NOME': df_mest_marcado['NOME'],
-                                    'GESTOR': df_mest_marcado['GESTOR'],
-                                    'FUNÇÃO': df_mest_marcado['FUNÇÃO'],
-                                    'AREA': df_mest_marcado['AREA'],
-                                    'FI': df_mest_marcado[colunas_datas].apply(lambda row: (row == 'FI').sum(), axis=1),
-                                    'FA': df_mest_marcado[colunas_datas].apply(lambda row: (row == 'FA').sum(), axis=1),
-                                }).copy()
-                                df_ranking_temp = df_ranking_temp[df_ranking_temp['NOME'].notna() & (df_ranking_temp['NOME'] != '')]
-                                
-                                top10_fa_display = df_ranking_temp.sort_values(by='FA', ascending=False)
-                                top10_fi_display = df_ranking_temp.sort_values(by='FI', ascending=False)
-                                
-                                # Enriquece com dados do CSV
-                                top10_fa_display, top10_fi_display = enriquecer_ranking_com_dados_csv(top10_fa_display, top10_fi_display, df_colab_para_ranking)
-                                
-                                # Remove o sheet anterior (se existir)
-                                if 'Ranking ABS' in w.book.sheetnames:
-                                    del w.book['Ranking ABS']
-                                
-                                # Cria novo sheet com dados enriquecidos
-                                criar_sheet_ranking_abs(df_mest_marcado, w, MAPA_CORES, top10_fa_display, top10_fi_display)
-                                
-                                status_text.info("✅ Ranking atualizado com sucesso!")
-                                progress_bar.progress(75)
-                            except Exception as e:
-                                st.warning(f"⚠️ Não foi possível enriquecer ranking com CSV: {str(e)}")
-                        
-                        # ===== COLORIR CÉLULAS INCOMUNS NA PLANILHA DADOS =====
-                        status_text.info("🎯 Marcando presença incomum...")
-                        progress_bar.progress(75)
-                        colorir_celulas_incomuns_dados(w, MAPA_CORES, mapa_datas)
+                    # Verifica se é domingo ou feriado
+                    eh_domingo = dias_calendario[data_obj]['DOMINGO']
+                    eh_feriado = dias_calendario[data_obj]['FERIADO']
+                    
+                    cell_total_data = ws_porcentagens.cell(row=row_pct, column=col_idx)
+                    col_letter = get_column_letter(col_idx)
+                    
+                    # Se é domingo ou feriado, escreve o texto com background preto
+                    if eh_feriado:
+                        cell_total_data.value = "FERIADO"
+                        cell_total_data.fill = PatternFill(start_color='FF000000', end_color='FF000000', fill_type='solid')
+                        cell_total_data.font = Font(bold=True, color='FFFFFFFF')
+                    elif eh_domingo:
+                        cell_total_data.value = "DOMINGO"
+                        cell_total_data.fill = PatternFill(start_color='FF000000', end_color='FF000000', fill_type='solid')
+                        cell_total_data.font = Font(bold=True, color='FFFFFFFF')
                     else:
-                        status_text.info("⚡ Modo Rápido ativo — pulando sheets extras...")
-                        progress_bar.progress(75)
-                    
-                    # ===== REMOVER BORDAS E MUDAR BACKGROUND PARA BRANCO =====
-                    status_text.info("🎨 Finalizando formatação...")
-                    progress_bar.progress(80)
-                    
-                    from openpyxl.styles import Border, Side
-                    
-                    # Define borda vazia
-                    no_border = Border(
-                        left=Side(style=None),
-                        right=Side(style=None),
-                        top=Side(style=None),
-                        bottom=Side(style=None)
-                    )
-                    white_fill = PatternFill(start_color='FFFFFFFF', end_color='FFFFFFFF', fill_type='solid')
-                    
-                    # Aplica a todas as abas
-                    for ws_name in w.book.sheetnames:
-                        worksheet = w.book[ws_name]
-                        for row in worksheet.iter_rows():
-                            for cell in row:
-                                cell.border = no_border
-                                # Só muda background se não tiver cor específica atribuída (mantém cores de header e dados)
-                                if cell.fill.start_color.index == '00000000' or cell.fill.start_color.index == 'FFFFFFFF' or cell.fill.start_color.index == '0':
-                                    cell.fill = white_fill
+                        # Soma FI e FA (linhas armazenadas em row_fi e row_fa)
+                        cell_total_data.value = f'={col_letter}{row_fi}+{col_letter}{row_fa}'
+                        valores_dia = valores_pct['DATAS'].get(data_obj, {})
+                        valores_sem_formulas.registrar(cell_total_data, valores_dia.get('FI', 0) + valores_dia.get('FA', 0))
+                        cell_total_data.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
+                        cell_total_data.font = Font(bold=True)
+                    
+                    cell_total_data.alignment = Alignment(horizontal='center', vertical='center')
+                
+                # MÉDIA para TOTAL
+                cell_media_tot = ws_porcentagens.cell(row=row_pct, column=col_media_idx)
+                cell_media_tot.value = f'=AVERAGE({col_inicio_letra}{row_pct}:{col_fim_letra}{row_pct})'
+                cell_media_tot.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
+                cell_media_tot.font = Font(bold=True)
+                cell_media_tot.alignment = Alignment(horizontal='center', vertical='center')
+                cell_media_tot.number_format = '0.00'
+                
+                row_total_faltas = row_pct
+                row_pct += 1
+                
+                # Linha de %Acumulado - TOTAL / HC Total
+                cell_acum_label = ws_porcentagens.cell(row=row_pct, column=1, value='%Acumulado')
+                cell_acum_label.fill = PatternFill(start_color='FF0D4F45', end_color='FF0D4F45', fill_type='solid')
+                cell_acum_label.font = Font(bold=True, color='FFFFFFFF')
+                
+                # Célula vazia em B
+                cell_acum_hc = ws_porcentagens.cell(row=row_pct, column=2)
+                cell_acum_hc.fill = PatternFill(start_color='FF0D4F45', end_color='FF0D4F45', fill_type='solid')
+                
+                # Soma acumulada de faltas / HC do dia respectivo * 100
+                # Cores condicionais: Verde <3%, Amarelo 3-3.5%, Vermelho >3.5%
+                row_acumulado = row_pct
+                for dia in range(1, dias_no_mes + 1):
+                    col_idx = dia + 1
+                    data_obj = datetime.date(ano_dados, mes_dados, dia)
                     
-                    out.seek(0)
-                
-                # Gera nome do arquivo no padrão solicitado
-                meses_nomes = {
-                    1: 'Janeiro', 2: 'Fevereiro', 3: 'Março', 4: 'Abril', 5: 'Maio', 6: 'Junho',
-                    7: 'Julho', 8: 'Agosto', 9: 'Setembro', 10: 'Outubro', 11: 'Novembro', 12: 'Dezembro'
+                    # Verifica se é domingo ou feriado
+                    eh_domingo = dias_calendario[data_obj]['DOMINGO']
+                    eh_feriado = dias_calendario[data_obj]['FERIADO']
+                    
+                    cell_acum_data = ws_porcentagens.cell(row=row_pct, column=col_idx)
+                    col_letter = get_column_letter(col_idx)
+                    
+                    # Se é domingo ou feriado, escreve o texto com background preto
+                    if eh_feriado:
+                        cell_acum_data.value = "FERIADO"
+                        cell_acum_data.fill = PatternFill(start_color='FF000000', end_color='FF000000', fill_type='solid')
+                        cell_acum_data.font = Font(bold=True, color='FFFFFFFF')
+                    elif eh_domingo:
+                        cell_acum_data.value = "DOMINGO"
+                        cell_acum_data.fill = PatternFill(start_color='FF000000', end_color='FF000000', fill_type='solid')
+                        cell_acum_data.font = Font(bold=True, color='FFFFFFFF')
+                    else:
+                        # Referencia: célula do TOTAL (row_total_faltas) / HC da data respectiva (mesmo col_letter em row_total_hc) * 100
+                        cell_acum_data.value = f'=IFERROR(({col_letter}{row_total_faltas}/{col_letter}{row_total_hc})*100,0)'
+                        valores_dia = valores_pct['DATAS'].get(data_obj)
+                        hc_dia = hc_total_pct - valores_dia['DESLIGADO'] if valores_dia else 0
+                        faltas_dia = valores_dia['FI'] + valores_dia['FA'] if valores_dia else 0
+                        valores_sem_formulas.registrar(cell_acum_data, faltas_dia / hc_dia * 100 if hc_dia else 0)
+                        cell_acum_data.number_format = '0.00"%"'
+                        cell_acum_data.fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
+                        cell_acum_data.font = Font(bold=True)
+                    
+                    cell_acum_data.alignment = Alignment(horizontal='center', vertical='center')
+                
+                # MÉDIA para %Acumulado
+                cell_media_acum = ws_porcentagens.cell(row=row_pct, column=col_media_idx)
+                cell_media_acum.value = f'=AVERAGE({col_inicio_letra}{row_pct}:{col_fim_letra}{row_pct})'
+                cell_media_acum.fill = PatternFill(start_color='FF0D4F45', end_color='FF0D4F45', fill_type='solid')
+                cell_media_acum.font = Font(bold=True, color='FFFFFFFF')
+                cell_media_acum.alignment = Alignment(horizontal='center', vertical='center')
+                cell_media_acum.number_format = '0.00"%"'
+                
+                # Adiciona regras condicionais para %Acumulado
+                from openpyxl.formatting.rule import CellIsRule
+                # Verde: < 3% (VERDE FORTE)
+                green_fill = PatternFill(start_color='FF00B050', end_color='FF00B050', fill_type='solid')
+                green_font = Font(bold=True, color='FFFFFFFF')
+                green_rule = CellIsRule(operator='lessThan', formula=['3'], fill=green_fill, font=green_font)
+                
+                # Vermelho: >= 3% (VERMELHO FORTE)
+                red_fill = PatternFill(start_color='FFFF0000', end_color='FFFF0000', fill_type='solid')
+                red_font = Font(bold=True, color='FFFFFFFF')
+                red_rule = CellIsRule(operator='greaterThanOrEqual', formula=['3'], fill=red_fill, font=red_font)
+                
+                # Aplica as regras ao intervalo de %Acumulado
+                acum_range = f'{get_column_letter(2)}{row_acumulado}:{get_column_letter(len(sorted(mapa_datas.keys()))+1)}{row_acumulado}'
+                ws_porcentagens.conditional_formatting.add(acum_range, green_rule)
+                ws_porcentagens.conditional_formatting.add(acum_range, red_rule)
+                
+                # Ajusta largura das colunas
+                ws_porcentagens.column_dimensions['A'].width = 25
+                ws_porcentagens.column_dimensions['B'].width = 15
+                for col_idx in range(2, len(sorted(mapa_datas.keys())) + 2):
+                    ws_porcentagens.column_dimensions[get_column_letter(col_idx)].width = 12
+                inicio_etapa = registrar_tempo_etapa(tempos_etapas, 'Porcentagens ABS', inicio_etapa)
+                
+                # ===== RELATÓRIOS SELECIONADOS (MODO RÁPIDO: NENHUM) =====
+                relatorios_selecionados = [] if st.session_state.modo_rapido else [
+                    nome for nome in RELATORIOS if nome in st.session_state.relatorios_selecionados
+                ]
+                dependencias = dependencias_dos_relatorios(relatorios_selecionados)
+                
+                # ===== DADOS DO CSV DE COLABORADORES (só se algum relatório usa; já lidos na base de ativos) =====
+                df_colab_para_ranking = None
+                if 'colaboradores' in dependencias and file_colaboradores is not None:
+                    if base_ativos is not None:
+                        df_colab_para_ranking = base_ativos.df
+                    else:
+                        st.warning(f"⚠️ Não foi possível carregar CSV de colaboradores: {erro_base_ativos}")
+                
+                # ===== TABELA DE FATOS (contagens por colaborador, lidas por todos os relatórios) =====
+                fatos_abs = None
+                if relatorios_selecionados:
+                    status_text.info("🧮 Contando marcações por colaborador...")
+                    fatos_abs = TabelaFatosAbs(matriz_presenca, afastamentos)
+                    inicio_etapa = registrar_tempo_etapa(tempos_etapas, 'Tabela de fatos', inicio_etapa)
+                
+                contexto_relatorios = {
+                    'df_mest': df_mest_marcado,
+                    'w': w,
+                    'mapa_datas': mapa_datas,
+                    'afastamentos': afastamentos,
+                    'calendario': calendario,
+                    'df_colaboradores': df_colab_para_ranking,
+                    'base_ativos': base_ativos if df_colab_para_ranking is not None else None,
+                    'fatos': fatos_abs,
                 }
-                mes_nome = meses_nomes.get(mes, 'Mês')
-                nome_arquivo = f"{mes:02d}- Controle de Absenteismo - {mes_nome}.xlsx"
-                
-                # Cria versão SEM FÓRMULAS (valores apenas - mais leve)
-                from openpyxl.utils import get_column_letter
-                out_sem_formulas = io.BytesIO()
-                
-                # Carrega o workbook com fórmulas
-                wb_com_formulas = load_workbook(out)
-                
-                # Cria um novo workbook para a versão sem fórmulas
-                wb_sem_formulas = Workbook()
-                wb_sem_formulas.remove(wb_sem_formulas.active)  # Remove sheet padrão
-                
-                # Copia todas as abas convertendo fórmulas em valores
-                for sheet_origin in wb_com_formulas.sheetnames:
-                    ws_origin = wb_com_formulas[sheet_origin]
-                    ws_new = wb_sem_formulas.create_sheet(sheet_origin)
-                    
-                    # Copia as dimensões
-                    for row in ws_origin.iter_rows():
-                        for cell in row:
-                            new_cell = ws_new[cell.coordinate]
-                            
-                            # Copia valor (não fórmula)
-                            if cell.value is not None:
-                                # Se é fórmula, tenta calcular; senão copia o valor
-                                if isinstance(cell.value, str) and cell.value.startswith('='):
-                                    # Deixa em branco ou copia a fórmula como texto (não executa)
-                                    new_cell.value = cell.value
-                                else:
-                                    new_cell.value = cell.value
-                            
-                            # Copia formatação
-                            if cell.has_style:
-                                new_cell.font = copy(cell.font)
-                                new_cell.border = copy(cell.border)
-                                new_cell.fill = copy(cell.fill)
-                                new_cell.number_format = copy(cell.number_format)
-                                new_cell.protection = copy(cell.protection)
-                                new_cell.alignment = copy(cell.alignment)
-                    
-                    # Copia largura das colunas
-                    for col_letter, col_dimension in ws_origin.column_dimensions.items():
-                        ws_new.column_dimensions[col_letter].width = col_dimension.width
-                    
-                    # Copia altura das linhas
-                    for row_num, row_dimension in ws_origin.row_dimensions.items():
-                        ws_new.row_dimensions[row_num].height = row_dimension.height
-                
-                # Salva workbook sem fórmulas
-                wb_sem_formulas.save(out_sem_formulas)
-                out_sem_formulas.seek(0)
-                
-                # Finaliza barra de progresso
-                status_text.success("✅ Processamento concluído com sucesso!")
-                progress_bar.progress(100)
-                
-                st.divider()
-                
-                # Dois botões de download lado a lado
-                col_download1, col_download2 = st.columns(2)
-                
-                with col_download1:
-                    st.download_button(
-                        "📊 COM Fórmulas (Mais Pesado)",
-                        out.getvalue(),
-                        f"COM_FORMULAS_{nome_arquivo}",
-                        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                        key="download_com_formulas"
-                    )
-                
-                with col_download2:
-                    st.download_button(
-                        "📋 SEM Fórmulas (Mais Leve)",
-                        out_sem_formulas.getvalue(),
-                        f"SEM_FORMULAS_{nome_arquivo}",
-                        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                        key="download_sem_formulas"
-                    )
-            except Exception as e:
-                st.error(f"❌ Erro durante o processamento: {str(e)}")
+                for idx_relatorio, nome_relatorio in enumerate(relatorios_selecionados):
+                    status_text.info(RELATORIOS[nome_relatorio]['mensagem'])
+                    progress_bar.progress(71 + (4 * idx_relatorio) // len(relatorios_selecionados))
+                    RELATORIOS[nome_relatorio]['gerar'](contexto_relatorios)
+                    inicio_etapa = registrar_tempo_etapa(tempos_etapas, nome_relatorio, inicio_etapa)
+                
+                if st.session_state.modo_rapido:
+                    status_text.info("⚡ Modo Rápido ativo — pulando sheets extras...")
+                    progress_bar.progress(75)
+                elif not st.session_state.cores_condicionais:
+                    # ===== COLORIR CÉLULAS INCOMUNS NA PLANILHA DADOS =====
+                    # (no modo de formatação condicional, a regra de incomuns já está na aba Dados)
+                    status_text.info("🎯 Marcando presença incomum...")
+                    progress_bar.progress(75)
+                    colorir_celulas_incomuns_dados(w, MAPA_CORES, mapa_datas)
+                inicio_etapa = registrar_tempo_etapa(tempos_etapas, 'Presença incomum (Dados)', inicio_etapa)
+                
+                out.seek(0)
+            inicio_etapa = registrar_tempo_etapa(tempos_etapas, 'Gravação do arquivo (COM fórmulas)', inicio_etapa)
+            
+            # Gera nome do arquivo no padrão solicitado
+            meses_nomes = {
+                1: 'Janeiro', 2: 'Fevereiro', 3: 'Março', 4: 'Abril', 5: 'Maio', 6: 'Junho',
+                7: 'Julho', 8: 'Agosto', 9: 'Setembro', 10: 'Outubro', 11: 'Novembro', 12: 'Dezembro'
+            }
+            mes_nome = meses_nomes.get(mes_planilha, 'Mês')
+            nome_arquivo = f"{mes_planilha:02d}- Controle de Absenteismo - {mes_nome}.xlsx"
+            
+            # Cria versão SEM FÓRMULAS (valores apenas - mais leve): o mesmo workbook em memória
+            # recebe os valores calculados no pandas no lugar das fórmulas e é salvo de novo
+            out_sem_formulas = io.BytesIO()
+            valores_sem_formulas.gravar(w.book, out_sem_formulas)
+            out_sem_formulas.seek(0)
+            inicio_etapa = registrar_tempo_etapa(tempos_etapas, 'Versão SEM fórmulas', inicio_etapa)
+            
+            # Finaliza barra de progresso
+            status_text.success("✅ Processamento concluído com sucesso!")
+            progress_bar.progress(100)
+            
+            with st.expander(f"⏱️ Tempo por etapa ({sum(t for _, t in tempos_etapas):.1f}s)"):
+                st.dataframe(
+                    pd.DataFrame(tempos_etapas, columns=['Etapa', 'Segundos']).round({'Segundos': 2}),
+                    hide_index=True, width='stretch'
+                )
+            
+            st.divider()
+            
+            # Dois botões de download lado a lado
+            col_download1, col_download2 = st.columns(2)
+            
+            with col_download1:
+                st.download_button(
+                    "📊 COM Fórmulas (Mais Pesado)",
+                    out.getvalue(),
+                    f"COM_FORMULAS_{nome_arquivo}",
+                    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    key="download_com_formulas"
+                )
+            
+            with col_download2:
+                st.download_button(
+                    "📋 SEM Fórmulas (Mais Leve)",
+                    out_sem_formulas.getvalue(),
+                    f"SEM_FORMULAS_{nome_arquivo}",
+                    "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                    key="download_sem_formulas"
+                )
+        except Exception as e:
+            st.error(f"❌ Erro ao gerar a planilha: {str(e)}")
 
 # ===== INSERÇÃO MANUAL DE NÃO ENCONTRADOS NA MESTRA =====
 if st.session_state.nao_encontrados_processamento:
@@ -1,15 +1,8 @@
-import pandas as pd
+from funcoes_leitura_csv import ler_csv_detectando, descrever_dialeto
 
-# Tenta ler com diferentes codificações
-encodings = ['utf-8', 'latin-1', 'iso-8859-1', 'cp1252']
-
-for enc in encodings:
-    try:
-        df = pd.read_csv('exemplo_colaboradores.csv', encoding=enc)
-        print(f"Sucesso com encoding: {enc}")
-        # Salva em UTF-8
-        df.to_csv('exemplo_colaboradores.csv', encoding='utf-8', index=False)
-        print("Arquivo convertido para UTF-8!")
-        break
-    except Exception as e:
-        print(f"Falhou com {enc}: {str(e)[:50]}")
+# Detecta encoding, separador e cabeçalho e lê o arquivo uma única vez
+df, dialeto = ler_csv_detectando('exemplo_colaboradores.csv')
+print(f"Lido com: {descrever_dialeto(dialeto)}")
+# Salva em UTF-8
+df.to_csv('exemplo_colaboradores.csv', encoding='utf-8', index=False)
+print("Arquivo convertido para UTF-8!")
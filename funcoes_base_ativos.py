@@ -0,0 +1,221 @@
+"""
+Módulo da base de ativos (CSV/XLSX de colaboradores)
+Lê o arquivo uma única vez por conteúdo (hash do upload), resolve uma vez as
+colunas usadas pelo app (colaborador, cargo, situação, CC, gestor, unidade,
+jornada, admissão, sexo, matrícula) e monta índices por nome limpo, matrícula e
+gestor. Inserções pendentes, atualização de Situação e Ranking ABS consultam a
+mesma base em vez de reler o arquivo e varrer as linhas.
+"""
+
+import io
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+from unidecode import unidecode
+
+from funcoes_lancamento import limpar_nome
+from funcoes_leitura_arquivos import hash_conteudo
+from funcoes_leitura_csv import bytes_do_arquivo, descrever_dialeto, ler_csv_detectando
+from funcoes_processamento_csv import determinar_turno
+
+
+# Campo -> (nomes de coluna aceitos, já normalizados; posição no layout padrão da base de ativos)
+COLUNAS_BASE_ATIVOS = {
+    'colaborador': (['COLABORADOR'], 3),           # D
+    'situacao': (['DESCRICAOSITUACAO', 'SITUACAO'], 8),  # I
+    'admissao': (['DATAADMISSAO'], 12),             # M
+    'cargo': (['CARGO'], 19),                       # T
+    'unidade': (['DESCRICAODAUNIDADEORGANIZACIONAL', 'UNIDADEORGANIZACIONAL'], 21),  # V
+    'gestor': (['NOMEGESTOR', 'GESTOR'], 25),       # Z
+    'cc': (['DESCRICAOCC', 'DESCRICAOCENTRODECUSTO'], 29),  # AD
+    'jornada': (['JORNADA'], 42),                   # AQ
+    'sexo': (['SEXO'], 50),                         # AY
+    'matricula': (['MATRICULA', 'CHAPA'], None),
+}
+
+# Colunas da mestra preenchidas a partir da base de ativos -> campo da base
+CAMPOS_MESTRA = {
+    'FUNCAO': 'cargo',
+    'SITUACAO': 'situacao',
+    'AREA': 'cc',
+    'SUPERVISOR': 'gestor',
+    'SETOR': 'unidade',
+    'HORARIO': 'jornada',
+}
+
+MIN_COLUNAS_BASE_ATIVOS = 4
+MAX_BASES_CACHE = 8
+
+_cache_bases = OrderedDict()   # {(hash, excel): BaseAtivos} em ordem de uso (LRU)
+_cache_lock = threading.Lock()
+
+
+def _normalizar_coluna(nome_coluna) -> str:
+    return re.sub(r'[^A-Z0-9]', '', unidecode(str(nome_coluna)).upper())
+
+
+def _chave_matricula(valor) -> str:
+    """Matrícula como texto ('123' para 123, 123.0 ou ' 123 ')."""
+    if pd.isna(valor):
+        return ''
+    texto = str(valor).strip()
+    return texto[:-2] if re.fullmatch(r'\d+\.0', texto) else texto
+
+
+def _indice(chaves: pd.Series) -> Dict[str, List[int]]:
+    """{chave: posições das linhas, em ordem} ignorando chaves vazias."""
+    indice: Dict[str, List[int]] = {}
+    for pos, chave in enumerate(chaves.tolist()):
+        if chave:
+            indice.setdefault(chave, []).append(pos)
+    return indice
+
+
+class BaseAtivos:
+    """
+    Base de ativos lida uma vez, com colunas resolvidas e índices de busca.
+
+    Cada campo de COLUNAS_BASE_ATIVOS é procurado pelo nome da coluna e, se não
+    houver, pela posição do layout padrão. O DataFrame é compartilhado entre
+    reruns (cache por hash), então quem consulta não deve modificá-lo.
+
+    Args:
+        df: DataFrame da base de ativos (uma linha por colaborador)
+        dialeto: Dialeto do CSV detectado na leitura (None para Excel)
+    """
+
+    def __init__(self, df: pd.DataFrame, dialeto: Optional[Dict] = None):
+        self.df = df.reset_index(drop=True)
+        self.dialeto = dialeto
+        colunas_norm = {}
+        for col in self.df.columns:
+            colunas_norm.setdefault(_normalizar_coluna(col), col)
+
+        self.colunas: Dict[str, Optional[str]] = {}
+        for campo, (aliases, posicao) in COLUNAS_BASE_ATIVOS.items():
+            coluna = next((colunas_norm[a] for a in aliases if a in colunas_norm), None)
+            if coluna is None and posicao is not None and posicao < len(self.df.columns):
+                coluna = self.df.columns[posicao]
+            self.colunas[campo] = coluna
+
+        self.nomes_limpos = self.textos('colaborador').map(limpar_nome)
+        self.por_nome = _indice(self.nomes_limpos)
+        self.por_matricula = _indice(self._valores('matricula').map(_chave_matricula))
+        self.por_gestor = _indice(self.textos('gestor').map(limpar_nome))
+        self._tabela_mestra: Optional[pd.DataFrame] = None
+
+    def __len__(self) -> int:
+        return len(self.df)
+
+    def coluna(self, campo: str) -> Optional[str]:
+        """Nome da coluna resolvida para o campo (None se a base não tem)."""
+        return self.colunas.get(campo)
+
+    def _valores(self, campo: str) -> pd.Series:
+        coluna = self.coluna(campo)
+        if coluna is None:
+            return pd.Series([None] * len(self.df), dtype=object)
+        return self.df[coluna]
+
+    def textos(self, campo: str) -> pd.Series:
+        """Valores do campo como texto sem espaços nas pontas ('' para vazio)."""
+        valores = self._valores(campo)
+        return valores.where(valores.notna(), '').astype(str).str.strip()
+
+    def posicao_nome(self, nome) -> Optional[int]:
+        """Primeira linha com o nome limpo igual ao informado (None se não houver)."""
+        posicoes = self.por_nome.get(limpar_nome(nome))
+        return posicoes[0] if posicoes else None
+
+    def posicao_matricula(self, matricula) -> Optional[int]:
+        """Primeira linha com a matrícula informada (None se não houver)."""
+        posicoes = self.por_matricula.get(_chave_matricula(matricula))
+        return posicoes[0] if posicoes else None
+
+    def posicoes_gestor(self, gestor) -> List[int]:
+        """Linhas dos colaboradores do gestor (nome limpo)."""
+        return list(self.por_gestor.get(limpar_nome(gestor), []))
+
+    def mapa_por_nome(self, campo: str) -> Dict[str, str]:
+        """
+        {nome limpo: texto do campo}; com nomes repetidos vale a última linha.
+        Vazio se a base não tem a coluna de colaborador ou do campo.
+        """
+        if self.coluna('colaborador') is None or self.coluna(campo) is None:
+            return {}
+        nomes = self.textos('colaborador')
+        preenchidos = nomes != ''
+        return dict(zip(self.nomes_limpos[preenchidos], self.textos(campo)[preenchidos]))
+
+    def tabela_mestra(self) -> pd.DataFrame:
+        """
+        Dados de cada linha da base nas colunas da mestra (FUNCAO, SITUACAO, AREA,
+        SUPERVISOR, SETOR, HORARIO e TURNO calculado pela jornada), '' quando a
+        base não tem o campo. Calculada uma vez.
+        """
+        if self._tabela_mestra is None:
+            tabela = pd.DataFrame(index=self.df.index)
+            for chave, campo in CAMPOS_MESTRA.items():
+                tabela[chave] = self.textos(campo) if self.coluna(campo) is not None else ''
+            if self.coluna('jornada') is not None:
+                jornadas = tabela['HORARIO']
+                turnos = {jornada: determinar_turno(jornada) for jornada in jornadas.unique()}
+                tabela['TURNO'] = jornadas.map(turnos)
+            else:
+                tabela['TURNO'] = ''
+            self._tabela_mestra = tabela
+        return self._tabela_mestra
+
+    def dados_colaborador(self, nome) -> Dict[str, str]:
+        """Dados da mestra (tabela_mestra) da primeira linha com o nome; {} se não houver."""
+        if self.coluna('colaborador') is None:
+            return {}
+        pos = self.posicao_nome(nome)
+        if pos is None:
+            return {}
+        return self.tabela_mestra().iloc[pos].to_dict()
+
+
+def ler_base_ativos(conteudo: bytes, excel: bool) -> BaseAtivos:
+    """Lê a base de ativos dos bytes do upload (Excel com cabeçalho na 1ª linha ou CSV detectado)."""
+    if excel:
+        return BaseAtivos(pd.read_excel(io.BytesIO(conteudo)))
+    df, dialeto = ler_csv_detectando(conteudo, on_bad_lines='skip')
+    return BaseAtivos(df, dialeto)
+
+
+def carregar_base_ativos(arquivo) -> Tuple[Optional[BaseAtivos], Optional[str]]:
+    """
+    Base de ativos do upload, lida uma única vez por conteúdo (hash) e
+    compartilhada entre as etapas e reruns.
+
+    Returns:
+        Tupla (base, erro); base é None quando o arquivo não pôde ser lido ou
+        tem menos de MIN_COLUNAS_BASE_ATIVOS colunas
+    """
+    if arquivo is None:
+        return None, None
+    try:
+        conteudo = bytes_do_arquivo(arquivo)
+        excel = str(getattr(arquivo, 'name', '')).lower().endswith(('.xlsx', '.xlsm'))
+        chave = (hash_conteudo(conteudo), excel)
+        with _cache_lock:
+            base = _cache_bases.get(chave)
+            if base is not None:
+                _cache_bases.move_to_end(chave)
+        if base is None:
+            base = ler_base_ativos(conteudo, excel)
+            with _cache_lock:
+                _cache_bases[chave] = base
+                while len(_cache_bases) > MAX_BASES_CACHE:
+                    _cache_bases.popitem(last=False)
+    except Exception as e:
+        return None, str(e)
+
+    if len(base.df.columns) < MIN_COLUNAS_BASE_ATIVOS:
+        detalhe = f" ({descrever_dialeto(base.dialeto)})" if base.dialeto else ''
+        return None, f"Base de ativos com {len(base.df.columns)} coluna(s){detalhe}."
+    return base, None
@@ -0,0 +1,275 @@
+"""
+Módulo de calendário do período processado
+Monta UMA VEZ a tabela de dias (dia da semana, semana do mês, feriados, dia útil)
+usada por todas as etapas que dependem de datas
+"""
+
+import calendar
+import datetime
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# Feriados nacionais de data fixa: (mês, dia, nome)
+FERIADOS_NACIONAIS_FIXOS = [
+    (1, 1, 'Confraternização mundial'),
+    (4, 21, 'Tiradentes'),
+    (5, 1, 'Dia do trabalho'),
+    (9, 7, 'Independência do Brasil'),
+    (10, 12, 'Nossa Senhora Aparecida'),
+    (11, 2, 'Finados'),
+    (11, 15, 'Proclamação da República'),
+    (12, 25, 'Natal'),
+]
+
+# Feriados estaduais (RJ) e municipais (Rio de Janeiro): (mês, dia, nome)
+# Ajuste esta lista conforme a unidade.
+FERIADOS_REGIONAIS_RJ = [
+    (1, 20, 'São Sebastião'),
+    (4, 23, 'São Jorge'),
+]
+
+_cache_feriados = {}               # {(ano, regionais, api): {data: nome}}
+_cache_feriados_api = {}           # {ano: {data: nome}} (só consultas com sucesso)
+_feriados_lock = threading.Lock()
+
+COLUNAS_CALENDARIO = [
+    'DATA', 'COLUNA', 'NA_MESTRA', 'DIA_SEMANA', 'DOMINGO', 'FIM_DE_SEMANA',
+    'SEMANA_MES', 'POSICAO_SEMANA', 'FERIADO', 'NOME_FERIADO', 'DIA_UTIL'
+]
+
+
+def calcular_pascoa(ano: int) -> datetime.date:
+    """Data do domingo de Páscoa (algoritmo de Meeus/Jones/Butcher, calendário gregoriano)."""
+    a = ano % 19
+    b, c = divmod(ano, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    l = (32 + 2 * e + 2 * i - h - k) % 7
+    m = (a + 11 * h + 22 * l) // 451
+    mes, dia = divmod(h + l - 7 * m + 114, 31)
+    return datetime.date(ano, mes, dia + 1)
+
+
+def calcular_feriados(ano: int, feriados_regionais: Iterable[Tuple[int, int, str]] = ()) -> Dict[datetime.date, str]:
+    """
+    Calcula localmente (sem internet) os feriados do ano.
+
+    Inclui os nacionais de data fixa, o Dia da Consciência Negra (nacional a partir
+    de 2024), os móveis derivados da Páscoa (Carnaval, Sexta-feira Santa, Páscoa e
+    Corpus Christi) e os feriados regionais informados.
+
+    Args:
+        ano: Ano desejado
+        feriados_regionais: Lista de (mês, dia, nome) dos feriados estaduais/municipais
+
+    Returns:
+        Dicionário {data: nome_feriado}
+    """
+    feriados = {datetime.date(ano, mes, dia): nome for mes, dia, nome in FERIADOS_NACIONAIS_FIXOS}
+    if ano >= 2024:
+        feriados[datetime.date(ano, 11, 20)] = 'Dia da consciência negra'
+
+    pascoa = calcular_pascoa(ano)
+    feriados[pascoa - datetime.timedelta(days=47)] = 'Carnaval'
+    feriados[pascoa - datetime.timedelta(days=2)] = 'Sexta-feira Santa'
+    feriados[pascoa] = 'Páscoa'
+    feriados[pascoa + datetime.timedelta(days=60)] = 'Corpus Christi'
+
+    for mes, dia, nome in feriados_regionais:
+        feriados.setdefault(datetime.date(ano, mes, dia), nome)
+    return dict(sorted(feriados.items()))
+
+
+def buscar_feriados_api(ano: int, timeout: float = 5) -> Tuple[Dict[datetime.date, str], Optional[str]]:
+    """
+    Busca os feriados nacionais do ano na Brasil API (fonte opcional de atualização).
+
+    Returns:
+        Tupla (feriados, erro); feriados é vazio e erro descreve a falha quando a
+        API não responde
+    """
+    feriados = {}
+    try:
+        import requests
+        url = f"https://brasilapi.com.br/api/feriados/v1/{ano}"
+        response = requests.get(url, timeout=timeout)
+        if response.status_code != 200:
+            return {}, f"HTTP {response.status_code}"
+        for feriado in response.json():
+            try:
+                data = datetime.datetime.strptime(feriado['date'], '%Y-%m-%d').date()
+                feriados[data] = feriado.get('name', 'Feriado')
+            except Exception:
+                pass
+    except Exception as e:
+        return {}, str(e)
+    return feriados, None
+
+
+def feriados_do_ano(ano: int, feriados_regionais: Iterable[Tuple[int, int, str]] = FERIADOS_REGIONAIS_RJ,
+                    consultar_api: bool = False) -> Tuple[Dict[datetime.date, str], Optional[str]]:
+    """
+    Feriados do ano, calculados localmente e memorizados por ano.
+
+    Com consultar_api=True, a Brasil API é consultada uma única vez por ano (por
+    processo) e o que ela trouxer é somado ao cálculo local; se a API falhar, o
+    cálculo local é usado sozinho e a API é consultada de novo na próxima chamada.
+
+    Returns:
+        Tupla (feriados, erro): {data: nome_feriado} (cópia) e a falha da API
+        (None se ela não foi consultada ou respondeu)
+    """
+    regionais = tuple(tuple(f) for f in feriados_regionais)
+    chave = (ano, regionais, consultar_api)
+    with _feriados_lock:
+        if chave in _cache_feriados:
+            return dict(_cache_feriados[chave]), None
+
+    feriados = calcular_feriados(ano, regionais)
+    if consultar_api:
+        with _feriados_lock:
+            feriados_api = _cache_feriados_api.get(ano)
+        erro_api = None
+        if feriados_api is None:
+            feriados_api, erro_api = buscar_feriados_api(ano)
+            if feriados_api:
+                with _feriados_lock:
+                    _cache_feriados_api[ano] = feriados_api
+        feriados.update(feriados_api or {})
+        feriados = dict(sorted(feriados.items()))
+        if not feriados_api:
+            # API falhou: devolve o cálculo local sem memorizar, para consultar de novo depois
+            return dict(feriados), erro_api
+
+    with _feriados_lock:
+        _cache_feriados[chave] = feriados
+    return dict(feriados), None
+
+
+def montar_calendario(mapa_datas: Dict, feriados: Optional[Dict] = None,
+                      ano_padrao: Optional[int] = None, mes_padrao: Optional[int] = None) -> pd.DataFrame:
+    """
+    Monta a tabela de calendário do período processado.
+
+    Cobre todos os dias dos meses que aparecem em mapa_datas (ou do mês padrão,
+    se mapa_datas estiver vazio). A semana do mês segue o calendar.monthcalendar
+    do mês da primeira data (semanas de segunda a domingo), localizando cada data
+    pelo número do dia, como nos relatórios semanais.
+
+    Args:
+        mapa_datas: Mapa data -> nome da coluna na mestra
+        feriados: Dicionário {data: nome do feriado}
+        ano_padrao: Ano usado quando mapa_datas está vazio
+        mes_padrao: Mês usado quando mapa_datas está vazio
+
+    Returns:
+        DataFrame (uma linha por dia, em ordem) com as colunas:
+        DATA, COLUNA (None se a data não está na mestra), NA_MESTRA, DIA_SEMANA (0=segunda),
+        DOMINGO, FIM_DE_SEMANA, SEMANA_MES (1..6, 0 = fora do mês de referência),
+        POSICAO_SEMANA (0..6 dentro da semana do mês), FERIADO, NOME_FERIADO e DIA_UTIL
+    """
+    feriados = feriados or {}
+    datas_mestra = sorted(d for d in mapa_datas.keys() if isinstance(d, datetime.date))
+
+    if datas_mestra:
+        meses = sorted({(d.year, d.month) for d in datas_mestra})
+        ano_ref, mes_ref = datas_mestra[0].year, datas_mestra[0].month
+    elif ano_padrao and mes_padrao:
+        meses = [(ano_padrao, mes_padrao)]
+        ano_ref, mes_ref = ano_padrao, mes_padrao
+    else:
+        return pd.DataFrame(columns=COLUNAS_CALENDARIO)
+
+    datas = [
+        datetime.date(a, m, dia)
+        for a, m in meses
+        for dia in range(1, calendar.monthrange(a, m)[1] + 1)
+    ]
+
+    # Número do dia -> (semana, posição) no calendário do mês de referência
+    semana_por_dia = {}
+    for num_semana, semana_dias in enumerate(calendar.monthcalendar(ano_ref, mes_ref), start=1):
+        for posicao, dia in enumerate(semana_dias):
+            if dia != 0:
+                semana_por_dia[dia] = (num_semana, posicao)
+
+    dia_semana = np.array([d.weekday() for d in datas], dtype=np.int8)
+    feriado = np.array([d in feriados for d in datas], dtype=bool)
+    fim_de_semana = dia_semana >= 5
+
+    cal = pd.DataFrame({
+        'DATA': datas,
+        'COLUNA': pd.Series([mapa_datas.get(d) for d in datas], dtype=object),
+        'NA_MESTRA': [d in mapa_datas for d in datas],
+        'DIA_SEMANA': dia_semana,
+        'DOMINGO': dia_semana == 6,
+        'FIM_DE_SEMANA': fim_de_semana,
+        'SEMANA_MES': np.array([semana_por_dia.get(d.day, (0, 0))[0] for d in datas], dtype=np.int8),
+        'POSICAO_SEMANA': np.array([semana_por_dia.get(d.day, (0, 0))[1] for d in datas], dtype=np.int8),
+        'FERIADO': feriado,
+        'NOME_FERIADO': pd.Series([feriados.get(d, '') for d in datas], dtype=object),
+        'DIA_UTIL': ~fim_de_semana & ~feriado,
+    })
+    return cal
+
+
+def indexar_calendario(calendario: pd.DataFrame) -> Dict[datetime.date, Dict]:
+    """Retorna {data: linha do calendário (dict)} para consultas dia a dia."""
+    return calendario.set_index('DATA', drop=False).to_dict('index')
+
+
+def feriados_do_calendario(calendario: pd.DataFrame) -> Dict[datetime.date, str]:
+    """Retorna {data: nome do feriado} dos dias de feriado do calendário."""
+    dias = calendario[calendario['FERIADO']]
+    return dict(zip(dias['DATA'], dias['NOME_FERIADO']))
+
+
+def semanas_do_periodo(calendario: pd.DataFrame, ate_sabado: bool = False) -> List[List[datetime.date]]:
+    """
+    Agrupa as datas presentes na mestra pelas semanas do mês de referência.
+
+    Args:
+        calendario: Tabela de montar_calendario
+        ate_sabado: True para considerar apenas segunda a sábado
+
+    Returns:
+        Lista (na ordem das semanas) com as datas ordenadas de cada semana;
+        semanas sem nenhuma data da mestra não aparecem
+    """
+    dias = calendario[calendario['NA_MESTRA'] & (calendario['SEMANA_MES'] > 0)]
+    if ate_sabado:
+        dias = dias[dias['POSICAO_SEMANA'] <= 5]
+    return [sorted(grupo['DATA']) for _, grupo in dias.groupby('SEMANA_MES', sort=True)]
+
+
+def preencher_fins_de_semana(df: pd.DataFrame, calendario: pd.DataFrame, marcacao: str = 'D') -> int:
+    """
+    Preenche com a marcação (padrão 'D' - Descanso) as células VAZIAS dos sábados e domingos.
+
+    Vazio = NaN/None ou texto '', 'nan', 'none', '<na>', 'nat' (sem diferenciar maiúsculas).
+    As colunas de fim de semana passam a ser do tipo object. Modifica df.
+
+    Returns:
+        Quantidade de células preenchidas
+    """
+    colunas = [
+        c for c in calendario.loc[calendario['FIM_DE_SEMANA'] & calendario['NA_MESTRA'], 'COLUNA']
+        if c in df.columns
+    ]
+    preenchidas = 0
+    for col in colunas:
+        valores = df[col].astype(object)
+        texto = valores.astype(str).str.strip().str.lower()
+        vazio = (valores.isna() | texto.isin(['', 'nan', 'none', '<na>', 'nat'])).to_numpy()
+        if vazio.any():
+            valores = valores.where(~vazio, marcacao)
+            preenchidas += int(vazio.sum())
+        df[col] = pd.Series(valores.to_numpy(dtype=object), index=df.index, dtype=object)
+    return preenchidas
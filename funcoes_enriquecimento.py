@@ -0,0 +1,151 @@
+"""
+Módulo do enriquecimento do Ranking ABS com o CSV de colaboradores
+Normaliza os nomes do CSV uma vez e monta um dicionário de nomes exatos e
+blocos de trigramas. Cada nome distinto do ranking é comparado (SequenceMatcher)
+só com os candidatos do seu bloco que ainda podem superar o melhor resultado, e
+o resultado fica em cache para as listas de FA e FI. Data de admissão e tempo de serviço
+são calculados de forma vetorizada para as linhas do CSV.
+"""
+
+import datetime
+from collections import Counter
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from dateutil.relativedelta import relativedelta
+
+
+SEM_DADO = 'Não consta'
+
+
+def normalizar_nome_ranking(nome) -> str:
+    """Nome como comparado no enriquecimento: texto, sem espaços nas pontas, maiúsculo."""
+    return str(nome).strip().upper()
+
+
+def _trigramas(texto: str) -> set:
+    texto = f' {texto} '
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+
+class IndiceFuzzyNomes:
+    """
+    Busca de nomes do CSV: correspondência exata primeiro; sem ela, o nome mais
+    parecido (SequenceMatcher) com similaridade >= limiar. Em empate, vale a
+    primeira linha do CSV.
+
+    Os candidatos da busca aproximada são os nomes que compartilham algum
+    trigrama com o nome procurado (blocos por trigrama). Eles são comparados na
+    ordem do limite superior da similaridade (caracteres em comum, o quick_ratio
+    do difflib, calculado de uma vez para o bloco), e a busca para quando nenhum
+    candidato restante pode superar o melhor já encontrado.
+
+    Args:
+        nomes: Coluna de nomes do CSV (a posição na série é a posição da linha)
+        limiar: Similaridade mínima para aceitar a busca aproximada
+    """
+
+    def __init__(self, nomes: pd.Series, limiar: float = 0.75):
+        self.limiar = limiar
+        self._nomes: List[str] = [normalizar_nome_ranking(n) for n in nomes.tolist()]
+        self._exato: Dict[str, int] = {}
+        self._blocos: Dict[str, List[int]] = {}
+        for pos, nome in enumerate(self._nomes):
+            self._exato.setdefault(nome, pos)
+            for trigrama in _trigramas(nome):
+                self._blocos.setdefault(trigrama, []).append(pos)
+
+        # Contagem de cada caractere por nome (linhas x alfabeto) para o limite superior
+        self._alfabeto = {c: i for i, c in enumerate(sorted({c for nome in self._nomes for c in nome}))}
+        self._contagens = np.zeros((len(self._nomes), len(self._alfabeto)), dtype=np.int32)
+        for pos, nome in enumerate(self._nomes):
+            for c, qtd in Counter(nome).items():
+                self._contagens[pos, self._alfabeto[c]] = qtd
+        self._tamanhos = np.array([len(nome) for nome in self._nomes], dtype=np.int64)
+        self._cache: Dict[str, Optional[int]] = {}
+
+    def _candidatos(self, nome: str):
+        """Posições do bloco do nome e o limite superior da similaridade de cada uma."""
+        bloco = set()
+        for trigrama in _trigramas(nome):
+            bloco.update(self._blocos.get(trigrama, ()))
+        posicoes = np.fromiter(sorted(bloco), dtype=np.int64, count=len(bloco))
+        consulta = np.zeros(len(self._alfabeto), dtype=np.int32)
+        for c, qtd in Counter(nome).items():
+            if c in self._alfabeto:
+                consulta[self._alfabeto[c]] = qtd
+        em_comum = np.minimum(self._contagens[posicoes], consulta).sum(axis=1)
+        total = self._tamanhos[posicoes] + len(nome)
+        limites = np.divide(2.0 * em_comum, total, out=np.ones(len(posicoes)), where=total > 0)
+        return posicoes, limites
+
+    def buscar(self, nome) -> Optional[int]:
+        """Posição da linha do CSV correspondente ao nome (None se não houver)."""
+        nome = normalizar_nome_ranking(nome)
+        if nome not in self._cache:
+            pos = self._exato.get(nome)
+            if pos is None:
+                melhor_score = 0
+                posicoes, limites = self._candidatos(nome)
+                ordem = np.lexsort((posicoes, -limites))
+                for candidato, limite in zip(posicoes[ordem].tolist(), limites[ordem].tolist()):
+                    if limite < max(melhor_score, self.limiar):
+                        break
+                    score = SequenceMatcher(None, nome, self._nomes[candidato]).ratio()
+                    if score > melhor_score or (score == melhor_score and pos is not None and candidato < pos):
+                        melhor_score = score
+                        pos = candidato
+                if melhor_score < self.limiar:
+                    pos = None
+            self._cache[nome] = pos
+        return self._cache[nome]
+
+
+def datas_admissao(valores: pd.Series) -> pd.Series:
+    """
+    Datas de admissão como datetime (NaT quando não dá para ler). Texto aceita
+    dd/mm/aaaa ou aaaa-mm-dd; outros valores (datas do Excel) são convertidos direto.
+    """
+    valores = valores.reset_index(drop=True)
+    eh_texto = valores.map(lambda v: isinstance(v, str))
+    datas = pd.Series(pd.NaT, index=valores.index, dtype='datetime64[ns]')
+    if eh_texto.any():
+        textos = valores[eh_texto]
+        datas[eh_texto] = pd.to_datetime(textos, format='%d/%m/%Y', errors='coerce').fillna(
+            pd.to_datetime(textos, format='%Y-%m-%d', errors='coerce')
+        )
+    if (~eh_texto).any():
+        datas[~eh_texto] = pd.to_datetime(valores[~eh_texto], errors='coerce')
+    return datas
+
+
+def tempo_de_servico(valores: pd.Series, hoje: Optional[datetime.datetime] = None) -> pd.Series:
+    """
+    Tempo desde a admissão no formato "Xa Ym" (anos e meses completos, como
+    relativedelta), "N/A" para datas inválidas e SEM_DADO para vazio.
+    """
+    hoje = pd.Timestamp(hoje or datetime.datetime.now())
+    datas = datas_admissao(valores)
+    resultado = pd.Series('N/A', index=datas.index, dtype=object)
+    resultado[valores.reset_index(drop=True).isna().to_numpy()] = SEM_DADO
+
+    passadas = datas.notna() & (datas <= hoje)
+    if passadas.any():
+        d = datas[passadas]
+        meses = (hoje.year - d.dt.year) * 12 + (hoje.month - d.dt.month)
+        # d + meses cai no mês de hoje (dia limitado ao fim do mês); se passar de hoje, o mês não fechou
+        dia_alvo = np.minimum(d.dt.day, hoje.days_in_month)
+        hora_d = d - d.dt.normalize()
+        hora_hoje = hoje - hoje.normalize()
+        nao_fechou = (dia_alvo > hoje.day) | ((dia_alvo == hoje.day) & (hora_d > hora_hoje))
+        meses = meses - nao_fechou.astype(int)
+        resultado[passadas] = (meses // 12).astype(str) + 'a ' + (meses % 12).astype(str) + 'm'
+
+    # Admissão no futuro (raro): mesmo texto do relativedelta, valor a valor
+    futuras = datas.notna() & (datas > hoje)
+    for pos in np.flatnonzero(futuras.to_numpy()):
+        diff = relativedelta(hoje.to_pydatetime(), datas.iloc[pos].to_pydatetime())
+        resultado.iloc[pos] = f"{diff.years}a {diff.months}m"
+    return resultado
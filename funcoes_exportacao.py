@@ -0,0 +1,518 @@
+"""
+Módulo de gravação da planilha de saída
+Define a política de estilo das abas (bordas e fundo decididos na criação),
+declara os estilos das marcações UMA VEZ por workbook (NamedStyles compartilhados)
+e grava a aba Dados em bloco a partir da matriz de presença.
+Também calcula no pandas os valores das células com fórmula, usados na
+versão SEM fórmulas da planilha
+"""
+
+import datetime
+import re
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from openpyxl.cell import Cell
+from openpyxl.formatting.rule import CellIsRule, FormulaRule
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.utils import column_index_from_string, get_column_letter
+
+
+# Política de estilo da saída: células sem bordas e fundo branco onde não há cor.
+# O fundo branco vem das linhas de grade ocultas em cada aba (uma vez por aba),
+# sem precisar pintar as células sem cor. O cabeçalho da aba Dados mantém a borda
+# fina que o cabeçalho do to_excel tinha.
+BORDA_CELULAS = Border()
+_LADO_FINO = Side(style='thin')
+BORDA_CABECALHO = Border(left=_LADO_FINO, right=_LADO_FINO, top=_LADO_FINO, bottom=_LADO_FINO)
+OCULTAR_LINHAS_DE_GRADE = True
+
+COR_CABECALHO = 'FF0D4F45'
+COR_COLUNA_INFO = 'FFF0F0F0'
+COLUNAS_INFO = ('NOME', 'AREA', 'GESTOR')
+FORMATO_DATA = 'DD/MM'
+
+# Marcação -> (chave da cor em MAPA_CORES, texto branco)
+ESTILOS_MARCACOES = {
+    'P': ('P', False),
+    'FI': ('FI', True),
+    'FA': ('FA', False),
+    'FÉRIAS-BH': ('FÉRIAS-BH', True),
+    'DESLIGADO': ('DESLIGADO', True),
+    'D': ('DESCANSO', False),
+    'FERIADO': ('FERIADO', True),
+}
+
+# Marcações que a pintura de "incomuns" não altera (demais valores ficam cinza claro)
+CODIGOS_COMUNS = ('P', 'FI', 'FA', 'FÉRIAS-BH', 'DESLIGADO', 'FERIADO', 'DOMINGO')
+COR_INCOMUM = 'FFF0F0F0'
+
+ESTILO_CABECALHO = 'Dados Cabeçalho'
+ESTILO_COLUNA_INFO = 'Dados Info'
+ESTILO_DATA = 'Dados Data'
+ESTILO_AFASTAMENTO = 'Dados Afastamento'
+ESTILO_AFASTAMENTO_FERIADO = 'Dados Afastamento FERIADO'
+
+# Taxonomia de áreas da aba Porcentagens ABS: grupo -> termos procurados (SEARCH, sem
+# diferenciar maiúsculas) na AREA, como (termo, termo que exclui a linha). Cada grupo vira
+# uma linha de HC e um par de linhas contagem/% na aba. Nas fórmulas SUMPRODUCT cada termo
+# encontrado soma 1; na coluna auxiliar (fórmulas leves) a linha fica no primeiro grupo.
+TERMOS_GRUPOS_PORCENTAGENS = {
+    'M&A': (
+        ('PROJETO INTERPRISE - MOVIMENTACAO E ARMAZENAGEM', None),
+        ('MOVIMENTACAO E ARMAZENAGEM', 'PROJETO INTERPRISE'),
+        ('BLOQ', None),
+        ('CD-RJ | FOB', None),
+        ('M&A | LOCAFARMA CD-RJ', None),
+    ),
+    'CRDK / D&E': (
+        ('CRDK D&E LCFA | CD-RJ', None),
+        ('CRDK D&E|CD-RJ HB', None),
+        ('CRDK FOB LCFA | CD-RJ', None),
+        ('D&E LCFA | CD-RJ', None),
+        ('CRDK LCFA | CD-RJ', None),
+    ),
+}
+
+# Coluna auxiliar da aba Dados com o grupo de cada colaborador (modo de fórmulas leves)
+COLUNA_GRUPO_AREA = 'GRUPO ÁREA'
+
+_FORMULA_MEDIA = re.compile(r'^=AVERAGE\(([A-Z]+)(\d+):([A-Z]+)(\d+)\)$')
+
+
+def _nome_estilo_marcacao(marcacao: str) -> str:
+    return f'Dados {marcacao}'
+
+
+def _preenchimento(cor: str) -> PatternFill:
+    return PatternFill(start_color=cor, end_color=cor, fill_type='solid')
+
+
+def criar_aba(book, titulo: str, indice: Optional[int] = None):
+    """Cria uma aba no workbook já com a política de estilo da saída aplicada."""
+    ws = book.create_sheet(titulo, indice)
+    if OCULTAR_LINHAS_DE_GRADE:
+        ws.sheet_view.showGridLines = False
+    return ws
+
+
+def registrar_estilos_dados(book, mapa_cores: Dict[str, str]) -> Dict[str, str]:
+    """
+    Declara (uma vez por workbook) os NamedStyles da aba Dados.
+
+    Returns:
+        Mapa marcação -> nome do estilo das células de data
+    """
+    existentes = set(book.named_styles)
+
+    def registrar(nome, **atributos):
+        if nome not in existentes:
+            book.add_named_style(NamedStyle(name=nome, **atributos))
+            existentes.add(nome)
+
+    registrar(
+        ESTILO_CABECALHO,
+        fill=_preenchimento(COR_CABECALHO),
+        font=Font(bold=True, color='FFFFFFFF', size=11),
+        alignment=Alignment(horizontal='center', vertical='center', wrap_text=True),
+        border=BORDA_CABECALHO,
+    )
+    registrar(ESTILO_COLUNA_INFO, fill=_preenchimento(COR_COLUNA_INFO))
+    registrar(ESTILO_DATA, number_format=FORMATO_DATA)
+
+    estilos = {}
+    for marcacao, (chave_cor, texto_branco) in ESTILOS_MARCACOES.items():
+        nome = _nome_estilo_marcacao(marcacao)
+        atributos = {'fill': _preenchimento(mapa_cores[chave_cor]), 'number_format': FORMATO_DATA}
+        if texto_branco:
+            atributos['font'] = Font(color='FFFFFFFF')
+        registrar(nome, **atributos)
+        estilos[marcacao] = nome
+
+    registrar(ESTILO_AFASTAMENTO, fill=_preenchimento(mapa_cores['Afastamento']), number_format=FORMATO_DATA)
+    registrar(
+        ESTILO_AFASTAMENTO_FERIADO,
+        fill=_preenchimento(mapa_cores['Afastamento']),
+        font=Font(color='FFFFFFFF'),
+        number_format=FORMATO_DATA,
+    )
+    return estilos
+
+
+def _valor_celula(valor):
+    """Valor gravável na célula (vazios do pandas viram célula vazia)."""
+    if valor is None:
+        return None
+    try:
+        if pd.isna(valor):
+            return None
+    except (TypeError, ValueError):
+        pass
+    return valor
+
+
+def _largura_coluna(df: pd.DataFrame, col_name, min_width: int = 10, max_width: int = 50) -> int:
+    """Largura baseada no maior valor da coluna (mesma regra da aba Dados)."""
+    if col_name not in df.columns:
+        return min_width
+    max_len = df[col_name].astype(str).str.len().max()
+    header_len = len(str(col_name))
+    largest = max(max_len, header_len) if pd.notna(max_len) else header_len
+    return min(max(largest + 2, min_width), max_width)
+
+
+def _texto_cabecalho(col_name):
+    """Cabeçalho gravado: colunas de data datetime viram 'dd/mm'."""
+    if isinstance(col_name, (datetime.datetime, datetime.date)):
+        return col_name.strftime('%d/%m')
+    return col_name
+
+
+def _intervalos_colunas(indices: List[int], ultima_linha: int) -> List[str]:
+    """Intervalos 'E2:AI300' dos blocos contíguos de colunas (índices 1-based)."""
+    intervalos = []
+    inicio = anterior = None
+    for col_idx in sorted(indices) + [None]:
+        if col_idx is not None and anterior is not None and col_idx == anterior + 1:
+            anterior = col_idx
+            continue
+        if inicio is not None:
+            intervalos.append(f'{get_column_letter(inicio)}2:{get_column_letter(anterior)}{ultima_linha}')
+        inicio = anterior = col_idx
+    return intervalos
+
+
+def aplicar_cores_condicionais_dados(ws, indices_datas: List[int], qtd_linhas: int,
+                                     mapa_cores: Dict[str, str], marcar_incomuns: bool = False) -> int:
+    """
+    Pinta as colunas de data com UMA regra de formatação condicional por marcação,
+    em vez de estilo célula a célula. As cores continuam certas se as marcações
+    forem editadas depois no Excel.
+
+    Com marcar_incomuns=True, valores fora de CODIGOS_COMUNS (inclusive D e
+    Afastamento) ficam cinza claro com texto preto, como em colorir_celulas_incomuns_dados.
+
+    Returns:
+        Quantidade de regras criadas
+    """
+    intervalos = _intervalos_colunas(indices_datas, qtd_linhas + 1)
+    if not intervalos or qtd_linhas <= 0:
+        return 0
+    alvo = ' '.join(intervalos)
+    ancora = intervalos[0].split(':')[0]
+
+    regras = []
+    for marcacao in ('P', 'FI', 'FA', 'FÉRIAS-BH', 'DESLIGADO', 'FERIADO'):
+        chave_cor, texto_branco = ESTILOS_MARCACOES[marcacao]
+        regras.append(CellIsRule(
+            operator='equal', formula=[f'"{marcacao}"'], stopIfTrue=True,
+            fill=_preenchimento(mapa_cores[chave_cor]),
+            font=Font(color='FFFFFFFF') if texto_branco else None,
+        ))
+
+    if marcar_incomuns:
+        condicoes = [f'TRIM({ancora})<>""'] + [f'TRIM({ancora})<>"{c}"' for c in CODIGOS_COMUNS]
+        regras.append(FormulaRule(
+            formula=[f'AND({",".join(condicoes)})'], stopIfTrue=True,
+            fill=_preenchimento(COR_INCOMUM), font=Font(color='FF000000', bold=False),
+        ))
+
+    for marcacao, chave_cor in (('D', 'DESCANSO'), ('Afastamento', 'Afastamento')):
+        regras.append(CellIsRule(
+            operator='equal', formula=[f'"{marcacao}"'], stopIfTrue=True,
+            fill=_preenchimento(mapa_cores[chave_cor]),
+        ))
+
+    for regra in regras:
+        ws.conditional_formatting.add(alvo, regra)
+    return len(regras)
+
+
+def renderizar_aba_dados(book, df: pd.DataFrame, matriz, mapa_cores: Dict[str, str],
+                         nome_aba: str = 'Dados', indice: Optional[int] = 0,
+                         cores_condicionais: bool = False, marcar_incomuns: bool = False):
+    """
+    Grava a aba Dados a partir do DataFrame final e da matriz de presença.
+
+    Cada linha é gravada de uma vez (append) e cada célula recebe um dos
+    estilos declarados em registrar_estilos_dados, sem criar PatternFill/Font
+    por célula. O resultado visual é o mesmo da formatação célula a célula.
+
+    Args:
+        book: Workbook openpyxl de destino
+        df: DataFrame final (matriz_presenca.para_dataframe())
+        matriz: MatrizPresenca com as marcações e a máscara de afastamento
+        mapa_cores: Dicionário de cores das marcações
+        nome_aba: Nome da aba
+        indice: Posição da aba no workbook
+        cores_condicionais: Células de data levam só o valor (sem estilo); as cores vêm de
+            aplicar_cores_condicionais_dados (um FERIADO dentro de afastamento
+            fica com a cor de FERIADO)
+        marcar_incomuns: Repassado a aplicar_cores_condicionais_dados
+
+    Returns:
+        Worksheet gravada
+    """
+    estilos_marcacoes = registrar_estilos_dados(book, mapa_cores)
+    ws = criar_aba(book, nome_aba, indice)
+
+    colunas = list(df.columns)
+    posicao_data = {c: j for j, c in enumerate(matriz.colunas_datas)}
+
+    # Estilo fixo por coluna (None = célula sem estilo); colunas de data usam a marcação
+    estilo_fixo: List[Optional[str]] = []
+    for col_name in colunas:
+        if col_name in posicao_data:
+            estilo_fixo.append(None if cores_condicionais else ESTILO_DATA)
+        elif col_name in COLUNAS_INFO:
+            estilo_fixo.append(ESTILO_COLUNA_INFO)
+        else:
+            estilo_fixo.append(None)
+
+    cabecalho = []
+    for col_name in colunas:
+        cell = Cell(ws, value=_texto_cabecalho(col_name))
+        cell.style = ESTILO_CABECALHO
+        cabecalho.append(cell)
+    ws.append(cabecalho)
+
+    afastado = matriz.afastado
+    for i, linha in enumerate(df.to_numpy(dtype=object)):
+        celulas = []
+        for col_idx, valor in enumerate(linha):
+            valor = _valor_celula(valor)
+            cell = Cell(ws, value=valor)
+            estilo = estilo_fixo[col_idx]
+            if estilo == ESTILO_DATA:
+                texto = str(valor).strip() if valor else ''
+                if afastado[i, posicao_data[colunas[col_idx]]]:
+                    estilo = ESTILO_AFASTAMENTO_FERIADO if texto == 'FERIADO' else ESTILO_AFASTAMENTO
+                else:
+                    estilo = estilos_marcacoes.get(texto, ESTILO_DATA)
+            if estilo is not None:
+                cell.style = estilo
+            celulas.append(cell)
+        ws.append(celulas)
+
+    if cores_condicionais:
+        indices_datas = [col_idx for col_idx, col_name in enumerate(colunas, 1) if col_name in posicao_data]
+        aplicar_cores_condicionais_dados(ws, indices_datas, len(df), mapa_cores, marcar_incomuns)
+
+    # Larguras
+    for col_idx, col_name in enumerate(colunas, 1):
+        letra = get_column_letter(col_idx)
+        if col_name in ('NOME', 'GESTOR'):
+            ws.column_dimensions[letra].width = _largura_coluna(df, col_name, min_width=15, max_width=40)
+        elif col_name == 'AREA':
+            ws.column_dimensions[letra].width = 25
+        else:
+            try:
+                datetime.datetime.strptime(str(col_name), '%d/%m')
+                ws.column_dimensions[letra].width = 7
+            except ValueError:
+                ws.column_dimensions[letra].width = 10
+
+    return ws
+
+
+def _texto_excel(serie: pd.Series) -> pd.Series:
+    """Texto maiúsculo das células, como o Excel compara em SEARCH/COUNTIF (vazio = '')."""
+    return serie.where(serie.notna(), '').astype(str).str.upper()
+
+
+def _pesos_termos_area(areas: pd.Series, termos) -> np.ndarray:
+    """Quantidade de termos do grupo encontrados na AREA de cada linha (regra das fórmulas SUMPRODUCT)."""
+    peso = np.zeros(len(areas), dtype=np.int64)
+    for termo, exceto in termos:
+        encontrado = areas.str.contains(termo, regex=False).to_numpy(dtype=bool)
+        if exceto:
+            encontrado = encontrado & ~areas.str.contains(exceto, regex=False).to_numpy(dtype=bool)
+        peso += encontrado
+    return peso
+
+
+def classificar_grupos_area(areas: pd.Series, termos_grupos: Optional[Dict] = None) -> pd.Series:
+    """
+    Grupo da aba Porcentagens ABS de cada linha (coluna auxiliar da aba Dados).
+    A linha fica no primeiro grupo com algum termo encontrado na AREA; sem termo, ''.
+    """
+    termos_grupos = TERMOS_GRUPOS_PORCENTAGENS if termos_grupos is None else termos_grupos
+    textos = _texto_excel(areas)
+    grupos = np.full(len(textos), '', dtype=object)
+    for grupo, termos in reversed(list(termos_grupos.items())):
+        grupos[_pesos_termos_area(textos, termos) > 0] = grupo
+    return pd.Series(grupos, index=areas.index, dtype=object)
+
+
+def calcular_porcentagens_abs(df: pd.DataFrame, mapa_datas: Dict, col_area: str = 'AREA',
+                              termos_grupos: Optional[Dict] = None,
+                              grupos: Optional[pd.Series] = None) -> Dict:
+    """
+    Calcula no pandas os valores das fórmulas da aba Porcentagens ABS.
+
+    Args:
+        df: DataFrame final gravado na aba Dados
+        mapa_datas: Mapa data -> nome da coluna na mestra
+        col_area: Coluna com a área do colaborador
+        termos_grupos: Taxonomia de áreas (padrão: TERMOS_GRUPOS_PORCENTAGENS)
+        grupos: Coluna auxiliar de classificar_grupos_area (modo de fórmulas leves);
+            sem ela, cada termo encontrado soma 1, como nas fórmulas SUMPRODUCT
+
+    Returns:
+        {'HC': {grupo: HC}, 'DATAS': {data: {grupo: FI+FA do grupo, 'FI': n, 'FA': n, 'DESLIGADO': n}}}
+    """
+    termos_grupos = TERMOS_GRUPOS_PORCENTAGENS if termos_grupos is None else termos_grupos
+    if grupos is not None:
+        rotulos = grupos.to_numpy(dtype=object)
+        pesos = {grupo: (rotulos == grupo).astype(np.int64) for grupo in termos_grupos}
+    else:
+        areas = _texto_excel(df[col_area])
+        pesos = {grupo: _pesos_termos_area(areas, termos) for grupo, termos in termos_grupos.items()}
+
+    por_data = {}
+    for data_obj, coluna in mapa_datas.items():
+        if coluna not in df.columns:
+            continue
+        textos = _texto_excel(df[coluna]).to_numpy()
+        fi = textos == 'FI'
+        fa = textos == 'FA'
+        valores = {grupo: int(peso[fi | fa].sum()) for grupo, peso in pesos.items()}
+        valores.update(FI=int(fi.sum()), FA=int(fa.sum()), DESLIGADO=int((textos == 'DESLIGADO').sum()))
+        por_data[data_obj] = valores
+
+    return {'HC': {grupo: int(peso.sum()) for grupo, peso in pesos.items()}, 'DATAS': por_data}
+
+
+class FormulasPorcentagens:
+    """
+    Monta as fórmulas da aba Porcentagens ABS que leem a aba Dados.
+
+    Sem coluna auxiliar, usa SUMPRODUCT(ISNUMBER(SEARCH(...))) sobre as colunas
+    inteiras, com um SEARCH por termo da taxonomia. Com a coluna auxiliar de
+    grupo (classificar_grupos_area), usa COUNTIF/COUNTIFS em intervalos
+    limitados às linhas gravadas, bem mais leves de recalcular.
+
+    Args:
+        letra_area: Letra da coluna AREA na aba Dados
+        qtd_linhas: Quantidade de colaboradores gravados na aba Dados
+        letra_grupo: Letra da coluna auxiliar de grupo (None = fórmulas SUMPRODUCT)
+        termos_grupos: Taxonomia de áreas (padrão: TERMOS_GRUPOS_PORCENTAGENS)
+    """
+
+    def __init__(self, letra_area: str, qtd_linhas: int, letra_grupo: Optional[str] = None,
+                 termos_grupos: Optional[Dict] = None):
+        self.letra_area = letra_area
+        self.letra_grupo = letra_grupo
+        self.ultima_linha = max(qtd_linhas + 1, 2)
+        self.termos_grupos = TERMOS_GRUPOS_PORCENTAGENS if termos_grupos is None else termos_grupos
+
+    def _coluna(self, letra: str) -> str:
+        if self.letra_grupo:
+            return f'Dados!${letra}$2:${letra}${self.ultima_linha}'
+        return f'Dados!{letra}:${letra}'
+
+    def _buscas_termos(self, grupo: str) -> List[str]:
+        area = self._coluna(self.letra_area)
+        buscas = []
+        for termo, exceto in self.termos_grupos[grupo]:
+            busca = f'ISNUMBER(SEARCH("{termo}",{area}))'
+            if exceto:
+                busca += f'*NOT(ISNUMBER(SEARCH("{exceto}",{area})))'
+            buscas.append(busca)
+        return buscas
+
+    def hc(self, grupo: str) -> str:
+        """HC do grupo."""
+        if self.letra_grupo:
+            return f'=COUNTIF({self._coluna(self.letra_grupo)},"{grupo}")'
+        return '=' + '+'.join(f'SUMPRODUCT({busca}*1)' for busca in self._buscas_termos(grupo))
+
+    def faltas_grupo(self, grupo: str, letra_data: str) -> str:
+        """FI + FA do grupo na coluna de data."""
+        data = self._coluna(letra_data)
+        if self.letra_grupo:
+            grupo_ref = self._coluna(self.letra_grupo)
+            return (
+                f'=COUNTIFS({grupo_ref},"{grupo}",{data},"FI")'
+                f'+COUNTIFS({grupo_ref},"{grupo}",{data},"FA")'
+            )
+        return f'=SUMPRODUCT(({"+".join(self._buscas_termos(grupo))})*(({data}="FI")+({data}="FA")))'
+
+    def contagem(self, letra_data: str, marcacao: str) -> str:
+        """Quantidade de células com a marcação na coluna de data (sem o sinal de =)."""
+        return f'COUNTIF({self._coluna(letra_data)},"{marcacao}")'
+
+
+def _eh_formula(valor) -> bool:
+    return isinstance(valor, str) and valor.startswith('=')
+
+
+def _resolver_medias(ws) -> int:
+    """
+    Troca as fórmulas =AVERAGE(B9:AF9) da aba pela média dos números do intervalo
+    (texto e vazio são ignorados, como no Excel). Intervalos que ainda têm fórmulas
+    ficam como estão.
+    """
+    resolvidas = 0
+    for row in ws.iter_rows():
+        for cell in row:
+            if not _eh_formula(cell.value):
+                continue
+            encontrado = _FORMULA_MEDIA.match(cell.value.replace('$', ''))
+            if not encontrado:
+                continue
+            col_ini, lin_ini, col_fim, lin_fim = encontrado.groups()
+            valores = [
+                v for linha in ws.iter_rows(
+                    min_row=int(lin_ini), max_row=int(lin_fim),
+                    min_col=column_index_from_string(col_ini), max_col=column_index_from_string(col_fim),
+                    values_only=True
+                )
+                for v in linha
+            ]
+            if any(_eh_formula(v) for v in valores):
+                continue
+            numeros = [v for v in valores if isinstance(v, (int, float)) and not isinstance(v, bool)]
+            cell.value = sum(numeros) / len(numeros) if numeros else None
+            resolvidas += 1
+    return resolvidas
+
+
+class ValoresSemFormulas:
+    """
+    Valores calculados das células gravadas com fórmula.
+
+    Depois que a versão COM fórmulas é salva, o mesmo workbook em memória recebe
+    esses valores e é salvo de novo como versão SEM fórmulas, sem recarregar o
+    arquivo nem copiar célula a célula.
+    """
+
+    def __init__(self):
+        self._valores = {}
+
+    def __len__(self) -> int:
+        return len(self._valores)
+
+    def registrar(self, cell, valor):
+        """Guarda o valor da fórmula gravada em cell."""
+        self._valores[(cell.parent.title, cell.coordinate)] = valor
+
+    def gravar(self, book, destino, abas_sem_formulas=('Dados',)):
+        """
+        Troca as fórmulas do workbook pelos valores e salva em destino.
+        Células sobrescritas depois do registro (sem fórmula) não são alteradas.
+        As médias (=AVERAGE) das demais abas são calculadas a partir dos valores.
+        """
+        for (aba, coordenada), valor in self._valores.items():
+            if aba not in book.sheetnames:
+                continue
+            cell = book[aba][coordenada]
+            if _eh_formula(cell.value):
+                cell.value = valor
+
+        for ws in book.worksheets:
+            if ws.title not in abas_sem_formulas:
+                _resolver_medias(ws)
+
+        book.save(destino)
@@ -0,0 +1,183 @@
+"""
+Módulo da tabela de fatos dos relatórios de absenteísmo
+Conta as marcações da matriz de presença uma única vez (indicadores booleanos
+colaborador x dia para FI, FA e DESLIGADO) e guarda, por colaborador, os
+atributos usados pelos relatórios: gestor, turno, área, grupo de área e se
+tem afastamento. Ofensores, Ranking, Semanais, Setor e Turno leem as
+contagens por período daqui em vez de percorrer as células da mestra.
+"""
+
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+import pandas as pd
+
+from funcoes_exportacao import classificar_grupos_area
+from funcoes_genero import IndiceGenero, nome_limpo_genero, proporcao_genero
+from funcoes_matriz_presenca import MatrizPresenca
+
+
+MARCAS_FATOS = ('FI', 'FA', 'DESLIGADO')
+ATRIBUTOS_FATOS = ('NOME', 'FUNÇÃO', 'AREA', 'GESTOR', 'TURNO')
+
+
+class TabelaFatosAbs:
+    """
+    Contagens de marcações por colaborador e período, montadas a partir da matriz.
+
+    As linhas seguem a ordem da mestra (posições 0..n-1, as mesmas chaves de
+    afastamentos). FA de quem tem afastamento detectado pode ser excluída das
+    contagens, como no relatório de Ofensores.
+
+    Args:
+        matriz: MatrizPresenca já marcada (feriados, afastamentos, férias, ...)
+        afastamentos: {linha: [(inicio, fim), ...]} de detectar_afastamentos_no_dataframe
+    """
+
+    def __init__(self, matriz: MatrizPresenca, afastamentos: Optional[Dict] = None):
+        textos = matriz.textos()
+        self.colunas_datas = list(matriz.colunas_datas)
+        self.datas = matriz.datas
+        self.posicao_coluna = dict(matriz.posicao_coluna)
+        self.indicadores = {marca: textos == marca for marca in MARCAS_FATOS}
+
+        metadados = matriz.metadados
+        colaboradores = pd.DataFrame(index=pd.RangeIndex(len(matriz)))
+        for coluna in ATRIBUTOS_FATOS:
+            if coluna in metadados.columns:
+                colaboradores[coluna] = metadados[coluna].to_numpy()
+        areas = metadados['AREA'] if 'AREA' in metadados.columns else pd.Series([''] * len(matriz))
+        colaboradores['GRUPO_AREA'] = classificar_grupos_area(areas).to_numpy()
+        colaboradores['AFASTADO'] = np.isin(np.arange(len(matriz)), list(afastamentos or {}))
+        for marca, indicador in self.indicadores.items():
+            colaboradores[marca] = indicador.sum(axis=1)
+        self.colaboradores = colaboradores
+
+    @classmethod
+    def da_mestra(cls, df: pd.DataFrame, mapa_datas: Dict, afastamentos: Optional[Dict] = None) -> 'TabelaFatosAbs':
+        """Monta a tabela direto do DataFrame da mestra (quando a matriz não está à mão)."""
+        df = df.drop(columns=['NOME_LIMPO'], errors='ignore').reset_index(drop=True)
+        return cls(MatrizPresenca(df, mapa_datas), afastamentos)
+
+    def __len__(self) -> int:
+        return len(self.colaboradores)
+
+    def mascara_colunas(self, colunas: Optional[Iterable] = None) -> np.ndarray:
+        """Máscara das colunas de data pelos rótulos da mestra (rótulos que não são data são ignorados)."""
+        if colunas is None:
+            return np.ones(len(self.colunas_datas), dtype=bool)
+        mascara = np.zeros(len(self.colunas_datas), dtype=bool)
+        posicoes = [self.posicao_coluna[c] for c in colunas if c in self.posicao_coluna]
+        mascara[posicoes] = True
+        return mascara
+
+    def contagens(self, colunas: Optional[Iterable] = None, linhas=None, excluir_fa_afastados: bool = False) -> pd.DataFrame:
+        """
+        Quantidade de FI, FA e DESLIGADO de cada colaborador no período.
+
+        Args:
+            colunas: Rótulos das colunas de data do período (todas se None)
+            linhas: Posições ou máscara booleana dos colaboradores (todos se None)
+            excluir_fa_afastados: Zera FA de quem tem afastamento detectado
+
+        Returns:
+            DataFrame indexado pela posição da linha na mestra
+        """
+        mascara = self.mascara_colunas(colunas)
+        resultado = pd.DataFrame(
+            {marca: indicador[:, mascara].sum(axis=1) for marca, indicador in self.indicadores.items()},
+            index=self.colaboradores.index
+        )
+        if excluir_fa_afastados:
+            resultado.loc[self.colaboradores['AFASTADO'].to_numpy(), 'FA'] = 0
+        if linhas is not None:
+            resultado = resultado.iloc[np.flatnonzero(linhas) if np.asarray(linhas).dtype == bool else linhas]
+        return resultado
+
+    def fatos_por_periodo(self, periodos: Dict[str, Iterable], excluir_fa_afastados: bool = False) -> pd.DataFrame:
+        """
+        Tabela de fatos longa: uma linha por colaborador x período, com as contagens
+        e os atributos do colaborador. Todos os períodos saem de um único produto
+        matricial (indicadores colaborador x dia por pertinência dia x período).
+
+        Args:
+            periodos: {rótulo do período: rótulos das colunas de data}
+        """
+        rotulos = list(periodos)
+        if not rotulos:
+            return pd.DataFrame(columns=['LINHA', 'PERIODO', *MARCAS_FATOS])
+        pertinencia = np.column_stack([self.mascara_colunas(periodos[r]) for r in rotulos]).astype(np.int64)
+        n = len(self)
+        fatos = pd.DataFrame({
+            'LINHA': np.tile(np.arange(n), len(rotulos)),
+            'PERIODO': np.repeat(np.array(rotulos, dtype=object), n),
+        })
+        for marca, indicador in self.indicadores.items():
+            contagens = indicador.astype(np.int64) @ pertinencia
+            if marca == 'FA' and excluir_fa_afastados:
+                contagens[self.colaboradores['AFASTADO'].to_numpy()] = 0
+            fatos[marca] = contagens.T.ravel()
+        atributos = self.colaboradores.drop(columns=list(MARCAS_FATOS))
+        return fatos.join(atributos, on='LINHA')
+
+    def resumo_por_gestor(self, periodos: Dict[str, Iterable]) -> pd.DataFrame:
+        """
+        Totais do relatório de Ofensores por gestor e período, em um único groupby.
+
+        FI conta sempre; FA só de quem não tem afastamento detectado. Colaboradores
+        sem gestor ficam de fora.
+
+        Returns:
+            DataFrame indexado por (PERIODO, GESTOR) com TOTAL_COLAB, FI, FA e
+            COLAB_COM_FALTAS
+        """
+        colunas = ['TOTAL_COLAB', 'FI', 'FA', 'COLAB_COM_FALTAS']
+        if 'GESTOR' not in self.colaboradores.columns:
+            return pd.DataFrame(columns=colunas, index=pd.MultiIndex.from_arrays([[], []], names=['PERIODO', 'GESTOR']))
+        fatos = self.fatos_por_periodo(periodos, excluir_fa_afastados=True)
+        fatos['COM_FALTA'] = (fatos['FI'] + fatos['FA']) > 0
+        resumo = fatos.groupby(['PERIODO', 'GESTOR'], sort=False).agg(
+            TOTAL_COLAB=('LINHA', 'size'),
+            FI=('FI', 'sum'),
+            FA=('FA', 'sum'),
+            COLAB_COM_FALTAS=('COM_FALTA', 'sum'),
+        )
+        return resumo.astype(np.int64)[colunas]
+
+    def resumo_genero_por_gestor(self, periodos: Dict[str, Iterable], indice_genero: IndiceGenero) -> pd.Series:
+        """
+        Proporção de gênero dos colaboradores distintos com pelo menos 1 FI ou FA,
+        por gestor e período: gênero de cada nome pelo índice do CSV + groupby.
+
+        Returns:
+            Série indexada por (PERIODO, GESTOR) com o texto de proporcao_genero;
+            gestores sem ninguém com gênero conhecido ficam de fora ("N/A")
+        """
+        indice_vazio = pd.MultiIndex.from_arrays([[], []], names=['PERIODO', 'GESTOR'])
+        if not indice_genero.disponivel or not {'GESTOR', 'NOME'} <= set(self.colaboradores.columns):
+            return pd.Series(index=indice_vazio, dtype=object)
+        fatos = self.fatos_por_periodo(periodos)
+        fatos = fatos[(fatos['FI'] + fatos['FA']) > 0].copy()
+        fatos['NOME_GENERO'] = fatos['NOME'].map(nome_limpo_genero)
+        fatos['GENERO'] = indice_genero.generos(fatos['NOME_GENERO'])
+        fatos = fatos[fatos['GENERO'].notna() & fatos['GESTOR'].notna()]
+        fatos = fatos.drop_duplicates(subset=['PERIODO', 'GESTOR', 'NOME_GENERO'])
+        if fatos.empty:
+            return pd.Series(index=indice_vazio, dtype=object)
+        totais = pd.crosstab([fatos['PERIODO'], fatos['GESTOR']], fatos['GENERO'])
+        totais = totais.reindex(columns=['F', 'M'], fill_value=0)
+        return pd.Series(
+            [proporcao_genero(int(f), int(m)) for f, m in zip(totais['F'], totais['M'])],
+            index=totais.index, dtype=object
+        )
+
+    def por_dia(self, linhas=None) -> pd.DataFrame:
+        """Quantidade de FI, FA e DESLIGADO por coluna de data, somando os colaboradores de linhas."""
+        if linhas is None:
+            selecao = slice(None)
+        else:
+            selecao = np.flatnonzero(linhas) if np.asarray(linhas).dtype == bool else np.asarray(linhas, dtype=np.int64)
+        return pd.DataFrame(
+            {marca: indicador[selecao].sum(axis=0) for marca, indicador in self.indicadores.items()},
+            index=pd.Index(self.colunas_datas)
+        )
@@ -0,0 +1,130 @@
+"""
+Módulo do índice de gênero dos colaboradores
+Monta uma vez, a partir do CSV de colaboradores, o índice nome normalizado ->
+gênero usado nas proporções de gênero por gestor (Ofensores de ABS). A busca
+mantém a regra antiga (nome igual, ou um nome contido no outro; vale a primeira
+linha do CSV com sexo reconhecido), mas os candidatos da busca por contenção
+saem de um índice de tokens em vez de uma varredura do CSV inteiro.
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from unidecode import unidecode
+
+
+COLUNAS_NOME_GENERO = ['Nome', 'NOME', 'nome', 'Colaborador', 'COLABORADOR', 'Funcionário', 'FUNCIONÁRIO']
+COLUNAS_SEXO = ['Sexo', 'SEXO', 'sexo', 'Genero', 'GENERO', 'genero', 'Género', 'GÉNERO']
+VALORES_FEMININO = ('F', 'FEMININO', 'MULHER', 'FEMINO')
+VALORES_MASCULINO = ('M', 'MASCULINO', 'HOMEM', 'MASC')
+
+
+def nome_limpo_genero(nome) -> str:
+    """Nome da mestra normalizado para a busca de gênero ('' para vazio)."""
+    if pd.isna(nome):
+        return ''
+    nome = str(nome).strip()
+    return unidecode(nome).upper() if nome else ''
+
+
+def proporcao_genero(total_feminino: int, total_masculino: int) -> str:
+    """Texto da proporção ("Fem X% | Mas Y%", maior primeiro) ou "N/A" sem ninguém."""
+    total = total_feminino + total_masculino
+    if total == 0:
+        return "N/A"
+    pct_fem = total_feminino / total * 100
+    pct_masc = total_masculino / total * 100
+    if pct_fem >= pct_masc:
+        return f"Fem {pct_fem:.0f}% | Mas {pct_masc:.0f}%"
+    return f"Mas {pct_masc:.0f}% | Fem {pct_fem:.0f}%"
+
+
+class IndiceGenero:
+    """
+    Índice nome normalizado -> gênero ('F' ou 'M') do CSV de colaboradores.
+
+    Só entram as linhas com sexo reconhecido. Um nome da mestra casa com uma linha
+    do CSV se os nomes são iguais ou se um contém o outro; vale a primeira linha
+    do CSV que casar. Para a contenção, os candidatos vêm dos tokens do meio dos
+    nomes (um nome com 3+ tokens contido em outro tem os tokens do meio inteiros
+    no outro); nomes com até 2 tokens são conferidos diretamente. Os resultados
+    ficam em cache por nome.
+
+    Args:
+        df_colab_csv: DataFrame do CSV de colaboradores (colunas de nome e sexo)
+    """
+
+    def __init__(self, df_colab_csv: Optional[pd.DataFrame]):
+        self.col_nome = self.col_sexo = None
+        if df_colab_csv is not None and not df_colab_csv.empty:
+            self.col_nome = next((c for c in COLUNAS_NOME_GENERO if c in df_colab_csv.columns), None)
+            self.col_sexo = next((c for c in COLUNAS_SEXO if c in df_colab_csv.columns), None)
+        self.disponivel = self.col_nome is not None and self.col_sexo is not None
+        self._cache: Dict[str, Optional[str]] = {}
+        self._nomes: List[str] = []
+        self._generos: List[str] = []
+        self._exato: Dict[str, int] = {}
+        self._por_token: Dict[str, List[int]] = {}
+        self._por_token_meio: Dict[str, List[int]] = {}
+        self._curtos: List[int] = []
+        if not self.disponivel:
+            return
+
+        nomes = df_colab_csv[self.col_nome]
+        nomes = nomes.where(nomes.notna(), '').astype(str).str.strip().str.upper().map(unidecode).str.upper()
+        sexos = df_colab_csv[self.col_sexo]
+        sexos = sexos.where(sexos.notna(), '').astype(str).str.strip().str.upper()
+        generos = np.select([sexos.isin(VALORES_FEMININO), sexos.isin(VALORES_MASCULINO)], ['F', 'M'], '')
+
+        for nome, genero in zip(nomes.tolist(), generos.tolist()):
+            if not genero:
+                continue
+            pos = len(self._nomes)
+            self._nomes.append(nome)
+            self._generos.append(genero)
+            self._exato.setdefault(nome, pos)
+            tokens = nome.split()
+            for token in set(tokens):
+                self._por_token.setdefault(token, []).append(pos)
+            if len(tokens) >= 3:
+                for token in set(tokens[1:-1]):
+                    self._por_token_meio.setdefault(token, []).append(pos)
+            else:
+                self._curtos.append(pos)
+        self._serie_nomes = pd.Series(self._nomes, dtype=object)
+
+    def _primeira_ocorrencia(self, nome: str) -> Optional[int]:
+        """Posição da primeira linha do CSV que casa com nome (igual ou contenção)."""
+        achados = set()
+        if nome in self._exato:
+            achados.add(self._exato[nome])
+
+        # Nome da mestra contido no nome do CSV
+        tokens = nome.split()
+        if len(tokens) >= 3:
+            meio = min(set(tokens[1:-1]), key=lambda t: len(self._por_token.get(t, ())))
+            achados.update(p for p in self._por_token.get(meio, ()) if nome in self._nomes[p])
+        elif self._nomes:
+            achados.update(np.flatnonzero(self._serie_nomes.str.contains(nome, regex=False).to_numpy()).tolist())
+
+        # Nome do CSV contido no nome da mestra
+        candidatos = set(self._curtos)
+        for token in set(tokens):
+            candidatos.update(self._por_token_meio.get(token, ()))
+        achados.update(p for p in candidatos if self._nomes[p] in nome)
+        return min(achados) if achados else None
+
+    def genero(self, nome_limpo: str) -> Optional[str]:
+        """'F', 'M' ou None (sem correspondência) para um nome de nome_limpo_genero."""
+        if not self.disponivel or not nome_limpo:
+            return None
+        if nome_limpo not in self._cache:
+            pos = self._primeira_ocorrencia(nome_limpo)
+            self._cache[nome_limpo] = self._generos[pos] if pos is not None else None
+        return self._cache[nome_limpo]
+
+    def generos(self, nomes_limpos: pd.Series) -> pd.Series:
+        """Gênero de cada nome (None sem correspondência), buscando cada nome distinto uma vez."""
+        mapa = {nome: self.genero(nome) for nome in pd.unique(nomes_limpos)}
+        return nomes_limpos.map(mapa)
@@ -0,0 +1,429 @@
+"""
+Módulo de lançamento das planilhas de encarregado na planilha mestra
+Resolve os nomes dos lançamentos contra a mestra usando índices montados uma vez por processamento
+"""
+
+import datetime
+import math
+import re
+from collections import Counter, defaultdict
+from difflib import SequenceMatcher
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from unidecode import unidecode
+
+
+def limpar_nome(nome) -> str:
+    """Normaliza nome para comparação (sem acentos, maiúsculo e sem espaços nas pontas)."""
+    if isinstance(nome, str):
+        return unidecode(nome).upper().strip()
+    return ""
+
+
+def calcular_similaridade(s1: str, s2: str) -> float:
+    """Calcula similaridade entre duas strings (0 a 1)"""
+    return SequenceMatcher(None, s1, s2).ratio()
+
+
+def _normalizar_codigo(valor) -> str:
+    """Normaliza um código lançado (sem acentos, maiúsculo, só letras e números)."""
+    texto = unidecode(str(valor)).upper()
+    return re.sub(r'[^A-Z0-9]', '', texto)
+
+
+def extrair_dia_do_cabecalho(label_dia, mes, ano):
+    """
+    Extrai a data do cabeçalho da coluna, detectando automaticamente o formato.
+    Aceita: "01/nov", "01/11", "01", "1/nov", "1/11", etc.
+    """
+    if pd.isna(label_dia):
+        return None
+    
+    label_str = str(label_dia).strip().lower()
+    
+    # Mapa de meses em português (tanto nomes curtos quanto abreviações)
+    mapa_mes_curto = {'jan': 1, 'fev': 2, 'mar': 3, 'abr': 4, 'mai': 5, 'jun': 6, 
+                      'jul': 7, 'ago': 8, 'set': 9, 'out': 10, 'nov': 11, 'dez': 12}
+    
+    dia_num = None
+    mes_encontrado = None
+    
+    # Formato 1: "DD/mmm" ou "D/mmm" (ex: "01/nov", "1/nov")
+    for nome_mes, num_mes in mapa_mes_curto.items():
+        if nome_mes in label_str:
+            if num_mes == mes:
+                mes_encontrado = num_mes
+                # Extrair número antes do mês
+                parts = label_str.split(nome_mes)
+                if parts[0]:
+                    try:
+                        # Remove tudo que não é número
+                        dia_num = int("".join(filter(str.isdigit, parts[0])))
+                    except:
+                        pass
+            if mes_encontrado is not None:
+                break
+    
+    # Formato 2: "DD/MM" ou "D/M" (ex: "01/11", "1/11")
+    if mes_encontrado is None:
+        # Tenta com separadores comuns: /, -, .
+        partes = re.split(r'[/.\-]', label_str.strip())
+        if len(partes) >= 2:
+            try:
+                dia_candidato = int(partes[0].strip())
+                mes_candidato = int(partes[1].strip())
+                # Valida se é o mês certo e dia válido
+                if mes_candidato == mes and 1 <= dia_candidato <= 31:
+                    dia_num = dia_candidato
+                    mes_encontrado = mes_candidato
+            except:
+                pass
+    
+    # Formato 3: "DD" (só o dia, sem separador)
+    if mes_encontrado is None:
+        try:
+            # Se for só número, assume que é o dia
+            dia_num = int(label_str.strip())
+            if 1 <= dia_num <= 31:
+                mes_encontrado = mes
+        except:
+            pass
+    
+    # Se encontrou dia e mês válidos, retornar data
+    if dia_num is not None and mes_encontrado == mes and 1 <= dia_num <= 31:
+        try:
+            return datetime.date(ano, mes, dia_num)
+        except:
+            pass
+    
+    return None
+
+
+def converter_para_marcacao(valor, mapa_codigos: Dict, mapa_texto_para_marcacao: Dict) -> Optional[str]:
+    """
+    Converte o valor lançado pelo encarregado no código de marcação da mestra.
+    Aceita números (1, 2, 4...) via mapa_codigos e texto (P, FI, FA...) via mapa_texto_para_marcacao.
+    Retorna None quando o valor não corresponde a nenhuma marcação.
+    """
+    if pd.isna(valor):
+        return None
+    # Tenta primeiro como número
+    try:
+        num_val = int(float(str(valor).strip()))
+        if num_val in mapa_codigos:
+            return mapa_codigos[num_val]
+    except (ValueError, TypeError, OverflowError):
+        pass
+    # Tenta como texto normalizado
+    texto_normalizado = _normalizar_codigo(valor)
+    if texto_normalizado in mapa_texto_para_marcacao:
+        return mapa_texto_para_marcacao[texto_normalizado]
+    return None
+
+
+def montar_tabela_lancamentos(df_enc: pd.DataFrame, idx_col: int, mes: int, ano: int,
+                              mapa_codigos: Dict, mapa_texto_para_marcacao: Dict) -> pd.DataFrame:
+    """
+    Transforma a planilha de um encarregado (nome + uma coluna por dia) na tabela de lançamentos.
+
+    Cada cabeçalho de dia é convertido em data UMA VEZ por planilha e cada código
+    distinto é convertido em marcação UMA VEZ; as colunas que não são dias do mês
+    são descartadas antes de desempilhar. A ordem das linhas é a mesma do melt
+    (coluna a coluna, de cima para baixo).
+
+    Args:
+        df_enc: DataFrame do encarregado já sem as linhas de cabeçalho
+        idx_col: Índice da coluna de nomes (as colunas seguintes são os dias)
+        mes: Mês de referência
+        ano: Ano de referência
+        mapa_codigos: Mapa código numérico -> marcação
+        mapa_texto_para_marcacao: Mapa texto normalizado -> marcação
+
+    Returns:
+        DataFrame com NOME, NOME_LIMPO, NOME_ID (código do nome na planilha),
+        DATA e MARCACAO (categórica), apenas com lançamentos válidos
+    """
+    colunas = ['NOME', 'NOME_LIMPO', 'NOME_ID', 'DATA', 'MARCACAO']
+    nomes = df_enc.iloc[:, idx_col].to_numpy(dtype=object)
+    rotulos = list(df_enc.columns[idx_col + 1:])
+
+    # Cabeçalho -> data (cada rótulo é interpretado uma única vez)
+    datas_rotulo = {}
+    for rotulo in rotulos:
+        chave = rotulo if not pd.isna(rotulo) else None
+        if chave not in datas_rotulo:
+            datas_rotulo[chave] = extrair_dia_do_cabecalho(rotulo, mes, ano)
+    datas_colunas = [datas_rotulo[r if not pd.isna(r) else None] for r in rotulos]
+    posicoes_dias = [j for j, data in enumerate(datas_colunas) if data is not None]
+
+    if len(nomes) == 0 or not posicoes_dias:
+        return pd.DataFrame(columns=colunas)
+
+    # Nome -> nome limpo / código (por nome distinto)
+    nome_ids, nomes_distintos = pd.factorize(pd.Series(nomes), use_na_sentinel=False)
+    nomes_limpos_distintos = np.array([limpar_nome(n) for n in nomes_distintos], dtype=object)
+
+    valores = df_enc.iloc[:, idx_col + 1:].to_numpy(dtype=object)[:, posicoes_dias]
+    n_linhas, n_dias = valores.shape
+
+    # Desempilha coluna a coluna (mesma ordem do melt)
+    ids_long = np.tile(nome_ids, n_dias)
+    datas_long = np.repeat(np.array([datas_colunas[j] for j in posicoes_dias], dtype=object), n_linhas)
+    codigos_long = pd.Series(valores.T.ravel())
+
+    # Código -> marcação (cada valor distinto é convertido uma única vez)
+    codigos_distintos = codigos_long.dropna().unique()
+    mapa_marcacao = {
+        c: converter_para_marcacao(c, mapa_codigos, mapa_texto_para_marcacao)
+        for c in codigos_distintos
+    }
+    marcacoes_long = codigos_long.map(mapa_marcacao)
+
+    validos = (marcacoes_long.notna().to_numpy()
+               & (nomes_limpos_distintos[ids_long] != ''))
+
+    ids_validos = ids_long[validos]
+    tabela = pd.DataFrame({
+        'NOME': nomes_distintos.to_numpy(dtype=object)[ids_validos],
+        'NOME_LIMPO': nomes_limpos_distintos[ids_validos],
+        'NOME_ID': ids_validos.astype('int32'),
+        'DATA': datas_long[validos],
+        'MARCACAO': pd.Categorical(marcacoes_long.to_numpy(dtype=object)[validos]),
+    })
+    return tabela
+
+
+def _trigramas(texto: str) -> Counter:
+    """Conta os trigramas (substrings de 3 caracteres) de um texto, por posição."""
+    return Counter(texto[i:i + 3] for i in range(len(texto) - 2))
+
+
+class IndiceNomes:
+    """
+    Índice de resolução de nomes da planilha mestra (montado UMA VEZ por processamento).
+
+    Reproduz exatamente as três buscas usadas no lançamento, na mesma ordem:
+    1. Busca exata em NOME_LIMPO (hash)
+    2. Busca fuzzy (SequenceMatcher >= limiar), avaliando apenas os candidatos
+       que passam pelo filtro de tamanho e pelo bloqueio por trigramas
+    3. Busca pelas duas primeiras palavras do nome (índice de palavras)
+
+    O filtro de tamanho e o bloqueio por trigramas são limites inferiores
+    derivados da própria fórmula do ratio, então nenhum nome que passaria
+    no limiar é descartado. Cada nome é resolvido uma única vez (cache).
+
+    Args:
+        nomes_limpos: Lista com o NOME_LIMPO de cada linha da mestra, na ordem das linhas
+        limiar_similaridade: Similaridade mínima para a busca fuzzy
+    """
+
+    def __init__(self, nomes_limpos: List[str], limiar_similaridade: float = 0.85):
+        self.nomes = [n if isinstance(n, str) else "" for n in nomes_limpos]
+        self.limiar = limiar_similaridade
+
+        self._exato = defaultdict(list)       # {nome: [posições]}
+        self._palavras = defaultdict(set)     # {palavra: {posições}}
+        self._trigramas = defaultdict(list)   # {trigrama: [posições]}
+        self._por_tamanho = defaultdict(list) # {len(nome): [posições]}
+        self._cache = {}
+
+        for pos, nome in enumerate(self.nomes):
+            self._exato[nome].append(pos)
+            self._por_tamanho[len(nome)].append(pos)
+            for palavra in set(nome.split()):
+                self._palavras[palavra].add(pos)
+            for trigrama in _trigramas(nome):
+                self._trigramas[trigrama].append(pos)
+
+    def __len__(self) -> int:
+        return len(self.nomes)
+
+    def resolver(self, nome: str) -> List[int]:
+        """
+        Retorna as posições (0-based) das linhas da mestra que correspondem ao nome.
+        Lista vazia quando o nome não foi encontrado em nenhuma das três buscas.
+        """
+        if nome in self._cache:
+            return self._cache[nome]
+
+        if not nome:
+            posicoes = []
+        else:
+            posicoes = self._exato.get(nome, [])
+            if not posicoes:
+                posicoes = self._buscar_fuzzy(nome)
+            if not posicoes:
+                posicoes = self._buscar_palavras_iniciais(nome)
+
+        self._cache[nome] = list(posicoes)
+        return self._cache[nome]
+
+    def resolver_varios(self, nomes) -> Dict[str, List[int]]:
+        """Resolve cada nome ÚNICO uma vez e retorna {nome: [posições]}."""
+        return {nome: self.resolver(nome) for nome in dict.fromkeys(nomes)}
+
+    def _buscar_fuzzy(self, nome: str) -> List[int]:
+        limiar = self.limiar
+        la = len(nome)
+
+        # Filtro de tamanho: ratio = 2M/(la+lb) e M <= min(la, lb)
+        lb_min = math.ceil(limiar * la / (2 - limiar) - 1e-9)
+        lb_max = math.floor(la * (2 - limiar) / limiar + 1e-9)
+
+        # Trigramas compartilhados (contados pelas posições do nome buscado)
+        compartilhados = Counter()
+        for trigrama, qtd in _trigramas(nome).items():
+            for pos in self._trigramas.get(trigrama, ()):
+                compartilhados[pos] += qtd
+
+        candidatos = []
+        for lb in range(max(lb_min, 0), lb_max + 1):
+            posicoes_tamanho = self._por_tamanho.get(lb)
+            if not posicoes_tamanho:
+                continue
+
+            # Com M caracteres casados em blocos, pelo menos M - 2*(blocos) trigramas
+            # do nome buscado aparecem no candidato; blocos <= não casados + 1
+            m_min = math.ceil(limiar * (la + lb) / 2 - 1e-9)
+            minimo_trigramas = m_min - 2 * ((la - m_min) + (lb - m_min) + 1)
+
+            if minimo_trigramas <= 0:
+                candidatos.extend(posicoes_tamanho)
+            else:
+                candidatos.extend(p for p in posicoes_tamanho if compartilhados.get(p, 0) >= minimo_trigramas)
+
+        encontrados = []
+        for pos in sorted(candidatos):
+            matcher = SequenceMatcher(None, nome, self.nomes[pos])
+            if matcher.real_quick_ratio() < limiar or matcher.quick_ratio() < limiar:
+                continue
+            if matcher.ratio() >= limiar:
+                encontrados.append(pos)
+        return encontrados
+
+    def _buscar_palavras_iniciais(self, nome: str) -> List[int]:
+        palavras_nome = nome.split()[:2]
+        if not palavras_nome:
+            return []
+
+        posicoes = None
+        for palavra in palavras_nome:
+            conjunto = self._palavras.get(palavra, set())
+            posicoes = set(conjunto) if posicoes is None else posicoes & conjunto
+            if not posicoes:
+                return []
+        return sorted(posicoes)
+
+
+def resolver_lancamentos_arquivo(df_long: pd.DataFrame, indice: IndiceNomes, mapa_datas: Dict,
+                                 ordem_arquivo: int = 0) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Resolve os lançamentos de UM arquivo de encarregado em triplas (linha, coluna de data, marcação).
+
+    O rótulo LEGENDA é sempre ignorado e datas fora da mestra não contam como
+    sucesso nem como erro (mesmas regras do lançamento linha a linha). Os
+    contadores do arquivo são calculados por agregação sobre a tabela.
+
+    Args:
+        df_long: Tabela de lançamentos (saída de montar_tabela_lancamentos)
+        indice: Índice de nomes da mestra
+        mapa_datas: Mapa data -> coluna de data da mestra
+        ordem_arquivo: Ordem do arquivo no processamento (usada na regra de conflito)
+
+    Returns:
+        Tupla (triplas, resumo):
+        - triplas: DataFrame com ARQUIVO, ORDEM, LINHA (posição na mestra), COLUNA e MARCACAO
+        - resumo: {'sucesso', 'erros' (nomes na ordem em que aparecem), 'nomes_unicos', 'linhas'}
+    """
+    tabela = df_long[df_long['NOME_LIMPO'] != 'LEGENDA']
+    nomes_unicos = set(tabela['NOME_LIMPO'])
+
+    colunas = np.array([mapa_datas.get(d) for d in tabela['DATA']], dtype=object)
+    na_mestra = pd.notna(pd.Series(colunas, dtype=object)).to_numpy()
+    tabela = tabela[na_mestra]
+    colunas = colunas[na_mestra]
+
+    mapa_resolucao = indice.resolver_varios(tabela['NOME_LIMPO'])
+    posicoes = [mapa_resolucao[n] for n in tabela['NOME_LIMPO']]
+    qtd_posicoes = np.fromiter((len(p) for p in posicoes), dtype=np.int64, count=len(posicoes))
+    encontrado = qtd_posicoes > 0
+
+    nomes_erro = tabela['NOME_LIMPO'].to_numpy(dtype=object)[~encontrado]
+    erros = list(dict.fromkeys(nomes_erro))
+
+    # Um lançamento pode casar com mais de uma linha da mestra: expande por posição
+    ordem = np.repeat(np.arange(len(tabela)), qtd_posicoes)
+    linhas = (np.concatenate([np.asarray(p, dtype=np.int64) for p in posicoes if p])
+              if encontrado.any() else np.empty(0, dtype=np.int64))
+    triplas = pd.DataFrame({
+        'ARQUIVO': np.full(len(ordem), ordem_arquivo, dtype=np.int32),
+        'ORDEM': ordem,
+        'LINHA': linhas,
+        'COLUNA': colunas[ordem],
+        'MARCACAO': tabela['MARCACAO'].to_numpy(dtype=object)[ordem],
+    })
+
+    resumo = {
+        'sucesso': int(encontrado.sum()),
+        'erros': erros,
+        'nomes_unicos': nomes_unicos,
+        'linhas': set(np.unique(linhas).tolist()),
+    }
+    return triplas, resumo
+
+
+def aplicar_lancamentos_em_bloco(df_mest: pd.DataFrame, triplas: pd.DataFrame,
+                                 gestores: Optional[Dict[int, str]] = None,
+                                 col_gestor: str = 'GESTOR') -> int:
+    """
+    Grava todos os lançamentos resolvidos na mestra de uma só vez (modifica df_mest).
+
+    Regra de conflito (mesma célula lançada mais de uma vez): vence o último
+    lançamento, isto é, o último arquivo na ordem de upload e, dentro do arquivo,
+    a última linha, como no processamento arquivo a arquivo. As colunas de data lançadas passam
+    a ser do tipo object.
+
+    O GESTOR de cada linha lançada é o encarregado do último arquivo (com
+    encarregado preenchido) que lançou naquela linha.
+
+    Args:
+        df_mest: DataFrame da mestra
+        triplas: Concatenação das triplas de resolver_lancamentos_arquivo
+        gestores: {ordem do arquivo: nome do encarregado} (opcional)
+        col_gestor: Coluna de gestor da mestra
+
+    Returns:
+        Quantidade de células gravadas
+    """
+    if triplas.empty:
+        return 0
+
+    triplas = triplas.sort_values(['ARQUIVO', 'ORDEM'], kind='stable')
+    finais = triplas.drop_duplicates(subset=['LINHA', 'COLUNA'], keep='last')
+
+    # Bloco object com as colunas de data lançadas -> uma única atribuição por índices
+    colunas = list(dict.fromkeys(finais['COLUNA']))
+    pos_coluna = {c: j for j, c in enumerate(colunas)}
+    bloco = np.empty((len(df_mest), len(colunas)), dtype=object)
+    for j, c in enumerate(colunas):
+        bloco[:, j] = df_mest[c].to_numpy(dtype=object)
+
+    idx_colunas = np.fromiter((pos_coluna[c] for c in finais['COLUNA']), dtype=np.int64, count=len(finais))
+    bloco[finais['LINHA'].to_numpy(), idx_colunas] = finais['MARCACAO'].to_numpy(dtype=object)
+
+    for j, c in enumerate(colunas):
+        df_mest[c] = pd.Series(bloco[:, j], index=df_mest.index, dtype=object)
+
+    # GESTOR: último arquivo (na ordem de processamento) com encarregado preenchido
+    if gestores and col_gestor in df_mest.columns:
+        arquivos_com_gestor = [a for a, g in gestores.items() if g and str(g).strip() != '']
+        com_gestor = triplas[triplas['ARQUIVO'].isin(arquivos_com_gestor)]
+        if not com_gestor.empty:
+            ultimo_arquivo = com_gestor.groupby('LINHA')['ARQUIVO'].max()
+            valores = df_mest[col_gestor].to_numpy(dtype=object, copy=True)
+            valores[ultimo_arquivo.index.to_numpy()] = [gestores[a] for a in ultimo_arquivo]
+            df_mest[col_gestor] = pd.Series(valores, index=df_mest.index, dtype=object)
+
+    return len(finais)
@@ -0,0 +1,563 @@
+"""
+Módulo de leitura das planilhas enviadas (encarregados)
+Lê as planilhas a partir dos bytes do upload, com reparo de ZIP, leitura paralela
+e cache por conteúdo (hash) compartilhado entre reruns e sessões do Streamlit
+"""
+
+import hashlib
+import io
+import json
+import os
+import threading
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from openpyxl import load_workbook
+
+
+# Pasta local para dados persistidos entre execuções (memória de layouts, snapshots)
+DIRETORIO_CACHE = os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache_absenteismo')
+ARQUIVO_MEMORIA_LAYOUTS = os.path.join(DIRETORIO_CACHE, 'layouts_encarregado.json')
+DIRETORIO_SNAPSHOTS_MESTRA = os.path.join(DIRETORIO_CACHE, 'mestra')
+MAX_SNAPSHOTS_MESTRA = 10
+MAX_LAYOUTS_MEMORIZADOS = 200
+
+KEYWORDS_NOMES = ['NOME', 'NOMES', 'COLABORADOR', 'COLABORADORES', 'FUNCIONARIO', 'FUNCIONARIOS',
+                  'EMPLOYEE', 'EMPLOYEES', 'PESSOAL', 'PERSON', 'STAFF']
+
+# Limites do cache de planilhas lidas (por processo do Streamlit)
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+CACHE_MAX_ITENS = 256
+
+_cache_planilhas = OrderedDict()   # {(hash, guia): DataFrame} em ordem de uso (LRU)
+_cache_info = OrderedDict()        # {hash: {'guias': [...], 'guia_ativa': str}}
+_cache_bytes = 0
+_cache_lock = threading.Lock()
+
+_memoria_layouts = None            # {impressão do layout: configuração} (espelho do JSON)
+_memoria_lock = threading.Lock()
+
+
+def hash_conteudo(conteudo: bytes) -> str:
+    """Retorna o hash (SHA-1) do conteúdo de um arquivo enviado."""
+    return hashlib.sha1(conteudo).hexdigest()
+
+
+def _tamanho_df(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+def _cache_obter(chave) -> Optional[pd.DataFrame]:
+    with _cache_lock:
+        item = _cache_planilhas.get(chave)
+        if item is None:
+            return None
+        _cache_planilhas.move_to_end(chave)
+        return item[0]
+
+
+def _cache_guardar(chave, df: pd.DataFrame):
+    """Guarda o DataFrame no cache e descarta os menos usados além dos limites."""
+    global _cache_bytes
+    tamanho = _tamanho_df(df)
+    if tamanho > CACHE_MAX_BYTES:
+        return
+    with _cache_lock:
+        antigo = _cache_planilhas.pop(chave, None)
+        if antigo is not None:
+            _cache_bytes -= antigo[1]
+        _cache_planilhas[chave] = (df, tamanho)
+        _cache_bytes += tamanho
+        while _cache_planilhas and (_cache_bytes > CACHE_MAX_BYTES or len(_cache_planilhas) > CACHE_MAX_ITENS):
+            _, (_, tamanho_removido) = _cache_planilhas.popitem(last=False)
+            _cache_bytes -= tamanho_removido
+
+
+def limpar_cache_planilhas():
+    """Esvazia o cache de planilhas lidas."""
+    global _cache_bytes
+    with _cache_lock:
+        _cache_planilhas.clear()
+        _cache_info.clear()
+        _cache_bytes = 0
+
+
+def reparar_bytes_zip(conteudo: bytes) -> bytes:
+    """
+    Remove bytes extras antes da assinatura ZIP (PK\\x03\\x04) de um .xlsx corrompido.
+
+    Raises:
+        ValueError: Se não há assinatura ZIP após o início do arquivo
+    """
+    pk_index = conteudo.find(b'PK\x03\x04')
+    if pk_index > 0:
+        return conteudo[pk_index:]
+    raise ValueError("Não foi possível reparar")
+
+
+def obter_guia_ativa(conteudo: bytes) -> str:
+    """Retorna o título da guia ativa do arquivo Excel."""
+    wb = load_workbook(io.BytesIO(conteudo), read_only=True, data_only=True)
+    try:
+        return wb.active.title
+    finally:
+        wb.close()
+
+
+def obter_info_planilha(conteudo: bytes) -> Dict:
+    """
+    Retorna as guias e a guia ativa do arquivo Excel (com cache por conteúdo).
+
+    Returns:
+        Dicionário {'guias': [nomes das guias], 'guia_ativa': título da guia ativa}
+
+    Raises:
+        Exception: Se o arquivo não puder ser aberto nem reparado
+    """
+    chave = hash_conteudo(conteudo)
+    with _cache_lock:
+        if chave in _cache_info:
+            _cache_info.move_to_end(chave)
+            return dict(_cache_info[chave])
+
+    def ler_info(dados):
+        wb = load_workbook(io.BytesIO(dados), read_only=True, data_only=True)
+        try:
+            return {'guias': list(wb.sheetnames), 'guia_ativa': wb.active.title}
+        finally:
+            wb.close()
+
+    try:
+        info = ler_info(conteudo)
+    except Exception as erro_original:
+        try:
+            info = ler_info(reparar_bytes_zip(conteudo))
+        except Exception:
+            raise erro_original
+
+    with _cache_lock:
+        _cache_info[chave] = info
+        while len(_cache_info) > CACHE_MAX_ITENS:
+            _cache_info.popitem(last=False)
+    return dict(info)
+
+
+def ler_planilha_cache(conteudo: bytes, guia: Optional[str] = None) -> Tuple[pd.DataFrame, str]:
+    """
+    Igual a ler_planilha_bruta, mas guarda o resultado por (hash do conteúdo, guia).
+
+    A planilha é lida uma única vez e servida a todos os consumidores (validação,
+    configuração automática, pré-visualização e processamento). Devolve uma cópia,
+    então quem chama pode modificar o DataFrame à vontade.
+    """
+    if guia is None:
+        guia = obter_info_planilha(conteudo)['guia_ativa']
+    chave = (hash_conteudo(conteudo), guia)
+    df = _cache_obter(chave)
+    if df is None:
+        df, guia = ler_planilha_bruta(conteudo, guia)
+        _cache_guardar(chave, df)
+    return df.copy(), guia
+
+
+def ler_planilha_bruta(conteudo: bytes, guia: Optional[str] = None) -> Tuple[pd.DataFrame, str]:
+    """
+    Lê uma guia da planilha sem cabeçalho e com todas as células como texto.
+
+    Tenta a leitura direta (openpyxl) e, se falhar, repara o ZIP removendo os
+    bytes anteriores à assinatura PK. Quando a guia não é informada, usa a guia
+    ativa do arquivo.
+
+    Args:
+        conteudo: Bytes do arquivo enviado
+        guia: Nome da guia (None = guia ativa)
+
+    Returns:
+        Tupla (DataFrame bruto com header=None e dtype=str, nome da guia lida)
+
+    Raises:
+        Exception: O erro da primeira tentativa, se nenhuma leitura funcionar
+    """
+    try:
+        if guia is None:
+            guia = obter_guia_ativa(conteudo)
+        df = pd.read_excel(io.BytesIO(conteudo), sheet_name=guia, header=None, dtype=str, engine='openpyxl')
+        return df, guia
+    except Exception as erro_original:
+        try:
+            conteudo_reparado = reparar_bytes_zip(conteudo)
+            if guia is None:
+                guia = obter_guia_ativa(conteudo_reparado)
+            df = pd.read_excel(io.BytesIO(conteudo_reparado), sheet_name=guia, header=None, dtype=str, engine='openpyxl')
+            return df, guia
+        except Exception:
+            raise erro_original
+
+
+def _ler_planilha_tarefa(tarefa: Tuple[int, str, bytes, Optional[str]]) -> Dict:
+    """
+    Lê UMA planilha (executada nos processos/threads de leitura).
+    Nunca lança exceção: o erro é devolvido no resultado.
+    """
+    indice, nome, conteudo, guia = tarefa
+    try:
+        df, guia_lida = ler_planilha_bruta(conteudo, guia)
+        return {'indice': indice, 'nome': nome, 'guia': guia_lida, 'df': df, 'erro': None}
+    except Exception as e:
+        return {'indice': indice, 'nome': nome, 'guia': guia, 'df': None, 'erro': str(e)}
+
+
+def ler_planilhas_em_paralelo(tarefas: List[Tuple[int, str, bytes, Optional[str]]],
+                              paralelo: bool = True,
+                              max_workers: Optional[int] = None,
+                              ao_progredir: Optional[Callable[[int, int, Dict], None]] = None) -> List[Dict]:
+    """
+    Lê várias planilhas de uma vez, em processos separados (a leitura do XML é CPU).
+
+    Os resultados (e as chamadas de progresso) saem na mesma ordem das tarefas.
+    Arquivos já presentes no cache de planilhas não são relidos. Se o pool de
+    processos não puder ser usado (ex.: ambiente sem fork/spawn), cai para um
+    pool de threads.
+
+    Args:
+        tarefas: Lista de (índice, nome do arquivo, bytes, guia ou None para a guia ativa)
+        paralelo: False para ler um arquivo por vez no processo atual
+        max_workers: Quantidade de processos (padrão: núcleos disponíveis, até o nº de tarefas)
+        ao_progredir: Callback (concluídos, total, resultado) chamado após cada arquivo
+
+    Returns:
+        Lista de dicionários {'indice', 'nome', 'guia', 'df', 'erro'}, na ordem das tarefas
+    """
+    total = len(tarefas)
+    resultados = [None] * total
+    concluidos = 0
+
+    # Arquivos já lidos (mesmo conteúdo e guia) saem do cache, sem ir para o pool
+    pendentes = []
+    for posicao, (indice, nome, conteudo, guia) in enumerate(tarefas):
+        hash_arquivo = hash_conteudo(conteudo)
+        guia_chave = guia
+        if guia_chave is None:
+            with _cache_lock:
+                info = _cache_info.get(hash_arquivo)
+            guia_chave = info['guia_ativa'] if info else None
+        df = _cache_obter((hash_arquivo, guia_chave)) if guia_chave is not None else None
+        if df is not None:
+            resultados[posicao] = {'indice': indice, 'nome': nome, 'guia': guia_chave, 'df': df.copy(), 'erro': None}
+        else:
+            pendentes.append((posicao, hash_arquivo))
+
+    def registrar(posicao, hash_arquivo, resultado):
+        resultados[posicao] = resultado
+        if resultado['df'] is not None:
+            _cache_guardar((hash_arquivo, resultado['guia']), resultado['df'].copy())
+
+    def emitir_progresso():
+        # Progresso sempre na ordem das tarefas
+        nonlocal concluidos
+        while concluidos < total and resultados[concluidos] is not None:
+            concluidos += 1
+            if ao_progredir:
+                ao_progredir(concluidos, total, resultados[concluidos - 1])
+
+    emitir_progresso()
+    if not pendentes:
+        return resultados
+
+    if not paralelo or len(pendentes) <= 1:
+        for posicao, hash_arquivo in pendentes:
+            registrar(posicao, hash_arquivo, _ler_planilha_tarefa(tarefas[posicao]))
+            emitir_progresso()
+        return resultados
+
+    workers = max_workers or min(len(pendentes), os.cpu_count() or 1)
+
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            lidos = executor.map(_ler_planilha_tarefa, [tarefas[p] for p, _ in pendentes])
+            for (posicao, hash_arquivo), resultado in zip(pendentes, lidos):
+                registrar(posicao, hash_arquivo, resultado)
+                emitir_progresso()
+        return resultados
+    except Exception:
+        # Pool de processos indisponível: refaz o que faltou com threads
+        pass
+
+    restantes = [(p, h) for p, h in pendentes if resultados[p] is None]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        lidos = executor.map(_ler_planilha_tarefa, [tarefas[p] for p, _ in restantes])
+        for (posicao, hash_arquivo), resultado in zip(restantes, lidos):
+            registrar(posicao, hash_arquivo, resultado)
+            emitir_progresso()
+    return resultados
+
+
+def letras_colunas(qtd_colunas: int) -> List[str]:
+    """Nomes das colunas no formato do Excel (A, B, ..., Z, AA, AB, ...)."""
+    letras = []
+    for i in range(qtd_colunas):
+        if i < 26:
+            letras.append(chr(65 + i))
+        else:
+            letras.append(f"{chr(65 + i//26 - 1)}{chr(65 + i%26)}")
+    return letras
+
+
+def _textos_celulas(df_bloco: pd.DataFrame) -> np.ndarray:
+    """Matriz com str(célula) de cada posição (células vazias viram 'nan', como str(NaN))."""
+    valores = df_bloco.to_numpy(dtype=object)
+    textos = np.empty(valores.shape, dtype=object)
+    if valores.size:
+        textos.ravel()[:] = [str(v) for v in valores.ravel()]
+    return textos
+
+
+def _aplicar_por_valor_unico(textos: np.ndarray, funcao) -> np.ndarray:
+    """Aplica funcao(texto) -> bool uma vez por texto distinto e devolve a matriz booleana."""
+    if textos.size == 0:
+        return np.zeros(textos.shape, dtype=bool)
+    codigos, unicos = pd.factorize(textos.ravel())
+    resultado_unicos = np.fromiter((funcao(t) for t in unicos), dtype=bool, count=len(unicos))
+    return resultado_unicos[codigos].reshape(textos.shape)
+
+
+def detectar_config_planilha(df_raw: pd.DataFrame) -> Tuple[Optional[str], Optional[int], Optional[int]]:
+    """
+    Detecta a coluna de nomes e a linha dos dias de uma planilha de encarregado.
+
+    Regras:
+    1. Coluna: nas 10 primeiras linhas, a primeira linha que contém uma palavra-chave
+       (NOME, COLABORADOR...) define a coluna (a mais à direita). Sem palavra-chave,
+       usa a coluna mais à direita com letras em mais de 70% das células.
+    2. Linha: a primeira das 20 primeiras linhas com pelo menos 15 células numéricas.
+
+    Cada texto distinto é avaliado uma única vez.
+
+    Args:
+        df_raw: Planilha bruta (header=None, dtype=str)
+
+    Returns:
+        Tupla (letra da coluna, índice da coluna, índice da linha); None quando não detectado
+    """
+    qtd_linhas, qtd_colunas = df_raw.shape
+    letras = letras_colunas(qtd_colunas)
+    col_detectada = None
+    idx_col_detectada = None
+
+    # 1. COLUNA (Nomes) pela keyword
+    topo = _textos_celulas(df_raw.iloc[:min(10, qtd_linhas)])
+    tem_keyword = _aplicar_por_valor_unico(
+        topo, lambda t: any(k in t.upper().strip() for k in KEYWORDS_NOMES)
+    )
+    linhas_com_keyword = np.flatnonzero(tem_keyword.any(axis=1))
+    if len(linhas_com_keyword):
+        idx_col_detectada = int(np.flatnonzero(tem_keyword[linhas_com_keyword[0]])[-1])
+        col_detectada = letras[idx_col_detectada]
+
+    # Pelo conteúdo (muitas letras)
+    if col_detectada is None and qtd_colunas:
+        tem_letras = _aplicar_por_valor_unico(
+            _textos_celulas(df_raw), lambda t: any(c.isalpha() for c in t)
+        )
+        colunas_texto = np.flatnonzero(tem_letras.sum(axis=0) > qtd_linhas * 0.7)
+        if len(colunas_texto):
+            idx_col_detectada = int(colunas_texto[-1])
+            col_detectada = letras[idx_col_detectada]
+
+    # 2. LINHA (Dias): primeira linha com pelo menos 15 números
+    linha_detectada = detectar_linha_dias(df_raw)
+
+    return col_detectada, idx_col_detectada, linha_detectada
+
+
+def detectar_linha_dias(df_raw: pd.DataFrame) -> Optional[int]:
+    """Primeira das 20 primeiras linhas com pelo menos 15 células numéricas (None se não houver)."""
+    cabecalhos = _textos_celulas(df_raw.iloc[:min(20, len(df_raw))])
+    eh_numero = _aplicar_por_valor_unico(cabecalhos, lambda t: t.strip().isdigit())
+    linhas_dias = np.flatnonzero(eh_numero.sum(axis=1) >= 15)
+    return int(linhas_dias[0]) if len(linhas_dias) else None
+
+
+def impressao_layout(df_raw: pd.DataFrame, guia: str, linha_cabecalho: int) -> str:
+    """
+    Gera a impressão digital do layout de uma planilha de encarregado.
+
+    Considera só o que não muda de um mês para o outro: a guia, a linha do
+    cabeçalho, a posição da primeira célula preenchida de cada linha acima dele
+    (títulos com mês e ano não entram) e, no cabeçalho, os textos com a posição
+    e onde começam os dias (a quantidade de dias do mês não entra). As linhas de
+    colaboradores, abaixo do cabeçalho, ficam de fora.
+    """
+    partes = [str(guia), str(linha_cabecalho)]
+    topo = df_raw.iloc[:linha_cabecalho + 1].to_numpy(dtype=object)
+    for pos, linha in enumerate(topo):
+        preenchidas = [(j, str(v).strip()) for j, v in enumerate(linha) if not pd.isna(v) and str(v).strip() != '']
+        if pos < linha_cabecalho:
+            partes.append(str(preenchidas[0][0]) if preenchidas else '-')
+            continue
+        textos = [f"{j}:{texto.upper()}" for j, texto in preenchidas if not texto.isdigit()]
+        inicio_dias = next((j for j, texto in preenchidas if texto.isdigit()), None)
+        partes.append('|'.join(textos) + f"|dias:{inicio_dias}")
+    return hashlib.sha1('\n'.join(partes).encode('utf-8')).hexdigest()
+
+
+def _carregar_memoria_layouts() -> Dict:
+    global _memoria_layouts
+    if _memoria_layouts is None:
+        try:
+            with open(ARQUIVO_MEMORIA_LAYOUTS, 'r', encoding='utf-8') as f:
+                _memoria_layouts = json.load(f)
+        except Exception:
+            _memoria_layouts = {}
+    return _memoria_layouts
+
+
+def consultar_layout(impressao: str) -> Optional[Dict]:
+    """Retorna a configuração memorizada para o layout ({'linha_idx', 'col_idx', 'guia'}) ou None."""
+    with _memoria_lock:
+        config = _carregar_memoria_layouts().get(impressao)
+        return dict(config) if config else None
+
+
+def memorizar_layout(impressao: str, linha_idx: int, col_idx: int, guia: str):
+    """
+    Grava a configuração do layout no arquivo local de memória (JSON), que
+    guarda só os MAX_LAYOUTS_MEMORIZADOS memorizados mais recentemente.
+    Falhas de escrita (ex.: pasta somente leitura) são ignoradas.
+    """
+    config = {'linha_idx': int(linha_idx), 'col_idx': int(col_idx), 'guia': guia}
+    with _memoria_lock:
+        memoria = _carregar_memoria_layouts()
+        if memoria.get(impressao) == config:
+            return
+        memoria.pop(impressao, None)
+        memoria[impressao] = config
+        for antiga in list(memoria)[:-MAX_LAYOUTS_MEMORIZADOS]:
+            del memoria[antiga]
+        try:
+            os.makedirs(DIRETORIO_CACHE, exist_ok=True)
+            caminho_tmp = ARQUIVO_MEMORIA_LAYOUTS + '.tmp'
+            with open(caminho_tmp, 'w', encoding='utf-8') as f:
+                json.dump(memoria, f, ensure_ascii=False, indent=2)
+            os.replace(caminho_tmp, ARQUIVO_MEMORIA_LAYOUTS)
+        except Exception:
+            pass
+
+
+def detectar_config_com_memoria(df_raw: pd.DataFrame, guia: str) -> Tuple[Optional[str], Optional[int], Optional[int], bool]:
+    """
+    Detecta a configuração da planilha usando primeiro a memória de layouts.
+
+    A linha do cabeçalho (dias) é localizada primeiro; layouts já conhecidos
+    (mesma impressão digital até o cabeçalho) pulam a detecção da coluna de
+    nomes. Layouts novos passam pelo detector e, se tudo foi detectado, são
+    memorizados.
+
+    Returns:
+        Tupla (letra da coluna, índice da coluna, índice da linha, layout_conhecido)
+    """
+    linha_cabecalho = detectar_linha_dias(df_raw)
+    if linha_cabecalho is None:
+        col_letra, col_idx, linha_idx = detectar_config_planilha(df_raw)
+        return col_letra, col_idx, linha_idx, False
+
+    impressao = impressao_layout(df_raw, guia, linha_cabecalho)
+    config = consultar_layout(impressao)
+    qtd_linhas, qtd_colunas = df_raw.shape
+    if config and config['col_idx'] < qtd_colunas and config['linha_idx'] == linha_cabecalho:
+        col_idx = config['col_idx']
+        return letras_colunas(qtd_colunas)[col_idx], col_idx, config['linha_idx'], True
+
+    col_letra, col_idx, linha_idx = detectar_config_planilha(df_raw)
+    if col_letra and linha_idx is not None:
+        memorizar_layout(impressao, linha_idx, col_idx, guia)
+    return col_letra, col_idx, linha_idx, False
+
+
+def classificar_arquivo_excel(conteudo: bytes) -> str:
+    """
+    Classifica os bytes de um arquivo Excel enviado.
+
+    Returns:
+        'xlsx' ou 'xlsm' (ZIP válido), 'zip_deslocado' (ZIP válido após bytes extras
+        no início), 'zip_corrompido' (ZIP truncado/danificado) ou 'invalido'
+    """
+    pk_index = conteudo.find(b'PK\x03\x04')
+    if pk_index < 0:
+        return 'invalido'
+    try:
+        with zipfile.ZipFile(io.BytesIO(conteudo[pk_index:]), 'r') as zf:
+            nomes = zf.namelist()
+    except zipfile.BadZipFile:
+        return 'zip_corrompido'
+    if pk_index > 0:
+        return 'zip_deslocado'
+    return 'xlsm' if 'xl/vbaProject.bin' in nomes else 'xlsx'
+
+
+def _caminho_snapshot_mestra(hash_arquivo: str) -> str:
+    return os.path.join(DIRETORIO_SNAPSHOTS_MESTRA, f'{hash_arquivo}.pkl')
+
+
+def _salvar_snapshot_mestra(hash_arquivo: str, df: pd.DataFrame):
+    """Grava o snapshot e mantém só os MAX_SNAPSHOTS_MESTRA mais recentes (falhas são ignoradas)."""
+    try:
+        os.makedirs(DIRETORIO_SNAPSHOTS_MESTRA, exist_ok=True)
+        caminho = _caminho_snapshot_mestra(hash_arquivo)
+        df.to_pickle(caminho + '.tmp', compression=None)
+        os.replace(caminho + '.tmp', caminho)
+
+        snapshots = sorted(
+            (os.path.join(DIRETORIO_SNAPSHOTS_MESTRA, n) for n in os.listdir(DIRETORIO_SNAPSHOTS_MESTRA) if n.endswith('.pkl')),
+            key=os.path.getmtime, reverse=True
+        )
+        for antigo in snapshots[MAX_SNAPSHOTS_MESTRA:]:
+            os.remove(antigo)
+    except Exception:
+        pass
+
+
+def carregar_planilha_mestra(conteudo: bytes) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Carrega a planilha MESTRA lendo os bytes uma única vez.
+
+    O arquivo é classificado antes da leitura (xlsx, xlsm, ZIP com bytes extras,
+    ZIP corrompido) e lido uma única vez com openpyxl. O resultado é guardado em
+    um snapshot local pelo hash do conteúdo: a mesma mestra enviada de novo
+    (na mesma sessão ou em outro dia) é carregada do snapshot, sem reler o Excel.
+
+    Args:
+        conteudo: Bytes do arquivo enviado
+
+    Returns:
+        Tupla (DataFrame com header=0, info) onde info tem 'hash', 'tipo' e
+        'snapshot' (True quando veio do snapshot)
+
+    Raises:
+        ValueError: Se o arquivo não é um Excel válido nem pode ser reparado
+    """
+    hash_arquivo = hash_conteudo(conteudo)
+    caminho = _caminho_snapshot_mestra(hash_arquivo)
+    if os.path.exists(caminho):
+        try:
+            df = pd.read_pickle(caminho, compression=None)
+            os.utime(caminho)
+            return df, {'hash': hash_arquivo, 'tipo': 'snapshot', 'snapshot': True}
+        except Exception:
+            pass
+
+    tipo = classificar_arquivo_excel(conteudo)
+    if tipo == 'invalido':
+        raise ValueError("O arquivo não é um Excel (.xlsx/.xlsm) válido")
+    if tipo == 'zip_corrompido':
+        raise ValueError("Arquivo ZIP corrompido (truncado ou danificado) e não pode ser recuperado")
+    if tipo == 'zip_deslocado':
+        conteudo = reparar_bytes_zip(conteudo)
+
+    df = pd.read_excel(io.BytesIO(conteudo), header=0, engine='openpyxl')
+    _salvar_snapshot_mestra(hash_arquivo, df)
+    return df, {'hash': hash_arquivo, 'tipo': tipo, 'snapshot': False}
@@ -0,0 +1,157 @@
+"""
+Módulo de leitura de CSV com detecção do dialeto
+Inspeciona só o começo do arquivo para escolher encoding (BOM, UTF-8 válido,
+cp1252), separador (csv.Sniffer, com contagem de campos por linha como reserva)
+e a linha do cabeçalho (pula linhas-título como "Colaboradores"), e então lê o
+arquivo uma única vez com o engine C. Substitui os laços de tentativas
+encoding x separador x skiprows do app e das páginas.
+"""
+
+import codecs
+import csv
+import io
+from collections import Counter
+from typing import Dict, Optional, Tuple
+
+import pandas as pd
+
+
+TAMANHO_AMOSTRA = 64 * 1024
+MAX_LINHAS_AMOSTRA = 50
+SEPARADORES_CSV = ';,\t|'
+
+
+def bytes_do_arquivo(arquivo) -> bytes:
+    """Bytes de um upload do Streamlit, arquivo aberto, caminho ou bytes."""
+    if isinstance(arquivo, (bytes, bytearray)):
+        return bytes(arquivo)
+    if isinstance(arquivo, str):
+        with open(arquivo, 'rb') as f:
+            return f.read()
+    if hasattr(arquivo, 'getvalue'):
+        return arquivo.getvalue()
+    arquivo.seek(0)
+    return arquivo.read()
+
+
+def detectar_encoding(conteudo: bytes) -> str:
+    """
+    Encoding do arquivo: BOM quando houver; senão UTF-8 se o conteúdo for UTF-8
+    válido; senão cp1252 (planilhas do Windows); latin-1 como último recurso.
+    """
+    if conteudo.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    if conteudo.startswith((codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)):
+        return 'utf-16'
+    for encoding in ('utf-8', 'cp1252'):
+        try:
+            conteudo.decode(encoding)
+            return encoding
+        except UnicodeDecodeError:
+            continue
+    return 'latin-1'
+
+
+def _linhas_amostra(conteudo: bytes, encoding: str) -> list:
+    """Primeiras linhas completas do arquivo, já decodificadas."""
+    amostra = conteudo[:TAMANHO_AMOSTRA]
+    texto = codecs.getincrementaldecoder(encoding)(errors='replace').decode(amostra, final=False)
+    linhas = texto.splitlines()
+    if len(conteudo) > TAMANHO_AMOSTRA and len(linhas) > 1:
+        linhas = linhas[:-1]  # a última pode estar cortada no meio
+    return linhas[:MAX_LINHAS_AMOSTRA]
+
+
+def _campos(linha: str, sep: str, quotechar: str) -> list:
+    return next(csv.reader([linha], delimiter=sep, quotechar=quotechar), [])
+
+
+def _separador_por_contagem(linhas: list) -> str:
+    """Separador cuja quantidade de campos por linha é maior e mais estável na amostra."""
+    melhor_sep, melhor_pontuacao = ';', None
+    for sep in SEPARADORES_CSV:
+        contagens = [len(_campos(linha, sep, '"')) for linha in linhas if linha.strip()]
+        if not contagens:
+            continue
+        moda, frequencia = Counter(contagens).most_common(1)[0]
+        pontuacao = (moda > 1, frequencia, moda)
+        if melhor_pontuacao is None or pontuacao > melhor_pontuacao:
+            melhor_sep, melhor_pontuacao = sep, pontuacao
+    return melhor_sep
+
+
+def detectar_dialeto_csv(conteudo: bytes) -> Dict:
+    """
+    Detecta encoding, separador, aspas e linha do cabeçalho a partir da amostra.
+
+    Returns:
+        Dicionário {'encoding', 'sep', 'quotechar', 'linha_cabecalho', 'colunas'};
+        'colunas' é a quantidade de campos esperada por linha
+    """
+    encoding = detectar_encoding(conteudo)
+    linhas = _linhas_amostra(conteudo, encoding)
+    dialeto = {'encoding': encoding, 'sep': ';', 'quotechar': '"', 'linha_cabecalho': 0, 'colunas': 1}
+    if not any(linha.strip() for linha in linhas):
+        return dialeto
+
+    try:
+        sniff = csv.Sniffer().sniff('\n'.join(linhas), delimiters=SEPARADORES_CSV)
+        sep, quotechar = sniff.delimiter, sniff.quotechar or '"'
+    except csv.Error:
+        sep, quotechar = _separador_por_contagem(linhas), '"'
+
+    contagens = [len(_campos(linha, sep, quotechar)) if linha.strip() else 0 for linha in linhas]
+    moda = Counter(c for c in contagens if c).most_common(1)[0][0]
+    if moda <= 1:
+        # O Sniffer pode escolher um separador que só aparece no título
+        sep, quotechar = _separador_por_contagem(linhas), '"'
+        contagens = [len(_campos(linha, sep, quotechar)) if linha.strip() else 0 for linha in linhas]
+        moda = Counter(c for c in contagens if c).most_common(1)[0][0]
+
+    # Cabeçalho: primeira linha com o número de campos esperado e pelo menos 2 preenchidos
+    linha_cabecalho = 0
+    if moda > 1:
+        for pos, (linha, qtd) in enumerate(zip(linhas, contagens)):
+            preenchidos = sum(1 for campo in _campos(linha, sep, quotechar) if campo.strip())
+            if qtd >= moda and preenchidos >= 2:
+                linha_cabecalho = pos
+                break
+
+    dialeto.update(sep=sep, quotechar=quotechar, linha_cabecalho=linha_cabecalho, colunas=moda)
+    return dialeto
+
+
+def ler_csv_detectando(arquivo, dialeto: Optional[Dict] = None, **kwargs) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Lê o CSV uma única vez (engine C) com o dialeto detectado.
+
+    Args:
+        arquivo: Upload do Streamlit, arquivo aberto, caminho ou bytes
+        dialeto: Dialeto já conhecido (detectado na amostra se None)
+        **kwargs: Repassados ao pd.read_csv (ex.: on_bad_lines, dtype)
+
+    Returns:
+        Tupla (DataFrame, dialeto usado) — o dialeto pode ser registrado por quem chama
+
+    Raises:
+        Exception: O erro do pd.read_csv, se o arquivo não puder ser lido
+    """
+    conteudo = bytes_do_arquivo(arquivo)
+    if dialeto is None:
+        dialeto = detectar_dialeto_csv(conteudo)
+    df = pd.read_csv(
+        io.BytesIO(conteudo),
+        encoding=dialeto['encoding'],
+        sep=dialeto['sep'],
+        quotechar=dialeto['quotechar'],
+        skiprows=dialeto['linha_cabecalho'],
+        header=0,
+        engine='c',
+        **kwargs
+    )
+    return df, dialeto
+
+
+def descrever_dialeto(dialeto: Dict) -> str:
+    """Texto curto do dialeto para log (ex.: "cp1252, sep=';', cabeçalho na linha 2")."""
+    return f"{dialeto['encoding']}, sep={dialeto['sep']!r}, cabeçalho na linha {dialeto['linha_cabecalho'] + 1}"
@@ -0,0 +1,289 @@
+"""
+Módulo da matriz de presença do período processado
+Guarda as marcações (P, FI, FA, D, FERIADO, ...) da mestra em uma matriz 2-D
+(linhas x colunas de data) com os metadados de linhas e colunas. Feriados,
+afastamentos, desligamentos e férias alteram a matriz, e a aba Dados é
+gravada a partir dela uma única vez no final.
+"""
+
+import datetime
+import re
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from unidecode import unidecode
+
+
+def chave_nome(nome) -> str:
+    """Normaliza nome para comparação exata, colapsando espaços e removendo acentos."""
+    texto = unidecode(str(nome)).upper().strip()
+    return re.sub(r'\s+', ' ', texto)
+
+
+def _textos_marcas(marcas: np.ndarray) -> np.ndarray:
+    """Texto normalizado (strip + maiúsculo, '' para vazio) de cada célula da matriz."""
+    if marcas.size == 0:
+        return np.empty(marcas.shape, dtype=object)
+    textos = pd.DataFrame(marcas).apply(
+        lambda col: col.where(col.notna(), '').astype(str).str.strip().str.upper()
+    )
+    return textos.to_numpy(dtype=object)
+
+
+# Marcações que mantêm uma sequência de afastamento aberta (só FA conta para o limiar)
+MARCAS_SEQUENCIA_AFASTAMENTO = ('FA', 'D', 'FERIADO', 'AFASTAMENTO')
+
+
+def detectar_sequencias_afastamento(marcas: np.ndarray, limiar_fa: int = 15) -> Dict[int, List[Tuple[int, int]]]:
+    """
+    Sequências de afastamento de todas as linhas de uma vez (run-length com numpy).
+
+    Uma sequência é um trecho contínuo de células FA, D, FERIADO ou AFASTAMENTO
+    de uma linha; outra marcação (ou vazio) quebra o trecho. O trecho vira
+    afastamento quando tem mais de limiar_fa células FA.
+
+    Args:
+        marcas: Matriz linhas x colunas de data, na ordem em que as colunas são percorridas
+        limiar_fa: Quantidade de FA que a sequência precisa ultrapassar
+
+    Returns:
+        {posição da linha: [(coluna_inicio, coluna_fim), ...]} (colunas inclusivas)
+    """
+    linhas, dias = marcas.shape
+    if not linhas or not dias:
+        return {}
+    textos = _textos_marcas(marcas)
+
+    # Uma coluna vazia de separação no fim de cada linha: trechos não atravessam linhas
+    largura = dias + 1
+    continua = np.zeros((linhas, largura), dtype=bool)
+    continua[:, :dias] = np.isin(textos, MARCAS_SEQUENCIA_AFASTAMENTO)
+    eh_fa = np.zeros((linhas, largura), dtype=np.int64)
+    eh_fa[:, :dias] = textos == 'FA'
+
+    bordas = np.diff(np.concatenate(([0], continua.ravel().astype(np.int8))))
+    inicios = np.flatnonzero(bordas == 1)
+    fins = np.flatnonzero(bordas == -1)  # primeira célula depois do trecho
+    fa_acumulado = np.concatenate(([0], np.cumsum(eh_fa.ravel())))
+    qtd_fa = fa_acumulado[fins] - fa_acumulado[inicios]
+
+    afastamentos = {}
+    manter = qtd_fa > limiar_fa
+    for inicio, fim in zip(inicios[manter].tolist(), fins[manter].tolist()):
+        afastamentos.setdefault(inicio // largura, []).append((inicio % largura, (fim - 1) % largura))
+    return afastamentos
+
+
+def detectar_afastamentos_no_dataframe(df: pd.DataFrame, mapa_datas: Dict, limiar_fa: int = 15) -> Dict:
+    """
+    Detecta colaboradores com sequências contendo > limiar_fa FA (ignorando D, FERIADO e AFASTAMENTO).
+
+    Lógica:
+    - Procura por sequências de FA, D, FERIADO ou AFASTAMENTO
+    - Continua enquanto houver FA, D, FERIADO ou AFASTAMENTO
+    - Conta apenas FA (ignora D, FERIADO, AFASTAMENTO)
+    - Se total de FA > limiar_fa, marca toda a sequência como afastamento
+
+    As colunas são as de data ordenadas pelo rótulo; as sequências de todas as
+    linhas saem de uma vez de detectar_sequencias_afastamento.
+
+    Returns:
+        {índice da linha: [(coluna_inicio, coluna_fim), ...]}
+    """
+    colunas_datas = sorted([col for col in df.columns if col in mapa_datas.values()])
+    por_posicao = detectar_sequencias_afastamento(df[colunas_datas].to_numpy(dtype=object), limiar_fa)
+    return {df.index[pos]: sequencias for pos, sequencias in por_posicao.items()}
+
+
+class MatrizPresenca:
+    """
+    Matriz de marcações da mestra (uma linha por colaborador, uma coluna por data).
+
+    As colunas de data seguem a ordem em que aparecem na mestra; as demais
+    colunas (NOME, AREA, GESTOR, ...) ficam como metadados e não são alteradas.
+    Além do valor de cada célula, a matriz guarda a máscara das células pintadas
+    como afastamento (uma célula FERIADO dentro de um afastamento mantém o texto,
+    mas recebe a cor de afastamento).
+
+    Args:
+        df: DataFrame da mestra (sem NOME_LIMPO), na ordem em que será gravado
+        mapa_datas: Mapa data -> nome da coluna na mestra
+        col_nome: Coluna com o nome do colaborador (padrão: NOME, Nome ou a primeira)
+    """
+
+    def __init__(self, df: pd.DataFrame, mapa_datas: Dict, col_nome: Optional[str] = None):
+        data_por_coluna = {}
+        for data_obj, coluna in mapa_datas.items():
+            if isinstance(data_obj, datetime.datetime):
+                data_obj = data_obj.date()
+            if isinstance(data_obj, datetime.date):
+                data_por_coluna[coluna] = data_obj
+
+        self.colunas = list(df.columns)
+        self.colunas_datas = [c for c in self.colunas if c in data_por_coluna]
+        self.datas = np.array([data_por_coluna[c] for c in self.colunas_datas], dtype=object)
+        self.posicao_coluna = {c: j for j, c in enumerate(self.colunas_datas)}
+
+        self.metadados = df.drop(columns=self.colunas_datas).reset_index(drop=True)
+        self.marcas = np.empty((len(df), len(self.colunas_datas)), dtype=object)
+        for j, coluna in enumerate(self.colunas_datas):
+            self.marcas[:, j] = df[coluna].to_numpy(dtype=object)
+        self.afastado = np.zeros(self.marcas.shape, dtype=bool)
+
+        if col_nome is None:
+            col_nome = next((c for c in ('NOME', 'Nome') if c in df.columns), self.colunas[0] if self.colunas else None)
+        self.col_nome = col_nome
+        self._mapa_linhas = None
+
+    def __len__(self) -> int:
+        return self.marcas.shape[0]
+
+    @property
+    def shape(self):
+        return self.marcas.shape
+
+    def textos(self) -> np.ndarray:
+        """Texto normalizado (strip + maiúsculo) de todas as células de data."""
+        return _textos_marcas(self.marcas)
+
+    def mapa_linhas(self) -> Dict[str, List[int]]:
+        """Mapa nome normalizado (chave_nome) -> posições (0-based) das linhas."""
+        if self._mapa_linhas is None:
+            mapa = defaultdict(list)
+            if self.col_nome in self.metadados.columns:
+                for pos, nome in enumerate(self.metadados[self.col_nome].tolist()):
+                    nome_linha = chave_nome(nome) if not pd.isna(nome) else ''
+                    if nome_linha:
+                        mapa[nome_linha].append(pos)
+            self._mapa_linhas = dict(mapa)
+        return self._mapa_linhas
+
+    def colunas_no_intervalo(self, inicio: datetime.date, fim: datetime.date) -> np.ndarray:
+        """Máscara booleana das colunas de data entre inicio e fim (inclusive)."""
+        if not len(self.datas):
+            return np.zeros(0, dtype=bool)
+        return np.array([inicio <= d <= fim for d in self.datas], dtype=bool)
+
+    def marcar(self, linhas, colunas, marca: str, preservar: Iterable[str] = ()) -> int:
+        """
+        Grava a marca nas células (linhas x colunas), exceto nas que já têm um
+        dos textos de preservar. Células marcadas deixam de ser afastamento.
+
+        Args:
+            linhas: Posições das linhas (ou máscara booleana)
+            colunas: Posições das colunas de data (ou máscara booleana)
+            marca: Texto gravado nas células
+            preservar: Textos (normalizados) que não são sobrescritos
+
+        Returns:
+            Quantidade de células gravadas
+        """
+        linhas = np.flatnonzero(linhas) if np.asarray(linhas).dtype == bool else np.asarray(linhas, dtype=np.int64)
+        colunas = np.flatnonzero(colunas) if np.asarray(colunas).dtype == bool else np.asarray(colunas, dtype=np.int64)
+        if not len(linhas) or not len(colunas):
+            return 0
+
+        bloco = np.ix_(linhas, colunas)
+        alvo = np.ones((len(linhas), len(colunas)), dtype=bool)
+        preservar = {str(p).strip().upper() for p in preservar}
+        if preservar:
+            textos = _textos_marcas(self.marcas[bloco])
+            alvo &= ~np.isin(textos, list(preservar))
+
+        sub_marcas = self.marcas[bloco]
+        sub_marcas[alvo] = marca
+        self.marcas[bloco] = sub_marcas
+        sub_afastado = self.afastado[bloco]
+        sub_afastado[alvo] = False
+        self.afastado[bloco] = sub_afastado
+        return int(alvo.sum())
+
+    def mascara_intervalos(self, linhas, inicios, fins) -> np.ndarray:
+        """
+        Máscara (linhas x colunas de data) das células cobertas por intervalos de datas.
+
+        O intervalo i cobre, na linha linhas[i], as datas de inicios[i] a fins[i]
+        (inclusive). Todos os intervalos são comparados com o vetor de datas de uma vez.
+        """
+        mascara = np.zeros(self.shape, dtype=bool)
+        linhas = np.asarray(linhas, dtype=np.int64)
+        if not len(linhas) or not len(self.datas):
+            return mascara
+        datas = self.datas.astype('datetime64[D]')
+        inicios = np.asarray(inicios, dtype='datetime64[D]')
+        fins = np.asarray(fins, dtype='datetime64[D]')
+        cobertas = (datas[None, :] >= inicios[:, None]) & (datas[None, :] <= fins[:, None])
+        np.logical_or.at(mascara, linhas, cobertas)
+        return mascara
+
+    def marcar_mascara(self, mascara: np.ndarray, marca: str, preservar: Iterable[str] = ()) -> int:
+        """
+        Grava a marca nas células da máscara (linhas x colunas de data), exceto nas
+        que já têm um dos textos de preservar. Células marcadas deixam de ser afastamento.
+
+        Returns:
+            Quantidade de células gravadas
+        """
+        alvo = self.alvo_mascara(mascara, preservar)
+        self.marcas[alvo] = marca
+        self.afastado[alvo] = False
+        return int(alvo.sum())
+
+    def alvo_mascara(self, mascara: np.ndarray, preservar: Iterable[str] = ()) -> np.ndarray:
+        """Células da máscara que marcar_mascara gravaria (sem as de texto preservado)."""
+        alvo = np.array(mascara, dtype=bool)
+        preservar = {str(p).strip().upper() for p in preservar}
+        linhas = np.flatnonzero(alvo.any(axis=1))
+        if preservar and len(linhas):
+            textos = _textos_marcas(self.marcas[linhas])
+            alvo[linhas] &= ~np.isin(textos, list(preservar))
+        return alvo
+
+    def marcar_feriados(self, feriados: Dict[datetime.date, str]) -> int:
+        """Marca as colunas inteiras dos feriados como FERIADO (sobrescreve tudo)."""
+        if not feriados or not len(self):
+            return 0
+        colunas = np.array([d in feriados for d in self.datas], dtype=bool)
+        return self.marcar(np.arange(len(self)), colunas, 'FERIADO')
+
+    def marcar_afastamentos(self, afastamentos: Dict[int, List]) -> int:
+        """
+        Marca os afastamentos detectados como "Afastamento".
+
+        afastamentos vem de detectar_afastamentos_no_dataframe: {linha: [(inicio, fim), ...]},
+        com inicio/fim sendo índices nas colunas de data ORDENADAS pelo rótulo. O trecho
+        marcado vai da coluna inicial à final na ordem da mestra; células FERIADO ou
+        vazias mantêm o texto, mas todas recebem a cor de afastamento.
+        """
+        if not afastamentos:
+            return 0
+        colunas_ordenadas = sorted(self.colunas_datas)
+        marcadas = 0
+        for linha, sequencias in afastamentos.items():
+            for inicio, fim in sequencias:
+                j_inicio = self.posicao_coluna[colunas_ordenadas[inicio]]
+                j_fim = self.posicao_coluna[colunas_ordenadas[fim]]
+                trecho = slice(j_inicio, j_fim + 1)
+                textos = _textos_marcas(self.marcas[linha:linha + 1, trecho])[0]
+                trocar = ~np.isin(textos, ['FERIADO', ''])
+                valores = self.marcas[linha, trecho]
+                valores[trocar] = 'Afastamento'
+                self.marcas[linha, trecho] = valores
+                self.afastado[linha, trecho] = True
+                marcadas += j_fim - j_inicio + 1
+        return marcadas
+
+    def dataframe_datas(self) -> pd.DataFrame:
+        """Apenas as colunas de data (rótulos originais), com índice 0..n-1."""
+        return pd.DataFrame(
+            {c: pd.Series(self.marcas[:, j], dtype=object) for j, c in enumerate(self.colunas_datas)},
+            index=pd.RangeIndex(len(self))
+        )
+
+    def para_dataframe(self) -> pd.DataFrame:
+        """DataFrame completo (metadados + marcações), na ordem original das colunas."""
+        df_datas = self.dataframe_datas()
+        df = pd.concat([self.metadados, df_datas], axis=1)
+        return df[self.colunas]
@@ -0,0 +1,180 @@
+"""
+Módulo da reconciliação da planilha mestra com a base de ativos
+Calcula de uma vez, com junções pelo nome limpo, o que muda na mestra: os nomes
+pendentes a inserir (com FUNÇÃO, SITUAÇÃO, AREA, SUPERVISOR, SETOR, TURNO e
+HORARIO vindos da base), as SITUAÇÕES a atualizar e os nomes que não estão na
+base. As inserções entram com um único concat e o resultado traz o resumo das
+diferenças para exibição.
+"""
+
+from typing import Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+from pandas.api.types import is_object_dtype, is_string_dtype
+
+from funcoes_base_ativos import CAMPOS_MESTRA, BaseAtivos, _normalizar_coluna
+from funcoes_lancamento import limpar_nome
+
+
+COLUNA_SITUACAO_MESTRA = 'SITUAÇÃO'
+
+# Campo da tabela da base -> nomes aceitos da coluna na mestra
+ALIASES_COLUNAS_MESTRA = {
+    'FUNCAO': ['FUNÇÃO', 'FUNCAO'],
+    'SITUACAO': ['SITUAÇÃO', 'SITUACAO'],
+    'AREA': ['AREA', 'ÁREA'],
+    'SUPERVISOR': ['SUPERVISOR'],
+    'SETOR': ['SETOR'],
+    'TURNO': ['TURNO'],
+    'HORARIO': ['HORARIO', 'HORÁRIO'],
+}
+ALIASES_GESTOR_MESTRA = ['GESTOR', 'ENCARREGADO']
+NOMES_IGNORADOS = ('', 'LEGENDA')
+
+
+def encontrar_coluna_por_alias(df_mest: pd.DataFrame, aliases: Iterable[str]) -> Optional[str]:
+    """Primeira coluna da mestra cujo nome normalizado está entre os aliases."""
+    aliases_norm = {_normalizar_coluna(a) for a in aliases}
+    return next((c for c in df_mest.columns if _normalizar_coluna(c) in aliases_norm), None)
+
+
+def _texto(valor) -> str:
+    return str(valor).strip() if pd.notna(valor) else ''
+
+
+def _primeira_linha_por_nome(base_ativos: Optional[BaseAtivos]) -> pd.Series:
+    """Nome limpo -> primeira linha da base com esse nome."""
+    if base_ativos is None or base_ativos.coluna('colaborador') is None:
+        return pd.Series(dtype='int64')
+    nomes = base_ativos.nomes_limpos
+    nomes = nomes[nomes != ''].drop_duplicates()
+    return pd.Series(nomes.index, index=nomes.to_numpy())
+
+
+def _novas_linhas(df_mest: pd.DataFrame, base_ativos: Optional[BaseAtivos], insercoes) -> Tuple[pd.DataFrame, pd.Series]:
+    """
+    Linhas da mestra para os nomes pendentes que ainda não estão nela (um por
+    nome limpo, na ordem das inserções), e se cada um foi achado na base.
+    """
+    pendentes = pd.DataFrame(
+        [(_texto(item.get('nome', '')), _texto(item.get('encarregado', ''))) for item in insercoes],
+        columns=['NOME', 'ENCARREGADO'], dtype=object
+    )
+    pendentes['NOME_LIMPO'] = pendentes['NOME'].map(limpar_nome)
+    existentes = set(df_mest['NOME'].map(limpar_nome))
+    pendentes = pendentes[
+        (pendentes['NOME'] != '')
+        & ~pendentes['NOME_LIMPO'].isin(NOMES_IGNORADOS)
+        & ~pendentes['NOME_LIMPO'].isin(existentes)
+    ].drop_duplicates(subset=['NOME_LIMPO']).reset_index(drop=True)
+
+    # Junção com a base pelo nome limpo (primeira linha da base com o nome)
+    posicoes = pendentes['NOME_LIMPO'].map(_primeira_linha_por_nome(base_ativos))
+    encontrados = posicoes.notna()
+
+    novas = pd.DataFrame('', index=pendentes.index, columns=df_mest.columns, dtype=object)
+    novas['NOME'] = pendentes['NOME']
+    col_gestor = encontrar_coluna_por_alias(df_mest, ALIASES_GESTOR_MESTRA)
+    if col_gestor is not None:
+        novas[col_gestor] = pendentes['ENCARREGADO']
+    if encontrados.any():
+        dados = base_ativos.tabela_mestra().reindex(posicoes[encontrados].astype('int64'))
+        dados.index = posicoes[encontrados].index
+        for campo in list(CAMPOS_MESTRA) + ['TURNO']:
+            coluna = encontrar_coluna_por_alias(df_mest, ALIASES_COLUNAS_MESTRA[campo])
+            if coluna is not None:
+                novas.loc[encontrados, coluna] = dados[campo]
+    # Só textos: mesmo tipo de coluna que a linha nova teria criada de um dicionário
+    return novas.astype(str), encontrados
+
+
+def reconciliar_mestra(df_mest: pd.DataFrame, base_ativos: Optional[BaseAtivos] = None,
+                       insercoes: Iterable[Dict] = (), atualizar_situacao: bool = True) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Insere os nomes pendentes e atualiza a SITUAÇÃO da mestra pela base de ativos.
+
+    Inserções: nomes novos (ignorando vazios, LEGENDA e quem já está na mestra),
+    com o encarregado na coluna de gestor e os dados da primeira linha da base com
+    o mesmo nome; sem a base, só NOME e gestor. SITUAÇÃO: cada linha da mestra
+    (inclusive as inseridas) recebe a situação da última linha da base com o mesmo
+    nome, quando for diferente da atual.
+
+    Args:
+        df_mest: Planilha mestra (não é modificada)
+        base_ativos: Base de ativos (None = sem dados da base e sem atualização)
+        insercoes: Itens {'nome', 'encarregado'} pendentes
+        atualizar_situacao: Atualiza a SITUAÇÃO pela base
+
+    Returns:
+        Tupla (mestra reconciliada, diferenças); diferenças tem 'inseridos'
+        (NOME, NA_BASE), 'situacao' (LINHA, NOME, ANTES, DEPOIS) e
+        'nao_encontrados' (LINHA, NOME: nomes da mestra fora da base)
+    """
+    insercoes = list(insercoes or [])
+    novas, encontrados = _novas_linhas(df_mest, base_ativos, insercoes)
+    if len(novas):
+        df = pd.concat([df_mest, novas], ignore_index=True)
+    else:
+        df = df_mest.copy()
+
+    diff = {
+        'inseridos': pd.DataFrame({'NOME': novas['NOME'].to_numpy(), 'NA_BASE': encontrados.to_numpy()}),
+        'situacao': pd.DataFrame(columns=['LINHA', 'NOME', 'ANTES', 'DEPOIS']),
+        'nao_encontrados': pd.DataFrame(columns=['LINHA', 'NOME']),
+    }
+
+    nomes = df['NOME'].map(_texto)
+    nomes_limpos = nomes.map(limpar_nome)
+    com_nome = nomes != ''
+
+    # Nomes da mestra fora da base: independe da atualização de SITUAÇÃO
+    if base_ativos is not None and base_ativos.coluna('colaborador') is not None:
+        fora = com_nome & ~nomes_limpos.isin(_primeira_linha_por_nome(base_ativos).index)
+        diff['nao_encontrados'] = pd.DataFrame({'LINHA': df.index[fora], 'NOME': nomes[fora].to_numpy()})
+
+    mapa_situacoes = base_ativos.mapa_por_nome('situacao') if base_ativos is not None and atualizar_situacao else {}
+    if mapa_situacoes:
+        novas_situacoes = nomes_limpos.map(mapa_situacoes)
+        na_base = com_nome & novas_situacoes.notna()
+        if COLUNA_SITUACAO_MESTRA in df.columns:
+            atuais = df[COLUNA_SITUACAO_MESTRA]
+            textos_atuais = atuais.map(str)
+        else:
+            atuais = pd.Series([None] * len(df), index=df.index, dtype=object)
+            textos_atuais = pd.Series('', index=df.index, dtype=object)
+        mudou = na_base & (textos_atuais != novas_situacoes)
+
+        if mudou.any():
+            if COLUNA_SITUACAO_MESTRA in df.columns and not (
+                is_object_dtype(df[COLUNA_SITUACAO_MESTRA]) or is_string_dtype(df[COLUNA_SITUACAO_MESTRA])
+            ):
+                df[COLUNA_SITUACAO_MESTRA] = df[COLUNA_SITUACAO_MESTRA].astype(object)
+            df.loc[mudou, COLUNA_SITUACAO_MESTRA] = novas_situacoes[mudou]
+
+        diff['situacao'] = pd.DataFrame({
+            'LINHA': df.index[mudou],
+            'NOME': nomes[mudou].to_numpy(),
+            'ANTES': atuais[mudou].to_numpy(),
+            'DEPOIS': novas_situacoes[mudou].to_numpy(),
+        })
+
+    return df, diff
+
+
+def resumo_reconciliacao(diff: Dict) -> pd.DataFrame:
+    """Quantidades da reconciliação (uma linha por tipo de diferença) para exibição."""
+    inseridos = diff['inseridos']
+    return pd.DataFrame({
+        'Diferença': [
+            'Inseridos com dados da base',
+            'Inseridos sem dados da base',
+            'Situação atualizada',
+            'Nomes da mestra fora da base',
+        ],
+        'Quantidade': [
+            int(inseridos['NA_BASE'].sum()),
+            int((~inseridos['NA_BASE'].astype(bool)).sum()),
+            len(diff['situacao']),
+            len(diff['nao_encontrados']),
+        ],
+    })
@@ -11,6 +11,7 @@ import io
 from openpyxl import Workbook
 from openpyxl.styles import PatternFill, Font, Alignment, Border, Side
 from funcoes_processamento_csv import determinar_turno
+from funcoes_leitura_csv import ler_csv_detectando
 
 st.set_page_config(page_title="Banco de Horas", layout="wide")
 
@@ -64,18 +65,7 @@ if file_banco_horas and file_csv_colaboradores:
         # Cache do CSV para reutilização (evita ler o arquivo duas vezes)
         df_csv_cache = None
         try:
-            encodings = ['latin-1', 'iso-8859-1', 'cp1252', 'utf-8']
-            for encoding in encodings:
-                try:
-                    df_csv_cache = pd.read_csv(
-                        file_csv_colaboradores,
-                        encoding=encoding,
-                        sep=';',
-                        skiprows=1
-                    )
-                    break
-                except Exception:
-                    continue
+            df_csv_cache, _ = ler_csv_detectando(file_csv_colaboradores)
         except Exception:
             df_csv_cache = None
         
@@ -1,6 +1,7 @@
 import streamlit as st
 import pandas as pd
 import io
+from funcoes_leitura_csv import ler_csv_detectando
 
 st.set_page_config(page_title="ABS pelo Ponto", layout="wide")
 
@@ -29,27 +30,11 @@ if uploaded_file is not None and uploaded_csv_gestores is not None:
         st.stop()
 
     # 2. Leitura do Arquivo CSV (Gestores)
+    # Encoding, separador e linha-título ("Colaboradores") detectados na amostra, uma única leitura
     try:
-        # Tenta ler ignorando a primeira linha (que costuma ser título "Colaboradores")
-        df_gestores = pd.read_csv(uploaded_csv_gestores, sep=';', encoding='latin-1', skiprows=1, engine='python')
-        
-        # Se mesmo assim tiver poucas colunas, tenta ler normal (caso o arquivo não tenha o título)
-        if len(df_gestores.columns) < 5:
-             uploaded_csv_gestores.seek(0)
-             df_gestores = pd.read_csv(uploaded_csv_gestores, sep=';', encoding='latin-1', engine='python')
-
-    except:
-        uploaded_csv_gestores.seek(0)
-        try:
-             # Tenta skiprows=1 com ; e utf-8
-             df_gestores = pd.read_csv(uploaded_csv_gestores, sep=';', encoding='utf-8', skiprows=1, engine='python')
-        except:
-             try:
-                # Tenta normal , utf-8
-                uploaded_csv_gestores.seek(0)
-                df_gestores = pd.read_csv(uploaded_csv_gestores, sep=',', encoding='utf-8', engine='python')
-             except:
-                 pass
+        df_gestores, _ = ler_csv_detectando(uploaded_csv_gestores)
+    except Exception:
+        pass
 
     # Verifica se CSV tem colunas D (idx 3) e Z (idx 25)
     # Mas como as letras podem não bater com indices se houver leitura errada, vamos tentar pegar pelo indice mesmo se tiver colunas suficientes.
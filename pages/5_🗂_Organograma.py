@@ -10,6 +10,8 @@ import unicodedata
 import pandas as pd
 import streamlit as st
 
+from funcoes_leitura_csv import ler_csv_detectando
+
 
 st.set_page_config(page_title="ORGANOGRAMA", layout="wide")
 
@@ -70,22 +72,8 @@ def ler_planilha(uploaded_file):
     if uploaded_file.name.lower().endswith((".xlsx", ".xls")):
         return pd.read_excel(uploaded_file)
 
-    encodings = ["utf-8", "latin-1", "iso-8859-1", "cp1252", "utf-16"]
-    separators = [";", ",", "\t", "|"]
-
-    for encoding in encodings:
-        for separator in separators:
-            for skiprows in (0, 1):
-                try:
-                    uploaded_file.seek(0)
-                    df_try = pd.read_csv(uploaded_file, encoding=encoding, sep=separator, skiprows=skiprows)
-                    if len(df_try.columns) > 1:
-                        return df_try
-                except Exception:
-                    pass
-
-    uploaded_file.seek(0)
-    return pd.read_csv(uploaded_file, encoding="latin-1", sep=";")
+    df, _ = ler_csv_detectando(uploaded_file)
+    return df
 
 
 uploaded = st.file_uploader(
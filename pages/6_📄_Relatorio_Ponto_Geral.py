@@ -13,6 +13,7 @@ import re
 from typing import Dict, List, Tuple
 from unidecode import unidecode
 from funcoes_processamento_csv import determinar_turno
+from funcoes_leitura_csv import ler_csv_detectando
 
 st.set_page_config(page_title="Relatório de Ponto Geral", layout="wide")
 
@@ -154,21 +155,10 @@ def safe_unidecode(valor):
 
 
 def processar_csv_gestores(csv_file) -> Tuple[Dict[str, Dict], Dict[str, str]]:
-    df_csv = None
-    tentativas = [
-        {'sep': ';', 'encoding': 'latin-1', 'skiprows': 1},
-        {'sep': ';', 'encoding': 'utf-8', 'skiprows': 1},
-        {'sep': ',', 'encoding': 'utf-8', 'skiprows': 0},
-        {'sep': ';', 'encoding': 'latin-1', 'skiprows': 0},
-    ]
-    for params in tentativas:
-        try:
-            csv_file.seek(0)
-            df_csv = pd.read_csv(csv_file, **params, engine='python')
-            if len(df_csv.columns) >= 30:
-                break
-        except:
-            df_csv = None
+    try:
+        df_csv, _ = ler_csv_detectando(csv_file)
+    except Exception:
+        df_csv = None
     if df_csv is None or len(df_csv.columns) < 30:
         st.error(f"Não foi possível ler o CSV. Colunas: {len(df_csv.columns) if df_csv is not None else 0}")
         return {}, {}
@@ -0,0 +1,123 @@
+"""
+Equivalência da detecção de afastamentos com o laço antigo
+O laço por linha (iterrows + while, str().strip().upper() por célula) fica aqui
+como referência; detectar_sequencias_afastamento e
+detectar_afastamentos_no_dataframe precisam dar exatamente o mesmo
+{linha: [(inicio, fim)]} em matrizes aleatórias de FA/D/FERIADO/AFASTAMENTO.
+
+Medição de tempo: python tests/test_afastamentos.py [linhas] [dias]
+"""
+
+import datetime
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from funcoes_matriz_presenca import detectar_afastamentos_no_dataframe, detectar_sequencias_afastamento
+
+
+MARCAS_TESTE = ['FA', 'FA', 'FA', ' fa ', 'D', 'FERIADO', 'Afastamento', 'P', 'FI', 'DESLIGADO', '', None]
+PESOS_MARCAS = np.array([8, 4, 4, 1, 3, 1, 1, 4, 1, 1, 1, 1], dtype=float)
+
+
+def detectar_laco_antigo(df, mapa_datas, limiar_fa=15):
+    """Caminho antigo de detectar_afastamentos_no_dataframe (referência)."""
+    afastamentos = {}
+    colunas_datas = sorted([col for col in df.columns if col in mapa_datas.values()])
+    for idx, row in df.iterrows():
+        afastamentos_row = []
+        i = 0
+        while i < len(colunas_datas):
+            col = colunas_datas[i]
+            valor = str(row[col]).strip().upper() if pd.notna(row[col]) else ''
+            if valor in ['FA', 'D', 'FERIADO', 'AFASTAMENTO']:
+                fa_total = 0
+                col_inicio = i
+                j = i
+                while j < len(colunas_datas):
+                    col_j = colunas_datas[j]
+                    valor_j = str(row[col_j]).strip().upper() if pd.notna(row[col_j]) else ''
+                    if valor_j == 'FA':
+                        fa_total += 1
+                        j += 1
+                    elif valor_j in ['D', 'FERIADO', 'AFASTAMENTO']:
+                        j += 1
+                    else:
+                        break
+                if fa_total > limiar_fa:
+                    afastamentos_row.append((col_inicio, j - 1))
+                i = j if j > i else i + 1
+            else:
+                i += 1
+        if afastamentos_row:
+            afastamentos[idx] = afastamentos_row
+    return afastamentos
+
+
+def montar_matriz(linhas, dias, rng):
+    """Mestra aleatória com NOME e colunas DD/MM (blocos longos de FA/D para passar do limiar)."""
+    datas = [datetime.date(2025, 1, 1) + datetime.timedelta(days=i) for i in range(dias)]
+    mapa_datas = {d: d.strftime('%d/%m') for d in datas}
+    marcas = rng.choice(np.array(MARCAS_TESTE, dtype=object), (linhas, dias), p=PESOS_MARCAS / PESOS_MARCAS.sum())
+    df = pd.DataFrame(marcas, columns=list(mapa_datas.values()))
+    df.insert(0, 'NOME', [f'COLABORADOR {i}' for i in range(linhas)])
+    return df, mapa_datas
+
+
+@pytest.mark.parametrize('semente', range(20))
+def test_sequencias_iguais_ao_laco_antigo(semente):
+    rng = np.random.default_rng(semente)
+    df, mapa_datas = montar_matriz(int(rng.integers(0, 40)), int(rng.integers(0, 45)), rng)
+    colunas_datas = sorted(mapa_datas.values())
+    for limiar in (0, 1, 3, 5, 10, 15, 20):
+        esperado = detectar_laco_antigo(df, mapa_datas, limiar)
+        assert detectar_sequencias_afastamento(df[colunas_datas].to_numpy(dtype=object), limiar) == esperado
+        assert detectar_afastamentos_no_dataframe(df, mapa_datas, limiar) == esperado
+
+
+def test_indice_da_mestra_preservado():
+    rng = np.random.default_rng(99)
+    df, mapa_datas = montar_matriz(30, 31, rng)
+    df.index = pd.RangeIndex(100, 130)
+    assert detectar_afastamentos_no_dataframe(df, mapa_datas, 5) == detectar_laco_antigo(df, mapa_datas, 5)
+
+
+def test_sequencia_nao_atravessa_linhas():
+    df = pd.DataFrame([['P', 'FA', 'FA'], ['FA', 'FA', 'P']], columns=['01/01', '02/01', '03/01'])
+    mapa_datas = {i: c for i, c in enumerate(df.columns)}
+    assert detectar_afastamentos_no_dataframe(df, mapa_datas, 2) == {}
+    assert detectar_afastamentos_no_dataframe(df, mapa_datas, 1) == {0: [(1, 2)], 1: [(0, 1)]}
+
+
+def test_matriz_vazia():
+    assert detectar_sequencias_afastamento(np.empty((0, 31), dtype=object)) == {}
+    assert detectar_sequencias_afastamento(np.empty((10, 0), dtype=object)) == {}
+
+
+def medir(funcao, *args, repeticoes=3):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao(*args)
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos), resultado
+
+
+if __name__ == '__main__':
+    linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 1500
+    dias = int(sys.argv[2]) if len(sys.argv) > 2 else 31
+    df, mapa_datas = montar_matriz(linhas, dias, np.random.default_rng(5))
+
+    t_antigo, antigo = medir(detectar_laco_antigo, df, mapa_datas, repeticoes=1)
+    t_novo, novo = medir(detectar_afastamentos_no_dataframe, df, mapa_datas)
+
+    print(f"{linhas} linhas x {dias} dias ({len(novo)} linhas com afastamento)")
+    print(f"laço por linha (iterrows): {t_antigo:7.3f}s")
+    print(f"run-length (numpy):        {t_novo:7.3f}s")
+    print(f"resultado idêntico: {antigo == novo}")
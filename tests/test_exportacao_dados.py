@@ -0,0 +1,175 @@
+"""
+Equivalência da aba Dados com a formatação célula a célula
+O caminho antigo (to_excel + PatternFill/Font/Alignment novos para cada célula)
+fica aqui como referência; renderizar_aba_dados (NamedStyles compartilhados)
+precisa gravar os mesmos valores com a mesma aparência resolvida: preenchimento,
+fonte (negrito e cor), alinhamento, bordas e formato de número.
+
+Medição de tempo: python tests/test_exportacao_dados.py [linhas] [dias]
+"""
+
+import datetime
+import io
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from funcoes_exportacao import renderizar_aba_dados
+from funcoes_matriz_presenca import MatrizPresenca
+
+
+MAPA_CORES = {
+    'P': 'FF90EE90',
+    'FI': 'FFFF0000',
+    'FA': 'FFFFFF00',
+    'Afastamento': 'FFC0C0C0',
+    'FERIADO': 'FF000000',
+    'FÉRIAS-BH': 'FF000000',
+    'DESLIGADO': 'FF800080',
+    'DESCANSO': 'FFC0C0C0'
+}
+
+
+def montar_dados(linhas, dias, semente=7):
+    rng = np.random.default_rng(semente)
+    datas = [datetime.date(2025, 1, 1) + datetime.timedelta(days=i) for i in range(dias)]
+    mapa_datas = {d: d.strftime('%d/%m') for d in datas}
+    df = pd.DataFrame({
+        'NOME': [f'COLABORADOR {i}' for i in range(linhas)],
+        'FUNÇÃO': 'AUXILIAR',
+        'AREA': rng.choice(['M&A', 'CRDK D&E LCFA | CD-RJ'], linhas),
+        'GESTOR': rng.choice([f'GESTOR {g}' for g in range(20)], linhas),
+    })
+    marcas = rng.choice(np.array(['P', 'P', 'P', 'FI', 'FA', 'D', 'FÉRIAS-BH', 'DESLIGADO', None], dtype=object),
+                        (linhas, dias))
+    for j, d in enumerate(datas):
+        df[mapa_datas[d]] = marcas[:, j]
+
+    matriz = MatrizPresenca(df, mapa_datas)
+    matriz.marcar_feriados({datas[0]: 'Confraternização Universal'})
+    if linhas:
+        matriz.marcar_afastamentos({0: [(0, min(dias, 20) - 1)]})
+    return matriz.para_dataframe(), matriz
+
+
+def gravar_celula_a_celula(df, matriz):
+    """Caminho antigo: to_excel + PatternFill/Font novos para cada célula (referência)."""
+    # Borda fina do cabeçalho do to_excel no pandas 2.x (o pandas 3 não grava mais),
+    # aplicada aqui para a referência não depender da versão do pandas
+    lado = Side(style='thin')
+    out = io.BytesIO()
+    with pd.ExcelWriter(out, engine='openpyxl') as w:
+        df.to_excel(w, index=False, sheet_name='Dados')
+        ws = w.sheets['Dados']
+        for col_idx in range(1, len(df.columns) + 1):
+            cell = ws.cell(row=1, column=col_idx)
+            cell.fill = PatternFill(start_color='FF0D4F45', end_color='FF0D4F45', fill_type='solid')
+            cell.font = Font(bold=True, color='FFFFFFFF', size=11)
+            cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
+            cell.border = Border(left=lado, right=lado, top=lado, bottom=lado)
+        for col_idx, col_name in enumerate(df.columns, 1):
+            if col_name in ('NOME', 'AREA', 'GESTOR'):
+                for row_idx in range(2, ws.max_row + 1):
+                    ws.cell(row=row_idx, column=col_idx).fill = PatternFill(start_color='FFF0F0F0', end_color='FFF0F0F0', fill_type='solid')
+        for j, col_data in enumerate(matriz.colunas_datas):
+            col_idx = list(df.columns).index(col_data) + 1
+            for row_idx in range(2, ws.max_row + 1):
+                cell = ws.cell(row=row_idx, column=col_idx)
+                cell.number_format = 'DD/MM'
+                valor = str(cell.value).strip() if cell.value else ''
+                if matriz.afastado[row_idx - 2, j]:
+                    cell.fill = PatternFill(start_color=MAPA_CORES['Afastamento'], end_color=MAPA_CORES['Afastamento'], fill_type='solid')
+                    if valor == 'FERIADO':
+                        cell.font = Font(color='FFFFFFFF')
+                    continue
+                chave = {'D': 'DESCANSO'}.get(valor, valor)
+                if chave in MAPA_CORES:
+                    cell.fill = PatternFill(start_color=MAPA_CORES[chave], end_color=MAPA_CORES[chave], fill_type='solid')
+                    if valor in ('FI', 'FÉRIAS-BH', 'DESLIGADO', 'FERIADO'):
+                        cell.font = Font(color='FFFFFFFF')
+    return out.getvalue()
+
+
+def gravar_estilos_compartilhados(df, matriz):
+    out = io.BytesIO()
+    with pd.ExcelWriter(out, engine='openpyxl') as w:
+        renderizar_aba_dados(w.book, df, matriz, MAPA_CORES)
+    return out.getvalue()
+
+
+def _cor_fonte(cell):
+    # Cor de tema (fonte padrão) e fonte sem cor aparecem iguais (texto preto)
+    cor = cell.font.color
+    return cor.rgb if cor is not None and cor.type == 'rgb' else None
+
+
+def _bordas(cell):
+    borda = cell.border
+    return tuple(lado.style if lado is not None else None for lado in (borda.left, borda.right, borda.top, borda.bottom))
+
+
+def aparencia(conteudo):
+    """Valor e estilo resolvido de cada célula da aba Dados."""
+    ws = load_workbook(io.BytesIO(conteudo))['Dados']
+    return [
+        (
+            c.value,
+            c.fill.fill_type, c.fill.start_color.rgb,
+            bool(c.font.bold), _cor_fonte(c),
+            c.alignment.horizontal, c.alignment.vertical, bool(c.alignment.wrap_text),
+            _bordas(c),
+            c.number_format,
+        )
+        for row in ws.iter_rows() for c in row
+    ]
+
+
+@pytest.mark.parametrize('linhas, dias, semente', [
+    (60, 31, 7),
+    (25, 10, 8),
+    (1, 45, 9),
+])
+def test_aparencia_igual_a_celula_a_celula(linhas, dias, semente):
+    df, matriz = montar_dados(linhas, dias, semente)
+    antigo = aparencia(gravar_celula_a_celula(df, matriz))
+    novo = aparencia(gravar_estilos_compartilhados(df, matriz))
+    assert len(novo) == len(antigo)
+    for celula_antiga, celula_nova in zip(antigo, novo):
+        assert celula_nova == celula_antiga
+
+
+def test_cabecalho_com_borda_fina():
+    df, matriz = montar_dados(5, 7)
+    ws = load_workbook(io.BytesIO(gravar_estilos_compartilhados(df, matriz)))['Dados']
+    assert all(_bordas(c) == ('thin',) * 4 for c in ws[1])
+
+
+def medir(funcao, *args, repeticoes=3):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao(*args)
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos), resultado
+
+
+if __name__ == '__main__':
+    linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 1500
+    dias = int(sys.argv[2]) if len(sys.argv) > 2 else 31
+    df, matriz = montar_dados(linhas, dias)
+
+    t_antigo, arq_antigo = medir(gravar_celula_a_celula, df, matriz)
+    t_novo, arq_novo = medir(gravar_estilos_compartilhados, df, matriz)
+
+    print(f"{linhas} linhas x {dias} dias")
+    print(f"célula a célula:        {t_antigo:7.2f}s  {len(arq_antigo) / 1024:8.1f} KB")
+    print(f"estilos compartilhados: {t_novo:7.2f}s  {len(arq_novo) / 1024:8.1f} KB")
+    print(f"aparência idêntica: {aparencia(arq_antigo) == aparencia(arq_novo)}")
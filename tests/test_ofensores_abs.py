@@ -0,0 +1,134 @@
+"""
+Equivalência dos totais do relatório Ofensores de ABS com o laço antigo
+O laço de processar_analise (para cada período e gestor, filtra a mestra e
+percorre as células com iterrows) fica aqui como referência;
+TabelaFatosAbs.resumo_por_gestor precisa dar os mesmos TOTAL_COLAB, FI, FA e
+COLAB_COM_FALTAS para todos os gestores em todos os períodos.
+
+Medição de tempo: python tests/test_ofensores_abs.py [linhas] [dias] [gestores]
+"""
+
+import datetime
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from funcoes_fatos_abs import TabelaFatosAbs
+from funcoes_matriz_presenca import MatrizPresenca
+
+
+def montar_dados(linhas, dias, qtd_gestores, semente=11):
+    rng = np.random.default_rng(semente)
+    datas = [datetime.date(2025, 1, 1) + datetime.timedelta(days=i) for i in range(dias)]
+    mapa_datas = {d: d.strftime('%d/%m') for d in datas}
+    df = pd.DataFrame({
+        'NOME': [f'COLABORADOR {i}' for i in range(linhas)],
+        'FUNÇÃO': 'AUXILIAR',
+        'AREA': rng.choice(['M&A', 'CRDK D&E LCFA | CD-RJ'], linhas),
+        'GESTOR': rng.choice(np.array([f'GESTOR {g}' for g in range(qtd_gestores)] + [None], dtype=object), linhas),
+        'TURNO': rng.choice(['1º TURNO', '2º TURNO', '3º TURNO'], linhas),
+    })
+    marcas = rng.choice(np.array(['P', 'P', 'P', 'FI', 'FA', ' fa', 'D', 'FERIADO', 'DESLIGADO', None], dtype=object),
+                        (linhas, dias))
+    for j, d in enumerate(datas):
+        df[mapa_datas[d]] = marcas[:, j]
+
+    afastamentos = {int(linha): [(0, min(dias, 16) - 1)]
+                    for linha in rng.choice(linhas, max(1, linhas // 50), replace=False)} if linhas else {}
+
+    # Período inteiro + semanas de 7 dias, como no relatório
+    colunas = [mapa_datas[d] for d in datas]
+    periodos = {'PERÍODO INTEIRO': colunas}
+    for inicio in range(0, dias, 7):
+        periodos[f'SEMANA {inicio // 7 + 1}'] = colunas[inicio:inicio + 7]
+    return df, mapa_datas, afastamentos, periodos
+
+
+def totais_laco_antigo(df, afastamentos, periodos):
+    """Caminho antigo de processar_analise (sem o gênero), um período por vez (referência)."""
+    gestores = sorted(g for g in df['GESTOR'].dropna().unique() if str(g).strip())
+    resultado = {}
+    for rotulo, colunas_processar in periodos.items():
+        for gestor in gestores:
+            colaboradores_gestor = df[df['GESTOR'] == gestor]
+            total_fi = 0
+            total_fa = 0
+            for idx, row in colaboradores_gestor.iterrows():
+                tem_afastamento = idx in afastamentos
+                for col_data in colunas_processar:
+                    valor = str(row[col_data]).strip().upper() if pd.notna(row[col_data]) else ''
+                    if valor == 'FERIADO':
+                        continue
+                    if valor == 'FI':
+                        total_fi += 1
+                    elif valor == 'FA' and not tem_afastamento:
+                        total_fa += 1
+
+            colab_com_faltas = 0
+            for idx, row in colaboradores_gestor.iterrows():
+                tem_afastamento = idx in afastamentos
+                for col_data in colunas_processar:
+                    valor = str(row[col_data]).strip().upper() if pd.notna(row[col_data]) else ''
+                    if valor == 'FI' or (valor == 'FA' and not tem_afastamento):
+                        colab_com_faltas += 1
+                        break
+
+            resultado[(rotulo, gestor)] = (len(colaboradores_gestor), total_fi, total_fa, colab_com_faltas)
+    return resultado
+
+
+def totais_groupby(df, mapa_datas, afastamentos, periodos):
+    fatos = TabelaFatosAbs(MatrizPresenca(df, mapa_datas), afastamentos)
+    resumo = fatos.resumo_por_gestor(periodos)
+    return {
+        chave: (linha.TOTAL_COLAB, linha.FI, linha.FA, linha.COLAB_COM_FALTAS)
+        for chave, linha in zip(resumo.index, resumo.itertuples(index=False))
+    }
+
+
+@pytest.mark.parametrize('linhas, dias, qtd_gestores, semente', [
+    (120, 31, 8, 1),
+    (200, 28, 15, 2),
+    (60, 10, 3, 3),
+    (80, 45, 1, 4),
+])
+def test_totais_iguais_ao_laco_antigo(linhas, dias, qtd_gestores, semente):
+    df, mapa_datas, afastamentos, periodos = montar_dados(linhas, dias, qtd_gestores, semente)
+    assert totais_groupby(df, mapa_datas, afastamentos, periodos) == totais_laco_antigo(df, afastamentos, periodos)
+
+
+def test_mestra_sem_gestor():
+    df, mapa_datas, afastamentos, periodos = montar_dados(30, 14, 3)
+    df = df.drop(columns=['GESTOR'])
+    resumo = TabelaFatosAbs(MatrizPresenca(df, mapa_datas), afastamentos).resumo_por_gestor(periodos)
+    assert resumo.empty
+
+
+def medir(funcao, *args, repeticoes=3):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        resultado = funcao(*args)
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos), resultado
+
+
+if __name__ == '__main__':
+    linhas = int(sys.argv[1]) if len(sys.argv) > 1 else 1500
+    dias = int(sys.argv[2]) if len(sys.argv) > 2 else 31
+    qtd_gestores = int(sys.argv[3]) if len(sys.argv) > 3 else 40
+    df, mapa_datas, afastamentos, periodos = montar_dados(linhas, dias, qtd_gestores)
+
+    t_antigo, totais_antigos = medir(totais_laco_antigo, df, afastamentos, periodos, repeticoes=1)
+    t_novo, totais_novos = medir(totais_groupby, df, mapa_datas, afastamentos, periodos)
+
+    print(f"{linhas} linhas x {dias} dias, {qtd_gestores} gestores, {len(periodos)} períodos")
+    print(f"laço por gestor (iterrows): {t_antigo:7.2f}s")
+    print(f"groupby (tabela de fatos):  {t_novo:7.2f}s")
+    print(f"totais idênticos: {totais_antigos == totais_novos}")